@@ -0,0 +1,354 @@
+"""
+Admission control voor LLM calls.
+
+Bij een piek in het verkeer wordt elk chat bericht een losse upstream
+completion, tot OpenAI rate limits teruggeeft. LLMAdmissionController zit
+vóór elke LLM call en:
+
+- begrenst het aantal gelijktijdige upstream calls; de rest wacht in een
+  begrensde queue tot een deadline, daarna volgt een nette afwijzing
+- voegt identieke, gelijktijdige verzoeken samen (coalescing): één
+  upstream call, alle wachtenden krijgen hetzelfde antwoord of dezelfde
+  token stream; een stream loopt door zolang er nog iemand luistert
+- past per gebruiker een token bucket toe
+- houdt queue wait, afwijzingen en upstream latency bij
+
+Usage:
+
+    controller = get_admission_controller()
+    reply = await controller.call(key, user_id, lambda: client.chat.completions.create(...))
+
+    async for delta in controller.stream(key, user_id, produce_deltas):
+        ...
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+
+from app.auth import User
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_QUEUE_TIMEOUT = 5.0
+DEFAULT_USER_RATE = 0.5     # tokens per seconde
+DEFAULT_USER_BURST = 5
+# Aantal eigen proxies vóór de app; alleen hun X-Forwarded-For hops zijn te vertrouwen
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+MAX_TRACKED_USERS = 10000
+
+BUSY_MESSAGE = "The dealer is a little busy right now. Please try again in a moment."
+
+
+class AdmissionRejected(Exception):
+    """Verzoek niet toegelaten: queue vol, deadline verstreken of rate limited"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"LLM request rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self) -> int:
+        return 429 if self.reason == "rate_limited" else 503
+
+
+def request_key(messages: List[Dict[str, str]], **params: Any) -> str:
+    """Identieke verzoeken: exact dezelfde messages en model parameters"""
+    payload = json.dumps([messages, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def rejection_to_http(error: AdmissionRejected) -> HTTPException:
+    """429 (rate limited) of 503 (vol) met Retry-After voor de JSON routes"""
+    print(f"⏳ LLM request rejected: {error.reason}")
+    return HTTPException(
+        status_code=error.status_code,
+        detail=BUSY_MESSAGE,
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+    )
+
+
+def client_identity(request: Request, user: Optional[User] = None) -> str:
+    """Sleutel voor de rate limit: de geverifieerde uid, anders het client IP"""
+    if user is not None:
+        return f"user:{user.sub}"
+    return f"ip:{client_ip(request)}"
+
+
+def client_ip(request: Request) -> str:
+    """Client IP; X-Forwarded-For alleen voor zover onze eigen proxies het zetten
+
+    De client kan zelf hops vooraan in de header zetten. Elke proxy voegt
+    achteraan het adres toe waar hij de request van kreeg, dus met N eigen
+    proxies is de N-de hop van achteren de echte client.
+    """
+    forwarded = request.headers.get("x-forwarded-for")
+    if TRUSTED_PROXY_HOPS and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+
+class _TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class _Flight:
+    """Eén lopende upstream call waar meerdere verzoeken op meeliften"""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self.listeners = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: Any) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class LLMAdmissionController:
+    """Concurrency cap + queue, coalescing en per-user token buckets"""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        user_rate: Optional[float] = None,
+        user_burst: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)
+        )
+        self.max_queue = max_queue if max_queue is not None else int(
+            os.getenv("LLM_MAX_QUEUE", DEFAULT_MAX_QUEUE)
+        )
+        self.queue_timeout = queue_timeout or float(
+            os.getenv("LLM_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT)
+        )
+        # 0 = geen per-user limiet
+        self.user_rate = user_rate if user_rate is not None else float(
+            os.getenv("LLM_USER_RATE", DEFAULT_USER_RATE)
+        )
+        self.user_burst = user_burst or float(os.getenv("LLM_USER_BURST", DEFAULT_USER_BURST))
+
+        self._active = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._flights: Dict[str, _Flight] = {}
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._lock = threading.Lock()
+
+        self.admitted = 0
+        self.coalesced = 0
+        self.rejected = {"queue_full": 0, "deadline": 0, "rate_limited": 0}
+        self.upstream_errors = 0
+        self._queue_wait_ms: deque = deque(maxlen=1000)
+        self._upstream_ms: deque = deque(maxlen=1000)
+
+    # --- Per-user token bucket ---
+    def check_rate(self, user_id: Optional[str]) -> None:
+        if not user_id or not self.user_rate:
+            return
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_USERS:
+                    # Volle buckets zijn niet te onderscheiden van nieuwe; weg ermee
+                    self._buckets = {
+                        uid: b for uid, b in self._buckets.items()
+                        if b.tokens + (now - b.updated) * self.user_rate < self.user_burst
+                    }
+                bucket = self._buckets[user_id] = _TokenBucket(self.user_burst, now)
+            bucket.tokens = min(self.user_burst, bucket.tokens + (now - bucket.updated) * self.user_rate)
+            bucket.updated = now
+            if bucket.tokens < 1:
+                self.rejected["rate_limited"] += 1
+                raise AdmissionRejected("rate_limited", (1 - bucket.tokens) / self.user_rate)
+            bucket.tokens -= 1
+
+    # --- Concurrency slots ---
+    @asynccontextmanager
+    async def slot(self):
+        """Een upstream slot; wacht in de queue tot de deadline"""
+        started = time.perf_counter()
+        if self._active >= self.max_concurrency or self._waiters:
+            if len(self._waiters) >= self.max_queue:
+                self.rejected["queue_full"] += 1
+                raise AdmissionRejected("queue_full", self.queue_timeout)
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            except BaseException as e:
+                # Deadline of client disconnect tijdens het wachten
+                if waiter.done() and not waiter.cancelled():
+                    # Slot kwam net op tijd vrij; doorgeven aan de volgende
+                    self._release()
+                else:
+                    waiter.cancel()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.rejected["deadline"] += 1
+                    raise AdmissionRejected("deadline", self.queue_timeout)
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            # Het slot is door _release al aan ons overgedragen
+        else:
+            self._active += 1
+
+        self.admitted += 1
+        self._queue_wait_ms.append((time.perf_counter() - started) * 1000)
+        upstream_started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.upstream_errors += 1
+            raise
+        finally:
+            self._upstream_ms.append((time.perf_counter() - upstream_started) * 1000)
+            self._release()
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Slot direct overdragen, zodat niemand voor kan dringen
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    # --- Admission + coalescing ---
+    async def call(self, key: Optional[str], user_id: Optional[str], fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Voer `fn()` uit als upstream call, gedeeld met identieke lopende verzoeken"""
+        async def produce():
+            yield await fn()
+
+        async with aclosing(self.stream(key, user_id, produce)) as results:
+            async for result in results:
+                return result
+
+    async def stream(
+        self, key: Optional[str], user_id: Optional[str], produce: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """Zoals `call`, maar voor een stream: meeliftende verzoeken krijgen dezelfde chunks
+
+        De upstream call loopt in een eigen task, los van de client die hem
+        startte. Haakt die client af, dan lopen de andere luisteraars gewoon
+        door; pas als niemand meer luistert wordt de upstream call afgebroken.
+        Elke aanroeper, ook een meelifter, telt mee voor zijn eigen rate limit.
+        """
+        self.check_rate(user_id)
+        flight = self._flights.get(key) if key else None
+        if flight is not None:
+            self.coalesced += 1
+            flight.followers += 1
+        else:
+            flight = _Flight()
+            if key:
+                self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight, produce))
+
+        flight.listeners += 1
+        try:
+            async for chunk in flight.follow():
+                yield chunk
+        finally:
+            flight.listeners -= 1
+            if not flight.listeners and not flight.done:
+                # Niemand luistert meer; nieuwe verzoeken starten een eigen call
+                if key and self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _run(self, key: Optional[str], flight: _Flight, produce: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async with self.slot():
+                async for chunk in produce():
+                    flight.publish(chunk)
+            flight.finish()
+        except BaseException as e:
+            flight.finish(e if isinstance(e, Exception) else AdmissionRejected("cancelled", 0))
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            if key and self._flights.get(key) is flight:
+                del self._flights[key]
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 1)
+
+    def stats(self) -> Dict[str, Any]:
+        queue_wait, upstream = list(self._queue_wait_ms), list(self._upstream_ms)
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "coalesced": self.coalesced,
+            "rejected": dict(self.rejected),
+            "upstream_errors": self.upstream_errors,
+            "queue_wait_ms_p50": self._percentile(queue_wait, 50),
+            "queue_wait_ms_p99": self._percentile(queue_wait, 99),
+            "upstream_ms_p50": self._percentile(upstream, 50),
+            "upstream_ms_p99": self._percentile(upstream, 99),
+        }
+
+
+# --- Shared instance ---
+_controller: Optional[LLMAdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> LLMAdmissionController:
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = LLMAdmissionController()
+        return _controller
@@ -0,0 +1,173 @@
+"""
+Eén langlevende LLM client voor de hele applicatie.
+
+Een nieuwe `OpenAI(...)` per bericht betekent per bericht een nieuwe
+connection pool en vaak een verse TLS handshake. LLMClientManager maakt in
+de FastAPI lifespan één AsyncOpenAI client aan op een getunede
+`httpx.AsyncClient` (keep-alive, HTTP/2, begrensde pool) en sluit die netjes
+af bij shutdown.
+
+Usage:
+
+    from app.apis.ai_chat.client import get_llm_client
+
+    client = get_llm_client()
+    response = await client.chat.completions.create(...)
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_RETRIES = 2
+
+PLACEHOLDER_API_KEY = "sk-your-openai-api-key-here"
+
+
+def http2_available() -> bool:
+    """HTTP/2 in httpx vereist het optionele `h2` package"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class LLMClientManager:
+    """Beheert de gedeelde AsyncOpenAI client en zijn connection pool"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        verify: Any = True,
+    ):
+        from openai import AsyncOpenAI
+
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key or api_key == PLACEHOLDER_API_KEY:
+            raise ValueError("OPENAI_API_KEY environment variable not set or using placeholder")
+
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.max_connections = max_connections or int(
+            os.getenv("LLM_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)
+        )
+        self.max_keepalive = max_keepalive or int(
+            os.getenv("LLM_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE)
+        )
+        self.keepalive_expiry = keepalive_expiry or float(
+            os.getenv("LLM_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)
+        )
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", DEFAULT_TIMEOUT))
+        if http2 is None:
+            http2 = os.getenv("LLM_HTTP2", "1").lower() not in ("0", "false", "no")
+        if http2 and not http2_available():
+            print("⚠️ h2 package not installed, LLM client falls back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        max_retries = max_retries if max_retries is not None else int(
+            os.getenv("LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+        )
+
+        self.http_client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=DEFAULT_CONNECT_TIMEOUT),
+            # Eigen CA bundle (bijv. achter een TLS proxy); anders certifi
+            verify=verify,
+        )
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=self.base_url,
+            http_client=self.http_client,
+            max_retries=max_retries,
+        )
+        # Pooled connecties horen bij de event loop waarop ze zijn geopend
+        self.loop = _running_loop()
+
+    @property
+    def closed(self) -> bool:
+        return self.http_client.is_closed
+
+    async def aclose(self) -> None:
+        """Sluit alle keep-alive connecties.
+
+        uvicorn rondt lopende requests af voordat de lifespan shutdown draait,
+        dus hier zijn geen streams meer actief.
+        """
+        if not self.closed:
+            await self.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": str(self.client.base_url),
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+            "keepalive_expiry": self.keepalive_expiry,
+            "closed": self.closed,
+        }
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+# --- Application scoped instance ---
+_manager: Optional[LLMClientManager] = None
+
+
+async def start_llm_client() -> Optional[LLMClientManager]:
+    """Maak de gedeelde client aan (vanuit de lifespan)"""
+    global _manager
+    if _manager is None or _manager.closed:
+        try:
+            _manager = LLMClientManager()
+        except ValueError as e:
+            print(f"⚠️ LLM client not started: {e}")
+            return None
+    return _manager
+
+
+async def stop_llm_client() -> None:
+    global _manager
+    if _manager is not None:
+        await _manager.aclose()
+        _manager = None
+
+
+def get_llm_manager() -> LLMClientManager:
+    """Gedeelde manager; wordt lazy aangemaakt als de lifespan niet draaide"""
+    global _manager
+    loop = _running_loop()
+    if _manager is None or _manager.closed or (loop is not None and _manager.loop not in (None, loop)):
+        # Raises ValueError als OPENAI_API_KEY ontbreekt
+        _manager = LLMClientManager()
+    if _manager.loop is None:
+        _manager.loop = loop
+    return _manager
+
+
+def get_llm_client():
+    """Gedeelde AsyncOpenAI client"""
+    return get_llm_manager().client
@@ -0,0 +1,200 @@
+"""
+Chat context binnen een token budget.
+
+De frontend stuurt de laatste berichten mee, zonder naar hun lengte te
+kijken: één geplakt essay blaast de prompt (en de latency) op.
+ContextBuilder telt tokens lokaal en bouwt de messages lijst binnen een
+vast input budget:
+
+- elk bericht wordt afgekapt op CHAT_MESSAGE_MAX_TOKENS
+- history wordt van nieuw naar oud toegevoegd zolang het budget het toelaat
+- oudere beurten die niet meer passen worden samengevat in één korte
+  system notitie (extractief, zonder extra LLM call)
+
+Per request wordt bijgehouden hoeveel tokens dat scheelt.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from .tokens import TOKENS_PER_MESSAGE, TOKENS_PER_REQUEST, count_tokens, truncate_to_tokens
+
+DEFAULT_BUDGET = 400
+DEFAULT_MESSAGE_MAX_TOKENS = 200
+DEFAULT_MAX_HISTORY = 6
+DEFAULT_SUMMARY_TOKENS = 60
+SUMMARY_SNIPPET_TOKENS = 16
+
+
+@dataclass
+class ChatContext:
+    messages: List[Dict[str, str]]
+    prompt_tokens: int
+    original_tokens: int
+    truncated: int = 0
+    summarized: int = 0
+    dropped: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.original_tokens - self.prompt_tokens)
+
+
+@dataclass
+class _Turn:
+    role: str
+    content: str
+
+
+class ContextBuilder:
+    """Bouwt system + history + bericht binnen een input token budget"""
+
+    def __init__(
+        self,
+        budget: Optional[int] = None,
+        message_max_tokens: Optional[int] = None,
+        max_history: Optional[int] = None,
+        summary_tokens: Optional[int] = None,
+    ):
+        self.budget = budget or int(os.getenv("CHAT_CONTEXT_BUDGET", DEFAULT_BUDGET))
+        self.message_max_tokens = message_max_tokens or int(
+            os.getenv("CHAT_MESSAGE_MAX_TOKENS", DEFAULT_MESSAGE_MAX_TOKENS)
+        )
+        self.max_history = max_history or int(os.getenv("CHAT_MAX_HISTORY", DEFAULT_MAX_HISTORY))
+        self.summary_tokens = summary_tokens if summary_tokens is not None else int(
+            os.getenv("CHAT_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS)
+        )
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.tokens_saved = 0
+        self.truncated = 0
+        self.summarized = 0
+
+    def build(
+        self,
+        system_messages: Sequence[Dict[str, str]],
+        history: Sequence[Any],
+        message: str,
+    ) -> ChatContext:
+        """`history` mag dicts of objecten met `.role` / `.content` bevatten"""
+        turns = [_Turn(*_role_content(m)) for m in history]
+        original = TOKENS_PER_REQUEST + sum(
+            TOKENS_PER_MESSAGE + count_tokens(t.content) for t in turns
+        ) + sum(TOKENS_PER_MESSAGE + count_tokens(m["content"]) for m in system_messages)
+        original += TOKENS_PER_MESSAGE + count_tokens(message)
+
+        truncated = 0
+        user_text = truncate_to_tokens(message, self.message_max_tokens)
+        truncated += user_text != message
+        used = TOKENS_PER_REQUEST + TOKENS_PER_MESSAGE + count_tokens(user_text)
+        used += sum(TOKENS_PER_MESSAGE + count_tokens(m["content"]) for m in system_messages)
+
+        window_start = max(0, len(turns) - self.max_history)
+        window = [truncate_to_tokens(t.content, self.message_max_tokens) for t in turns[window_start:]]
+        costs = [TOKENS_PER_MESSAGE + count_tokens(content) for content in window]
+
+        # Past niet alles, dan ruimte vrijhouden voor de samenvatting
+        history_budget = self.budget
+        if self.summary_tokens and (window_start or used + sum(costs) > self.budget):
+            history_budget -= TOKENS_PER_MESSAGE + self.summary_tokens
+
+        # Nieuwste beurten eerst, tot het budget of het maximum aantal berichten op is
+        kept: List[_Turn] = []
+        cut = window_start
+        for i in range(len(turns) - 1, window_start - 1, -1):
+            turn = turns[i]
+            content, cost = window[i - window_start], costs[i - window_start]
+            if used + cost > history_budget:
+                cut = i + 1
+                break
+            truncated += content != turn.content
+            kept.append(_Turn(turn.role, content))
+            used += cost
+        older = turns[:cut]
+        kept.reverse()
+
+        summary = None
+        summarized = 0
+        if older and self.summary_tokens:
+            summary, summarized = self._summarize(older, min(self.summary_tokens, self.budget - used - TOKENS_PER_MESSAGE))
+            if summary:
+                used += TOKENS_PER_MESSAGE + count_tokens(summary["content"])
+
+        messages = list(system_messages)
+        if summary:
+            messages.append(summary)
+        messages.extend({"role": t.role, "content": t.content} for t in kept)
+        messages.append({"role": "user", "content": user_text})
+
+        context = ChatContext(
+            messages=messages,
+            prompt_tokens=used,
+            original_tokens=original,
+            truncated=truncated,
+            summarized=summarized,
+            dropped=len(older) - summarized,
+        )
+        self._record(context)
+        return context
+
+    def _summarize(self, turns: List[_Turn], max_tokens: int):
+        """Korte extractieve samenvatting van oudere beurten"""
+        if max_tokens <= SUMMARY_SNIPPET_TOKENS:
+            return None, 0
+        header = "Earlier in this conversation:"
+        lines = []
+        used = count_tokens(header)
+        # Meest recente van de oude beurten zijn het meest relevant
+        for turn in reversed(turns):
+            speaker = "Player" if turn.role == "user" else "You"
+            line = f"{speaker}: {truncate_to_tokens(' '.join(turn.content.split()), SUMMARY_SNIPPET_TOKENS)}"
+            cost = count_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            lines.append(line)
+            used += cost
+        if not lines:
+            return None, 0
+        lines.reverse()
+        return {"role": "system", "content": header + "\n" + "\n".join(lines)}, len(lines)
+
+    def _record(self, context: ChatContext) -> None:
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += context.prompt_tokens
+            self.tokens_saved += context.tokens_saved
+            self.truncated += context.truncated
+            self.summarized += context.summarized
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "requests": self.requests,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.requests, 1) if self.requests else 0,
+            "tokens_saved": self.tokens_saved,
+            "truncated_messages": self.truncated,
+            "summarized_turns": self.summarized,
+        }
+
+
+def _role_content(message: Any):
+    if isinstance(message, dict):
+        return message["role"], message.get("content") or ""
+    return message.role, message.content or ""
+
+
+# --- Shared instance ---
+_builder: Optional[ContextBuilder] = None
+_builder_lock = threading.Lock()
+
+
+def get_context_builder() -> ContextBuilder:
+    global _builder
+    with _builder_lock:
+        if _builder is None:
+            _builder = ContextBuilder()
+        return _builder
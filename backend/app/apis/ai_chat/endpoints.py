@@ -1,74 +1,45 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-import openai
-import os
+from typing import Optional
+from app.auth import OptionalUser
+from .admission import AdmissionRejected, client_identity, rejection_to_http
+from .sessions import SessionExpiredError, valid_session_id
+from .streaming import SESSION_EXPIRED_MESSAGE, StreamChatRequest, complete_reply
 
 chat_router = APIRouter()
 
-class ChatMessage(BaseModel):
-    role: str
-    content: str
+SCORE_INSTRUCTION_MESSAGE = {
+    "role": "system",
+    "content": "When discussing the game, always mention current scores when relevant (e.g., 'You have 15, I have 3')."
+}
 
-class ChatRequest(BaseModel):
-    message: str
-    history: List[ChatMessage] = []
+class ChatRequest(StreamChatRequest):
     outfit_stage_index: int = 0
 
 class ChatResponse(BaseModel):
     reply: str
+    session_id: Optional[str] = None
+    cached: bool = False
 
 @chat_router.post("/send-message", response_model=ChatResponse)
-async def send_chat_message(request: ChatRequest):
+async def send_chat_message(request: ChatRequest, http_request: Request, user: OptionalUser):
     """
     Send a message to the AI chat system and get a response
     """
+    if request.session_id is not None and not valid_session_id(request.session_id):
+        raise HTTPException(status_code=400, detail="Invalid chat session id")
+    
     try:
-        # Get OpenAI API key from environment
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            raise HTTPException(status_code=500, detail="OpenAI API key not configured")
-        
-        # Set up OpenAI client
-        client = openai.OpenAI(api_key=openai_api_key)
-        
-        # Define personality prompts for different outfit stages
-        personality_prompts = [
-            "I am Emma, your sophisticated blackjack dealer with natural charm. I'm warm, professional, and subtly playful. I use gentle flirtation and encouragement. When discussing the game, I always mention current scores when relevant (e.g., 'You have 15, I have 3'). Keep responses under 15 words.",
-            "I am Emma wearing elegant cocktail attire. I'm charming, witty, and slightly more intimate. I compliment your decisions and create romantic tension. When discussing the game, I always mention current scores when relevant (e.g., 'You have 15, I have 3'). Keep responses under 15 words.",
-            "I am Emma in casual but stylish wear. I'm approachable, fun, and flirtatiously encouraging. I tease playfully about your luck and skills. When discussing the game, I always mention current scores when relevant (e.g., 'You have 15, I have 3'). Keep responses under 15 words.",
-            "I am Emma in sporty, confident attire. I'm energetic, bold, and confidently flirty. I celebrate your wins with enthusiasm and motivate you during losses. When discussing the game, I always mention current scores when relevant (e.g., 'You have 15, I have 3'). Keep responses under 15 words.",
-            "I am Emma in stunning poolside attire. I'm confident, alluring, and playfully seductive. I use sultry compliments and create anticipation. When discussing the game, I always mention current scores when relevant (e.g., 'You have 15, I have 3'). Keep responses under 15 words.",
-            "I am Emma in luxurious, captivating attire. I'm sophisticated, mysterious, and irresistibly charming. I whisper sweet encouragements and sultry observations. When discussing the game, I always mention current scores when relevant (e.g., 'You have 15, I have 3'). Keep responses under 15 words."
-        ]
-        
-        # Select personality based on outfit stage
-        selected_prompt = personality_prompts[min(request.outfit_stage_index, len(personality_prompts) - 1)]
-        
-        # Build messages for OpenAI
-        messages = [
-            {"role": "system", "content": selected_prompt + " Please detect the language of the user's input and respond in the same language. If the language is unclear, default to English. IMPORTANT: Always include current game scores in your responses when discussing the game state."}
-        ]
-        
-        # Add chat history
-        for msg in request.history[-6:]:  # Keep only last 6 messages for context
-            messages.append({"role": msg.role, "content": msg.content})
-        
-        # Add current message
-        messages.append({"role": "user", "content": request.message})
-        
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            max_tokens=50,
-            temperature=0.8
-        )
-        
-        reply = response.choices[0].message.content.strip()
-        
-        return ChatResponse(reply=reply)
-        
+        # Same prompt, context budget, reply cache and sessions as /stream, plus this route's score rule
+        result = await complete_reply(request, client_identity(http_request, user), [SCORE_INSTRUCTION_MESSAGE])
+        return ChatResponse(**result)
+        
+    except AdmissionRejected as e:
+        # Busy is not an error: tell the client when to retry instead of a random fallback
+        raise rejection_to_http(e)
+    except SessionExpiredError:
+        # The server lost this session: the client resends its history
+        raise HTTPException(status_code=409, detail=SESSION_EXPIRED_MESSAGE)
     except Exception as e:
         print(f"AI Chat error: {e}")
         # Return a fallback response
@@ -0,0 +1,191 @@
+"""
+Voorgecompileerde system prompts per dealer × outfit stage × taal.
+
+Dealer documenten dragen hun eigen persona (`chatPersonalityPrompt` en per
+outfit stage een `personalityPrompt`). PromptRegistry bouwt daar één keer
+alle system prompts van, inclusief token telling, en bouwt alleen opnieuw
+als de dealer catalogus verandert. Chat routes doen per request alleen nog
+een dictionary lookup op `(dealer_id, stage, language)`.
+
+Prompts zijn opgebouwd van stabiel naar variabel (dealer persona, dan
+outfit stage, dan taal), zodat verzoeken voor dezelfde dealer een
+identieke prefix delen en upstream prompt caching kan werken.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .tokens import count_tokens
+
+DEFAULT_STAGE_PROMPTS = [
+    "I am a professional blackjack dealer with natural charm. I am warm, professional and subtly playful. I use gentle flirtation and encouragement. Keep responses under 15 words.",
+    "I am an elegant blackjack dealer in cocktail attire. I am charming, witty and more intimate. I compliment your decisions and create romantic tension. Keep responses under 15 words.",
+    "I am a casual but stylish blackjack dealer. I am approachable, fun and flirtatiously encouraging. I playfully tease about your luck and skills. Keep responses under 15 words.",
+    "I am a sporty, confident blackjack dealer. I am energetic, bold and confidently flirtatious. I celebrate your wins with enthusiasm. Keep responses under 15 words.",
+    "I am a beautiful blackjack dealer in swimwear. I am confident, seductive and playfully enticing. I use sensual compliments. Keep responses under 15 words.",
+    "I am a luxurious, captivating blackjack dealer. I am refined, mysterious and irresistibly charming. I whisper sweet encouragements. Keep responses under 15 words.",
+]
+
+AUTO_LANGUAGE = "auto"
+LANGUAGE_INSTRUCTIONS = {
+    AUTO_LANGUAGE: "IMPORTANT: Default to English responses. If you detect the user is speaking Dutch, respond in Dutch. If German, respond in German. If unclear or mixed languages, use English.",
+    "en": "IMPORTANT: Always respond in English.",
+    "nl": "IMPORTANT: Always respond in Dutch.",
+    "de": "IMPORTANT: Always respond in German.",
+}
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    dealer_id: Optional[str]
+    stage: int
+    language: str
+    text: str
+    tokens: int
+
+    @property
+    def message(self) -> Dict[str, str]:
+        return {"role": "system", "content": self.text}
+
+
+PromptKey = Tuple[Optional[str], int, str]
+
+
+def strategy_message(game_state: Any) -> Optional[Dict[str, str]]:
+    """System notitie met het voorberekende advies voor de huidige hand; None zonder (geldige) game state"""
+    if game_state is None:
+        return None
+    from app.game import Rules
+    from app.game.strategy import get_strategy_tables
+    try:
+        advice = get_strategy_tables().advise(
+            Rules(), game_state.player_total, game_state.dealer_upcard, game_state.soft,
+            game_state.pair, first_decision=game_state.cards <= 2,
+        )
+    except ValueError:
+        return None
+    return {
+        "role": "system",
+        "content": f"Basic strategy for the current hand: {advice.describe()}. "
+                   f"If you give a tip, it must match this advice.",
+    }
+
+
+def compile_stage_prompts(dealer: Optional[Dict[str, Any]]) -> List[str]:
+    """Persona + stage tekst (zonder taal) voor elke outfit stage van een dealer"""
+    if not dealer:
+        return list(DEFAULT_STAGE_PROMPTS)
+
+    prefix = []
+    if dealer.get("name"):
+        prefix.append(f"My name is {dealer['name']}.")
+    persona = (dealer.get("chatPersonalityPrompt") or "").strip()
+    if persona:
+        prefix.append(persona)
+
+    stages = dealer.get("outfitStages") or []
+    compiled = []
+    for stage in range(len(stages) or len(DEFAULT_STAGE_PROMPTS)):
+        stage_data = stages[stage] if stage < len(stages) and isinstance(stages[stage], dict) else {}
+        stage_prompt = (stage_data.get("personalityPrompt") or "").strip()
+        if not stage_prompt:
+            stage_prompt = DEFAULT_STAGE_PROMPTS[min(stage, len(DEFAULT_STAGE_PROMPTS) - 1)]
+        compiled.append(" ".join(prefix + [stage_prompt]))
+    return compiled
+
+
+class PromptRegistry:
+    """Alle system prompts, vooraf samengesteld en geteld"""
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._prompts: Dict[PromptKey, CompiledPrompt] = {}
+        self._stage_counts: Dict[Optional[str], int] = {}
+        self._sources: Dict[str, Dict[str, Any]] = {}
+        self.builds = 0
+        self.compiled_dealers = 0
+
+        self._defaults = self._compile(None, None)
+        self._prompts = dict(self._defaults)
+        self._stage_counts = {None: len(DEFAULT_STAGE_PROMPTS)}
+        if catalog is not None:
+            catalog.add_listener(self.rebuild)
+            self.rebuild()
+
+    def _compile(self, dealer_id: Optional[str], dealer: Optional[Dict[str, Any]]) -> Dict[PromptKey, CompiledPrompt]:
+        prompts = {}
+        for stage, stage_text in enumerate(compile_stage_prompts(dealer)):
+            for language, instruction in LANGUAGE_INSTRUCTIONS.items():
+                text = f"{stage_text} {instruction}"
+                prompts[(dealer_id, stage, language)] = CompiledPrompt(
+                    dealer_id, stage, language, text, count_tokens(text)
+                )
+        return prompts
+
+    def rebuild(self) -> None:
+        """Compileer prompts van gewijzigde dealers opnieuw"""
+        dealers = {d["id"]: d for d in self.catalog.list()} if self.catalog is not None else {}
+        with self._lock:
+            prompts = dict(self._defaults)
+            sources = {}
+            for dealer_id, dealer in dealers.items():
+                # De catalogus is copy-on-write: een ongewijzigde dealer is hetzelfde object
+                if self._sources.get(dealer_id) is dealer:
+                    prompts.update({k: v for k, v in self._prompts.items() if k[0] == dealer_id})
+                else:
+                    prompts.update(self._compile(dealer_id, dealer))
+                    self.compiled_dealers += 1
+                sources[dealer_id] = dealer
+
+            stage_counts: Dict[Optional[str], int] = {}
+            for dealer_id, stage, _ in prompts:
+                stage_counts[dealer_id] = max(stage_counts.get(dealer_id, 0), stage + 1)
+
+            self._prompts = prompts
+            self._sources = sources
+            self._stage_counts = stage_counts
+            self.builds += 1
+
+    def get(self, dealer_id: Optional[str], stage: Optional[int], language: Optional[str] = None) -> CompiledPrompt:
+        """System prompt voor een dealer; onbekende dealers krijgen de standaard persona"""
+        prompts, stage_counts = self._prompts, self._stage_counts
+        if dealer_id not in stage_counts:
+            dealer_id = None
+        stage = stage or 0
+        if stage < 0 or stage >= stage_counts[dealer_id]:
+            stage = 0
+        if language not in LANGUAGE_INSTRUCTIONS:
+            language = AUTO_LANGUAGE
+        return prompts.get((dealer_id, stage, language)) or self._defaults[(None, 0, language)]
+
+    def stats(self) -> Dict[str, Any]:
+        prompts = list(self._prompts.values())
+        return {
+            "prompts": len(prompts),
+            "dealers": len([d for d in self._stage_counts if d is not None]),
+            "builds": self.builds,
+            "compiled_dealers": self.compiled_dealers,
+            "max_tokens": max((p.tokens for p in prompts), default=0),
+        }
+
+
+# --- Shared instance ---
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Gedeelde registry, gekoppeld aan de dealer catalogus als die geladen is"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            catalog = None
+            try:
+                from app.catalog import get_dealer_catalog
+                catalog = get_dealer_catalog()
+            except Exception as e:
+                print(f"⚠️ Prompt registry without dealer catalog: {e}")
+            _registry = PromptRegistry(catalog)
+        return _registry
@@ -0,0 +1,170 @@
+"""
+Reply cache voor automatische dealer reacties.
+
+De frontend stuurt naast getypte berichten ook automatische game events
+(`message_type`, bijv. "game_event" of "conversation_starter"). Die
+prompts herhalen zich constant: dezelfde outfit stage, dezelfde korte
+history, dezelfde "You won!" trigger. ReplyCache bewaart per genormaliseerde
+(system prompts, getrimde history, bericht) hash een kleine pool van
+antwoorden:
+
+- zolang de pool nog niet vol is gaat het verzoek naar het model en wordt
+  het antwoord toegevoegd (variety pool)
+- daarna komt elk antwoord uit de pool, nooit twee keer achter elkaar
+  hetzelfde
+- entries verlopen na een TTL en de cache is begrensd (LRU)
+
+Getypte berichten (`user_typed`) worden nooit gecached.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_TTL = 6 * 3600
+DEFAULT_VARIETY = 4
+DEFAULT_HISTORY = 2
+DEFAULT_CACHEABLE_TYPES = "game_event,conversation_starter"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Hoofdletters en witruimte maken voor de cache key niet uit"""
+    return _WHITESPACE.sub(" ", (text or "").strip().lower())
+
+
+@dataclass
+class _Entry:
+    created: float
+    replies: List[str] = field(default_factory=list)
+    last_served: Optional[int] = None
+
+
+class ReplyCache:
+    """TTL + LRU cache met een pool van varianten per prompt"""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        variety: Optional[int] = None,
+        history_messages: Optional[int] = None,
+        cacheable_types: Optional[Iterable[str]] = None,
+    ):
+        self.max_entries = max_entries or int(os.getenv("REPLY_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+        self.ttl = ttl or float(os.getenv("REPLY_CACHE_TTL", DEFAULT_TTL))
+        self.variety = max(1, variety or int(os.getenv("REPLY_CACHE_VARIETY", DEFAULT_VARIETY)))
+        self.history_messages = history_messages if history_messages is not None else int(
+            os.getenv("REPLY_CACHE_HISTORY", DEFAULT_HISTORY)
+        )
+        if cacheable_types is None:
+            cacheable_types = os.getenv("REPLY_CACHE_TYPES", DEFAULT_CACHEABLE_TYPES).split(",")
+        self.cacheable_types = {t.strip() for t in cacheable_types if t.strip()}
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def is_cacheable(self, message_type: Optional[str]) -> bool:
+        return bool(message_type) and message_type in self.cacheable_types
+
+    def key(self, system_prompt: str, history: List[Dict[str, str]], message: str) -> str:
+        """Hash van genormaliseerde system prompt, laatste history berichten en bericht"""
+        trimmed = history[-self.history_messages:] if self.history_messages else []
+        payload = [
+            normalize_text(system_prompt),
+            [(m["role"], normalize_text(m["content"])) for m in trimmed],
+            normalize_text(message),
+        ]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+    def key_for_messages(self, messages: List[Dict[str, str]]) -> str:
+        """Key voor een complete OpenAI messages lijst (system..., history..., user)"""
+        # Alle system berichten vooraan tellen mee, ook het strategie advies na de dealer prompt
+        start = 0
+        while start < len(messages) - 1 and messages[start]["role"] == "system":
+            start += 1
+        system_prompt = "\n\n".join(m["content"] for m in messages[:start])
+        return self.key(system_prompt, messages[start:-1], messages[-1]["content"])
+
+    def get(self, key: str) -> Optional[str]:
+        """Een antwoord uit de pool, of None zolang de pool nog gevuld wordt"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None or len(entry.replies) < self.variety:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            choices = [i for i in range(len(entry.replies)) if i != entry.last_served] or [0]
+            entry.last_served = self._random.choice(choices)
+            self.hits += 1
+            return entry.replies[entry.last_served]
+
+    def put(self, key: str, reply: str) -> None:
+        reply = (reply or "").strip()
+        if not reply:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(created=time.monotonic())
+            self._entries.move_to_end(key)
+            if reply not in entry.replies and len(entry.replies) < self.variety:
+                entry.replies.append(reply)
+                self.fills += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "fills": self.fills,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# --- Shared instance ---
+_reply_cache: Optional[ReplyCache] = None
+_reply_cache_lock = threading.Lock()
+
+
+def get_reply_cache() -> ReplyCache:
+    global _reply_cache
+    with _reply_cache_lock:
+        if _reply_cache is None:
+            _reply_cache = ReplyCache()
+        return _reply_cache
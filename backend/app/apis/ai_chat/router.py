@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 from .endpoints import chat_router
+from .streaming import stream_router
 
 router = APIRouter(tags=["AI Chat"])
 router.include_router(chat_router, prefix="/chat")
+router.include_router(stream_router)
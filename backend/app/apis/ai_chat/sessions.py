@@ -0,0 +1,333 @@
+"""
+Chat sessies aan de serverkant.
+
+Zonder sessie stuurt de frontend bij elk bericht de recente history mee,
+die de backend telkens opnieuw met pydantic valideert. Met een
+`session_id` bewaart SessionStore de conversatie zelf: een request bevat
+alleen nog het nieuwe bericht, hoe lang de chat ook loopt.
+
+- per sessie een ring buffer van de laatste CHAT_SESSION_MESSAGES berichten
+- een in-memory LRU (CHAT_SESSION_SIZE sessies) met TTL voor actieve chats
+- daarachter een pluggable persistente backend; SQLiteSessionBackend als
+  CHAT_SESSION_DB een pad is (standaard alleen in-memory, zodat een proces
+  niet zomaar een database in zijn werkmap schrijft)
+
+Session ids komen van de client (UUID per chat), zodat er geen extra
+round trip nodig is om een sessie te openen. Heeft de server een sessie
+niet (meer), bijv. na een herstart, een LRU evictie of een request op een
+andere worker, terwijl de client hem voortzet (`resume_session`), dan
+volgt SessionExpiredError: de client stuurt dan zijn history opnieuw mee
+in plaats van dat de dealer zonder context verder praat.
+
+Verlopen sessies worden elke CHAT_SESSION_PURGE_INTERVAL seconden
+opgeruimd, in het geheugen en in de backend (start()/stop() in de lifespan).
+"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_MAX_SESSIONS = 5000
+DEFAULT_MAX_MESSAGES = 20
+DEFAULT_TTL = 24 * 3600
+DEFAULT_PURGE_INTERVAL = 3600.0
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+class SessionExpiredError(LookupError):
+    """De client zet een sessie voort die de server niet (meer) heeft"""
+
+
+def valid_session_id(session_id: Optional[str]) -> bool:
+    return bool(session_id) and _SESSION_ID.match(session_id) is not None
+
+
+class SessionBackend(ABC):
+    """Persistente opslag achter de in-memory LRU"""
+
+    @abstractmethod
+    def load(self, session_id: str, max_age: float) -> Optional[List[Dict[str, str]]]:
+        """De berichten van een sessie, of None als hij niet bestaat of ouder is dan `max_age`"""
+
+    @abstractmethod
+    def save(self, session_id: str, messages: List[Dict[str, str]]) -> None:
+        """Overschrijf de berichten van een sessie"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Verwijder een sessie"""
+
+    def purge(self, max_age: float) -> int:
+        """Verwijder sessies ouder dan `max_age` seconden; geeft het aantal terug"""
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Eén rij per sessie met de ring buffer als JSON; de database opent bij het eerste gebruik"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "session_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def load(self, session_id: str, max_age: float) -> Optional[List[Dict[str, str]]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT messages, updated FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def save(self, session_id: str, messages: List[Dict[str, str]]) -> None:
+        payload = json.dumps(messages, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO chat_sessions (session_id, messages, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET messages = excluded.messages, updated = excluded.updated",
+                (session_id, payload, time.time()),
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    def purge(self, max_age: float) -> int:
+        """Verwijder sessies die langer dan `max_age` seconden niet gebruikt zijn"""
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM chat_sessions WHERE updated < ?", (time.time() - max_age,)
+            ).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _Session:
+    __slots__ = ("messages", "touched")
+
+    def __init__(self, messages, max_messages: int):
+        self.messages: deque = deque(messages, maxlen=max_messages)
+        self.touched = time.monotonic()
+
+
+class SessionStore:
+    """In-memory LRU van ring buffers, met optionele persistente backend"""
+
+    def __init__(
+        self,
+        backend: Optional[SessionBackend] = None,
+        max_sessions: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        ttl: Optional[float] = None,
+        purge_interval: Optional[float] = None,
+    ):
+        self.backend = backend
+        self.max_sessions = max_sessions or int(os.getenv("CHAT_SESSION_SIZE", DEFAULT_MAX_SESSIONS))
+        self.max_messages = max_messages or int(os.getenv("CHAT_SESSION_MESSAGES", DEFAULT_MAX_MESSAGES))
+        self.ttl = ttl or float(os.getenv("CHAT_SESSION_TTL", DEFAULT_TTL))
+        self.purge_interval = purge_interval or float(
+            os.getenv("CHAT_SESSION_PURGE_INTERVAL", DEFAULT_PURGE_INTERVAL)
+        )
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._purger: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.loads = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.purged = 0
+        self.backend_errors = 0
+
+    def _cached(self, session_id: str) -> Optional[_Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and time.monotonic() - session.touched > self.ttl:
+                del self._sessions[session_id]
+                session = None
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def _remember(self, session_id: str, session: _Session) -> _Session:
+        with self._lock:
+            # Een gelijktijdige load kan ons voor zijn geweest
+            session = self._sessions.setdefault(session_id, session)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+            return session
+
+    async def _backend_call(self, fn, *args):
+        if self.backend is None:
+            return None
+        try:
+            from app.datastore import get_datastore
+            return await get_datastore().run(fn, *args)
+        except Exception as e:
+            self.backend_errors += 1
+            print(f"⚠️ Chat session backend error: {e}")
+            return None
+
+    async def _session(self, session_id: str, record: bool = True) -> Optional[_Session]:
+        session = self._cached(session_id)
+        if session is not None:
+            self.hits += record
+            return session
+        messages = await self._backend_call(self.backend.load, session_id, self.ttl) if self.backend else None
+        if messages is None:
+            self.misses += record
+            return None
+        self.loads += record
+        return self._remember(session_id, _Session(messages, self.max_messages))
+
+    async def history(self, session_id: str) -> List[Dict[str, str]]:
+        """Berichten van een sessie, oudste eerst (leeg voor een nieuwe sessie)"""
+        session = await self._session(session_id)
+        return list(session.messages) if session is not None else []
+
+    async def resume(
+        self, session_id: str, seed: Sequence[Any] = (), resumed: bool = False
+    ) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+        """(history, nog op te slaan seed): een nieuwe sessie start met de meegestuurde history
+
+        Met `resumed` verwacht de client dat de server de sessie al heeft;
+        ontbreekt hij, dan volgt SessionExpiredError.
+        """
+        history = await self.history(session_id)
+        if history:
+            return history, []
+        if resumed:
+            self.expired += 1
+            raise SessionExpiredError(session_id)
+        seed = [{"role": m.role, "content": m.content} for m in seed]
+        return seed, seed
+
+    async def append(self, session_id: str, *messages: Dict[str, str]) -> None:
+        """Voeg berichten toe aan de ring buffer en schrijf de sessie door"""
+        session = await self._session(session_id, record=False)
+        if session is None:
+            session = self._remember(session_id, _Session((), self.max_messages))
+        with self._lock:
+            session.messages.extend({"role": m["role"], "content": m["content"]} for m in messages)
+            session.touched = time.monotonic()
+            snapshot = list(session.messages)
+        if self.backend is not None:
+            await self._backend_call(self.backend.save, session_id, snapshot)
+
+    async def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.backend is not None:
+            await self._backend_call(self.backend.delete, session_id)
+
+    # --- Opruimen ---
+    async def start(self) -> None:
+        if self._purger is None:
+            self._purger = asyncio.create_task(self._purge_loop())
+
+    async def stop(self) -> None:
+        if self._purger is not None:
+            self._purger.cancel()
+            try:
+                await self._purger
+            except asyncio.CancelledError:
+                pass
+            self._purger = None
+
+    async def _purge_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self.purge()
+            except Exception as e:
+                print(f"⚠️ Chat session purge failed: {e}")
+
+    async def purge(self) -> int:
+        """Verwijder sessies die langer dan de TTL niet gebruikt zijn, ook uit de backend"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [sid for sid, s in self._sessions.items() if now - s.touched > self.ttl]
+            for session_id in expired:
+                del self._sessions[session_id]
+        purged = len(expired)
+        if self.backend is not None:
+            purged += await self._backend_call(self.backend.purge, self.ttl) or 0
+        self.purged += purged
+        return purged
+
+    def close(self) -> None:
+        if self.backend is not None:
+            self.backend.close()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "max_messages": self.max_messages,
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": self.hits,
+            "loads": self.loads,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "purged": self.purged,
+            "backend_errors": self.backend_errors,
+        }
+
+
+# --- Shared instance ---
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = os.getenv("CHAT_SESSION_DB")
+            _store = SessionStore(SQLiteSessionBackend(path) if path else None)
+        return _store
+
+
+async def stop_session_store() -> None:
+    global _store
+    with _store_lock:
+        store, _store = _store, None
+    if store is not None:
+        await store.stop()
+        store.close()
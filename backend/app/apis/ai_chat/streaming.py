@@ -0,0 +1,316 @@
+"""
+Streaming AI chat via Server-Sent Events.
+
+`/ai-chat/stream` gebruikt de async OpenAI client met `stream=True` en
+stuurt elk token direct door als SSE event, zodat de dealer al begint te
+"typen" terwijl de completion nog loopt. De event loop wordt nergens
+geblokkeerd.
+
+Events:
+
+    event: token   data: {"delta": "Hi"}
+    event: done    data: {"reply": "...", "ttft_ms": 212.4, "total_ms": 640.1, "chunks": 12, "cached": false,
+                          "prompt_tokens": 310, "tokens_saved": 0, "session_id": "..."}
+    event: error   data: {"message": "...", "retry_after": 2}
+    event: error   data: {"message": "...", "session_reset": true}   (sessie kwijt: stuur de history opnieuw)
+
+Alle upstream calls lopen via de admission controller (concurrency cap,
+coalescing, per-user rate limit). Automatische game events (`message_type`) worden uit de reply cache
+beantwoord zodra daar genoeg varianten voor zijn. De history gaat door de
+ContextBuilder (token budget, zie context.py). Met een `session_id` komt de
+history uit de SessionStore (sessions.py) en stuurt de client alleen het
+nieuwe bericht. Het OpenAI endpoint volgt `OPENAI_BASE_URL`, zodat de route ook tegen een
+lokale OpenAI-compatible server getest kan worden.
+
+`complete_reply` doet hetzelfde zonder streaming, voor de send-message routes.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.auth import OptionalUser
+
+from .admission import (
+    BUSY_MESSAGE,
+    AdmissionRejected,
+    client_identity,
+    get_admission_controller,
+    request_key,
+)
+from .client import get_llm_client
+from .context import ChatContext, get_context_builder
+from .prompts import get_prompt_registry, strategy_message
+from .reply_cache import get_reply_cache
+from .sessions import SessionExpiredError, get_session_store, valid_session_id
+
+stream_router = APIRouter()
+
+CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+CHAT_PARAMS = {"model": CHAT_MODEL, "max_tokens": 50, "temperature": 0.7}
+
+NOT_CONFIGURED_MESSAGE = "AI chat is not configured. Please add OPENAI_API_KEY to your environment variables."
+ERROR_MESSAGE = "An error occurred while processing your message. Please try again."
+INVALID_SESSION_MESSAGE = "Invalid chat session id."
+SESSION_EXPIRED_MESSAGE = "Chat session expired; please resend the history."
+
+
+# --- Pydantic Models ---
+class StreamChatMessage(BaseModel):
+    role: str  # "user" or "assistant"
+    content: str
+
+
+class GameState(BaseModel):
+    player_total: int
+    dealer_upcard: str  # "2".."10", "J", "Q", "K", "A"
+    soft: bool = False
+    pair: Optional[str] = None  # rank van een paar, alleen bij twee kaarten
+    cards: int = 2
+
+
+class StreamChatRequest(BaseModel):
+    message: str
+    history: List[StreamChatMessage] = []
+    outfit_stage_index: Optional[int] = None
+    message_type: Optional[str] = None
+    dealer_id: Optional[str] = None
+    language: Optional[str] = None  # "en", "nl", "de"; leeg = automatisch detecteren
+    session_id: Optional[str] = None  # server-side history; `history` is dan alleen een seed
+    resume_session: bool = False  # de client verwacht dat de server de sessie al heeft
+    game_state: Optional[GameState] = None  # hand van de speler, voor het strategie advies
+
+
+# --- Metrics ---
+class StreamMetrics:
+    """Time-to-first-token en totale duur van recente streams"""
+
+    def __init__(self, window: int = 500):
+        self._ttft_ms: deque = deque(maxlen=window)
+        self._total_ms: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.errors = 0
+
+    def record(self, ttft_ms: Optional[float], total_ms: float) -> None:
+        with self._lock:
+            self.streams += 1
+            if ttft_ms is not None:
+                self._ttft_ms.append(ttft_ms)
+            self._total_ms.append(total_ms)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return round(ordered[index], 1)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            ttft, total = list(self._ttft_ms), list(self._total_ms)
+        return {
+            "streams": self.streams,
+            "errors": self.errors,
+            "ttft_ms_p50": self._percentile(ttft, 50),
+            "ttft_ms_p99": self._percentile(ttft, 99),
+            "total_ms_p50": self._percentile(total, 50),
+        }
+
+
+stream_metrics = StreamMetrics()
+
+
+# --- OpenAI ---
+def build_chat_context(request: StreamChatRequest, history: Optional[List] = None,
+                       extra_system: Sequence[Dict[str, str]] = ()) -> ChatContext:
+    """Voorgecompileerde system prompt van de dealer (plus strategie advies), dan history binnen het token budget"""
+    prompt = get_prompt_registry().get(request.dealer_id, request.outfit_stage_index, request.language)
+    system_messages = [prompt.message, *extra_system]
+    hint = strategy_message(request.game_state)
+    if hint is not None:
+        system_messages.append(hint)
+    if history is None:
+        history = request.history
+    return get_context_builder().build(system_messages, history, request.message)
+
+
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_reply(request: StreamChatRequest, user_id: Optional[str] = None) -> AsyncIterator[str]:
+    """Genereer de SSE events voor één chat bericht"""
+    started = time.perf_counter()
+    ttft_ms = None
+    chunks = 0
+    reply_parts = []
+
+    history = seed = None
+    if request.session_id is not None:
+        if not valid_session_id(request.session_id):
+            stream_metrics.record_error()
+            yield sse_event("error", {"message": INVALID_SESSION_MESSAGE})
+            return
+        sessions = get_session_store()
+        try:
+            history, seed = await sessions.resume(request.session_id, request.history, request.resume_session)
+        except SessionExpiredError:
+            yield sse_event("error", {"message": SESSION_EXPIRED_MESSAGE, "session_reset": True})
+            return
+
+    context = build_chat_context(request, history)
+    messages = context.messages
+    done_fields = {"prompt_tokens": context.prompt_tokens, "tokens_saved": context.tokens_saved}
+    if request.session_id is not None:
+        done_fields["session_id"] = request.session_id
+
+    async def remember(reply: str):
+        if request.session_id is not None and reply:
+            await sessions.append(
+                request.session_id, *seed,
+                {"role": "user", "content": request.message},
+                {"role": "assistant", "content": reply},
+            )
+
+    cache = get_reply_cache()
+    cache_key = cache.key_for_messages(messages) if cache.is_cacheable(request.message_type) else None
+    if cache_key:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            total_ms = (time.perf_counter() - started) * 1000
+            stream_metrics.record(total_ms, total_ms)
+            await remember(cached)
+            yield sse_event("token", {"delta": cached})
+            yield sse_event("done", {
+                "reply": cached, "ttft_ms": round(total_ms, 1), "total_ms": round(total_ms, 1),
+                "chunks": 1, "cached": True, **done_fields,
+            })
+            return
+
+    try:
+        client = get_llm_client()
+    except ValueError:
+        stream_metrics.record_error()
+        yield sse_event("error", {"message": NOT_CONFIGURED_MESSAGE})
+        return
+
+    params = CHAT_PARAMS
+
+    async def produce_deltas():
+        stream = await client.chat.completions.create(messages=messages, stream=True, **params)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Ook bij een client disconnect de upstream verbinding sluiten
+            await stream.close()
+
+    controller = get_admission_controller()
+    try:
+        async for delta in controller.stream(request_key(messages, **params), user_id, produce_deltas):
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            chunks += 1
+            reply_parts.append(delta)
+            yield sse_event("token", {"delta": delta})
+    except AdmissionRejected as e:
+        stream_metrics.record_error()
+        yield sse_event("error", {"message": BUSY_MESSAGE, "retry_after": round(e.retry_after, 1)})
+        return
+    except Exception as e:
+        print(f"AI Chat stream error: {e}")
+        stream_metrics.record_error()
+        yield sse_event("error", {"message": ERROR_MESSAGE})
+        return
+
+    total_ms = (time.perf_counter() - started) * 1000
+    stream_metrics.record(ttft_ms, total_ms)
+    print(f"💬 AI chat stream: ttft {ttft_ms or 0:.0f}ms, total {total_ms:.0f}ms, {chunks} chunks")
+    reply = "".join(reply_parts).strip()
+    if cache_key:
+        cache.put(cache_key, reply)
+    await remember(reply)
+    yield sse_event("done", {
+        "reply": reply,
+        "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+        "total_ms": round(total_ms, 1),
+        "chunks": chunks,
+        "cached": False,
+        **done_fields,
+    })
+
+
+async def complete_reply(request: StreamChatRequest, user_id: Optional[str] = None,
+                         extra_system: Sequence[Dict[str, str]] = ()) -> Dict[str, Any]:
+    """Zelfde pad als stream_reply (prompt, context, cache, sessie, admission), als één antwoord"""
+    history = seed = None
+    if request.session_id is not None:
+        history, seed = await get_session_store().resume(
+            request.session_id, request.history, request.resume_session
+        )
+    messages = build_chat_context(request, history, extra_system).messages
+
+    cache = get_reply_cache()
+    cache_key = cache.key_for_messages(messages) if cache.is_cacheable(request.message_type) else None
+    reply = cache.get(cache_key) if cache_key else None
+    cached = reply is not None
+    if not cached:
+        client = get_llm_client()
+        response = await get_admission_controller().call(
+            request_key(messages, **CHAT_PARAMS),
+            user_id,
+            lambda: client.chat.completions.create(messages=messages, **CHAT_PARAMS),
+        )
+        reply = (response.choices[0].message.content or "").strip()
+        if cache_key:
+            cache.put(cache_key, reply)
+
+    if request.session_id is not None and reply:
+        await get_session_store().append(
+            request.session_id, *seed,
+            {"role": "user", "content": request.message},
+            {"role": "assistant", "content": reply},
+        )
+    return {"reply": reply, "cached": cached, "session_id": request.session_id}
+
+
+# --- Routes ---
+@stream_router.post("/stream")
+async def stream_chat_message(request: StreamChatRequest, http_request: Request, user: OptionalUser):
+    """Stream het antwoord van de dealer als Server-Sent Events"""
+    return StreamingResponse(
+        stream_reply(request, client_identity(http_request, user)),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx/apache proxy mag de events niet bufferen
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@stream_router.get("/stream/stats")
+async def stream_stats():
+    """TTFT van recente streams, reply cache hit rate, admission, context en sessie metrics"""
+    return {
+        **stream_metrics.stats(),
+        "reply_cache": get_reply_cache().stats(),
+        "admission": get_admission_controller().stats(),
+        "prompts": get_prompt_registry().stats(),
+        "context": get_context_builder().stats(),
+        "sessions": get_session_store().stats(),
+    }
@@ -0,0 +1,70 @@
+"""
+Token tellingen voor prompts en chat history.
+
+Gebruikt `tiktoken` als dat geïnstalleerd is en de encoding kan laden
+(tiktoken downloadt het BPE bestand bij het eerste gebruik). Anders valt
+het terug op een schatting (~4 tekens per token voor Engels/Nederlands),
+die voor budgetten en statistieken ruim voldoende is.
+"""
+
+import math
+import os
+from functools import lru_cache
+from typing import Dict, Iterable
+
+DEFAULT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+
+# Vaste overhead per chat message en per request (role, scheiders, priming)
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REQUEST = 3
+
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _encoder(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # Bijv. geen netwerk voor de download; None wordt gecached, dus niet elke request opnieuw
+        print(f"⚠️ tiktoken encoding not available, estimating tokens: {e}")
+        return None
+
+
+def tiktoken_available() -> bool:
+    return _encoder(DEFAULT_MODEL) is not None
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Aantal tokens in `text` voor `model`"""
+    if not text:
+        return 0
+    encoder = _encoder(model)
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages: Iterable[Dict[str, str]], model: str = DEFAULT_MODEL) -> int:
+    """Tokens van een complete chat request, inclusief message overhead"""
+    return TOKENS_PER_REQUEST + sum(
+        TOKENS_PER_MESSAGE + count_tokens(m.get("content") or "", model) for m in messages
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL, marker: str = " …") -> str:
+    """Kap `text` af op `max_tokens` tokens (inclusief het marker token)"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    budget = max(0, max_tokens - 1)
+    encoder = _encoder(model)
+    if encoder is not None:
+        return encoder.decode(encoder.encode(text)[:budget]).rstrip() + marker
+    return text[: budget * CHARS_PER_TOKEN].rstrip() + marker
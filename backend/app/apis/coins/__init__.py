@@ -0,0 +1,55 @@
+"""
+Coin saldo API: lezen en aanpassen via gesharde counters.
+
+Bets en uitgaven uit het spel gaan hier doorheen in plaats van als
+increment op één document, zodat snelle spelers geen contention errors
+krijgen. Zie app.payments.balances.
+
+De client kan alleen afschrijven. Bijschrijvingen komen uitsluitend van de
+server: tafel settlements en aankopen via de ledger (`credit_coins`).
+"""
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.auth import AuthorizedUser
+from app.datastore import get_datastore
+from app.payments import InsufficientCoinsError, get_coin_balances
+
+router = APIRouter(prefix="/coins", tags=["coins"])
+
+
+class CoinAdjustment(BaseModel):
+    amount: int  # altijd negatief: inzet/uitgave
+
+
+def _balances():
+    try:
+        return get_coin_balances()
+    except Exception as e:
+        print(f"⚠️ Coin balances not available: {e}")
+        raise HTTPException(status_code=503, detail="Coin balances not available")
+
+
+@router.get("/balance")
+async def get_balance(user: AuthorizedUser, fresh: bool = False):
+    """Huidig saldo (gecached totaal, `fresh=true` telt de shards opnieuw op)"""
+    balance = await get_datastore().run(_balances().balance, user.sub, fresh)
+    return balance.to_dict()
+
+
+@router.post("/adjust")
+async def adjust_balance(body: CoinAdjustment, user: AuthorizedUser):
+    """Schrijf een inzet of uitgave af; niet onder nul, en nooit bijschrijven"""
+    if body.amount >= 0:
+        raise HTTPException(status_code=400, detail="Amount must be negative; credits are server-side only")
+    try:
+        balance = await get_datastore().run(_balances().adjust, user.sub, body.amount)
+    except InsufficientCoinsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return balance.to_dict()
+
+
+@router.get("/stats")
+async def get_balance_stats(user: AuthorizedUser):
+    return _balances().stats()
@@ -3,6 +3,9 @@ from typing import List, Dict, Any
 import asyncio
 import os
 
+from app.catalog import get_dealer_catalog
+from app.datastore import get_datastore
+
 # Firebase imports
 try:
     from firebase_admin import firestore
@@ -23,6 +26,13 @@ except Exception as e:
 
 router = APIRouter(prefix="/dealers", tags=["dealers"])
 
+async def _loaded_catalog():
+    """Dealer catalogus, geladen bij de eerste aanroep als de lifespan dat nog niet deed"""
+    catalog = get_dealer_catalog(db)
+    if not catalog.loaded:
+        await get_datastore().run(catalog.start)
+    return catalog
+
 @router.get("/", response_model=List[Dict[str, Any]])
 async def get_dealers():
     """
@@ -35,17 +45,10 @@ async def get_dealers():
                 detail="Firestore service not available"
             )
         
-        # Haal alle dealers op uit de dealers collectie
-        dealers_ref = db.collection('dealers')
-        docs = dealers_ref.stream()
+        # Dealers komen uit de in-memory catalogus (bijgehouden via on_snapshot)
+        dealers = (await _loaded_catalog()).list()
         
-        dealers = []
-        for doc in docs:
-            dealer_data = doc.to_dict()
-            dealer_data['id'] = doc.id
-            dealers.append(dealer_data)
-        
-        print(f"📊 Found {len(dealers)} dealers in Firestore")
+        print(f"📊 Found {len(dealers)} dealers in catalog")
         return dealers
         
     except Exception as e:
@@ -67,19 +70,15 @@ async def get_dealer(dealer_id: str):
                 detail="Firestore service not available"
             )
         
-        # Haal specifieke dealer op
-        dealer_ref = db.collection('dealers').document(dealer_id)
-        doc = dealer_ref.get()
+        # Haal specifieke dealer op uit de catalogus
+        dealer_data = (await _loaded_catalog()).get(dealer_id)
         
-        if not doc.exists:
+        if dealer_data is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"Dealer with id '{dealer_id}' not found"
             )
         
-        dealer_data = doc.to_dict()
-        dealer_data['id'] = doc.id
-        
         print(f"📊 Found dealer: {dealer_id}")
         return dealer_data
         
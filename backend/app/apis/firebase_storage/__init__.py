@@ -10,14 +10,17 @@ import tempfile
 import aiofiles
 import pathlib
 import io
+import asyncio
+import hashlib
 
-# PIL/Pillow imports
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    print("⚠️ PIL/Pillow not available. Install with: pip install Pillow")
+from app.datastore import get_datastore
+from app.imaging import (
+    ImageJobTimeoutError,
+    ImagePoolBusyError,
+    generate_variants,
+    get_image_pool,
+)
+from .object_index import KnownObjectIndex
 
 # Firebase imports
 try:
@@ -30,57 +33,13 @@ except ImportError:
 
 router = APIRouter(prefix="/firebase-storage", tags=["Firebase Storage"])
 
+# Uploads van grote bestanden mogen langer duren dan gewone datastore calls
+STORAGE_UPLOAD_TIMEOUT = float(os.getenv("STORAGE_UPLOAD_TIMEOUT", "60"))
+
 # Initialize Firebase Admin SDK
 firebase_app = None
 firebase_bucket = None
 
-def convert_to_webp(image_data: bytes, quality: int = 85, max_width: int = 1200) -> bytes:
-    """Convert image to WebP format for optimal web delivery"""
-    if not PIL_AVAILABLE:
-        print("⚠️ PIL not available, returning original image data")
-        return image_data
-        
-    try:
-        # Open image with PIL
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Convert to RGB if necessary (WebP doesn't support all formats)
-        if image.mode in ('RGBA', 'LA', 'P'):
-            # Convert to RGB, using white background for transparency
-            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            if image.mode in ('RGBA', 'LA'):
-                rgb_image.paste(image, mask=image.split()[-1])  # Use alpha channel as mask
-            image = rgb_image
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize if too large (maintain aspect ratio)
-        if image.width > max_width:
-            ratio = max_width / image.width
-            new_height = int(image.height * ratio)
-            image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
-            print(f"🔄 Resized image to {max_width}x{new_height}")
-        
-        # Convert to WebP
-        output = io.BytesIO()
-        image.save(output, format='WEBP', quality=quality, optimize=True)
-        webp_data = output.getvalue()
-        
-        original_kb = len(image_data) / 1024
-        webp_kb = len(webp_data) / 1024
-        reduction = ((original_kb - webp_kb) / original_kb) * 100
-        
-        print(f"🗜️ WebP conversion: {original_kb:.1f}KB → {webp_kb:.1f}KB ({reduction:.1f}% reduction)")
-        
-        return webp_data
-        
-    except Exception as e:
-        print(f"❌ WebP conversion failed: {e}")
-        # Return original data if conversion fails
-        return image_data
-
 def init_firebase():
     """Initialize Firebase Admin SDK"""
     global firebase_app, firebase_bucket
@@ -164,7 +123,9 @@ async def health_check():
             "firebase_available": FIREBASE_AVAILABLE,
             "bucket_initialized": firebase_bucket is not None,
             "bucket_name": config.get('storage_bucket'),
-            "project_id": config.get('project_id')
+            "project_id": config.get('project_id'),
+            "image_pool": get_image_pool().stats(),
+            "known_objects": known_objects.stats()
         }
         
     except Exception as e:
@@ -176,6 +137,14 @@ async def health_check():
         }
 
 # --- File Upload Models ---
+class ImageVariant(BaseModel):
+    width: int
+    height: int
+    format: str
+    content_type: str
+    url: str
+    size_bytes: int
+
 class UploadResponse(BaseModel):
     success: bool
     message: str
@@ -183,6 +152,124 @@ class UploadResponse(BaseModel):
     file_name: Optional[str] = None
     storage_method: Optional[str] = None
     download_url: Optional[str] = None
+    variants: Optional[List[ImageVariant]] = None
+    srcset: Optional[Dict[str, str]] = None  # content type -> srcset string
+    deduplicated: bool = False
+
+# --- Responsive image variants ---
+def parse_variant_widths(value: str) -> List[int]:
+    """Parse '160,480,1200' naar [160, 480, 1200]"""
+    return [int(part) for part in value.split(',') if part.strip()]
+
+IMAGE_VARIANT_WIDTHS = parse_variant_widths(os.getenv("IMAGE_VARIANT_WIDTHS", "160,480,1200"))
+IMAGE_VARIANT_AVIF = os.getenv("IMAGE_VARIANT_AVIF", "false").lower() == "true"
+
+def variant_path(folder: str, stem: str, width: int, fmt: str) -> str:
+    """Voorspelbaar pad per variant, bijv. dealers/<stem>/w480.webp"""
+    return f"{folder}/{stem}/w{width}.{fmt}"
+
+def build_srcset(variants: List[ImageVariant]) -> Dict[str, str]:
+    srcset: Dict[str, List[str]] = {}
+    for variant in variants:
+        srcset.setdefault(variant.content_type, []).append(f"{variant.url} {variant.width}w")
+    return {content_type: ", ".join(entries) for content_type, entries in srcset.items()}
+
+# --- Content-addressed storage ---
+# Objecten worden opgeslagen onder de sha256 van hun bewerkte bytes. Een pad
+# verandert daarna nooit meer, dus CDN's en browsers mogen het eeuwig cachen.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+known_objects = KnownObjectIndex()
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+async def object_exists(file_path: str) -> bool:
+    """Bestaat het object al? Meestal beantwoord uit de lokale index"""
+    if file_path in known_objects:
+        return True
+    blob = firebase_bucket.blob(file_path)
+    if await get_datastore().run(blob.exists):
+        known_objects.add(file_path)
+        return True
+    return False
+
+async def upload_blob(file_path: str, data: bytes, content_type: str) -> str:
+    """Upload bytes naar Storage en geef de publieke URL terug"""
+    datastore = get_datastore()
+    blob = firebase_bucket.blob(file_path)
+    blob.cache_control = IMMUTABLE_CACHE_CONTROL
+    await datastore.run(
+        blob.upload_from_string, data,
+        content_type=content_type, timeout=STORAGE_UPLOAD_TIMEOUT
+    )
+    
+    # Make file publicly accessible
+    await datastore.run(blob.make_public)
+    known_objects.add(file_path)
+    return blob.public_url
+
+# --- Streaming uploads ---
+# Afbeeldingen moeten voor PIL in het geheugen; voor hen geldt een harde limiet
+# die al tijdens het lezen wordt gecontroleerd. Alle andere bestanden worden
+# in chunks gehasht en daarna in chunks naar Storage gestreamd.
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", 20 * 1024 * 1024))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+# GCS resumable uploads vereisen een veelvoud van 256 KB
+STORAGE_STREAM_CHUNK_SIZE = int(os.getenv("STORAGE_STREAM_CHUNK_SIZE", 1024 * 1024))
+READ_CHUNK_SIZE = 256 * 1024
+
+class UploadTooLargeError(ValueError):
+    def __init__(self, limit: int):
+        super().__init__(f"File exceeds the upload limit of {limit // (1024 * 1024)}MB")
+
+async def read_capped(file: UploadFile, limit: int) -> bytearray:
+    """Lees een upload in chunks en stop zodra de limiet overschreden wordt"""
+    if file.size is not None and file.size > limit:
+        raise UploadTooLargeError(limit)
+    
+    buffer = bytearray()
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) > limit:
+            raise UploadTooLargeError(limit)
+    return buffer
+
+async def digest_stream(file: UploadFile, limit: int):
+    """Bereken sha256 en grootte in chunks, zonder het bestand in het geheugen te laden"""
+    if file.size is not None and file.size > limit:
+        raise UploadTooLargeError(limit)
+    
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        size += len(chunk)
+        if size > limit:
+            raise UploadTooLargeError(limit)
+        digest.update(chunk)
+    
+    await file.seek(0)
+    return digest.hexdigest(), size
+
+async def upload_stream(file_path: str, file_obj, size: int, content_type: str) -> str:
+    """Stream een file object naar Storage en geef de publieke URL terug"""
+    datastore = get_datastore()
+    blob = firebase_bucket.blob(file_path)
+    blob.cache_control = IMMUTABLE_CACHE_CONTROL
+    blob.chunk_size = STORAGE_STREAM_CHUNK_SIZE
+    
+    # Kleine bestanden gaan in één request, grotere via een resumable upload
+    # die per chunk_size uit het file object leest
+    await datastore.run(
+        blob.upload_from_file, file_obj,
+        content_type=content_type,
+        size=size if size <= STORAGE_STREAM_CHUNK_SIZE else None,
+        timeout=STORAGE_UPLOAD_TIMEOUT
+    )
+    
+    # Make file publicly accessible
+    await datastore.run(blob.make_public)
+    known_objects.add(file_path)
+    return blob.public_url
 
 # --- Upload Routes ---
 @router.post("/upload", response_model=UploadResponse)
@@ -190,53 +277,59 @@ async def upload_file(
     file: UploadFile = File(...),
     folder: str = Form("uploads"),
     convert_webp: bool = Form(True),
-    webp_quality: int = Form(85)
+    webp_quality: int = Form(85),
+    variant_widths: str = Form(""),
+    include_avif: bool = Form(IMAGE_VARIANT_AVIF)
 ):
-    """Upload file to Firebase Storage with optional WebP conversion"""
+    """Upload file to Firebase Storage with optional WebP conversion and responsive variants"""
     try:
         if firebase_bucket is None:
             if not init_firebase():
                 raise HTTPException(status_code=500, detail="Firebase Storage not available")
         
-        # Read file content
-        file_content = await file.read()
         content_type = file.content_type
         file_ext = pathlib.Path(file.filename).suffix.lower() if file.filename else ""
         
-        # Convert to WebP if it's an image and conversion is enabled
+        # Generate WebP (and optionally AVIF) variants if it's an image and conversion is enabled
         if convert_webp and content_type and content_type.startswith('image/'):
+            file_content = await read_capped(file, MAX_IMAGE_UPLOAD_BYTES)
+            variants = None
             try:
-                webp_content = convert_to_webp(file_content, quality=webp_quality)
-                file_content = webp_content
-                content_type = 'image/webp'
-                file_ext = '.webp'
-                print("✅ Image converted to WebP format")
+                # Decode/resize/encode draait in de image pool, niet op de event loop
+                variants = await get_image_pool().submit(
+                    generate_variants,
+                    file_content,
+                    widths=parse_variant_widths(variant_widths) or IMAGE_VARIANT_WIDTHS,
+                    quality=webp_quality,
+                    formats=("webp", "avif") if include_avif else ("webp",)
+                )
+                print(f"✅ Image converted to {len(variants)} responsive variants")
+            except (ImagePoolBusyError, ImageJobTimeoutError):
+                raise
             except Exception as e:
-                print(f"⚠️ WebP conversion failed, using original: {e}")
-        
-        # Generate unique filename with correct extension
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = f"{folder}/{unique_filename}"
-        
-        # Upload to Firebase Storage
-        blob = firebase_bucket.blob(file_path)
-        blob.upload_from_string(file_content, content_type=content_type)
-        
-        # Make file publicly accessible
-        blob.make_public()
+                print(f"⚠️ Variant generation failed, using original: {e}")
+            
+            # Het origineel hoeft niet naast de varianten in het geheugen te blijven
+            del file_content
+            if variants:
+                return await _upload_variants(variants, folder)
+            await file.seek(0)
         
-        # Get public URL
-        public_url = blob.public_url
+        return await _upload_streamed(file, folder, file_ext, content_type)
         
-        return UploadResponse(
-            success=True,
-            message="File uploaded successfully",
-            file_url=public_url,
-            file_name=unique_filename,
-            storage_method="firebase_storage",
-            download_url=public_url
+    except UploadTooLargeError as e:
+        print(f"⛔ Upload rejected: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except ImagePoolBusyError as e:
+        print(f"⏳ Upload rejected, image pool busy: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Image processing is busy, please retry shortly",
+            headers={"Retry-After": "2"}
         )
-        
+    except ImageJobTimeoutError as e:
+        print(f"⏳ Upload rejected, image processing timed out: {e}")
+        raise HTTPException(status_code=504, detail="Image processing took too long")
     except Exception as e:
         print(f"❌ Upload error: {e}")
         return UploadResponse(
@@ -244,6 +337,85 @@ async def upload_file(
             message=f"Upload failed: {str(e)}"
         )
 
+async def _upload_streamed(file: UploadFile, folder: str, file_ext: str, content_type: str) -> UploadResponse:
+    """Upload een bestand ongewijzigd, in chunks van schijf naar Storage"""
+    digest, size = await digest_stream(file, MAX_UPLOAD_BYTES)
+    
+    # Content-addressed filename: same bytes, same object
+    unique_filename = f"{digest}{file_ext}"
+    file_path = f"{folder}/{unique_filename}"
+    
+    # Upload to Firebase Storage (off the event loop), unless it already exists
+    deduplicated = await object_exists(file_path)
+    if deduplicated:
+        public_url = firebase_bucket.blob(file_path).public_url
+        print(f"♻️ Upload deduplicated: {file_path}")
+    else:
+        public_url = await upload_stream(file_path, file.file, size, content_type)
+    
+    return UploadResponse(
+        success=True,
+        message="File already stored" if deduplicated else "File uploaded successfully",
+        file_url=public_url,
+        file_name=unique_filename,
+        storage_method="firebase_storage",
+        download_url=public_url,
+        deduplicated=deduplicated
+    )
+
+async def _upload_variants(variants: List[Dict[str, Any]], folder: str) -> UploadResponse:
+    """Upload alle varianten parallel en bouw het srcset manifest"""
+    # De grootste WebP variant blijft de standaard file_url voor bestaande clients
+    primary_index = max(
+        (i for i, v in enumerate(variants) if v["format"] == "webp"),
+        key=lambda i: variants[i]["width"]
+    )
+    
+    # Alle varianten delen de digest van de primaire variant als stem
+    stem = variants[primary_index]["sha256"]
+    paths = [variant_path(folder, stem, v["width"], v["format"]) for v in variants]
+    
+    # Per variant controleren: een eerdere upload van dezelfde afbeelding kan
+    # andere breedtes of formaten hebben gevraagd met dezelfde primaire variant
+    exists = await asyncio.gather(*(object_exists(path) for path in paths))
+    missing = [i for i, found in enumerate(exists) if not found]
+    deduplicated = not missing
+    if deduplicated:
+        print(f"♻️ Upload deduplicated: {paths[primary_index]}")
+    else:
+        await asyncio.gather(*(
+            upload_blob(paths[i], variants[i]["data"], variants[i]["content_type"])
+            for i in missing
+        ))
+    
+    uploaded = [
+        ImageVariant(
+            width=v["width"],
+            height=v["height"],
+            format=v["format"],
+            content_type=v["content_type"],
+            url=firebase_bucket.blob(path).public_url,
+            size_bytes=len(v["data"])
+        )
+        for v, path in zip(variants, paths)
+    ]
+    primary = uploaded[primary_index]
+    
+    return UploadResponse(
+        success=True,
+        message=(
+            "File already stored" if deduplicated
+            else f"File uploaded successfully with {len(uploaded)} variants"
+        ),
+        file_url=primary.url,
+        file_name=paths[primary_index][len(folder) + 1:],
+        storage_method="firebase_storage",
+        download_url=primary.url,
+        variants=uploaded,
+        srcset=build_srcset(uploaded),
+        deduplicated=deduplicated
+    )
+
 # --- Configuration ---
 def get_storage_config() -> Dict[str, Any]:
     """Get Firebase Storage configuration from environment variables"""
@@ -0,0 +1,47 @@
+"""
+Lokale index van objecten die al in Firebase Storage staan.
+
+Uploads zijn content-addressed: het object pad bevat de digest van de
+bewerkte bytes. Een pad dat één keer bestaat verandert dus nooit meer, en
+een positief antwoord van `blob.exists()` kan onbeperkt onthouden worden.
+De index is begrensd (LRU) zodat hij niet onbeperkt groeit.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_INDEX_SIZE = 10000
+
+
+class KnownObjectIndex:
+    """LRU set van object paden waarvan bekend is dat ze bestaan"""
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or int(os.getenv("STORAGE_INDEX_SIZE", DEFAULT_INDEX_SIZE))
+        self._paths: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, path: str) -> bool:
+        with self._lock:
+            if path in self._paths:
+                self._paths.move_to_end(path)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, path: str) -> None:
+        with self._lock:
+            self._paths[path] = None
+            self._paths.move_to_end(path)
+            while len(self._paths) > self.max_size:
+                self._paths.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def stats(self):
+        return {"size": len(self._paths), "hits": self.hits, "misses": self.misses}
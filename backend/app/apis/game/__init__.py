@@ -0,0 +1,148 @@
+"""
+Game API: strategie hints uit de voorberekende EV tabellen.
+
+`/game/hint` is een O(1) lookup in app.game.strategy, zonder LLM of
+Firestore; de frontend kan hem bij elke beslissing aanroepen.
+`/game/shoes/stats` toont de diepte van de pools met geschudde shoes.
+
+`/game/tables` speelt server-side rondes via de TableManager
+(app.game.sessions): elke tafel is van één speler, acties gaan op volgorde
+door de mailbox van de tafel. De route boekt de coins: inzet en double
+worden vooraf afgeschreven, de uitbetaling van de settlement wordt
+bijgeschreven, allebei via de gesharde saldi (app.payments.balances).
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.auth import AuthorizedUser
+from app.datastore import get_datastore
+from app.game import GameError, Rules
+from app.game.sessions import TableBusyError, TableNotFoundError, get_table_manager
+from app.game.shoe_pool import shoe_pool_stats
+from app.game.strategy import get_strategy_tables
+from app.payments import InsufficientCoinsError, get_coin_balances
+
+router = APIRouter(prefix="/game", tags=["game"])
+
+
+@router.get("/hint")
+async def get_hint(
+    total: int = 0,
+    upcard: str = "",
+    soft: bool = False,
+    pair: Optional[str] = None,
+    cards: int = 2,
+    decks: int = Rules.decks,
+    h17: bool = Rules.dealer_hits_soft_17,
+):
+    """Beste actie plus EV per actie; `pair` is de rank van een paar, `cards` het aantal kaarten in de hand"""
+    if not upcard or (not total and not pair):
+        raise HTTPException(status_code=400, detail="total (or pair) and upcard are required")
+    if not 1 <= decks <= 8:
+        raise HTTPException(status_code=400, detail="decks must be between 1 and 8")
+    rules = Rules(decks=decks, dealer_hits_soft_17=h17)
+    tables = get_strategy_tables()
+    if not tables.has(decks, h17):
+        # Regelset niet in strategy_tables.bin: eenmalig berekenen, buiten de event loop
+        await get_datastore().run(tables.table, decks, h17)
+    try:
+        advice = tables.advise(rules, total, upcard, soft, pair, first_decision=cards <= 2)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**advice.to_dict(), "hint": advice.describe()}
+
+
+@router.get("/hint/stats")
+async def get_hint_stats():
+    return get_strategy_tables().stats()
+
+
+@router.get("/shoes/stats")
+async def get_shoe_pool_stats():
+    """Voorraad, aanvullingen en inline fallbacks per shoe pool"""
+    return shoe_pool_stats()
+
+
+# --- Tafels ---
+class TableAction(BaseModel):
+    action: str  # "bet", "hit", "double", "stand" of "view"
+    bet: Optional[int] = None
+
+
+async def _call(table_id: str, action: str, owner: str, **args):
+    try:
+        return await get_table_manager().call(table_id, action, owner, **args)
+    except TableNotFoundError:
+        raise HTTPException(status_code=404, detail="Table not found")
+    except TableBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except GameError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _book(user_id: str, amount: int) -> None:
+    """Inzet (negatief) of uitbetaling op de gesharde saldi van de speler"""
+    try:
+        balances = get_coin_balances()
+    except Exception as e:
+        print(f"⚠️ Coin balances not available: {e}")
+        raise HTTPException(status_code=503, detail="Coin balances not available")
+    try:
+        await get_datastore().run(balances.adjust, user_id, amount)
+    except InsufficientCoinsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/tables")
+async def open_table(user: AuthorizedUser):
+    """Nieuwe tafel met de standaard regels; het antwoord bevat het table id"""
+    table_id = get_table_manager().open(user.sub)
+    return await _call(table_id, "view", user.sub)
+
+
+@router.get("/tables/stats")
+async def get_table_stats():
+    return get_table_manager().stats()
+
+
+@router.get("/tables/{table_id}")
+async def get_table(table_id: str, user: AuthorizedUser):
+    return await _call(table_id, "view", user.sub)
+
+
+@router.post("/tables/{table_id}/actions")
+async def table_action(table_id: str, body: TableAction, user: AuthorizedUser):
+    """Eén actie; na de laatste actie van een ronde staat de settlement in het antwoord"""
+    stake = 0
+    if body.action == "bet":
+        stake = body.bet or 0
+    elif body.action == "double":
+        # Double zet nog eens de huidige inzet in
+        stake = (await _call(table_id, "view", user.sub))["bet"]
+    if stake > 0:
+        await _book(user.sub, -stake)
+
+    try:
+        state = await _call(table_id, body.action, user.sub, bet=body.bet)
+    except HTTPException:
+        if stake > 0:
+            # Actie geweigerd door de tafel: inzet terug
+            await _book(user.sub, stake)
+        raise
+
+    settlement = state.get("settlement")
+    if settlement and settlement["payout"]:
+        await _book(user.sub, settlement["payout"])
+    return state
+
+
+@router.delete("/tables/{table_id}")
+async def close_table(table_id: str, user: AuthorizedUser):
+    try:
+        get_table_manager().close(table_id, user.sub)
+    except TableNotFoundError:
+        raise HTTPException(status_code=404, detail="Table not found")
+    return {"closed": table_id}
@@ -1,3 +1,3 @@
-from .user import AuthorizedUser, User
+from .user import AuthorizedUser, OptionalUser, User
 
-__all__ = ["AuthorizedUser", "User"]
+__all__ = ["AuthorizedUser", "OptionalUser", "User"]
@@ -32,4 +32,15 @@ def get_authorized_user(request: Request) -> User:
         name="Development User"
     )
 
+def get_optional_user(request: Request) -> Optional[User]:
+    """
+    Like get_authorized_user, but None for requests without a bearer token,
+    for routes that also serve anonymous visitors.
+    """
+    token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not token:
+        return None
+    return get_authorized_user(request)
+
 AuthorizedUser = Annotated[User, Depends(get_authorized_user)]
+OptionalUser = Annotated[Optional[User], Depends(get_optional_user)]
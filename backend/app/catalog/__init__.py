@@ -0,0 +1,4 @@
+from .dealer_catalog import DealerCatalog, get_dealer_catalog
+from .package_catalog import PackageCatalog
+
+__all__ = ["DealerCatalog", "PackageCatalog", "get_dealer_catalog"]
@@ -0,0 +1,217 @@
+"""
+In-memory dealer catalogus.
+
+De catalogus wordt één keer geladen bij het opstarten en daarna actueel
+gehouden via een Firestore `on_snapshot` listener. Als de listener niet
+gestart kan worden (of als DEALER_CATALOG_MODE=poll) valt hij terug op
+periodiek pollen. List- en detail-endpoints lezen daarna alleen nog uit
+het geheugen. Andere caches (zoals de prompt registry) kunnen zich met
+`add_listener` laten informeren over elke wijziging.
+
+Een ongewijzigde dealer blijft hetzelfde dict object, ook na een poll; de
+prompt registry vergelijkt op identiteit.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+SNAPSHOT_MODE = "snapshot"
+POLL_MODE = "poll"
+
+DEFAULT_POLL_INTERVAL = 30.0
+DEFAULT_START_TIMEOUT = 5.0
+
+
+class DealerCatalog:
+    """Thread-safe cache van de `dealers` collectie"""
+
+    def __init__(
+        self,
+        db,
+        collection: str = "dealers",
+        mode: Optional[str] = None,
+        poll_interval: Optional[float] = None,
+        start_timeout: Optional[float] = None,
+    ):
+        self.db = db
+        self.collection = collection
+        self.mode = mode or os.getenv("DEALER_CATALOG_MODE", SNAPSHOT_MODE)
+        self.poll_interval = poll_interval or float(
+            os.getenv("DEALER_CATALOG_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+        )
+        # Hoe lang het opstarten op de eerste snapshot wacht voordat het op pollen overgaat
+        self.start_timeout = start_timeout or float(
+            os.getenv("DEALER_CATALOG_START_TIMEOUT", DEFAULT_START_TIMEOUT)
+        )
+
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._dealers: Dict[str, Dict[str, Any]] = {}
+        self._snapshot: List[Dict[str, Any]] = []
+        self._watch = None
+        self._poll_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._listeners: List[Callable[[], None]] = []
+
+        self.loaded = False
+        self.last_refresh: Optional[float] = None
+        self.active_mode: Optional[str] = None
+
+    # --- Lifecycle ---
+    def start(self) -> None:
+        """Laad de catalogus en start de listener (idempotent)"""
+        with self._start_lock:
+            if self.loaded:
+                return
+
+            self._stop_event.clear()
+            if self.mode == SNAPSHOT_MODE and self._start_listener():
+                self.active_mode = SNAPSHOT_MODE
+            else:
+                self.reload()
+                self._start_poller()
+                self.active_mode = POLL_MODE
+
+            print(f"📚 Dealer catalog loaded ({len(self._dealers)} dealers, mode={self.active_mode})")
+
+    def stop(self) -> None:
+        """Stop de listener of poller"""
+        self._stop_event.set()
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception as e:
+                print(f"⚠️ Failed to unsubscribe dealer listener: {e}")
+            self._watch = None
+        if self._poll_thread is not None:
+            self._poll_thread.join(timeout=5)
+            self._poll_thread = None
+        self.loaded = False
+        self.active_mode = None
+
+    def _start_listener(self) -> bool:
+        initial_load = threading.Event()
+
+        def on_snapshot(col_snapshot, changes, read_time):
+            self._apply_changes(changes)
+            initial_load.set()
+
+        try:
+            self._watch = self.db.collection(self.collection).on_snapshot(on_snapshot)
+        except Exception as e:
+            print(f"⚠️ Dealer snapshot listener unavailable, falling back to polling: {e}")
+            self._watch = None
+            return False
+
+        if not initial_load.wait(timeout=self.start_timeout):
+            print("⚠️ Dealer snapshot listener did not deliver initial snapshot, falling back to polling")
+            self._watch.unsubscribe()
+            self._watch = None
+            return False
+        return True
+
+    def _start_poller(self) -> None:
+        self._poll_thread = threading.Thread(
+            target=self._poll_loop, name="dealer-catalog-poller", daemon=True
+        )
+        self._poll_thread.start()
+
+    def _poll_loop(self) -> None:
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"❌ Dealer catalog poll failed: {e}")
+
+    # --- Updates ---
+    def reload(self) -> None:
+        """Lees de volledige collectie opnieuw in; listeners alleen bij een wijziging"""
+        docs = list(self.db.collection(self.collection).stream())
+        with self._lock:
+            current = self._dealers
+            dealers = {doc.id: _reuse(current.get(doc.id), _to_dealer(doc)) for doc in docs}
+            changed = dealers.keys() != current.keys() or any(
+                dealer is not current[dealer_id] for dealer_id, dealer in dealers.items()
+            )
+            self._dealers = dealers
+            self._publish()
+        if changed:
+            self._notify()
+
+    def _apply_changes(self, changes) -> None:
+        with self._lock:
+            dealers = dict(self._dealers)
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    dealers.pop(doc.id, None)
+                else:
+                    dealers[doc.id] = _reuse(dealers.get(doc.id), _to_dealer(doc))
+            self._dealers = dealers
+            self._publish()
+        self._notify()
+
+    def _publish(self) -> None:
+        # Copy-on-write: lezers krijgen altijd een consistente lijst
+        self._snapshot = list(self._dealers.values())
+        self.last_refresh = time.time()
+        self.loaded = True
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Roep `callback()` aan na elke wijziging van de catalogus"""
+        self._listeners.append(callback)
+
+    def _notify(self) -> None:
+        # Buiten de lock, zodat listeners de catalogus zelf kunnen lezen
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Dealer catalog listener failed: {e}")
+
+    # --- Reads ---
+    def list(self) -> List[Dict[str, Any]]:
+        """Alle dealers uit het geheugen"""
+        return self._snapshot
+
+    def get(self, dealer_id: str) -> Optional[Dict[str, Any]]:
+        """Eén dealer uit het geheugen, of None"""
+        return self._dealers.get(dealer_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "mode": self.active_mode,
+            "dealer_count": len(self._dealers),
+            "last_refresh": self.last_refresh,
+        }
+
+
+def _to_dealer(doc) -> Dict[str, Any]:
+    dealer_data = doc.to_dict() or {}
+    dealer_data['id'] = doc.id
+    return dealer_data
+
+
+def _reuse(existing: Optional[Dict[str, Any]], dealer: Dict[str, Any]) -> Dict[str, Any]:
+    """Het bestaande dict als de inhoud gelijk is, zodat caches op identiteit kunnen vergelijken"""
+    return existing if existing == dealer else dealer
+
+
+# --- Shared instance ---
+_catalog: Optional[DealerCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_dealer_catalog(db=None) -> DealerCatalog:
+    """Gedeelde catalogus voor alle routers in dit proces"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            if db is None:
+                from firebase_admin import firestore
+                db = firestore.client()
+            _catalog = DealerCatalog(db)
+        return _catalog
@@ -0,0 +1,157 @@
+"""
+Voorgeserialiseerde pakketten catalogus voor de shop.
+
+`StripeService.coin_packages` bevat elk pakket twee keer (origineel id en
+een frontend alias). PackageCatalog zet de pakketten één keer om naar JSON
+bytes, met de aliases samengevoegd tot één entry met een `aliases` lijst,
+plus een sterke ETag. Requests krijgen daarna dezelfde bytes terug, of een
+304 als de client de huidige versie al heeft.
+
+Na een product sync (`create_stripe_products`) verhoogt de service zijn
+`catalog_version`; de catalogus ziet dat bij het volgende request en
+serialiseert opnieuw.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+DEFAULT_MAX_AGE = 300
+
+
+def group_aliases(packages: Dict[str, Any]) -> List[Tuple[Any, List[str]]]:
+    """(pakket, aliases) per uniek pakket, in de volgorde van de dict"""
+    groups: Dict[int, Tuple[Any, List[str]]] = {}
+    for key, package in packages.items():
+        group = groups.setdefault(id(package), (package, []))
+        if key != package.id:
+            group[1].append(key)
+    return list(groups.values())
+
+
+def coin_package_entry(package, aliases: List[str]) -> Dict[str, Any]:
+    return {
+        "id": package.id,
+        "name": package.name,
+        "coins": package.coins,
+        "price_eur": package.price_eur,
+        "original_price_eur": package.original_price_eur,
+        "is_popular": package.is_popular,
+        "bonus_description": package.bonus_description,
+        "stripe_price_id": package.stripe_price_id,
+        "aliases": aliases,
+        "type": "coins",
+    }
+
+
+def premium_package_entry(package, aliases: List[str]) -> Dict[str, Any]:
+    return {
+        "id": package.id,
+        "name": package.name,
+        "price_eur": package.price_eur,
+        "interval": package.interval,
+        "features": list(package.features),
+        "stripe_price_id": package.stripe_price_id,
+        "aliases": aliases,
+        "type": "premium",
+    }
+
+
+@dataclass(frozen=True)
+class EncodedCatalog:
+    version: int
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+class PackageCatalog:
+    """Pakketten van een StripeService als kant-en-klare HTTP response"""
+
+    def __init__(self, service, max_age: Optional[int] = None):
+        self.service = service
+        self.max_age = max_age if max_age is not None else int(
+            os.getenv("PACKAGES_CACHE_MAX_AGE", DEFAULT_MAX_AGE)
+        )
+        self._lock = threading.Lock()
+        self._encoded: Optional[EncodedCatalog] = None
+
+        self.builds = 0
+        self.served = 0
+        self.not_modified = 0
+        self.rebuild()
+
+    def payload(self) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "coin_packages": [
+                coin_package_entry(package, aliases)
+                for package, aliases in group_aliases(self.service.coin_packages)
+            ],
+            "premium_packages": [
+                premium_package_entry(package, aliases)
+                for package, aliases in group_aliases(self.service.premium_packages)
+            ],
+        }
+
+    def rebuild(self) -> EncodedCatalog:
+        """Serialiseer de pakketten opnieuw (na een product sync)"""
+        with self._lock:
+            version = getattr(self.service, "catalog_version", 0)
+            body = json.dumps(self.payload(), ensure_ascii=False, separators=(",", ":")).encode()
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            self._encoded = EncodedCatalog(
+                version=version,
+                body=body,
+                etag=etag,
+                headers={"ETag": etag, "Cache-Control": f"public, max-age={self.max_age}"},
+            )
+            self.builds += 1
+            print(f"🛒 Package catalog v{version}: {len(body)} bytes, ETag {etag}")
+            return self._encoded
+
+    def current(self) -> EncodedCatalog:
+        encoded = self._encoded
+        if encoded.version != getattr(self.service, "catalog_version", 0):
+            encoded = self.rebuild()
+        return encoded
+
+    def response(self, request: Request) -> Response:
+        """200 met de voorgeserialiseerde body, of 304 bij een geldige If-None-Match"""
+        encoded = self.current()
+        if etag_matches(request.headers.get("if-none-match"), encoded.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=encoded.headers)
+        self.served += 1
+        return Response(content=encoded.body, media_type="application/json", headers=encoded.headers)
+
+    def stats(self) -> Dict[str, Any]:
+        encoded = self._encoded
+        return {
+            "version": encoded.version,
+            "etag": encoded.etag,
+            "bytes": len(encoded.body),
+            "builds": self.builds,
+            "served": self.served,
+            "not_modified": self.not_modified,
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak vergelijking zoals RFC 9110 voorschrijft voor If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -0,0 +1,3 @@
+from .executor import DatastoreExecutor, DatastoreTimeoutError, get_datastore, stop_datastore
+
+__all__ = ["DatastoreExecutor", "DatastoreTimeoutError", "get_datastore", "stop_datastore"]
@@ -0,0 +1,181 @@
+"""
+Non-blocking toegang tot de synchrone firebase_admin clients.
+
+firebase_admin (Firestore en Storage) is volledig synchroon. Een directe
+aanroep in een `async def` route blokkeert de uvicorn event loop voor de
+hele netwerk round trip. DatastoreExecutor voert die aanroepen uit op een
+begrensde thread pool, met een concurrency cap en een timeout per operatie.
+
+Usage:
+
+    from app.datastore import get_datastore
+
+    datastore = get_datastore()
+    doc = await datastore.get(db.collection('dealers').document(dealer_id))
+    await datastore.run(blob.make_public)
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_TIMEOUT = 10.0
+
+
+class DatastoreTimeoutError(TimeoutError):
+    """Een datastore operatie duurde langer dan de toegestane timeout"""
+
+
+class DatastoreExecutor:
+    """Voert blokkerende firebase_admin calls uit buiten de event loop"""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        default_timeout: Optional[float] = None,
+    ):
+        self.max_workers = max_workers or int(
+            os.getenv("DATASTORE_MAX_WORKERS", DEFAULT_MAX_WORKERS)
+        )
+        # Nooit meer calls toelaten dan er threads zijn, anders wachten ze
+        # ongezien in de interne queue van de pool
+        self.max_concurrency = min(
+            max_concurrency or int(os.getenv("DATASTORE_MAX_CONCURRENCY", self.max_workers)),
+            self.max_workers,
+        )
+        self.default_timeout = default_timeout or float(
+            os.getenv("DATASTORE_TIMEOUT", DEFAULT_TIMEOUT)
+        )
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="datastore"
+        )
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._waiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Condition]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Voer `fn(*args, **kwargs)` uit op de pool binnen de timeout"""
+        timeout = timeout if timeout is not None else self.default_timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        await self._acquire_slot(loop, deadline, fn)
+
+        self.in_flight += 1
+        future = loop.run_in_executor(self._pool, lambda: fn(*args, **kwargs))
+        # Het slot komt pas vrij als de thread echt klaar is, ook als de
+        # aanroeper al een timeout kreeg. Zo blijft de cap eerlijk.
+        future.add_done_callback(self._release_slot)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(future), max(deadline - loop.time(), 0)
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise DatastoreTimeoutError(
+                f"{_name(fn)} did not complete within {timeout:.1f}s"
+            ) from None
+
+    async def _acquire_slot(self, loop, deadline: float, fn: Callable) -> None:
+        condition = self._waiters.get(loop)
+        if condition is None:
+            condition = self._waiters[loop] = asyncio.Condition()
+
+        async with condition:
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self._slots.acquire(blocking=False)),
+                    max(deadline - loop.time(), 0),
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise DatastoreTimeoutError(
+                    f"{_name(fn)} waited too long for a free datastore slot"
+                ) from None
+
+    def _release_slot(self, future) -> None:
+        self.in_flight -= 1
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self._slots.release()
+
+        # Wachtenden kunnen op een andere event loop zitten (bijv. TestClient)
+        for loop, condition in list(self._waiters.items()):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(loop.create_task, self._notify(condition))
+
+    @staticmethod
+    async def _notify(condition: asyncio.Condition) -> None:
+        async with condition:
+            condition.notify()
+
+    # --- Firestore helpers ---
+    async def get(self, doc_ref, timeout: Optional[float] = None):
+        """DocumentReference.get() zonder de event loop te blokkeren"""
+        return await self.run(doc_ref.get, timeout=timeout)
+
+    async def stream(self, query, timeout: Optional[float] = None) -> List[Any]:
+        """Lees alle documenten van een collectie of query"""
+        return await self.run(lambda: list(query.stream()), timeout=timeout)
+
+    async def set(self, doc_ref, data: Dict[str, Any], merge: bool = False,
+                  timeout: Optional[float] = None) -> Any:
+        return await self.run(doc_ref.set, data, merge=merge, timeout=timeout)
+
+    async def update(self, doc_ref, data: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        return await self.run(doc_ref.update, data, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _name(fn: Callable) -> str:
+    return getattr(fn, "__qualname__", None) or repr(fn)
+
+
+# --- Shared instance ---
+_datastore: Optional[DatastoreExecutor] = None
+_datastore_lock = threading.Lock()
+
+
+def get_datastore() -> DatastoreExecutor:
+    """Gedeelde executor voor alle routers in dit proces"""
+    global _datastore
+    with _datastore_lock:
+        if _datastore is None:
+            _datastore = DatastoreExecutor()
+        return _datastore
+
+
+def stop_datastore() -> None:
+    """Stop de gedeelde executor; de volgende get_datastore() maakt een nieuwe"""
+    global _datastore
+    with _datastore_lock:
+        datastore, _datastore = _datastore, None
+    if datastore is not None:
+        datastore.shutdown()
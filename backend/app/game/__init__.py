@@ -0,0 +1,9 @@
+from .cards import Hand, card_code, card_label
+from .engine import GameError, Rules, Settlement, Table
+from .shoe import Shoe
+from .shoe_pool import ShoePool, get_shoe_pool
+
+__all__ = [
+    "GameError", "Hand", "Rules", "Settlement", "Shoe", "ShoePool", "Table",
+    "card_code", "card_label", "get_shoe_pool",
+]
@@ -0,0 +1,87 @@
+"""
+Compacte kaart codering voor de blackjack engine.
+
+Een kaart is een int 0..51: `rank * 4 + suit`, met rank 0..12 voor
+2..A en suit 0..3 voor ♠ ♥ ♦ ♣. Een shoe is daarmee een `array('B')` van
+één byte per kaart in plaats van een object met strings per kaart, en een
+hand houdt alleen een hard totaal bij plus of er een aas in zit.
+"""
+
+from array import array
+from typing import Dict, Iterable, List
+
+RANK_LABELS = ("2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A")
+SUITS = ("♠", "♥", "♦", "♣")
+CARDS_PER_DECK = 52
+ACE = 12
+
+# Blackjack waarde per kaart code; een aas telt hier als 1, Hand maakt hem soft
+CARD_VALUES = bytes(1 if code >> 2 == ACE else min((code >> 2) + 2, 10) for code in range(CARDS_PER_DECK))
+
+
+def card_code(rank: str, suit: str = "♠") -> int:
+    return RANK_LABELS.index(rank) * 4 + SUITS.index(suit)
+
+
+def card_label(code: int) -> str:
+    return RANK_LABELS[code >> 2] + SUITS[code & 3]
+
+
+def card_dict(code: int) -> Dict[str, object]:
+    """Kaart in het formaat van de frontend (`Card` in blackjackLogic.ts, aas = 11)"""
+    value = CARD_VALUES[code]
+    return {"rank": RANK_LABELS[code >> 2], "suit": SUITS[code & 3], "value": 11 if value == 1 else value}
+
+
+def new_shoe_cards(decks: int) -> array:
+    """Ongeschudde shoe van `decks` decks"""
+    return array("B", range(CARDS_PER_DECK)) * decks
+
+
+class Hand:
+    """Hand met incrementeel totaal: elke kaart is O(1), geen herberekening"""
+
+    __slots__ = ("cards", "hard", "has_ace")
+
+    def __init__(self, cards: Iterable[int] = ()):
+        self.cards = bytearray()
+        self.hard = 0
+        self.has_ace = False
+        for code in cards:
+            self.add(code)
+
+    def add(self, code: int) -> int:
+        value = CARD_VALUES[code]
+        self.cards.append(code)
+        self.hard += value
+        if value == 1:
+            self.has_ace = True
+        return self.score
+
+    @property
+    def soft(self) -> bool:
+        """Een aas telt als 11 zonder te busten"""
+        return self.has_ace and self.hard <= 11
+
+    @property
+    def score(self) -> int:
+        return self.hard + 10 if self.has_ace and self.hard <= 11 else self.hard
+
+    @property
+    def busted(self) -> bool:
+        return self.hard > 21
+
+    @property
+    def is_blackjack(self) -> bool:
+        return len(self.cards) == 2 and self.score == 21
+
+    def clear(self) -> None:
+        self.cards.clear()
+        self.hard = 0
+        self.has_ace = False
+
+    def labels(self) -> List[str]:
+        return [card_label(code) for code in self.cards]
+
+    def __len__(self) -> int:
+        return len(self.cards)
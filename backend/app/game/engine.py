@@ -0,0 +1,210 @@
+"""
+Server-side blackjack: de uitkomst wordt hier bepaald, niet in de browser.
+
+Een Table speelt rondes tegen één speler:
+
+    table = Table(Rules())
+    table.start_round(bet=50)
+    table.hit()
+    table.stand()              # dealer speelt, uitkomst staat vast
+    settlement = table.settle()
+
+De engine doet geen I/O; inzet afschrijven en uitbetalen gebeurt door de
+aanroeper (de /game/tables route, via CoinBalances) op basis van de
+Settlement. Tables gebruiken __slots__ en een byte-array shoe, zodat
+tienduizenden tafels in één proces passen (zie bench_blackjack.py).
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .cards import Hand, card_dict, card_label
+from .shoe import DEFAULT_DECKS, DEFAULT_PENETRATION, Shoe
+
+# Fases zoals GamePage.tsx ze kent
+BETTING = "BETTING"
+PLAYER_TURN = "PLAYER_TURN"
+GAME_OVER = "GAME_OVER"
+
+BLACKJACK = "blackjack"
+WIN = "win"
+PUSH = "push"
+LOSE = "lose"
+BUST = "bust"
+
+
+class GameError(Exception):
+    """Actie past niet bij de huidige fase van de tafel"""
+
+
+@dataclass(frozen=True)
+class Rules:
+    decks: int = DEFAULT_DECKS
+    penetration: float = DEFAULT_PENETRATION
+    dealer_hits_soft_17: bool = False
+    blackjack_pays: float = 1.5
+    min_bet: int = 1
+    max_bet: int = 100000
+
+
+@dataclass(frozen=True)
+class Settlement:
+    outcome: str
+    bet: int
+    payout: int  # terug naar de speler, inclusief inzet
+    player_score: int
+    dealer_score: int
+
+    @property
+    def net(self) -> int:
+        return self.payout - self.bet
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "outcome": self.outcome,
+            "bet": self.bet,
+            "payout": self.payout,
+            "net": self.net,
+            "player_score": self.player_score,
+            "dealer_score": self.dealer_score,
+        }
+
+
+class Table:
+    __slots__ = ("rules", "shoe", "phase", "bet", "player", "dealer", "outcome", "rounds")
+
+    def __init__(self, rules: Optional[Rules] = None, shoe: Optional[Shoe] = None,
+                 rng: Optional[random.Random] = None):
+        self.rules = rules or Rules()
+        self.shoe = shoe or Shoe(self.rules.decks, self.rules.penetration, rng)
+        self.phase = BETTING
+        self.bet = 0
+        self.player = Hand()
+        self.dealer = Hand()
+        self.outcome: Optional[str] = None
+        self.rounds = 0
+
+    def _expect(self, phase: str) -> None:
+        if self.phase != phase:
+            raise GameError(f"Action not allowed in phase {self.phase}")
+
+    # --- Ronde ---
+    def start_round(self, bet: int) -> None:
+        self._expect(BETTING)
+        if not self.rules.min_bet <= bet <= self.rules.max_bet:
+            raise GameError(f"Bet must be between {self.rules.min_bet} and {self.rules.max_bet}")
+        if self.shoe.needs_shuffle:
+            self.shoe.shuffle()
+
+        self.bet = bet
+        self.outcome = None
+        self.player.clear()
+        self.dealer.clear()
+        draw = self.shoe.draw
+        self.player.add(draw())
+        self.dealer.add(draw())
+        self.player.add(draw())
+        self.dealer.add(draw())
+        self.phase = PLAYER_TURN
+
+        # Dealer kijkt naar blackjack; een natural beslist de ronde meteen
+        if self.player.is_blackjack or self.dealer.is_blackjack:
+            if self.player.is_blackjack and self.dealer.is_blackjack:
+                self._finish(PUSH)
+            else:
+                self._finish(BLACKJACK if self.player.is_blackjack else LOSE)
+
+    def hit(self) -> int:
+        self._expect(PLAYER_TURN)
+        score = self.player.add(self.shoe.draw())
+        if self.player.busted:
+            self._finish(BUST)
+        return score
+
+    def double(self) -> int:
+        """Inzet verdubbelen, precies één kaart, daarna staat de speler"""
+        self._expect(PLAYER_TURN)
+        if len(self.player) != 2:
+            raise GameError("Double is only allowed on the first two cards")
+        if 2 * self.bet > self.rules.max_bet:
+            raise GameError(f"Doubling would exceed the maximum bet of {self.rules.max_bet}")
+        self.bet *= 2
+        score = self.hit()
+        if self.phase == PLAYER_TURN:
+            self.stand()
+        return score
+
+    def stand(self) -> None:
+        self._expect(PLAYER_TURN)
+        dealer, draw = self.dealer, self.shoe.draw
+        hits_soft_17 = self.rules.dealer_hits_soft_17
+        while dealer.score < 17 or (hits_soft_17 and dealer.score == 17 and dealer.soft):
+            dealer.add(draw())
+
+        player_score, dealer_score = self.player.score, dealer.score
+        if dealer.busted or player_score > dealer_score:
+            self._finish(WIN)
+        elif player_score == dealer_score:
+            self._finish(PUSH)
+        else:
+            self._finish(LOSE)
+
+    def _finish(self, outcome: str) -> None:
+        self.outcome = outcome
+        self.phase = GAME_OVER
+
+    def settle(self) -> Settlement:
+        """Uitbetaling van de afgelopen ronde; de tafel gaat terug naar BETTING"""
+        self._expect(GAME_OVER)
+        bet, outcome = self.bet, self.outcome
+        if outcome == BLACKJACK:
+            payout = bet + int(bet * self.rules.blackjack_pays)
+        elif outcome == WIN:
+            payout = 2 * bet
+        elif outcome == PUSH:
+            payout = bet
+        else:
+            payout = 0
+        settlement = Settlement(outcome, bet, payout, self.player.score, self.dealer.score)
+        self.phase = BETTING
+        self.bet = 0
+        self.rounds += 1
+        return settlement
+
+    # --- Weergave ---
+    def view(self) -> Dict[str, Any]:
+        """Staat voor de client; de hole card blijft dicht tot de ronde voorbij is"""
+        reveal = self.phase == GAME_OVER
+        dealer_cards = list(self.dealer.cards) if reveal else list(self.dealer.cards[:1])
+        dealer_visible = self.dealer if reveal else Hand(dealer_cards)
+        return {
+            "phase": self.phase,
+            "bet": self.bet,
+            "player": {
+                "cards": [card_dict(code) for code in self.player.cards],
+                "score": self.player.score,
+                "soft": self.player.soft,
+            },
+            "dealer": {
+                "cards": [card_dict(code) for code in dealer_cards],
+                "hidden": len(self.dealer) - len(dealer_cards),
+                "score": dealer_visible.score,
+            },
+            "outcome": self.outcome,
+            "shoe_remaining": self.shoe.remaining,
+            # Alleen bij een shoe uit de ShoePool: sha256 van de huidige seed, seed van de vorige shoe
+            "shoe_commitment": self.shoe.commitment,
+            "previous_shoe_seed": self.shoe.previous_seed,
+        }
+
+    def describe(self) -> str:
+        """Korte samenvatting voor de dealer persona, bijv. 'Player: 10♠ 5♥ (15) | Dealer shows: 3♦'"""
+        player = " ".join(self.player.labels())
+        if self.phase == GAME_OVER:
+            dealer = f"Dealer: {' '.join(self.dealer.labels())} ({self.dealer.score})"
+        elif len(self.dealer):
+            dealer = f"Dealer shows: {card_label(self.dealer.cards[0])}"
+        else:
+            dealer = "Dealer: -"
+        return f"Player: {player} ({self.player.score}) | {dealer}"
@@ -0,0 +1,281 @@
+"""
+Server-side game sessions: elke tafel is een kleine asyncio actor.
+
+Acties voor een tafel komen binnen via `TableManager.call(table_id, ...)`
+en gaan naar de mailbox van die tafel; één drain task per tafel verwerkt ze
+op volgorde, zodat twee gelijktijdige requests voor dezelfde tafel nooit
+door elkaar lopen. Een tafel zonder berichten heeft geen task en geen
+mailbox, alleen de Table zelf.
+
+Geheugen blijft begrensd doordat tafels die TABLE_IDLE_TIMEOUT seconden
+niets deden (of de oudste zodra er meer dan TABLE_MAX_LIVE leven) worden
+omgezet naar een compacte snapshot (snapshot.py, ±100 bytes). Het
+volgende bericht voor die tafel laadt hem weer in. Snapshots vervallen na
+TABLE_SNAPSHOT_TTL seconden.
+
+De engine doet geen coin boekingen; de /game/tables route boekt inzet en
+Settlement op de gesharde saldi.
+
+Usage:
+
+    manager = get_table_manager()
+    await manager.start()
+    table_id = manager.open(user_id)
+    state = await manager.call(table_id, "bet", user_id, bet=50)
+"""
+
+import asyncio
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from .engine import GAME_OVER, GameError, Rules, Table
+from .shoe import Shoe
+from .shoe_pool import ShoePool, get_shoe_pool
+from .snapshot import dump_table, load_table
+
+DEFAULT_IDLE_TIMEOUT = 120.0
+DEFAULT_MAX_LIVE = 50000
+DEFAULT_EVICT_INTERVAL = 5.0
+DEFAULT_SNAPSHOT_TTL = 24 * 3600.0
+DEFAULT_MAILBOX_SIZE = 16
+
+ACTIONS = ("bet", "hit", "double", "stand", "view")
+
+
+class TableNotFoundError(KeyError):
+    """Onbekende tafel, of een tafel van een andere speler"""
+
+
+class TableBusyError(RuntimeError):
+    """De mailbox van de tafel is vol"""
+
+
+class TableActor:
+    """Eén tafel met een mailbox; de drain task bestaat alleen zolang er berichten zijn"""
+
+    __slots__ = ("table_id", "owner", "table", "mailbox", "draining", "last_active")
+
+    def __init__(self, table_id: str, owner: str, table: Table):
+        self.table_id = table_id
+        self.owner = owner
+        self.table = table
+        self.mailbox: Optional[Deque[Tuple[str, Dict[str, Any], asyncio.Future]]] = None
+        self.draining = False
+        self.last_active = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        return self.draining or bool(self.mailbox)
+
+    def handle(self, action: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        table = self.table
+        if action == "bet":
+            table.start_round(int(args.get("bet") or 0))
+        elif action == "hit":
+            table.hit()
+        elif action == "double":
+            table.double()
+        elif action == "stand":
+            table.stand()
+        elif action != "view":
+            raise GameError(f"Unknown action: {action}")
+
+        state = table.view()
+        state["table_id"] = self.table_id
+        if table.phase == GAME_OVER and action != "view":
+            # Ronde voorbij: direct afrekenen, de tafel staat weer open voor een nieuwe bet
+            state["settlement"] = table.settle().to_dict()
+        return state
+
+
+class TableManager:
+    """Routeert acties op table id naar actors en zet idle tafels om naar snapshots"""
+
+    def __init__(
+        self,
+        rules: Optional[Rules] = None,
+        idle_timeout: Optional[float] = None,
+        max_live: Optional[int] = None,
+        evict_interval: Optional[float] = None,
+        snapshot_ttl: Optional[float] = None,
+        mailbox_size: Optional[int] = None,
+        pool_for: Optional[Callable[[int], ShoePool]] = get_shoe_pool,
+    ):
+        self.rules = rules or Rules()
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(
+            os.getenv("TABLE_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT)
+        )
+        self.max_live = max_live or int(os.getenv("TABLE_MAX_LIVE", DEFAULT_MAX_LIVE))
+        self.evict_interval = evict_interval or float(os.getenv("TABLE_EVICT_INTERVAL", DEFAULT_EVICT_INTERVAL))
+        self.snapshot_ttl = snapshot_ttl or float(os.getenv("TABLE_SNAPSHOT_TTL", DEFAULT_SNAPSHOT_TTL))
+        self.mailbox_size = mailbox_size or int(os.getenv("TABLE_MAILBOX_SIZE", DEFAULT_MAILBOX_SIZE))
+        self.pool_for = pool_for
+
+        # Minst recent actief eerst, zodat het evicten bij de eerste actieve tafel kan stoppen
+        self._live: "OrderedDict[str, TableActor]" = OrderedDict()
+        self._snapshots: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._snapshot_bytes = 0
+        self._evictor: Optional[asyncio.Task] = None
+
+        self.opened = 0
+        self.messages = 0
+        self.evicted = 0
+        self.restored = 0
+        self.expired = 0
+        self.rejected = 0
+
+    # --- Lifecycle ---
+    async def start(self) -> None:
+        if self._evictor is None:
+            self._evictor = asyncio.create_task(self._evict_loop())
+
+    async def stop(self) -> None:
+        if self._evictor is not None:
+            self._evictor.cancel()
+            try:
+                await self._evictor
+            except asyncio.CancelledError:
+                pass
+            self._evictor = None
+
+    async def _evict_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.evict_interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                print(f"⚠️ Table eviction failed: {e}")
+
+    # --- Tafels ---
+    def open(self, owner: str, rules: Optional[Rules] = None) -> str:
+        """Nieuwe tafel voor `owner`; geeft het table id terug"""
+        rules = rules or self.rules
+        pool = self.pool_for(rules.decks) if self.pool_for else None
+        table = Table(rules, Shoe(rules.decks, rules.penetration, pool=pool))
+        table_id = secrets.token_urlsafe(12)
+        self._live[table_id] = TableActor(table_id, owner, table)
+        self.opened += 1
+        if len(self._live) > self.max_live:
+            self.evict_idle()
+        return table_id
+
+    def _actor(self, table_id: str, owner: Optional[str]) -> TableActor:
+        actor = self._live.get(table_id)
+        if actor is None:
+            stored = self._snapshots.pop(table_id, None)
+            if stored is None:
+                raise TableNotFoundError(table_id)
+            self._snapshot_bytes -= len(stored[0])
+            table, snapshot_owner = load_table(stored[0], self.pool_for)
+            actor = self._live[table_id] = TableActor(table_id, snapshot_owner, table)
+            self.restored += 1
+        if owner is not None and actor.owner != owner:
+            raise TableNotFoundError(table_id)
+        self._live.move_to_end(table_id)
+        actor.last_active = time.monotonic()
+        return actor
+
+    async def call(self, table_id: str, action: str, owner: Optional[str] = None, **args) -> Dict[str, Any]:
+        """Zet een actie in de mailbox van de tafel en wacht op het resultaat"""
+        actor = self._actor(table_id, owner)
+        if actor.mailbox is None:
+            actor.mailbox = deque()
+        elif len(actor.mailbox) >= self.mailbox_size:
+            self.rejected += 1
+            raise TableBusyError(f"Table {table_id} has {len(actor.mailbox)} pending actions")
+        future = asyncio.get_running_loop().create_future()
+        actor.mailbox.append((action, args, future))
+        self.messages += 1
+        if not actor.draining:
+            actor.draining = True
+            asyncio.create_task(self._drain(actor))
+        return await future
+
+    async def _drain(self, actor: TableActor) -> None:
+        mailbox = actor.mailbox
+        try:
+            while mailbox:
+                action, args, future = mailbox.popleft()
+                if future.cancelled():
+                    continue
+                try:
+                    future.set_result(actor.handle(action, args))
+                except Exception as e:
+                    future.set_exception(e)
+                if mailbox:
+                    # Andere tafels laten doorgaan tussen twee berichten
+                    await asyncio.sleep(0)
+        finally:
+            actor.draining = False
+            actor.mailbox = None
+
+    # --- Evictie ---
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Zet idle tafels om naar snapshots; daarna de oudste tot onder TABLE_MAX_LIVE"""
+        now = now if now is not None else time.monotonic()
+        over_limit = len(self._live) - self.max_live
+        victims = []
+        for table_id, actor in self._live.items():
+            if over_limit <= 0 and now - actor.last_active < self.idle_timeout:
+                break
+            if not actor.busy:
+                victims.append(actor)
+                over_limit -= 1
+        for actor in victims:
+            del self._live[actor.table_id]
+            snapshot = dump_table(actor.table, actor.owner)
+            self._snapshots[actor.table_id] = (snapshot, now)
+            self._snapshot_bytes += len(snapshot)
+        self.evicted += len(victims)
+
+        while self._snapshots:
+            table_id, (snapshot, stored) = next(iter(self._snapshots.items()))
+            if now - stored < self.snapshot_ttl:
+                break
+            del self._snapshots[table_id]
+            self._snapshot_bytes -= len(snapshot)
+            self.expired += 1
+        return len(victims)
+
+    def close(self, table_id: str, owner: Optional[str] = None) -> None:
+        self._actor(table_id, owner)
+        del self._live[table_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "live": len(self._live),
+            "snapshots": len(self._snapshots),
+            "snapshot_bytes": self._snapshot_bytes,
+            "opened": self.opened,
+            "messages": self.messages,
+            "evicted": self.evicted,
+            "restored": self.restored,
+            "expired": self.expired,
+            "rejected": self.rejected,
+        }
+
+
+# --- Shared instance ---
+_manager: Optional[TableManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_table_manager() -> TableManager:
+    """Gedeelde manager; alle tafels van dit proces"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = TableManager()
+        return _manager
+
+
+async def stop_table_manager() -> None:
+    global _manager
+    with _manager_lock:
+        manager, _manager = _manager, None
+    if manager is not None:
+        await manager.stop()
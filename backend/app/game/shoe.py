@@ -0,0 +1,88 @@
+"""
+Shoe van N decks als één `array('B')`.
+
+Trekken is een index ophogen; na de cut card (`penetration`) schudt de
+tafel bij de volgende ronde. Standaard wordt geschud met SystemRandom
+(CSPRNG); tests en benchmarks kunnen een eigen `random.Random` meegeven.
+Met een ShoePool komt elke nieuwe volgorde kant-en-klaar uit de pool, met
+een commitment vooraf en de seed achteraf (zie shoe_pool.py).
+"""
+
+import random
+from array import array
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from .cards import CARDS_PER_DECK, new_shoe_cards
+
+if TYPE_CHECKING:
+    from .shoe_pool import ShoePool
+
+DEFAULT_DECKS = 6
+DEFAULT_PENETRATION = 0.75
+
+_system_random = random.SystemRandom()
+
+
+class Shoe:
+    __slots__ = ("cards", "position", "cut", "rng", "shuffles", "pool", "commitment", "previous_seed", "_seed")
+
+    def __init__(
+        self,
+        decks: int = DEFAULT_DECKS,
+        penetration: float = DEFAULT_PENETRATION,
+        rng: Optional[random.Random] = None,
+        pool: Optional["ShoePool"] = None,
+    ):
+        if pool is not None and pool.decks != decks:
+            raise ValueError(f"Shoe pool has {pool.decks} decks, shoe needs {decks}")
+        # Met een pool komen de kaarten uit shuffle(); geen ongeschudde shoe aanmaken
+        self.cards = new_shoe_cards(decks) if pool is None else array("B")
+        self.cut = int(decks * CARDS_PER_DECK * penetration)
+        self.rng = rng or _system_random
+        self.pool = pool
+        self.commitment: Optional[str] = None
+        self.previous_seed: Optional[str] = None
+        self._seed: Optional[bytes] = None
+        self.position = 0
+        self.shuffles = 0
+        self.shuffle()
+
+    @classmethod
+    def stacked(cls, cards: Iterable[int]) -> "Shoe":
+        """Shoe in een vaste volgorde, zonder schudden (tests, replays)"""
+        shoe = cls.__new__(cls)
+        shoe.cards = array("B", cards)
+        shoe.cut = len(shoe.cards)
+        shoe.rng = _system_random
+        shoe.pool = None
+        shoe.commitment = shoe.previous_seed = shoe._seed = None
+        shoe.position = 0
+        shoe.shuffles = 0
+        return shoe
+
+    def shuffle(self) -> None:
+        if self.pool is not None:
+            prepared = self.pool.take()
+            # De seed van de vorige shoe mag nu openbaar; de nieuwe alleen als commitment
+            self.previous_seed = self._seed.hex() if self._seed else None
+            self.cards, self._seed, self.commitment = prepared.cards, prepared.seed, prepared.commitment
+        else:
+            self.rng.shuffle(self.cards)
+        self.position = 0
+        self.shuffles += 1
+
+    def draw(self) -> int:
+        if self.position >= len(self.cards):
+            # Alleen als een ronde voorbij de laatste kaart gaat
+            self.shuffle()
+        code = self.cards[self.position]
+        self.position += 1
+        return code
+
+    @property
+    def remaining(self) -> int:
+        return len(self.cards) - self.position
+
+    @property
+    def needs_shuffle(self) -> bool:
+        return self.position >= self.cut
@@ -0,0 +1,235 @@
+"""
+Pool van vooraf geschudde shoes, aangevuld door een achtergrond thread.
+
+Schudden met SystemRandom kost per 6-deck shoe een os.urandom call per
+kaart; op het request pad betekent dat latency precies op het moment dat
+een shoe op is. ShoePool houdt per aantal decks een begrensde voorraad
+klaar (SHOE_POOL_SIZE). Een tafel pakt bij de cut card een shoe uit de
+pool; zakt de voorraad onder SHOE_POOL_LOW_WATER, dan maakt de worker in
+batches van SHOE_POOL_BATCH bij tot de pool weer vol is. Alleen als de
+pool leeg is wordt er inline geschud (`fallbacks` in de stats).
+
+De worker schudt standaard in een apart proces (SHOE_POOL_MODE=process),
+zodat het bijmaken de GIL van de request threads niet vasthoudt; met
+SHOE_POOL_MODE=thread gebeurt het in de worker thread zelf.
+
+Elke shoe is seed-committed: de volgorde volgt deterministisch uit een
+geheime seed van 32 bytes (Fisher-Yates met een SHAKE-256 stroom) en de
+tafel laat vooraf alleen `sha256(seed)` zien. Na de shoe wordt de seed
+vrijgegeven, zodat een speler met `shuffle_from_seed` kan nagaan dat de
+volgorde vooraf vastlag.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import secrets
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .cards import new_shoe_cards
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_LOW_WATER = 8
+DEFAULT_BATCH = 8
+SEED_BYTES = 32
+
+
+def shuffle_from_seed(seed: bytes, decks: int) -> array:
+    """Fisher-Yates met 64-bit woorden uit SHAKE-256(seed); zelfde seed, zelfde volgorde"""
+    cards = new_shoe_cards(decks)
+    stream = array("Q", hashlib.shake_256(seed).digest(8 * len(cards)))
+    if sys.byteorder == "big":
+        stream.byteswap()
+    for i in range(len(cards) - 1, 0, -1):
+        j = stream[i] % (i + 1)
+        cards[i], cards[j] = cards[j], cards[i]
+    return cards
+
+
+def commitment(seed: bytes) -> str:
+    return hashlib.sha256(seed).hexdigest()
+
+
+@dataclass(frozen=True)
+class PreparedShoe:
+    cards: array
+    seed: bytes
+    commitment: str
+
+
+def prepare_shoe(decks: int) -> PreparedShoe:
+    seed = secrets.token_bytes(SEED_BYTES)
+    return PreparedShoe(shuffle_from_seed(seed, decks), seed, commitment(seed))
+
+
+def _prepare_batch(decks: int, count: int) -> List[Tuple[bytes, bytes]]:
+    """In het worker proces: (kaarten, seed) als bytes, goedkoop om terug te sturen"""
+    batch = []
+    for _ in range(count):
+        seed = secrets.token_bytes(SEED_BYTES)
+        batch.append((shuffle_from_seed(seed, decks).tobytes(), seed))
+    return batch
+
+
+class ShoePool:
+    """Begrensde voorraad geschudde shoes van `decks` decks"""
+
+    def __init__(
+        self,
+        decks: int,
+        size: Optional[int] = None,
+        low_water: Optional[int] = None,
+        batch: Optional[int] = None,
+        mode: Optional[str] = None,
+    ):
+        self.decks = decks
+        self.size = size or int(os.getenv("SHOE_POOL_SIZE", DEFAULT_POOL_SIZE))
+        self.low_water = min(self.size - 1, low_water if low_water is not None else int(
+            os.getenv("SHOE_POOL_LOW_WATER", DEFAULT_LOW_WATER)
+        ))
+        self.batch = batch or int(os.getenv("SHOE_POOL_BATCH", DEFAULT_BATCH))
+        self.mode = mode or os.getenv("SHOE_POOL_MODE", "process")
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        self._shoes: Deque[PreparedShoe] = deque()
+        self._wakeup = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.generated = 0
+        self.served = 0
+        self.fallbacks = 0
+        self.refills = 0
+        self.generate_seconds = 0.0
+
+    # --- Worker ---
+    def start(self) -> "ShoePool":
+        with self._wakeup:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name=f"shoe-pool-{self.decks}d", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._wakeup:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._wakeup.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self._wakeup:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                # Pas bijmaken onder de low-water mark, dan in batches tot vol
+                while not self._stopping and len(self._shoes) > self.low_water:
+                    self._wakeup.wait()
+                if self._stopping:
+                    return
+                self.refills += 1
+            try:
+                self.fill()
+            except Exception as e:
+                # Kapot worker proces: verder in deze thread in plaats van een lege pool
+                print(f"⚠️ Shoe pool worker failed ({e}); shuffling in thread mode")
+                self.mode = "thread"
+
+    def fill(self) -> int:
+        """Vul de pool aan tot `size`; geeft het aantal nieuwe shoes terug"""
+        added = 0
+        while True:
+            with self._wakeup:
+                missing = self.size - len(self._shoes)
+                if missing <= 0 or self._stopping:
+                    return added
+            started = time.perf_counter()
+            # Schudden buiten de lock; take() wacht nooit op de worker
+            shoes = self._generate(min(missing, self.batch))
+            elapsed = time.perf_counter() - started
+            with self._wakeup:
+                room = self.size - len(self._shoes)
+                self._shoes.extend(shoes[:room])
+                self.generated += len(shoes)
+                self.generate_seconds += elapsed
+            added += min(len(shoes), room)
+
+    def _generate(self, count: int) -> List[PreparedShoe]:
+        if self.mode != "process":
+            return [prepare_shoe(self.decks) for _ in range(count)]
+        with self._wakeup:
+            if self._executor is None:
+                # Eén proces is genoeg; spawn i.p.v. fork, net als de image pool
+                self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            executor = self._executor
+        batch = executor.submit(_prepare_batch, self.decks, count).result()
+        return [PreparedShoe(array("B", cards), seed, commitment(seed)) for cards, seed in batch]
+
+    # --- Afnemen ---
+    def take(self) -> PreparedShoe:
+        """Een geschudde shoe uit de pool, of inline geschud als de pool leeg is"""
+        with self._wakeup:
+            shoe = self._shoes.popleft() if self._shoes else None
+            self.served += 1
+            if len(self._shoes) <= self.low_water:
+                self._wakeup.notify()
+            if shoe is not None:
+                return shoe
+            self.fallbacks += 1
+        return prepare_shoe(self.decks)
+
+    @property
+    def depth(self) -> int:
+        return len(self._shoes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "decks": self.decks,
+            "depth": len(self._shoes),
+            "size": self.size,
+            "low_water": self.low_water,
+            "generated": self.generated,
+            "served": self.served,
+            "fallbacks": self.fallbacks,
+            "refills": self.refills,
+            "generate_ms_avg": round(self.generate_seconds * 1000 / self.generated, 3) if self.generated else None,
+            "mode": self.mode,
+            "running": self._thread is not None,
+        }
+
+
+# --- Shared pools ---
+_pools: Dict[int, ShoePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_shoe_pool(decks: int) -> ShoePool:
+    """Gedeelde, gestarte pool per aantal decks"""
+    with _pools_lock:
+        pool = _pools.get(decks)
+        if pool is None:
+            pool = _pools[decks] = ShoePool(decks).start()
+        return pool
+
+
+def shoe_pool_stats() -> Dict[str, Any]:
+    return {f"{decks}d": pool.stats() for decks, pool in sorted(_pools.items())}
+
+
+def stop_shoe_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.stop()
@@ -0,0 +1,288 @@
+"""
+Gevectoriseerde Monte Carlo simulatie van de blackjack engine.
+
+In plaats van hand voor hand in Python speelt de simulator duizenden shoes
+tegelijk: elke rij van een (shoes x kaarten) uint8 matrix is een geschudde
+shoe, en elke stap (kaart trekken, policy opzoeken, dealer laten trekken)
+is één NumPy operatie over alle rijen. Rondes worden zoals aan tafel
+achter elkaar uit dezelfde shoe gedeeld tot de cut card, dus de
+samenstelling van de shoe telt mee.
+
+Regels komen uit `Rules` van de engine (decks, penetration, S17/H17,
+blackjack uitbetaling). De speler volgt een policy tabel
+`[soft, totaal, dealer upcard] -> actie`; ingebouwd zijn "basic" (basic
+strategy zonder splitsen), "dealer" (hit onder de 17) en "never_bust".
+
+Het werk wordt verdeeld over processen (SIMULATION_WORKERS, default het
+aantal cores), elk met een eigen SeedSequence; met dezelfde seed en
+hetzelfde aantal workers is de uitkomst reproduceerbaar.
+
+Usage:
+
+    result = simulate(5_000_000, Rules(decks=6), policy="basic")
+    print(result.house_edge, result.to_dict()["by_upcard"])
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from .cards import CARD_VALUES, CARDS_PER_DECK
+from .engine import Rules
+
+DEFAULT_BATCH_SHOES = 20000
+# Reserve achter de shoe voor een ronde die voorbij de laatste kaart gaat
+SHOE_PADDING = 24
+UPCARDS = ("2", "3", "4", "5", "6", "7", "8", "9", "10", "A")
+
+STAND, HIT, DOUBLE, DOUBLE_OR_STAND = 0, 1, 2, 3
+
+# Tellers per dealer upcard
+FIELDS = ("hands", "net", "wagered", "wins", "pushes", "losses",
+          "player_busts", "dealer_busts", "player_blackjacks", "dealer_blackjacks", "doubles")
+
+
+# --- Policies ---
+def _policy_table() -> np.ndarray:
+    return np.zeros((2, 22, len(UPCARDS)), dtype=np.uint8)
+
+
+def _rows(table: np.ndarray, soft: int, totals, actions: str) -> None:
+    """Vul één of meer totalen met een actie per upcard ('H', 'S', 'D', 's' = double anders stand)"""
+    codes = {"S": STAND, "H": HIT, "D": DOUBLE, "s": DOUBLE_OR_STAND}
+    for total in totals:
+        table[soft, total] = [codes[a] for a in actions]
+
+
+def basic_strategy(dealer_hits_soft_17: bool = False) -> np.ndarray:
+    """Basic strategy voor meerdere decks, zonder splitsen of surrender"""
+    table = _policy_table()
+    #                           2345678910A
+    _rows(table, 0, range(0, 9), "HHHHHHHHHH")
+    _rows(table, 0, [9], "HDDDDHHHHH")
+    _rows(table, 0, [10], "DDDDDDDDHH")
+    _rows(table, 0, [11], "DDDDDDDDDD" if dealer_hits_soft_17 else "DDDDDDDDDH")
+    _rows(table, 0, [12], "HHSSSHHHHH")
+    _rows(table, 0, range(13, 17), "SSSSSHHHHH")
+    _rows(table, 0, range(17, 22), "SSSSSSSSSS")
+    _rows(table, 1, range(0, 13), "HHHHHHHHHH")
+    _rows(table, 1, [13, 14], "HHHDDHHHHH")
+    _rows(table, 1, [15, 16], "HHDDDHHHHH")
+    _rows(table, 1, [17], "HDDDDHHHHH")
+    _rows(table, 1, [18], "ssssssSHHH" if dealer_hits_soft_17 else "SssssSSHHH")
+    _rows(table, 1, range(19, 22), "SSSSSSSSSS")
+    return table
+
+
+def threshold_policy(hard_stand: int, soft_stand: int) -> np.ndarray:
+    """Hit tot een vast totaal, ongeacht de upcard"""
+    table = _policy_table()
+    table[0, :hard_stand] = HIT
+    table[1, :soft_stand] = HIT
+    return table
+
+
+def resolve_policy(policy: Union[str, np.ndarray], rules: Rules) -> np.ndarray:
+    if isinstance(policy, np.ndarray):
+        return policy.astype(np.uint8)
+    if policy == "basic":
+        return basic_strategy(rules.dealer_hits_soft_17)
+    if policy == "dealer":
+        return threshold_policy(17, 17)
+    if policy == "never_bust":
+        return threshold_policy(12, 18)
+    raise ValueError(f"Unknown policy: {policy}")
+
+
+# --- Simulatie ---
+def _score(hard: np.ndarray, ace: np.ndarray) -> np.ndarray:
+    return np.where(ace & (hard <= 11), hard + 10, hard)
+
+
+def simulate_shoes(shoes: int, rules: Rules, policy: np.ndarray, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Speel `shoes` shoes tot de cut card; tellers per dealer upcard"""
+    values = np.frombuffer(CARD_VALUES, dtype=np.uint8)
+    base = np.tile(values, rules.decks)
+    cut = int(len(base) * rules.penetration)
+
+    matrix = np.empty((shoes, len(base) + SHOE_PADDING), dtype=np.uint8)
+    matrix[:, :len(base)] = base
+    rng.permuted(matrix[:, :len(base)], axis=1, out=matrix[:, :len(base)])
+    matrix[:, len(base):] = rng.choice(values, size=(shoes, SHOE_PADDING))
+
+    rows = np.arange(shoes)
+    pos = np.zeros(shoes, dtype=np.int32)
+    totals = {field: np.zeros(len(UPCARDS), dtype=np.float64) for field in FIELDS}
+
+    def draw(mask):
+        cards = matrix[rows, pos].astype(np.int16)
+        pos[mask] += 1
+        return np.where(mask, cards, 0)
+
+    while True:
+        active = pos < cut
+        if not active.any():
+            break
+
+        # Delen: speler, dealer, speler, dealer (zoals Table.start_round)
+        p1, up, p2, hole = draw(active), draw(active), draw(active), draw(active)
+        p_hard, p_ace = p1 + p2, (p1 == 1) | (p2 == 1)
+        d_hard, d_ace = up + hole, (up == 1) | (hole == 1)
+        up_index = np.where(up == 1, 9, up - 2)
+
+        p_bj = active & (_score(p_hard, p_ace) == 21)
+        d_bj = active & (_score(d_hard, d_ace) == 21)
+        bet = np.ones(shoes, dtype=np.float64)
+        doubled = np.zeros(shoes, dtype=bool)
+        first = np.ones(shoes, dtype=bool)
+
+        # Speler: per stap één policy lookup voor alle shoes
+        playing = active & ~p_bj & ~d_bj
+        while playing.any():
+            soft = p_ace & (p_hard <= 11)
+            total = np.minimum(_score(p_hard, p_ace), 21)
+            action = policy[soft.astype(np.intp), total, up_index]
+            double = playing & first & ((action == DOUBLE) | (action == DOUBLE_OR_STAND))
+            hit = playing & ~double & ((action == HIT) | (action == DOUBLE))
+            card = draw(double | hit)
+            p_hard += card
+            p_ace |= card == 1
+            doubled |= double
+            first &= ~(double | hit)
+            playing = hit & (_score(p_hard, p_ace) < 21)
+        bet[doubled] = 2.0
+        p_bust = active & (p_hard > 21)
+
+        # Dealer trekt alleen als de speler nog in het spel is
+        dealing = active & ~p_bj & ~d_bj & ~p_bust
+        while True:
+            d_score = _score(d_hard, d_ace)
+            needs = dealing & (d_score < 17)
+            if rules.dealer_hits_soft_17:
+                needs |= dealing & (d_score == 17) & d_ace & (d_hard <= 11)
+            if not needs.any():
+                break
+            card = draw(needs)
+            d_hard += card
+            d_ace |= card == 1
+        d_bust = dealing & (d_hard > 21)
+
+        p_score, d_score = _score(p_hard, p_ace), _score(d_hard, d_ace)
+        compared = dealing & ~d_bust
+        win = (p_bj & ~d_bj) | d_bust | (compared & (p_score > d_score))
+        push = (p_bj & d_bj) | (compared & (p_score == d_score))
+        lose = active & ~win & ~push
+
+        net = np.where(win, bet, 0.0) - np.where(lose, bet, 0.0)
+        net[p_bj & ~d_bj] = rules.blackjack_pays
+
+        index = up_index[active]
+        for field, weights in (
+            ("hands", None), ("net", net), ("wagered", bet), ("wins", win), ("pushes", push),
+            ("losses", lose), ("player_busts", p_bust), ("dealer_busts", d_bust),
+            ("player_blackjacks", p_bj), ("dealer_blackjacks", d_bj), ("doubles", doubled),
+        ):
+            w = None if weights is None else weights[active].astype(np.float64)
+            totals[field] += np.bincount(index, weights=w, minlength=len(UPCARDS))
+
+    return totals
+
+
+def _simulate_worker(hands: int, rules: Rules, policy: np.ndarray, seed: np.random.SeedSequence,
+                     batch_shoes: int) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    totals = {field: np.zeros(len(UPCARDS)) for field in FIELDS}
+    played = 0
+    while played < hands:
+        batch = simulate_shoes(batch_shoes, rules, policy, rng)
+        for field in FIELDS:
+            totals[field] += batch[field]
+        played += int(batch["hands"].sum())
+    return totals
+
+
+@dataclass
+class SimulationResult:
+    rules: Rules
+    policy: str
+    totals: Dict[str, np.ndarray]
+
+    def _rate(self, field: str) -> float:
+        return float(self.totals[field].sum() / self.hands)
+
+    @property
+    def hands(self) -> int:
+        return int(self.totals["hands"].sum())
+
+    @property
+    def house_edge(self) -> float:
+        """Verwacht verlies van de speler per eerste inzet"""
+        return float(-self.totals["net"].sum() / self.hands)
+
+    def to_dict(self) -> Dict[str, Any]:
+        t = self.totals
+        by_upcard: List[Dict[str, Any]] = []
+        for i, upcard in enumerate(UPCARDS):
+            hands = t["hands"][i] or 1
+            by_upcard.append({
+                "upcard": upcard,
+                "hands": int(t["hands"][i]),
+                "player_ev": round(float(t["net"][i] / hands), 4),
+                "win_rate": round(float(t["wins"][i] / hands), 4),
+                "push_rate": round(float(t["pushes"][i] / hands), 4),
+                "loss_rate": round(float(t["losses"][i] / hands), 4),
+                "dealer_bust_rate": round(float(t["dealer_busts"][i] / hands), 4),
+            })
+        return {
+            "rules": {
+                "decks": self.rules.decks,
+                "penetration": self.rules.penetration,
+                "dealer_hits_soft_17": self.rules.dealer_hits_soft_17,
+                "blackjack_pays": self.rules.blackjack_pays,
+            },
+            "policy": self.policy,
+            "hands": self.hands,
+            "house_edge": round(self.house_edge, 5),
+            "dealer_win_rate": round(self._rate("losses"), 4),
+            "player_win_rate": round(self._rate("wins"), 4),
+            "push_rate": round(self._rate("pushes"), 4),
+            "player_bust_rate": round(self._rate("player_busts"), 4),
+            "dealer_bust_rate": round(self._rate("dealer_busts"), 4),
+            "blackjack_rate": round(self._rate("player_blackjacks"), 4),
+            "double_rate": round(self._rate("doubles"), 4),
+            "by_upcard": by_upcard,
+        }
+
+
+def simulate(
+    hands: int,
+    rules: Optional[Rules] = None,
+    policy: Union[str, np.ndarray] = "basic",
+    workers: Optional[int] = None,
+    seed: Optional[int] = None,
+    batch_shoes: int = DEFAULT_BATCH_SHOES,
+) -> SimulationResult:
+    """Speel minstens `hands` handen, verdeeld over `workers` processen"""
+    rules = rules or Rules()
+    table = resolve_policy(policy, rules)
+    workers = workers or int(os.getenv("SIMULATION_WORKERS", os.cpu_count() or 1))
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    per_worker = -(-hands // workers)
+    # Niet meer shoes per batch dan nodig (±40 rondes per 6-deck shoe)
+    hands_per_shoe = max(1, int(rules.decks * CARDS_PER_DECK * rules.penetration / 5.5))
+    batch_shoes = max(1, min(batch_shoes, -(-per_worker // hands_per_shoe)))
+
+    if workers == 1:
+        parts = [_simulate_worker(per_worker, rules, table, seeds[0], batch_shoes)]
+    else:
+        # spawn i.p.v. fork, net als de image pool
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(_simulate_worker, [per_worker] * workers, [rules] * workers,
+                                  [table] * workers, seeds, [batch_shoes] * workers))
+
+    totals = {field: sum(part[field] for part in parts) for field in FIELDS}
+    return SimulationResult(rules, policy if isinstance(policy, str) else "custom", totals)
@@ -0,0 +1,79 @@
+"""
+Compacte snapshots van een tafel, voor tafels die even niet gespeeld worden.
+
+Een levende Table kost ±1 KB (objecten, hands, shoe van 312 bytes). Een
+snapshot is één bytes object met een vaste header en daarna de kaarten.
+Een shoe uit de ShoePool wordt bewaard als zijn seed van 32 bytes (de
+volgorde volgt daar deterministisch uit), een andere shoe als de kaarten
+zelf. Een 6-deck tafel uit de pool past zo in ±100 bytes.
+"""
+
+import struct
+from typing import Callable, Optional, Tuple
+
+from .cards import Hand
+from .engine import BETTING, BLACKJACK, BUST, GAME_OVER, LOSE, PLAYER_TURN, PUSH, WIN, Rules, Table
+from .shoe import Shoe
+from .shoe_pool import SEED_BYTES, ShoePool, commitment, shuffle_from_seed
+
+VERSION = 1
+PHASES = (BETTING, PLAYER_TURN, GAME_OVER)
+OUTCOMES = (None, BLACKJACK, WIN, PUSH, LOSE, BUST)
+SHOE_CARDS, SHOE_SEED = 0, 1
+
+# versie, decks, penetration (1/10000), H17, blackjack uitbetaling (1/1000), min/max bet,
+# fase, uitkomst, bet, rondes, shuffles, positie, cut, shoe soort, vorige seed?, #speler, #dealer, #owner
+HEADER = struct.Struct("<BBHBHIIBBIIIHHBBBBB")
+
+
+def dump_table(table: Table, owner: str = "") -> bytes:
+    rules, shoe = table.rules, table.shoe
+    owner_bytes = owner.encode()
+    seed = shoe._seed if shoe.pool is not None else None
+    previous = bytes.fromhex(shoe.previous_seed) if shoe.previous_seed else b""
+    header = HEADER.pack(
+        VERSION, rules.decks, round(rules.penetration * 10000), rules.dealer_hits_soft_17,
+        round(rules.blackjack_pays * 1000), rules.min_bet, rules.max_bet,
+        PHASES.index(table.phase), OUTCOMES.index(table.outcome), table.bet, table.rounds,
+        shoe.shuffles, shoe.position, shoe.cut, SHOE_SEED if seed else SHOE_CARDS, bool(previous),
+        len(table.player.cards), len(table.dealer.cards), len(owner_bytes),
+    )
+    shoe_bytes = seed if seed else shoe.cards.tobytes()
+    return b"".join((header, owner_bytes, table.player.cards, table.dealer.cards, shoe_bytes, previous))
+
+
+def load_table(data: bytes, pool_for: Optional[Callable[[int], ShoePool]] = None) -> Tuple[Table, str]:
+    """Tafel en owner uit een snapshot; `pool_for(decks)` levert de pool voor shoes met een seed"""
+    (version, decks, penetration, h17, blackjack_pays, min_bet, max_bet, phase, outcome, bet, rounds,
+     shuffles, position, cut, shoe_kind, has_previous, player_count, dealer_count, owner_length) = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported table snapshot version {version}")
+
+    offset = HEADER.size
+    owner = data[offset:offset + owner_length].decode()
+    offset += owner_length
+    player_cards = data[offset:offset + player_count]
+    offset += player_count
+    dealer_cards = data[offset:offset + dealer_count]
+    offset += dealer_count
+
+    rules = Rules(decks, penetration / 10000, bool(h17), blackjack_pays / 1000, min_bet, max_bet)
+    if shoe_kind == SHOE_SEED:
+        seed = data[offset:offset + SEED_BYTES]
+        offset += SEED_BYTES
+        shoe = Shoe.stacked(shuffle_from_seed(seed, decks))
+        shoe.pool = pool_for(decks) if pool_for else None
+        shoe._seed, shoe.commitment = seed, commitment(seed)
+    else:
+        shoe_length = decks * 52
+        shoe = Shoe.stacked(data[offset:offset + shoe_length])
+        offset += shoe_length
+    shoe.position, shoe.cut, shoe.shuffles = position, cut, shuffles
+    if has_previous:
+        shoe.previous_seed = data[offset:offset + SEED_BYTES].hex()
+
+    table = Table(rules, shoe)
+    table.phase, table.outcome = PHASES[phase], OUTCOMES[outcome]
+    table.bet, table.rounds = bet, rounds
+    table.player, table.dealer = Hand(player_cards), Hand(dealer_cards)
+    return table, owner
@@ -0,0 +1,389 @@
+"""
+Voorberekende strategie: verwachte waarde van stand / hit / double per
+situatie, zodat een hint een tabel lookup is in plaats van een LLM call.
+
+De EVs worden één keer berekend met gememoizeerde recursie over de
+samenstelling van de shoe (aantal kaarten per rank):
+
+- per dealer upcard en per beginhand van twee kaarten wordt de
+  eindverdeling van de dealer (17..21, bust) exact uitgerekend voor de shoe
+  zonder die drie kaarten, gegeven dat de dealer geen blackjack heeft
+  (de engine kijkt daar eerst naar)
+- de speler trekt uit een shoe die per kaart kleiner wordt; hit EV is het
+  gewogen maximum van stand en verder hitten, per samenstelling gecached
+- die verdeling van de dealer wordt na hits van de speler niet opnieuw
+  berekend; voor de eerste beslissing is de tabel exact
+
+Twee-kaart EVs worden per (hard/soft, totaal) gewogen naar kans gemiddeld
+en apart per paar bewaard. Splitsen zit niet in de engine en dus ook niet
+in de tabel. Handen van drie of meer kaarten (geen double meer) komen uit
+de volle shoe min de upcard.
+
+Per regelset (decks, S17/H17) is dat een vaste `array('h')` van EV *
+10000, zo'n 6 KB. `build_strategy_tables.py` schrijft alle regelsets naar
+`strategy_tables.bin`; die wordt bij het opstarten geladen. Een regelset
+die er niet in staat wordt bij de eerste vraag berekend (enkele seconden).
+
+Usage:
+
+    advice = get_strategy_tables().advise(Rules(), total=16, upcard="10")
+    print(advice.action, advice.describe())
+"""
+
+import os
+import struct
+import sys
+import threading
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cards import CARDS_PER_DECK
+from .engine import Rules
+
+# Rank index r heeft waarde r + 1: 0 = aas, 1..8 = 2..9, 9 = tien/plaatje
+RANKS = 10
+ACE_RANK, TEN_RANK = 0, 9
+RANK_ALIASES = {"A": 0, "J": 9, "Q": 9, "K": 9, "T": 9, **{str(v): v - 1 for v in range(2, 11)}}
+RANK_NAMES = ("A", "2", "3", "4", "5", "6", "7", "8", "9", "10")
+
+STAND, HIT, DOUBLE = "stand", "hit", "double"
+
+# EV's als int16 in 1/10000 inzet; double EV ligt tussen -2 en 2
+SCALE = 10000
+MISSING = -32768
+
+HARD, SOFT, PAIR = 0, 1, 2
+SLOTS = 22
+TWO_CARD_SIZE = 3 * SLOTS * RANKS * 3  # [hard/soft/paar][totaal of rank][upcard][stand, hit, double]
+MULTI_CARD_SIZE = 2 * SLOTS * RANKS * 2  # [hard/soft][totaal][upcard][stand, hit]
+TABLE_SIZE = TWO_CARD_SIZE + MULTI_CARD_SIZE
+
+DEFAULT_DECK_COUNTS = (1, 2, 4, 6, 8)
+DEFAULT_TABLES_PATH = os.path.join(os.path.dirname(__file__), "strategy_tables.bin")
+FILE_MAGIC = b"BJEV1"
+
+
+def parse_rank(label: str) -> int:
+    """'A', '2'..'10', 'J', 'Q', 'K' -> rank index"""
+    rank = RANK_ALIASES.get(str(label).strip().upper())
+    if rank is None:
+        raise ValueError(f"Unknown card rank: {label}")
+    return rank
+
+
+def shoe_composition(decks: int) -> List[int]:
+    per_rank = decks * CARDS_PER_DECK // 13
+    return [per_rank] * (RANKS - 1) + [per_rank * 4]
+
+
+# --- Berekening ---
+def dealer_outcomes(comp: List[int], upcard: int, hits_soft_17: bool) -> Tuple[float, ...]:
+    """Kans op een eindtotaal van 17, 18, 19, 20, 21 en bust, gegeven geen dealer blackjack"""
+    memo: Dict[Tuple[int, ...], Tuple[float, ...]] = {}
+
+    def play(hard: int, ace: bool) -> Tuple[float, ...]:
+        if hard > 21:
+            return (0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+        soft = ace and hard <= 11
+        score = hard + 10 if soft else hard
+        if score > 17 or (score == 17 and not (hits_soft_17 and soft)):
+            return tuple(1.0 if score == 17 + k else 0.0 for k in range(6))
+        # De kaarten die de dealer al trok bepalen hard/ace, dus de samenstelling is genoeg als key
+        key = tuple(comp)
+        cached = memo.get(key)
+        if cached is None:
+            cached = memo[key] = _draw(play, comp, hard, ace, range(RANKS))
+        return cached
+
+    # Hole card: geen tien onder een aas, geen aas onder een tien
+    banned = {ACE_RANK: TEN_RANK, TEN_RANK: ACE_RANK}.get(upcard)
+    return _draw(play, comp, upcard + 1, upcard == ACE_RANK, [r for r in range(RANKS) if r != banned])
+
+
+def _draw(play, comp: List[int], hard: int, ace: bool, ranks: Iterable[int]) -> Tuple[float, ...]:
+    ranks = [r for r in ranks if comp[r]]
+    remaining = sum(comp[r] for r in ranks)
+    totals = [0.0] * 6
+    for r in ranks:
+        p = comp[r] / remaining
+        comp[r] -= 1
+        outcome = play(hard + r + 1, ace or r == ACE_RANK)
+        comp[r] += 1
+        for k in range(6):
+            totals[k] += p * outcome[k]
+    return tuple(totals)
+
+
+def stand_values(outcomes: Tuple[float, ...]) -> List[float]:
+    """EV van staan per spelerscore 0..21 tegen deze dealer verdeling"""
+    values = []
+    for score in range(SLOTS):
+        win = outcomes[5] + sum(outcomes[k] for k in range(5) if 17 + k < score)
+        lose = sum(outcomes[k] for k in range(5) if 17 + k > score)
+        values.append(win - lose)
+    return values
+
+
+def _score(hard: int, ace: bool) -> int:
+    return hard + 10 if ace and hard <= 11 else hard
+
+
+class _PlayerSolver:
+    """Stand/hit/double EV voor de speler bij een vaste dealer verdeling"""
+
+    def __init__(self, comp: List[int], stand: List[float]):
+        self.comp = comp
+        self.stand = stand
+        self.memo: Dict[Tuple, float] = {}
+
+    def hit(self, hard: int, ace: bool) -> float:
+        comp = self.comp
+        key = (tuple(comp), hard, ace)
+        cached = self.memo.get(key)
+        if cached is not None:
+            return cached
+        remaining = sum(comp)
+        ev = 0.0
+        for r in range(RANKS):
+            if not comp[r]:
+                continue
+            new_hard, new_ace = hard + r + 1, ace or r == ACE_RANK
+            if new_hard > 21:
+                value = -1.0
+            else:
+                comp[r] -= 1
+                value = max(self.stand[_score(new_hard, new_ace)], self.hit(new_hard, new_ace))
+                comp[r] += 1
+            ev += comp[r] / remaining * value
+        self.memo[key] = ev
+        return ev
+
+    def double(self, hard: int, ace: bool) -> float:
+        comp, remaining = self.comp, sum(self.comp)
+        ev = 0.0
+        for r in range(RANKS):
+            if comp[r]:
+                new_hard = hard + r + 1
+                value = -1.0 if new_hard > 21 else self.stand[_score(new_hard, ace or r == ACE_RANK)]
+                ev += comp[r] / remaining * value
+        return 2 * ev
+
+    def evs(self, hard: int, ace: bool) -> Tuple[float, float, float]:
+        return self.stand[_score(hard, ace)], self.hit(hard, ace), self.double(hard, ace)
+
+
+def compute_table(decks: int, hits_soft_17: bool) -> array:
+    """Bereken de volledige EV tabel voor één regelset"""
+    data = array("h", [MISSING]) * TABLE_SIZE
+    for upcard in range(RANKS):
+        base = shoe_composition(decks)
+        base[upcard] -= 1
+        cards = sum(base)
+
+        # Twee kaarten: exact per combinatie, per totaal gewogen naar kans
+        sums: Dict[Tuple[int, int], List[float]] = {}
+        for r1 in range(RANKS):
+            for r2 in range(r1, RANKS):
+                if {r1, r2} == {ACE_RANK, TEN_RANK}:
+                    continue  # blackjack, geen beslissing
+                comp = list(base)
+                comp[r1] -= 1
+                comp[r2] -= 1
+                if min(comp) < 0:
+                    continue
+                solver = _PlayerSolver(comp, stand_values(dealer_outcomes(comp, upcard, hits_soft_17)))
+                hard, ace = r1 + r2 + 2, ACE_RANK in (r1, r2)
+                evs = solver.evs(hard, ace)
+                if r1 == r2:
+                    _put(data, _two_card_index(PAIR, r1, upcard), evs)
+                weight = (base[r1] * (base[r1] - 1) if r1 == r2 else 2 * base[r1] * base[r2]) / (cards * (cards - 1))
+                kind = SOFT if ace and hard <= 11 else HARD
+                group = sums.setdefault((kind, _score(hard, ace)), [0.0, 0.0, 0.0, 0.0])
+                group[0] += weight
+                for i in range(3):
+                    group[i + 1] += weight * evs[i]
+        for (kind, total), (weight, *weighted) in sums.items():
+            _put(data, _two_card_index(kind, total, upcard), [ev / weight for ev in weighted])
+
+        # Drie of meer kaarten: volle shoe min de upcard
+        solver = _PlayerSolver(base, stand_values(dealer_outcomes(base, upcard, hits_soft_17)))
+        for total in range(4, 22):
+            _put(data, _multi_card_index(HARD, total, upcard), solver.evs(total, False)[:2])
+        for total in range(12, 22):
+            _put(data, _multi_card_index(SOFT, total, upcard), solver.evs(total - 10, True)[:2])
+    return data
+
+
+def _two_card_index(kind: int, slot: int, upcard: int) -> int:
+    return ((kind * SLOTS + slot) * RANKS + upcard) * 3
+
+
+def _multi_card_index(kind: int, total: int, upcard: int) -> int:
+    return TWO_CARD_SIZE + ((kind * SLOTS + total) * RANKS + upcard) * 2
+
+
+def _put(data: array, index: int, evs: Iterable[float]) -> None:
+    for i, ev in enumerate(evs):
+        data[index + i] = round(ev * SCALE)
+
+
+# --- Lookups ---
+@dataclass(frozen=True)
+class Advice:
+    action: str
+    evs: Dict[str, float]
+    total: int
+    soft: bool
+    upcard: str
+    pair: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "action": self.action,
+            "evs": self.evs,
+            "total": self.total,
+            "soft": self.soft,
+            "pair": self.pair,
+            "upcard": self.upcard,
+        }
+
+    def describe(self) -> str:
+        """Bijv. 'Hard 16 vs dealer 10: hit (EV hit -0.535, stand -0.540)'"""
+        hand = f"Pair of {self.pair}s" if self.pair else f"{'Soft' if self.soft else 'Hard'} {self.total}"
+        ranked = sorted(self.evs.items(), key=lambda item: -item[1])
+        evs = ", ".join(f"{action} {ev:+.3f}" for action, ev in ranked)
+        return f"{hand} vs dealer {self.upcard}: {self.action} (EV {evs})"
+
+
+class StrategyTable:
+    """EV tabel van één regelset; elke lookup is een paar index berekeningen"""
+
+    __slots__ = ("decks", "hits_soft_17", "data")
+
+    def __init__(self, decks: int, hits_soft_17: bool, data: array):
+        if len(data) != TABLE_SIZE:
+            raise ValueError(f"Strategy table has {len(data)} entries, expected {TABLE_SIZE}")
+        self.decks = decks
+        self.hits_soft_17 = hits_soft_17
+        self.data = data
+
+    def evs(self, total: int, upcard: int, soft: bool = False, pair: Optional[int] = None,
+            first_decision: bool = True) -> Dict[str, float]:
+        """EV per toegestane actie; `pair` is een rank index, alleen bij de eerste beslissing"""
+        kind = SOFT if soft else HARD
+        if not (12 if soft else 4) <= total <= 21 or not 0 <= upcard < RANKS:
+            raise ValueError(f"No strategy for {'soft' if soft else 'hard'} {total}")
+        data = self.data
+        if first_decision:
+            index = _two_card_index(PAIR, pair, upcard) if pair is not None else _two_card_index(kind, total, upcard)
+            if data[index] != MISSING:
+                return {STAND: data[index] / SCALE, HIT: data[index + 1] / SCALE, DOUBLE: data[index + 2] / SCALE}
+        index = _multi_card_index(kind, total, upcard)
+        return {STAND: data[index] / SCALE, HIT: data[index + 1] / SCALE}
+
+
+class StrategyTables:
+    """Alle geladen regelsets, per (decks, H17)"""
+
+    def __init__(self, tables: Optional[Dict[Tuple[int, bool], StrategyTable]] = None):
+        self._tables = dict(tables or {})
+        self._lock = threading.Lock()
+        self.computed = 0
+
+    @classmethod
+    def compute(cls, deck_counts: Iterable[int] = DEFAULT_DECK_COUNTS) -> "StrategyTables":
+        return cls({
+            (decks, h17): StrategyTable(decks, h17, compute_table(decks, h17))
+            for decks in deck_counts for h17 in (False, True)
+        })
+
+    @classmethod
+    def load(cls, path: str) -> "StrategyTables":
+        with open(path, "rb") as f:
+            raw = f.read()
+        if not raw.startswith(FILE_MAGIC):
+            raise ValueError(f"{path} is not a strategy table file")
+        (count,) = struct.unpack_from("<H", raw, len(FILE_MAGIC))
+        offset = len(FILE_MAGIC) + 2
+        tables = {}
+        for _ in range(count):
+            decks, h17 = struct.unpack_from("<BB", raw, offset)
+            offset += 2
+            data = array("h", raw[offset:offset + TABLE_SIZE * 2])
+            if sys.byteorder == "big":
+                data.byteswap()
+            offset += TABLE_SIZE * 2
+            tables[(decks, bool(h17))] = StrategyTable(decks, bool(h17), data)
+        return cls(tables)
+
+    def save(self, path: str) -> None:
+        chunks = [FILE_MAGIC, struct.pack("<H", len(self._tables))]
+        for (decks, h17), table in sorted(self._tables.items()):
+            data = array("h", table.data)
+            if sys.byteorder == "big":
+                data.byteswap()
+            chunks += [struct.pack("<BB", decks, h17), data.tobytes()]
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(chunks))
+        os.replace(tmp, path)
+
+    def rule_sets(self) -> List[Tuple[int, bool]]:
+        return sorted(self._tables)
+
+    def has(self, decks: int, hits_soft_17: bool) -> bool:
+        return (decks, bool(hits_soft_17)) in self._tables
+
+    def table(self, decks: int, hits_soft_17: bool) -> StrategyTable:
+        """Tabel voor deze regels; een onbekende regelset wordt eenmalig berekend"""
+        key = (decks, bool(hits_soft_17))
+        table = self._tables.get(key)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(key)
+                if table is None:
+                    print(f"🧮 Computing strategy table for {decks} decks, {'H17' if hits_soft_17 else 'S17'}")
+                    table = self._tables[key] = StrategyTable(decks, bool(hits_soft_17), compute_table(decks, hits_soft_17))
+                    self.computed += 1
+        return table
+
+    def advise(self, rules: Rules, total: int, upcard: str, soft: bool = False,
+               pair: Optional[str] = None, first_decision: bool = True) -> Advice:
+        """Beste actie en alle EV's voor een hand; `pair` is de rank van een paar ('8', 'A')"""
+        pair_rank = parse_rank(pair) if pair else None
+        if pair_rank is not None:
+            total, soft = (12, True) if pair_rank == ACE_RANK else (2 * (pair_rank + 1), False)
+        up_rank = parse_rank(upcard)
+        evs = self.table(rules.decks, rules.dealer_hits_soft_17).evs(
+            total, up_rank, soft, pair_rank if first_decision else None, first_decision
+        )
+        action = max(evs, key=evs.get)
+        return Advice(action, evs, total, soft, RANK_NAMES[up_rank], RANK_NAMES[pair_rank] if pair_rank is not None else None)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "rule_sets": [f"{decks}d-{'h17' if h17 else 's17'}" for decks, h17 in self.rule_sets()],
+            "bytes": len(self._tables) * TABLE_SIZE * 2,
+            "computed": self.computed,
+        }
+
+
+# --- Shared instance ---
+_tables: Optional[StrategyTables] = None
+_tables_lock = threading.Lock()
+
+
+def get_strategy_tables() -> StrategyTables:
+    """Tabellen uit STRATEGY_TABLES_PATH, één keer geladen"""
+    global _tables
+    with _tables_lock:
+        if _tables is None:
+            path = os.getenv("STRATEGY_TABLES_PATH", DEFAULT_TABLES_PATH)
+            try:
+                _tables = StrategyTables.load(path)
+                print(f"✅ Strategy tables loaded: {len(_tables.rule_sets())} rule sets")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Strategy tables not loaded ({e}); computing on demand")
+                _tables = StrategyTables()
+        return _tables
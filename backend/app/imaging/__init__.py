@@ -0,0 +1,14 @@
+from .convert import PIL_AVAILABLE, avif_supported, convert_to_webp, generate_variants
+from .pool import ImageJobTimeoutError, ImagePoolBusyError, ImageWorkerPool, get_image_pool, stop_image_pool
+
+__all__ = [
+    "PIL_AVAILABLE",
+    "avif_supported",
+    "convert_to_webp",
+    "generate_variants",
+    "ImageJobTimeoutError",
+    "ImagePoolBusyError",
+    "ImageWorkerPool",
+    "get_image_pool",
+    "stop_image_pool",
+]
@@ -0,0 +1,134 @@
+"""
+Beeldconversie voor uploads.
+
+Deze module heeft geen side effects bij import, zodat de functies ook in
+worker processen van de image pool gebruikt kunnen worden.
+"""
+
+import hashlib
+import io
+from typing import Any, Dict, List, Sequence
+
+# PIL/Pillow imports
+try:
+    from PIL import Image, features
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    print("⚠️ PIL/Pillow not available. Install with: pip install Pillow")
+
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "avif": ("AVIF", "image/avif"),
+}
+
+
+def _to_rgb(image):
+    """Convert to RGB, using white background for transparency"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        if image.mode in ('RGBA', 'LA'):
+            rgb_image.paste(image, mask=image.split()[-1])  # Use alpha channel as mask
+        return rgb_image
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def convert_to_webp(image_data: bytes, quality: int = 85, max_width: int = 1200) -> bytes:
+    """Convert image to WebP format for optimal web delivery"""
+    if not PIL_AVAILABLE:
+        print("⚠️ PIL not available, returning original image data")
+        return image_data
+        
+    try:
+        # Open image with PIL
+        image = Image.open(io.BytesIO(image_data))
+        
+        # Convert to RGB if necessary (WebP doesn't support all formats)
+        image = _to_rgb(image)
+        
+        # Resize if too large (maintain aspect ratio)
+        if image.width > max_width:
+            ratio = max_width / image.width
+            new_height = int(image.height * ratio)
+            image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
+            print(f"🔄 Resized image to {max_width}x{new_height}")
+        
+        # Convert to WebP
+        output = io.BytesIO()
+        image.save(output, format='WEBP', quality=quality, optimize=True)
+        webp_data = output.getvalue()
+        
+        original_kb = len(image_data) / 1024
+        webp_kb = len(webp_data) / 1024
+        reduction = ((original_kb - webp_kb) / original_kb) * 100
+        
+        print(f"🗜️ WebP conversion: {original_kb:.1f}KB → {webp_kb:.1f}KB ({reduction:.1f}% reduction)")
+        
+        return webp_data
+        
+    except Exception as e:
+        print(f"❌ WebP conversion failed: {e}")
+        # Return original data if conversion fails
+        return image_data
+
+
+def avif_supported() -> bool:
+    return PIL_AVAILABLE and bool(features.check("avif"))
+
+
+def generate_variants(
+    image_data: bytes,
+    widths: Sequence[int] = (160, 480, 1200),
+    quality: int = 85,
+    formats: Sequence[str] = ("webp",),
+) -> List[Dict[str, Any]]:
+    """
+    Maak responsive varianten van een afbeelding in één decode pass.
+
+    Varianten worden van groot naar klein geschaald, elke stap vanaf de
+    vorige variant. Breedtes groter dan het origineel worden niet opgeschaald
+    maar samengevoegd tot één variant op de originele breedte.
+
+    Returns:
+        Lijst van dicts met width, height, format, content_type, data en de
+        sha256 digest van data, gesorteerd op breedte (klein naar groot)
+    """
+    if not PIL_AVAILABLE:
+        raise RuntimeError("PIL not available")
+
+    image = _to_rgb(Image.open(io.BytesIO(image_data)))
+    source_width = image.width
+
+    target_widths = sorted({min(int(w), source_width) for w in widths if int(w) > 0}, reverse=True)
+    formats = [f for f in formats if f in VARIANT_FORMATS and (f != "avif" or avif_supported())]
+
+    variants = []
+    current = image
+    for width in target_widths:
+        if current.width != width:
+            height = max(1, round(current.height * width / current.width))
+            current = current.resize((width, height), Image.Resampling.LANCZOS)
+
+        for fmt in formats:
+            pil_format, content_type = VARIANT_FORMATS[fmt]
+            output = io.BytesIO()
+            current.save(output, format=pil_format, quality=quality)
+            data = output.getvalue()
+            variants.append({
+                "width": current.width,
+                "height": current.height,
+                "format": fmt,
+                "content_type": content_type,
+                "data": data,
+                "sha256": hashlib.sha256(data).hexdigest(),
+            })
+
+    total_kb = sum(len(v["data"]) for v in variants) / 1024
+    print(f"🗜️ Generated {len(variants)} variants ({total_kb:.1f}KB total) from {len(image_data) / 1024:.1f}KB source")
+
+    variants.sort(key=lambda v: (v["width"], v["format"]))
+    return variants
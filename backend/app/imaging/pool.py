@@ -0,0 +1,174 @@
+"""
+Worker pool voor CPU-zware beeldbewerking.
+
+PIL decode, LANCZOS resize en WebP encode houden de GIL vast en duren
+honderden milliseconden voor een grote dealer foto. ImageWorkerPool voert
+die jobs uit in aparte processen, met backpressure (een maximale wachtrij),
+een queue depth metric en een timeout per job.
+
+Configuratie via environment variables:
+
+    IMAGE_POOL_WORKERS        aantal worker processen (default: aantal cores)
+    IMAGE_POOL_MAX_QUEUE      jobs die mogen wachten op een vrije worker
+    IMAGE_JOB_TIMEOUT         seconden per job
+    IMAGE_POOL_MODE           "process" (default) of "thread"
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_JOB_TIMEOUT = 30.0
+
+
+class ImagePoolBusyError(RuntimeError):
+    """De wachtrij van de image pool is vol"""
+
+
+class ImageJobTimeoutError(TimeoutError):
+    """Een beeldbewerking duurde langer dan de job timeout"""
+
+
+class ImageWorkerPool:
+    """Begrensde process pool met backpressure voor beeldbewerking"""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        job_timeout: Optional[float] = None,
+        mode: Optional[str] = None,
+    ):
+        self.max_workers = max_workers or int(
+            os.getenv("IMAGE_POOL_WORKERS", os.cpu_count() or 2)
+        )
+        self.max_queue = max_queue if max_queue is not None else int(
+            os.getenv("IMAGE_POOL_MAX_QUEUE", self.max_workers * 2)
+        )
+        self.job_timeout = job_timeout or float(
+            os.getenv("IMAGE_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT)
+        )
+        self.mode = mode or os.getenv("IMAGE_POOL_MODE", "process")
+
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+
+        # Jobs die zijn ingediend maar waarvan de worker nog niet klaar is
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.total_job_seconds = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs die wachten op een vrije worker"""
+        return max(self.pending - self.max_workers, 0)
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.mode == "thread":
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="image-worker"
+                    )
+                else:
+                    # spawn i.p.v. fork: de gRPC threads van firebase_admin
+                    # overleven een fork niet netjes
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                print(f"🖼️ Image worker pool started ({self.mode}, {self.max_workers} workers)")
+            return self._executor
+
+    async def submit(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Voer een picklebare functie uit op de pool"""
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise ImagePoolBusyError(
+                f"Image pool is full ({self.pending} jobs, capacity {self.capacity})"
+            )
+
+        timeout = timeout or self.job_timeout
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+
+        self.pending += 1
+        future = loop.run_in_executor(self._get_executor(), _call, fn, args, kwargs)
+        # Pending telt pas af als de worker echt klaar is, zodat een job die
+        # de timeout overschrijdt nog steeds als bezet wordt meegeteld
+        future.add_done_callback(lambda f: self._job_done(f, started))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise ImageJobTimeoutError(
+                f"Image job {getattr(fn, '__name__', fn)} exceeded {timeout:.1f}s"
+            ) from None
+
+    def _job_done(self, future, started: float) -> None:
+        self.pending -= 1
+        self.total_job_seconds += time.perf_counter() - started
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_job_ms": round(self.total_job_seconds / finished * 1000, 1) if finished else None,
+        }
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def _call(fn: Callable, args, kwargs):
+    return fn(*args, **kwargs)
+
+
+# --- Shared instance ---
+_image_pool: Optional[ImageWorkerPool] = None
+_image_pool_lock = threading.Lock()
+
+
+def get_image_pool() -> ImageWorkerPool:
+    """Gedeelde image pool voor dit proces"""
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            _image_pool = ImageWorkerPool()
+        return _image_pool
+
+
+def stop_image_pool() -> None:
+    """Stop de gedeelde pool; de volgende get_image_pool() maakt een nieuwe"""
+    global _image_pool
+    with _image_pool_lock:
+        pool, _image_pool = _image_pool, None
+    if pool is not None:
+        pool.shutdown()
@@ -5,6 +5,7 @@ import firebase_admin
 from firebase_admin import credentials, firestore, auth
 import asyncio
 import os
+from contextlib import asynccontextmanager
 from typing import Dict, List, Optional
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -19,8 +20,49 @@ from stripe_service import stripe_service, PackageType
 
 # Import AI chat router
 from app.apis.ai_chat.router import router as ai_chat_router
+from app.apis.ai_chat.client import start_llm_client, stop_llm_client
+from app.apis.ai_chat.prompts import get_prompt_registry
+from app.apis.ai_chat.sessions import get_session_store, stop_session_store
+from app.catalog import PackageCatalog, get_dealer_catalog
+from app.datastore import get_datastore, stop_datastore
+from app.game import Rules
+from app.imaging import stop_image_pool
+from app.game.sessions import get_table_manager, stop_table_manager
+from app.game.shoe_pool import get_shoe_pool, stop_shoe_pools
+from app.game.strategy import get_strategy_tables
+from app.payments import (
+    get_subscription_cache,
+    get_webhook_processor,
+    ingest_webhook,
+    stop_webhook_processor,
+)
 
-app = FastAPI(title="Lucky Flirty Chat API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Laad de dealer catalogus bij het opstarten en stop de listener bij afsluiten"""
+    catalog = get_dealer_catalog(db)
+    try:
+        await get_datastore().run(catalog.start)
+    except Exception as e:
+        print(f"⚠️ Dealer catalog not loaded at startup: {e}")
+    await start_llm_client()
+    get_prompt_registry()
+    get_strategy_tables()
+    get_shoe_pool(Rules().decks)
+    await get_table_manager().start()
+    await get_session_store().start()
+    get_webhook_processor(stripe_service, db).start()
+    yield
+    stop_webhook_processor()
+    await stop_table_manager()
+    stop_shoe_pools()
+    await stop_llm_client()
+    await stop_session_store()
+    catalog.stop()
+    stop_datastore()
+    stop_image_pool()
+
+app = FastAPI(title="Lucky Flirty Chat API", lifespan=lifespan)
 
 # Include AI chat router
 app.include_router(ai_chat_router, prefix="/api/ai-chat")
@@ -78,55 +120,23 @@ async def health_check():
 @app.get("/api/dealers")
 async def get_dealers():
     try:
-        dealers_ref = db.collection('dealers')
-        docs = dealers_ref.stream()
+        catalog = get_dealer_catalog(db)
+        if not catalog.loaded:
+            await get_datastore().run(catalog.start)
         
-        dealers = []
-        for doc in docs:
-            dealer_data = doc.to_dict()
-            dealer_data['id'] = doc.id
-            dealers.append(dealer_data)
-        
-        return {"dealers": dealers}
+        return {"dealers": catalog.list()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # === STRIPE ENDPOINTS ===
 
+# Shop catalogus één keer geserialiseerd; opnieuw na een product sync
+package_catalog = PackageCatalog(stripe_service)
+
 @app.get("/api/payments/packages")
-async def get_packages():
-    """Haal alle beschikbare coin en premium pakketten op"""
-    try:
-        coin_packages = []
-        for package in stripe_service.coin_packages.values():
-            coin_packages.append({
-                "id": package.id,
-                "name": package.name,
-                "coins": package.coins,
-                "price_eur": package.price_eur,
-                "original_price_eur": package.original_price_eur,
-                "is_popular": package.is_popular,
-                "bonus_description": package.bonus_description,
-                "type": "coins"
-            })
-        
-        premium_packages = []
-        for package in stripe_service.premium_packages.values():
-            premium_packages.append({
-                "id": package.id,
-                "name": package.name,
-                "price_eur": package.price_eur,
-                "interval": package.interval,
-                "features": package.features,
-                "type": "premium"
-            })
-        
-        return {
-            "coin_packages": coin_packages,
-            "premium_packages": premium_packages
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_packages(request: Request):
+    """Haal alle beschikbare coin en premium pakketten op (voorgeserialiseerd, met ETag/304)"""
+    return package_catalog.response(request)
 
 @app.post("/api/payments/create-checkout")
 async def create_checkout_session(request: CreateCheckoutRequest):
@@ -171,95 +181,23 @@ async def create_checkout_session(request: CreateCheckoutRequest):
 
 @app.post("/api/payments/webhook")
 async def stripe_webhook(request: Request):
-    """Verwerk Stripe webhook events"""
-    try:
-        payload = await request.body()
-        signature = request.headers.get('stripe-signature')
-        
-        if not signature:
-            raise HTTPException(status_code=400, detail="Missing stripe-signature header")
-        
-        # Verwerk webhook met stripe service
-        result = stripe_service.handle_webhook(payload.decode(), signature)
-        
-        if result["success"]:
-            # Verwerk de actie gebaseerd op het resultaat
-            if result.get("action") == "add_coins":
-                await add_coins_to_user(result["user_id"], result["coins"])
-            elif result.get("action") == "activate_premium":
-                await activate_premium_status(result["customer_id"])
-            elif result.get("action") == "deactivate_premium":
-                await deactivate_premium_status(result["customer_id"])
-        
-        return JSONResponse(content={"received": True})
-        
-    except Exception as e:
-        print(f"Webhook error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
+    """Ontvang Stripe webhook events; verwerking gebeurt via de webhook queue"""
+    payload = await request.body()
+    signature = request.headers.get('stripe-signature')
+    return await ingest_webhook(get_webhook_processor(stripe_service, db), payload, signature)
 
 @app.get("/api/payments/subscriptions/{user_email}")
 async def get_user_subscriptions(user_email: str):
     """Haal actieve abonnementen op voor een gebruiker"""
     try:
-        subscriptions = stripe_service.get_customer_subscriptions(user_email)
-        return {"subscriptions": subscriptions}
+        # Uit de cache; webhooks houden hem actueel
+        customer = await get_datastore().run(get_subscription_cache(stripe_service).lookup, user_email)
     except Exception as e:
+        # Geen antwoord is iets anders dan "geen abonnement": niet als niet-premium melden
+        print(f"Error fetching subscriptions: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-
-# === HELPER FUNCTIONS ===
-
-async def add_coins_to_user(user_id: str, coins: int):
-    """Voeg coins toe aan een gebruiker"""
-    try:
-        if not user_id:
-            return
-            
-        # Haal huidige player data op
-        player_ref = db.collection('playerProgress').document(user_id)
-        player_doc = player_ref.get()
-        
-        if player_doc.exists:
-            current_data = player_doc.to_dict()
-            current_coins = current_data.get('playerCoins', 0)
-            new_coins = current_coins + coins
-            
-            # Update coins
-            player_ref.update({
-                'playerCoins': new_coins,
-                'lastUpdated': firestore.SERVER_TIMESTAMP
-            })
-        else:
-            # Nieuwe player data
-            player_ref.set({
-                'playerCoins': coins,
-                'lastUpdated': firestore.SERVER_TIMESTAMP,
-                'totalCoinsEarned': coins
-            })
-        
-        print(f"✅ Added {coins} coins to user {user_id}")
-        
-    except Exception as e:
-        print(f"❌ Error adding coins to user {user_id}: {e}")
-
-async def activate_premium_status(customer_id: str):
-    """Activeer premium status voor een klant"""
-    try:
-        # Zoek gebruiker op basis van Stripe customer ID
-        # Dit vereist dat we customer IDs opslaan in user profiles
-        print(f"✅ Activated premium for customer {customer_id}")
-        
-    except Exception as e:
-        print(f"❌ Error activating premium for customer {customer_id}: {e}")
-
-async def deactivate_premium_status(customer_id: str):
-    """Deactiveer premium status voor een klant"""
-    try:
-        # Zoek gebruiker op basis van Stripe customer ID
-        # Dit vereist dat we customer IDs opslaan in user profiles
-        print(f"✅ Deactivated premium for customer {customer_id}")
-        
-    except Exception as e:
-        print(f"❌ Error deactivating premium for customer {customer_id}: {e}")
+    # Alleen een echte miss (geen klant of geen actief abonnement) is niet-premium
+    return {"subscriptions": customer.subscriptions, "is_premium": customer.is_premium}
 
 @app.post("/api/setup-stripe")
 async def setup_stripe_products():
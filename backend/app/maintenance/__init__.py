@@ -0,0 +1,15 @@
+from .base64_migration import (
+    ApiUploader,
+    Base64MigrationEngine,
+    BucketUploader,
+    MigrationReport,
+)
+from .bulk_writer import BulkWriter
+
+__all__ = [
+    "ApiUploader",
+    "Base64MigrationEngine",
+    "BucketUploader",
+    "BulkWriter",
+    "MigrationReport",
+]
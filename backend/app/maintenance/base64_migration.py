@@ -0,0 +1,292 @@
+"""
+Migratie van base64 dealer afbeeldingen naar Firebase Storage.
+
+Eén engine voor zowel `convert_base64_to_storage.py` (direct naar de
+bucket) als `auto_convert_base64.py` (via de backend upload API):
+
+- alle afbeeldingen worden parallel gedecodeerd en geüpload met een
+  worker pool, rechtstreeks vanuit het geheugen (geen temp bestanden)
+- voortgang staat in een checkpoint bestand, zodat een gecrashte run
+  verder gaat waar hij stopte zonder opnieuw te uploaden
+- Firestore wordt bijgewerkt met field-level `update()` via BulkWriter, in
+  plaats van het hele dealer document te overschrijven met `set()`
+
+Usage:
+
+    engine = Base64MigrationEngine(db, BucketUploader(bucket))
+    report = engine.run()
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .bulk_writer import MAX_BATCH_SIZE, BulkWriter
+
+DEFAULT_CHECKPOINT_PATH = ".base64_migration_checkpoint.json"
+
+MIME_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+
+
+def is_base64_data_url(url) -> bool:
+    """Controleer of een URL een base64 data URL is"""
+    return isinstance(url, str) and url.startswith('data:image/')
+
+
+def decode_data_url(data_url: str):
+    """Decodeer een data URL naar (bytes, mime type)"""
+    if ',' in data_url:
+        header, base64_string = data_url.split(',', 1)
+        mime_type = header.split(';')[0].split(':')[1] if ':' in header else 'image/jpeg'
+    else:
+        base64_string, mime_type = data_url, 'image/jpeg'
+    return base64.b64decode(base64_string), mime_type
+
+
+# --- Uploaders ---
+class BucketUploader:
+    """Upload rechtstreeks naar een Firebase Storage bucket"""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def upload(self, storage_path: str, data: bytes, content_type: str) -> str:
+        blob = self.bucket.blob(storage_path)
+        blob.upload_from_string(data, content_type=content_type)
+        blob.make_public()
+        return blob.public_url
+
+
+class ApiUploader:
+    """Upload via de backend `/api/firebase-storage/upload` route"""
+
+    def __init__(self, base_url: str = "http://localhost:8001", timeout: float = 30):
+        import requests
+        self.session = requests.Session()
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def upload(self, storage_path: str, data: bytes, content_type: str) -> str:
+        folder, filename = storage_path.rsplit('/', 1)
+        response = self.session.post(
+            f"{self.base_url}/api/firebase-storage/upload",
+            files={'file': (filename, data, content_type)},
+            data={'folder': folder},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        result = response.json()
+        if not result.get('success'):
+            raise RuntimeError(result.get('message', 'Unknown error'))
+        return result['download_url']
+
+
+# --- Checkpoint ---
+class MigrationCheckpoint:
+    """Voortgang van de migratie, atomisch weggeschreven naar schijf"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.completed: set = set()
+        self.uploaded: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.completed = set(state.get("completed", []))
+            self.uploaded = state.get("uploaded", {})
+            print(f"📍 Resuming from checkpoint: {len(self.completed)} dealers done, "
+                  f"{len(self.uploaded)} images already uploaded")
+
+    def record_upload(self, key: str, url: str) -> None:
+        with self._lock:
+            self.uploaded[key] = url
+
+    def mark_written(self, written: List[str], completed: List[str]) -> None:
+        """Uploads van weggeschreven dealers zijn niet meer nodig voor een resume"""
+        with self._lock:
+            self.completed.update(completed)
+            prefixes = tuple(f"{dealer_id}/" for dealer_id in written)
+            for key in [k for k in self.uploaded if k.startswith(prefixes)]:
+                del self.uploaded[key]
+        self.save()
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            state = {"completed": sorted(self.completed), "uploaded": dict(self.uploaded)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class MigrationReport:
+    dealers_scanned: int = 0
+    dealers_skipped: int = 0
+    dealers_updated: int = 0
+    images_converted: int = 0
+    images_reused: int = 0
+    images_failed: int = 0
+    batches_committed: int = 0
+    duration_seconds: float = 0.0
+    failures: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _ImageJob:
+    dealer_id: str
+    key: str            # checkpoint key, bijv. "emma/outfitStages/2"
+    field_path: tuple   # ("avatarUrl",) of ("outfitStages", 2)
+    storage_path: str
+    data_url: str
+
+
+# --- Engine ---
+class Base64MigrationEngine:
+    """Converteert base64 afbeeldingen van alle dealers naar Storage URLs"""
+
+    def __init__(
+        self,
+        db,
+        uploader,
+        checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT_PATH,
+        max_workers: int = 8,
+        batch_size: int = MAX_BATCH_SIZE,
+        collection: str = 'dealers',
+    ):
+        self.db = db
+        self.uploader = uploader
+        self.checkpoint = MigrationCheckpoint(checkpoint_path)
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.collection = collection
+
+    def run(self) -> MigrationReport:
+        report = MigrationReport()
+        started = time.perf_counter()
+        dealers_ref = self.db.collection(self.collection)
+
+        pending = []
+        for dealer_doc in dealers_ref.stream():
+            report.dealers_scanned += 1
+            if dealer_doc.id in self.checkpoint.completed:
+                report.dealers_skipped += 1
+                continue
+            dealer_data = dealer_doc.to_dict() or {}
+            jobs = self._find_images(dealer_doc.id, dealer_data)
+            if jobs:
+                pending.append((dealer_doc.id, dealer_data, jobs))
+
+        total_images = sum(len(jobs) for _, _, jobs in pending)
+        print(f"🔍 {len(pending)} dealers with {total_images} base64 images to convert")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            # Alle afbeeldingen van alle dealers tegelijk in de pool
+            futures = [
+                (dealer_id, dealer_data, [(job, pool.submit(self._convert, job)) for job in jobs])
+                for dealer_id, dealer_data, jobs in pending
+            ]
+
+            writer = BulkWriter(
+                self.db, batch_size=self.batch_size,
+                on_commit=lambda tags: self._on_commit(tags, report),
+            )
+            with writer:
+                for dealer_id, dealer_data, job_futures in futures:
+                    updates, failed = self._collect(dealer_id, dealer_data, job_futures, report)
+                    # Uploads van deze dealer overleven nu een crash
+                    self.checkpoint.save()
+                    if updates:
+                        writer.update(dealers_ref.document(dealer_id), updates, tag=(dealer_id, not failed))
+            report.batches_committed = writer.batches_committed
+
+        report.duration_seconds = time.perf_counter() - started
+        print(f"✅ Migration finished in {report.duration_seconds:.1f}s: "
+              f"{report.dealers_updated} dealers updated, {report.images_converted} images converted, "
+              f"{report.images_failed} failed")
+        return report
+
+    def _on_commit(self, tags, report: MigrationReport) -> None:
+        """Markeer de dealers uit een gecommitte batch in het checkpoint"""
+        written = [dealer_id for dealer_id, _ in tags]
+        report.dealers_updated += len(written)
+        self.checkpoint.mark_written(written, [dealer_id for dealer_id, complete in tags if complete])
+
+    def _find_images(self, dealer_id: str, dealer_data: Dict[str, Any]) -> List[_ImageJob]:
+        jobs = []
+        for field_name, name in (('avatarUrl', 'avatar'), ('professionalImageUrl', 'professional')):
+            if is_base64_data_url(dealer_data.get(field_name)):
+                jobs.append(_ImageJob(
+                    dealer_id, f"{dealer_id}/{field_name}", (field_name,),
+                    f"dealers/{dealer_id}/{name}", dealer_data[field_name],
+                ))
+
+        for i, stage in enumerate(dealer_data.get('outfitStages') or []):
+            if isinstance(stage, dict) and is_base64_data_url(stage.get('imageUrl')):
+                jobs.append(_ImageJob(
+                    dealer_id, f"{dealer_id}/outfitStages/{i}", ('outfitStages', i),
+                    f"dealers/{dealer_id}/outfits/stage_{i + 1}", stage['imageUrl'],
+                ))
+        return jobs
+
+    def _convert(self, job: _ImageJob):
+        """Decodeer en upload één afbeelding (draait in de worker pool)"""
+        url = self.checkpoint.uploaded.get(job.key)
+        if url:
+            return url, True
+
+        data, mime_type = decode_data_url(job.data_url)
+        extension = MIME_EXTENSIONS.get(mime_type, 'jpg')
+        url = self.uploader.upload(f"{job.storage_path}.{extension}", data, mime_type)
+        self.checkpoint.record_upload(job.key, url)
+        return url, False
+
+    def _collect(self, dealer_id, dealer_data, job_futures, report: MigrationReport):
+        """Wacht op de uploads van één dealer en bouw de field-level update"""
+        updates: Dict[str, Any] = {}
+        outfit_stages = None
+        failed = False
+
+        for job, future in job_futures:
+            try:
+                url, reused = future.result()
+            except Exception as e:
+                failed = True
+                report.images_failed += 1
+                report.failures.append(f"{job.key}: {e}")
+                print(f"  ❌ {job.key} failed: {e}")
+                continue
+
+            if reused:
+                report.images_reused += 1
+            else:
+                report.images_converted += 1
+
+            if job.field_path[0] == 'outfitStages':
+                # Array elementen kunnen niet los geüpdatet worden; alleen het
+                # outfitStages veld wordt herschreven, niet het hele document
+                if outfit_stages is None:
+                    outfit_stages = [dict(stage) for stage in dealer_data['outfitStages']]
+                outfit_stages[job.field_path[1]]['imageUrl'] = url
+            else:
+                updates[job.field_path[0]] = url
+
+        if outfit_stages is not None:
+            updates['outfitStages'] = outfit_stages
+        return updates, failed
+
@@ -0,0 +1,166 @@
+"""
+Gebatchte Firestore writes voor bulk jobs.
+
+Een losse `doc_ref.set()` of `update()` kost een volledige round trip per
+document, waardoor migraties over duizenden dealers of spelers puur op
+latency wachten. BulkWriter verzamelt writes en commit ze als WriteBatch
+van maximaal 500 operaties (de Firestore limiet), met retry + backoff bij
+een mislukte commit en een optionele throttle in docs/sec.
+
+Usage:
+
+    with BulkWriter(db) as writer:
+        for doc in db.collection('dealers').stream():
+            writer.update(doc.reference, {'migrated': True})
+    print(writer.stats())
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+MAX_BATCH_SIZE = 500
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.5
+
+
+class BulkWriter:
+    """Verzamelt Firestore writes en commit ze per batch"""
+
+    def __init__(
+        self,
+        db,
+        batch_size: int = MAX_BATCH_SIZE,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        max_docs_per_second: Optional[float] = None,
+        on_commit: Optional[Callable[[List[Any]], None]] = None,
+    ):
+        self.db = db
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.max_retries = max_retries if max_retries is not None else int(
+            os.getenv("BULK_WRITE_RETRIES", DEFAULT_MAX_RETRIES)
+        )
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(
+            os.getenv("BULK_WRITE_BACKOFF", DEFAULT_RETRY_BACKOFF)
+        )
+        # 0 of leeg = geen throttle
+        self.max_docs_per_second = max_docs_per_second if max_docs_per_second is not None else float(
+            os.getenv("BULK_WRITE_RATE", 0)
+        )
+        self.on_commit = on_commit
+
+        self._ops: List[tuple] = []
+        self._tags: List[Any] = []
+        self._lock = threading.RLock()
+
+        self.docs_written = 0
+        self.batches_committed = 0
+        self.retries = 0
+        self._started: Optional[float] = None
+        self._commit_seconds = 0.0
+
+    # --- Writes ---
+    def set(self, doc_ref, data: Dict[str, Any], merge: bool = False, tag: Any = None) -> None:
+        self._add(("set", doc_ref, data, merge), tag)
+
+    def update(self, doc_ref, data: Dict[str, Any], tag: Any = None) -> None:
+        self._add(("update", doc_ref, data, None), tag)
+
+    def delete(self, doc_ref, tag: Any = None) -> None:
+        self._add(("delete", doc_ref, None, None), tag)
+
+    def _add(self, op: tuple, tag: Any) -> None:
+        with self._lock:
+            if self._started is None:
+                self._started = time.perf_counter()
+            self._ops.append(op)
+            if tag is not None:
+                self._tags.append(tag)
+            if len(self._ops) >= self.batch_size:
+                self.flush()
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    # --- Commit ---
+    def flush(self) -> int:
+        """Commit alle openstaande writes; geeft het aantal weggeschreven docs terug"""
+        with self._lock:
+            if not self._ops:
+                return 0
+            ops, tags = self._ops, self._tags
+            self._throttle(len(ops))
+            self._commit_with_retry(ops)
+
+            self._ops, self._tags = [], []
+            self.docs_written += len(ops)
+            self.batches_committed += 1
+            if self.on_commit:
+                self.on_commit(tags)
+            return len(ops)
+
+    def _commit_with_retry(self, ops: List[tuple]) -> None:
+        attempt = 0
+        while True:
+            # Een mislukte WriteBatch is niet herbruikbaar, dus per poging opnieuw opbouwen
+            batch = self.db.batch()
+            for kind, doc_ref, data, merge in ops:
+                if kind == "set":
+                    batch.set(doc_ref, data, merge=merge)
+                elif kind == "update":
+                    batch.update(doc_ref, data)
+                else:
+                    batch.delete(doc_ref)
+
+            started = time.perf_counter()
+            try:
+                batch.commit()
+                self._commit_seconds += time.perf_counter() - started
+                return
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                self.retries += 1
+                print(f"⚠️ Batch commit failed ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _throttle(self, docs: int) -> None:
+        """Wacht tot deze batch binnen het docs/sec budget past"""
+        if not self.max_docs_per_second or self._started is None:
+            return
+        earliest = self._started + (self.docs_written + docs) / self.max_docs_per_second
+        delay = earliest - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    # --- Context manager ---
+    def close(self) -> None:
+        self.flush()
+        stats = self.stats()
+        if stats["docs_written"]:
+            print(f"💾 {stats['docs_written']} docs in {stats['batches_committed']} batches "
+                  f"({stats['docs_per_second']:.0f} docs/sec, {stats['retries']} retries)")
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # Na een fout niets meer committen; de aanroeper beslist over een herstart
+        if exc_type is None:
+            self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        return {
+            "docs_written": self.docs_written,
+            "batches_committed": self.batches_committed,
+            "pending": len(self._ops),
+            "retries": self.retries,
+            "elapsed_seconds": round(elapsed, 3),
+            "commit_seconds": round(self._commit_seconds, 3),
+            "docs_per_second": self.docs_written / elapsed if elapsed > 0 else 0.0,
+        }
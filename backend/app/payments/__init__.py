@@ -0,0 +1,35 @@
+from .balances import (
+    CoinBalance,
+    CoinBalances,
+    InsufficientCoinsError,
+    get_coin_balances,
+    invalidate_coin_balance,
+)
+from .ledger import CoinCredit, CoinLedger, credit_coins
+from .subscriptions import CustomerSubscriptions, SubscriptionCache, get_subscription_cache
+from .webhooks import (
+    WebhookProcessor,
+    WebhookQueue,
+    get_webhook_processor,
+    ingest_webhook,
+    stop_webhook_processor,
+)
+
+__all__ = [
+    "CoinBalance",
+    "CoinBalances",
+    "CoinCredit",
+    "CoinLedger",
+    "CustomerSubscriptions",
+    "WebhookProcessor",
+    "InsufficientCoinsError",
+    "SubscriptionCache",
+    "WebhookQueue",
+    "credit_coins",
+    "get_coin_balances",
+    "get_subscription_cache",
+    "get_webhook_processor",
+    "ingest_webhook",
+    "invalidate_coin_balance",
+    "stop_webhook_processor",
+]
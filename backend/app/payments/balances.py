@@ -0,0 +1,228 @@
+"""
+Gesharde coin saldi voor spelers die snel achter elkaar inzetten.
+
+Firestore houdt ongeveer één write per seconde per document vol. Elke bet
+als increment op `playerData/{uid}` loopt bij snelle spelers dus tegen
+contention errors aan. CoinBalances verdeelt de writes over N shard
+documenten in `playerData/{uid}/coinShards/{k}` en telt ze bij het lezen
+op:
+
+    saldo = playerData.playerCoins + som(coinShards.coins)
+
+`playerCoins` op het hoofddocument blijft de basis; daar schrijft de
+CoinLedger (aankopen, laag volume) nog steeds op, en bestaande saldi
+hoeven dus niet gemigreerd te worden. De frontend telt de shards bij het
+tonen op (usePlayerProgressStore). Het aantal shards hangt
+af van de tier van de speler (`coinTier` op het hoofddocument), in te
+stellen met COIN_SHARD_TIERS (bijv. "standard=4,premium=8,whale=32").
+Een grotere tier geeft alleen meer shards om naar te schrijven; lezen telt
+altijd alle bestaande shards op.
+
+Totalen worden per proces gecached (COIN_BALANCE_TTL seconden) en bij
+eigen writes direct bijgewerkt. Een afschrijving controleert het saldo
+onder een per-speler lock; die garantie geldt binnen één proces.
+
+Usage:
+
+    balances = get_coin_balances()
+    balances.adjust(user_id, -50)
+    print(balances.balance(user_id).coins)
+"""
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+from firebase_admin import firestore
+
+from .ledger import BALANCES_COLLECTION
+
+SHARDS_COLLECTION = "coinShards"
+DEFAULT_TIER = "standard"
+DEFAULT_TIERS = {"standard": 4, "premium": 8, "whale": 32}
+DEFAULT_TTL = 5.0
+DEFAULT_CACHE_SIZE = 10000
+LOCK_STRIPES = 64
+
+
+class InsufficientCoinsError(Exception):
+    """De afschrijving is groter dan het saldo"""
+
+
+def parse_tiers(value: Optional[str]) -> Dict[str, int]:
+    """'standard=4,whale=32' -> {'standard': 4, 'whale': 32}, aangevuld met de defaults"""
+    tiers = dict(DEFAULT_TIERS)
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, count = item.split("=", 1)
+            tiers[name.strip()] = max(1, int(count))
+    return tiers
+
+
+@dataclass(frozen=True)
+class CoinBalance:
+    user_id: str
+    coins: int
+    earned: int
+    tier: str
+    shards: int
+    fetched: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "coins": self.coins,
+            "earned": self.earned,
+            "tier": self.tier,
+            "shards": self.shards,
+        }
+
+
+class CoinBalances:
+    """Saldi verdeeld over shard documenten, met een gecached totaal"""
+
+    def __init__(
+        self,
+        db,
+        tiers: Optional[Dict[str, int]] = None,
+        ttl: Optional[float] = None,
+        max_cached: Optional[int] = None,
+        balances: str = BALANCES_COLLECTION,
+    ):
+        self.db = db
+        self.tiers = tiers or parse_tiers(os.getenv("COIN_SHARD_TIERS"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("COIN_BALANCE_TTL", DEFAULT_TTL))
+        self.max_cached = max_cached or int(os.getenv("COIN_BALANCE_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+        self.balances = balances
+
+        self._cache: "OrderedDict[str, CoinBalance]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Lock striping: begrensd geheugen, toch zelden twee spelers op één lock
+        self._user_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+        self.hits = 0
+        self.loads = 0
+        self.writes = 0
+        self.rejected = 0
+
+    def shard_count(self, tier: Optional[str]) -> int:
+        return self.tiers.get(tier or DEFAULT_TIER, self.tiers[DEFAULT_TIER])
+
+    def _player_ref(self, user_id: str):
+        return self.db.collection(self.balances).document(user_id)
+
+    def shard_ref(self, user_id: str, tier: Optional[str] = None):
+        """Een willekeurige shard binnen de tier van de speler"""
+        shard = random.randrange(self.shard_count(tier))
+        return self._player_ref(user_id).collection(SHARDS_COLLECTION).document(str(shard))
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[hash(user_id) % LOCK_STRIPES]
+
+    # --- Lezen ---
+    def balance(self, user_id: str, fresh: bool = False) -> CoinBalance:
+        """Saldo uit de cache, of opgeteld uit het hoofddocument en alle shards"""
+        if not fresh:
+            with self._cache_lock:
+                cached = self._cache.get(user_id)
+                if cached is not None and time.monotonic() - cached.fetched < self.ttl:
+                    self._cache.move_to_end(user_id)
+                    self.hits += 1
+                    return cached
+        return self._store(self._load(user_id))
+
+    def _load(self, user_id: str) -> CoinBalance:
+        player_ref = self._player_ref(user_id)
+        snapshot = player_ref.get()
+        data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        coins = data.get("playerCoins", 0)
+        earned = data.get("totalCoinsEarned", 0)
+        for shard in player_ref.collection(SHARDS_COLLECTION).stream():
+            shard_data = shard.to_dict() or {}
+            coins += shard_data.get("coins", 0)
+            earned += shard_data.get("earned", 0)
+        tier = data.get("coinTier", DEFAULT_TIER)
+        self.loads += 1
+        return CoinBalance(user_id, coins, earned, tier, self.shard_count(tier), time.monotonic())
+
+    def _store(self, balance: CoinBalance) -> CoinBalance:
+        with self._cache_lock:
+            self._cache[balance.user_id] = balance
+            self._cache.move_to_end(balance.user_id)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return balance
+
+    # --- Schrijven ---
+    def adjust(self, user_id: str, amount: int) -> CoinBalance:
+        """Tel `amount` op bij het saldo (negatief = afschrijven) via één shard"""
+        with self._user_lock(user_id):
+            current = self.balance(user_id)
+            if amount < 0 and current.coins + amount < 0:
+                # Mogelijk verouderd; pas afwijzen na een verse telling
+                current = self.balance(user_id, fresh=True)
+                if current.coins + amount < 0:
+                    self.rejected += 1
+                    raise InsufficientCoinsError(
+                        f"User {user_id} has {current.coins} coins, needs {-amount}"
+                    )
+
+            update = {"coins": firestore.Increment(amount)}
+            if amount > 0:
+                update["earned"] = firestore.Increment(amount)
+            self.shard_ref(user_id, current.tier).set(update, merge=True)
+            self.writes += 1
+
+            with self._cache_lock:
+                cached = self._cache.get(user_id)
+            base = cached or current
+            updated = replace(base, coins=base.coins + amount, earned=base.earned + max(amount, 0))
+            # Intussen geïnvalideerd (aankoop): niet terugzetten, volgende read telt opnieuw
+            return self._store(updated) if cached is not None else updated
+
+    def set_tier(self, user_id: str, tier: str) -> None:
+        if tier not in self.tiers:
+            raise ValueError(f"Unknown coin tier: {tier}")
+        self._player_ref(user_id).set({"coinTier": tier}, merge=True)
+        self.invalidate(user_id)
+
+    def invalidate(self, user_id: str) -> None:
+        """Vergeet het gecachede totaal (na een write buiten CoinBalances om)"""
+        with self._cache_lock:
+            self._cache.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "loads": self.loads,
+            "writes": self.writes,
+            "rejected": self.rejected,
+            "tiers": dict(self.tiers),
+        }
+
+
+# --- Shared instance ---
+_balances: Optional[CoinBalances] = None
+_balances_lock = threading.Lock()
+
+
+def get_coin_balances(db=None) -> CoinBalances:
+    """Gedeelde saldi voor alle routers in dit proces"""
+    global _balances
+    with _balances_lock:
+        if _balances is None:
+            if db is None:
+                db = firestore.client()
+            _balances = CoinBalances(db)
+        return _balances
+
+
+def invalidate_coin_balance(user_id: str) -> None:
+    """Na een aankoop via de ledger; doet niets als er nog geen gedeelde instantie is"""
+    if _balances is not None:
+        _balances.invalidate(user_id)
@@ -0,0 +1,183 @@
+"""
+Coin ledger: bijschrijvingen op `playerData` zonder read-modify-write.
+
+Elke bijschrijving is een onveranderlijke entry in `coinLedger/{entry_id}`
+plus een `firestore.Increment` op het saldo, samen in één atomische batch.
+Het saldo wordt dus nooit gelezen en gelijktijdige aankopen overschrijven
+elkaar niet meer.
+
+Met een idempotency key (bijv. het Stripe event id) is dat de entry id.
+De entry wordt met `create()` aangemaakt: bestaat hij al, dan faalt de
+hele batch en is er niets dubbel bijgeschreven.
+
+`credit_many` zet veel bijschrijvingen in één commit (max. 500 writes),
+met per speler één opgetelde increment.
+
+Usage:
+
+    ledger = CoinLedger(db)
+    ledger.credit(user_id, 500, idempotency_key=event_id, source="stripe")
+    ledger.credit_many([CoinCredit("user-1", 100), CoinCredit("user-2", 250)])
+"""
+
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
+
+from app.maintenance.bulk_writer import MAX_BATCH_SIZE
+
+# Het document dat de frontend leest (playerData/{uid}.playerCoins)
+BALANCES_COLLECTION = "playerData"
+LEDGER_COLLECTION = "coinLedger"
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.2
+
+
+@dataclass(frozen=True)
+class CoinCredit:
+    user_id: str
+    coins: int
+    idempotency_key: Optional[str] = None
+    source: Optional[str] = None
+    reason: Optional[str] = None
+    # Vast per credit, zodat een retry na een onzekere commit dezelfde entry raakt
+    entry_id: str = field(default="")
+
+    def __post_init__(self):
+        if not self.entry_id:
+            object.__setattr__(self, "entry_id", self.idempotency_key or uuid.uuid4().hex)
+
+
+class CoinLedger:
+    """Schrijft coins bij via Increment + een onveranderlijke ledger entry"""
+
+    def __init__(
+        self,
+        db,
+        balances: str = BALANCES_COLLECTION,
+        ledger: str = LEDGER_COLLECTION,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+    ):
+        self.db = db
+        self.balances = balances
+        self.ledger = ledger
+        self.max_retries = max_retries if max_retries is not None else int(
+            os.getenv("COIN_LEDGER_RETRIES", DEFAULT_MAX_RETRIES)
+        )
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(
+            os.getenv("COIN_LEDGER_BACKOFF", DEFAULT_RETRY_BACKOFF)
+        )
+
+        self.credited = 0
+        self.duplicates = 0
+        self.commits = 0
+        self.retries = 0
+
+    # --- Bijschrijven ---
+    def credit(self, user_id: str, coins: int, idempotency_key: Optional[str] = None,
+               source: Optional[str] = None, reason: Optional[str] = None) -> bool:
+        """Schrijf `coins` bij voor `user_id`; False als deze key al verwerkt was"""
+        return self.credit_many([CoinCredit(user_id, coins, idempotency_key, source, reason)])[0]
+
+    def credit_many(self, credits: Iterable[CoinCredit]) -> List[bool]:
+        """Schrijf alle credits bij in zo weinig mogelijk commits; per credit of hij is toegepast"""
+        credits = list(credits)
+        applied = [False] * len(credits)
+        seen = set()
+        chunk: List[int] = []
+        users = set()
+        for i, credit in enumerate(credits):
+            # Dezelfde key twee keer in één aanroep telt maar één keer
+            if credit.entry_id in seen:
+                self.duplicates += 1
+                continue
+            seen.add(credit.entry_id)
+            # Per credit een create, per speler een set
+            writes = len(chunk) + len(users) + 1 + (credit.user_id not in users)
+            if writes > MAX_BATCH_SIZE:
+                self._apply(credits, chunk, applied)
+                chunk, users = [], set()
+            chunk.append(i)
+            users.add(credit.user_id)
+        if chunk:
+            self._apply(credits, chunk, applied)
+        return applied
+
+    def _apply(self, credits: List[CoinCredit], chunk: List[int], applied: List[bool]) -> None:
+        try:
+            self._commit([credits[i] for i in chunk])
+        except AlreadyExists:
+            if len(chunk) == 1:
+                self.duplicates += 1
+                print(f"↩️ Coins for {credits[chunk[0]].entry_id} already credited, skipping")
+                return
+            # Eén bestaande entry laat de hele batch falen; los toepassen vindt welke
+            for i in chunk:
+                self._apply(credits, [i], applied)
+            return
+        for i in chunk:
+            applied[i] = True
+        self.credited += len(chunk)
+
+    def _commit(self, credits: List[CoinCredit]) -> None:
+        totals: Dict[str, int] = {}
+        earned: Dict[str, int] = {}
+        for credit in credits:
+            totals[credit.user_id] = totals.get(credit.user_id, 0) + credit.coins
+            earned[credit.user_id] = earned.get(credit.user_id, 0) + max(credit.coins, 0)
+
+        attempt = 0
+        while True:
+            # Een mislukte WriteBatch is niet herbruikbaar, dus per poging opnieuw opbouwen
+            batch = self.db.batch()
+            for credit in credits:
+                batch.create(self.db.collection(self.ledger).document(credit.entry_id), {
+                    'userId': credit.user_id,
+                    'coins': credit.coins,
+                    'source': credit.source,
+                    'reason': credit.reason,
+                    'idempotencyKey': credit.idempotency_key,
+                    'createdAt': firestore.SERVER_TIMESTAMP,
+                })
+            for user_id, coins in totals.items():
+                update = {
+                    'playerCoins': firestore.Increment(coins),
+                    'lastUpdated': firestore.SERVER_TIMESTAMP,
+                }
+                if earned[user_id]:
+                    update['totalCoinsEarned'] = firestore.Increment(earned[user_id])
+                batch.set(self.db.collection(self.balances).document(user_id), update, merge=True)
+            try:
+                batch.commit()
+                self.commits += 1
+                return
+            except AlreadyExists:
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                self.retries += 1
+                print(f"⚠️ Coin ledger commit failed ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "credited": self.credited,
+            "duplicates": self.duplicates,
+            "commits": self.commits,
+            "retries": self.retries,
+        }
+
+
+def credit_coins(db, user_id: str, coins: int, idempotency_key: Optional[str] = None,
+                 source: Optional[str] = None) -> bool:
+    """Schrijf `coins` bij voor `user_id`; False als deze key al verwerkt was"""
+    return CoinLedger(db, max_retries=0).credit(user_id, coins, idempotency_key, source)
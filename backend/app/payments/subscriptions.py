@@ -0,0 +1,232 @@
+"""
+Abonnementsstatus per klant, in het geheugen.
+
+`/api/payments/subscriptions/{email}` deed per request een Customer.list,
+een Subscription.list en een lazy `price.product` lookup bij Stripe.
+SubscriptionCache haalt klant + abonnementen in één call op
+(`expand=['data.subscriptions']`, plan namen via de lokale pakketten) en
+bewaart het resultaat per e-mail, met een index op customer id.
+
+Webhooks houden de cache actueel:
+
+- `customer.subscription.*` werkt het abonnement in de entry direct bij
+  (events ouder dan de laatst verwerkte voor dat abonnement worden genegeerd)
+- `invoice.*` en `customer.*` invalideren de entry van de klant
+
+Gelijktijdige misses voor hetzelfde e-mailadres delen één Stripe call.
+Entries verlopen na SUBSCRIPTION_CACHE_TTL seconden; een onbekende klant
+na SUBSCRIPTION_CACHE_MISSING_TTL, zodat een nieuwe klant snel zichtbaar is.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+DEFAULT_TTL = 300.0
+DEFAULT_MISSING_TTL = 30.0
+DEFAULT_MAX_ENTRIES = 10000
+PREMIUM_STATUSES = ("active", "trialing")
+# Niet meer in Subscription.list / customer.subscriptions zonder status filter
+ENDED_STATUSES = ("canceled", "incomplete_expired")
+
+
+@dataclass
+class CustomerSubscriptions:
+    email: str
+    customer_id: Optional[str]
+    subscriptions: List[Dict[str, Any]]
+    fetched: float
+    # subscription id -> `created` van het laatst toegepaste event
+    versions: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def is_premium(self) -> bool:
+        return any(sub["status"] in PREMIUM_STATUSES for sub in self.subscriptions)
+
+
+class SubscriptionCache:
+    """Abonnementen per e-mail en customer id, bijgewerkt door webhooks"""
+
+    def __init__(
+        self,
+        service,
+        ttl: Optional[float] = None,
+        missing_ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.service = service
+        self.ttl = ttl if ttl is not None else float(os.getenv("SUBSCRIPTION_CACHE_TTL", DEFAULT_TTL))
+        self.missing_ttl = missing_ttl if missing_ttl is not None else float(
+            os.getenv("SUBSCRIPTION_CACHE_MISSING_TTL", DEFAULT_MISSING_TTL)
+        )
+        self.max_entries = max_entries or int(os.getenv("SUBSCRIPTION_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+
+        self._lock = threading.Lock()
+        self._by_email: "OrderedDict[str, CustomerSubscriptions]" = OrderedDict()
+        self._by_customer: Dict[str, str] = {}
+        self._inflight: Dict[str, Future] = {}
+        # Tijdens een fetch geïnvalideerd: resultaat niet bewaren
+        self._stale: set = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.coalesced = 0
+        self.updates = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return email.strip().lower()
+
+    def _fresh(self, entry: CustomerSubscriptions) -> bool:
+        ttl = self.ttl if entry.customer_id else self.missing_ttl
+        return time.monotonic() - entry.fetched < ttl
+
+    # --- Lezen ---
+    def lookup(self, email: str) -> CustomerSubscriptions:
+        """Abonnementen voor `email`; bij een miss één Stripe call, gedeeld met gelijktijdige aanroepers"""
+        key = self._key(email)
+        with self._lock:
+            entry = self._by_email.get(key)
+            if entry is not None and self._fresh(entry):
+                self._by_email.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            entry = self._fetch(key)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._stale.discard(key)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if key in self._stale:
+                self._stale.discard(key)
+            else:
+                self._store(entry)
+        future.set_result(entry)
+        return entry
+
+    def _fetch(self, key: str) -> CustomerSubscriptions:
+        self.fetches += 1
+        customer = self.service.fetch_customer_subscriptions(key)
+        if customer is None:
+            return CustomerSubscriptions(key, None, [], time.monotonic())
+        return CustomerSubscriptions(key, customer["customer_id"], customer["subscriptions"], time.monotonic())
+
+    def _store(self, entry: CustomerSubscriptions) -> None:
+        self._drop(entry.email)
+        self._by_email[entry.email] = entry
+        if entry.customer_id:
+            self._by_customer[entry.customer_id] = entry.email
+        while len(self._by_email) > self.max_entries:
+            self._drop(next(iter(self._by_email)))
+
+    def _drop(self, key: str) -> None:
+        old = self._by_email.pop(key, None)
+        if old is not None and old.customer_id:
+            self._by_customer.pop(old.customer_id, None)
+
+    def get_by_customer(self, customer_id: str) -> Optional[CustomerSubscriptions]:
+        """Gecachede entry voor een Stripe customer id (zonder Stripe call)"""
+        with self._lock:
+            email = self._by_customer.get(customer_id)
+            entry = self._by_email.get(email) if email else None
+            return entry if entry is not None and self._fresh(entry) else None
+
+    # --- Webhooks ---
+    def apply_event(self, event: Dict[str, Any]) -> bool:
+        """Werk de cache bij voor een Stripe event; True als een entry geraakt is"""
+        event_type = event.get("type", "")
+        obj = event.get("data", {}).get("object", {})
+        if event_type.startswith("customer.subscription."):
+            return self._apply_subscription(obj, event_type, event.get("created", 0))
+        if event_type.startswith("invoice."):
+            return self.invalidate(customer_id=obj.get("customer"))
+        if event_type in ("customer.updated", "customer.deleted"):
+            return self.invalidate(customer_id=obj.get("id"))
+        return False
+
+    def _apply_subscription(self, subscription: Dict[str, Any], event_type: str, created: int) -> bool:
+        with self._lock:
+            email = self._by_customer.get(subscription.get("customer"))
+            if email is not None and email in self._inflight:
+                self._stale.add(email)
+            entry = self._by_email.get(email) if email else None
+            if entry is None:
+                return False
+            sub_id = subscription["id"]
+            # Stripe garandeert geen volgorde; een ouder event mag niets terugdraaien
+            if created < entry.versions.get(sub_id, 0):
+                return False
+            entry.versions[sub_id] = created
+
+            remaining = [sub for sub in entry.subscriptions if sub["id"] != sub_id]
+            if event_type != "customer.subscription.deleted" and subscription.get("status") not in ENDED_STATUSES:
+                remaining.append(self.service.subscription_summary(subscription))
+            entry.subscriptions = remaining
+            self.updates += 1
+            return True
+
+    def invalidate(self, email: Optional[str] = None, customer_id: Optional[str] = None) -> bool:
+        with self._lock:
+            key = self._key(email) if email else self._by_customer.get(customer_id)
+            if key is None:
+                return False
+            if key in self._inflight:
+                self._stale.add(key)
+            existed = key in self._by_email
+            self._drop(key)
+            self.invalidations += existed
+            return existed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._by_email),
+            "hits": self.hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "coalesced": self.coalesced,
+            "updates": self.updates,
+            "invalidations": self.invalidations,
+        }
+
+
+# --- Shared instance ---
+_cache: Optional[SubscriptionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_subscription_cache(service=None) -> SubscriptionCache:
+    """Gedeelde cache; `service` is alleen bij de eerste aanroep nodig"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if service is None:
+                from stripe_service import stripe_service as service
+            _cache = SubscriptionCache(service)
+        return _cache
+
+
+def apply_subscription_event(event: Dict[str, Any]) -> None:
+    """Vanuit de webhook processor; doet niets als er nog geen gedeelde cache is"""
+    if _cache is not None:
+        _cache.apply_event(event)
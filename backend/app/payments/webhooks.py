@@ -0,0 +1,374 @@
+"""
+Stripe webhooks: ontvangen en verwerken ontkoppeld.
+
+De route controleert alleen de handtekening, zet het event (op `event.id`)
+in een duurzame lokale queue (SQLite in WAL mode) en antwoordt direct met
+200. Stripe's retry timer hangt zo niet meer af van Firestore latency.
+Een dubbel afgeleverd event komt niet opnieuw in de queue.
+
+WebhookProcessor verwerkt de queue met een paar worker threads:
+
+- events worden geclaimd met een lease; een worker die halverwege crasht
+  geeft het event na de lease vanzelf terug
+- fouten worden opnieuw geprobeerd met exponential backoff, na
+  WEBHOOK_MAX_ATTEMPTS pogingen blijft het event als `failed` staan
+- de effecten zijn idempotent op `event.id` (zie `credit_coins`), dus ook
+  een tweede verwerking na een crash schrijft niets dubbel bij
+- bij het stoppen gaat de queue pas dicht als alle workers klaar zijn
+
+Usage:
+
+    processor = get_webhook_processor(stripe_service, db)
+    processor.start()
+    result = await ingest_webhook(processor, payload, signature)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import stripe
+from fastapi import HTTPException
+
+from .balances import invalidate_coin_balance
+from .ledger import credit_coins
+from .subscriptions import apply_subscription_event
+
+# In de backend map, niet in de werkmap van het proces (WEBHOOK_QUEUE_DB om te overschrijven)
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "stripe_webhooks.db")
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_LEASE = 60.0
+DEFAULT_RETRY_BACKOFF = 1.0
+MAX_RETRY_DELAY = 300.0
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class QueuedEvent:
+    event_id: str
+    event_type: str
+    payload: str
+    attempts: int
+
+    @property
+    def event(self) -> Dict[str, Any]:
+        return json.loads(self.payload)
+
+
+class WebhookQueue:
+    """Duurzame queue van Stripe events, één rij per `event.id`"""
+
+    def __init__(self, path: str, synchronous: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # FULL: een geacked event staat ook na stroomuitval nog op schijf
+        self._db.execute(f"PRAGMA synchronous={synchronous or os.getenv('WEBHOOK_QUEUE_SYNC', 'FULL')}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS webhook_events ("
+            "event_id TEXT PRIMARY KEY, event_type TEXT NOT NULL, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "received REAL NOT NULL, available_at REAL NOT NULL, lease_until REAL, "
+            "processed REAL, last_error TEXT, result TEXT)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS webhook_events_ready ON webhook_events (status, available_at)"
+        )
+
+    def enqueue(self, event_id: str, event_type: str, payload: str) -> bool:
+        """Sla een event op; False als dit event id al eerder ontvangen is"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO webhook_events "
+                "(event_id, event_type, payload, status, received, available_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (event_id, event_type, payload, PENDING, now, now),
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, limit: int, lease: float) -> List[QueuedEvent]:
+        """Claim tot `limit` klare events (ook events met een verlopen lease)"""
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE: ook meerdere processen op dezelfde file claimen nooit hetzelfde event
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT event_id, event_type, payload, attempts FROM webhook_events "
+                    "WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_until < ?) "
+                    "ORDER BY received LIMIT ?",
+                    (PENDING, now, PROCESSING, now, limit),
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE webhook_events SET status = ?, lease_until = ?, attempts = attempts + 1 "
+                    "WHERE event_id = ?",
+                    [(PROCESSING, now + lease, row[0]) for row in rows],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return [QueuedEvent(event_id, event_type, payload, attempts + 1)
+                for event_id, event_type, payload, attempts in rows]
+
+    def complete(self, event_id: str, result: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE webhook_events SET status = ?, processed = ?, lease_until = NULL, result = ? "
+                "WHERE event_id = ?",
+                (DONE, time.time(), json.dumps(result, default=str) if result is not None else None, event_id),
+            )
+
+    def retry(self, event_id: str, error: str, delay: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE webhook_events SET status = ?, available_at = ?, lease_until = NULL, last_error = ? "
+                "WHERE event_id = ?",
+                (PENDING, time.time() + delay, error, event_id),
+            )
+
+    def fail(self, event_id: str, error: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE webhook_events SET status = ?, lease_until = NULL, last_error = ? WHERE event_id = ?",
+                (FAILED, error, event_id),
+            )
+
+    def get(self, event_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM webhook_events WHERE event_id = ?", (event_id,))
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        return dict(zip(columns, row)) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM webhook_events GROUP BY status").fetchall()
+        return {PENDING: 0, PROCESSING: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class WebhookProcessor:
+    """Worker threads die de queue leeg werken"""
+
+    def __init__(
+        self,
+        queue: WebhookQueue,
+        handler: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        lease: Optional[float] = None,
+        retry_backoff: Optional[float] = None,
+        poll_interval: float = 1.0,
+        service=None,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.service = service
+        self.workers = workers or int(os.getenv("WEBHOOK_WORKERS", DEFAULT_WORKERS))
+        self.batch_size = batch_size or int(os.getenv("WEBHOOK_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.max_attempts = max_attempts or int(os.getenv("WEBHOOK_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+        self.lease = lease or float(os.getenv("WEBHOOK_LEASE", DEFAULT_LEASE))
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(
+            os.getenv("WEBHOOK_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF)
+        )
+        self.poll_interval = poll_interval
+
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._stats_lock = threading.Lock()
+
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+
+    # --- Lifecycle ---
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"stripe-webhooks-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"📬 Stripe webhook processor started ({self.workers} workers, queue {self.queue.path})")
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """Stop de workers; False als er na `timeout` nog een midden in een event zit"""
+        self._stop.set()
+        self.notify()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        return not self._threads
+
+    def notify(self) -> None:
+        """Maak wachtende workers wakker (na een enqueue)"""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def record_received(self, inserted: bool) -> None:
+        """Tel een binnengekomen event; een nieuw event maakt de workers wakker"""
+        self._count("received" if inserted else "duplicates")
+        if inserted:
+            self.notify()
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """Wacht tot er niets meer klaarstaat of in behandeling is"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            counts = self.queue.counts()
+            if not counts[PENDING] and not counts[PROCESSING]:
+                return True
+            time.sleep(0.01)
+        return False
+
+    # --- Workers ---
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                events = self.queue.claim(self.batch_size, self.lease)
+            except sqlite3.Error as e:
+                print(f"⚠️ Webhook queue claim failed: {e}")
+                events = []
+            if not events:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            for queued in events:
+                if self._stop.is_set():
+                    # Rest van de batch komt na de lease vanzelf terug
+                    break
+                self._process(queued)
+
+    def _process(self, queued: QueuedEvent) -> None:
+        try:
+            result = self.handler(queued.event)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if queued.attempts >= self.max_attempts:
+                self.queue.fail(queued.event_id, error)
+                self._count("failed")
+                print(f"❌ Webhook {queued.event_id} ({queued.event_type}) failed permanently: {error}")
+            else:
+                delay = min(MAX_RETRY_DELAY, self.retry_backoff * 2 ** (queued.attempts - 1))
+                self.queue.retry(queued.event_id, error, delay)
+                self._count("retried")
+            return
+        self.queue.complete(queued.event_id, result)
+        self._count("processed")
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._threads),
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "queue": self.queue.counts(),
+        }
+
+
+# --- Verwerking ---
+def apply_webhook_result(db, event_id: str, result: Dict[str, Any]) -> None:
+    """Voer de actie van `StripeService.process_event` uit, idempotent op `event_id`"""
+    action = result.get("action")
+    if action == "add_coins":
+        if result.get("user_id"):
+            if credit_coins(db, result["user_id"], result["coins"], idempotency_key=event_id, source="stripe"):
+                invalidate_coin_balance(result["user_id"])
+                print(f"✅ Added {result['coins']} coins to user {result['user_id']}")
+    elif action == "activate_premium":
+        # Vereist dat Stripe customer IDs in user profiles staan
+        print(f"✅ Activated premium for customer {result['customer_id']}")
+    elif action == "deactivate_premium":
+        print(f"✅ Deactivated premium for customer {result['customer_id']}")
+
+
+def make_webhook_handler(service, db=None) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Handler voor de processor; zonder `db` wordt Firestore pas bij het eerste event opgehaald"""
+    def handle(event: Dict[str, Any]) -> Dict[str, Any]:
+        nonlocal db
+        result = service.process_event(event)
+        apply_subscription_event(event)
+        if result.get("success"):
+            if db is None:
+                from firebase_admin import firestore
+                db = firestore.client()
+            apply_webhook_result(db, event["id"], result)
+        return result
+    return handle
+
+
+async def ingest_webhook(processor: WebhookProcessor, payload: bytes, signature: Optional[str]) -> Dict[str, Any]:
+    """Verifieer, zet in de queue en ack; verwerking volgt op de achtergrond"""
+    if not signature:
+        raise HTTPException(status_code=400, detail="Missing stripe-signature header")
+    try:
+        event = processor.service.verify_webhook(payload.decode(), signature)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid payload")
+    except stripe.error.SignatureVerificationError:
+        raise HTTPException(status_code=400, detail="Invalid signature")
+
+    from app.datastore import get_datastore
+    inserted = await get_datastore().run(
+        processor.queue.enqueue, event["id"], event["type"], payload.decode()
+    )
+    processor.record_received(inserted)
+    return {"received": True, "event_id": event["id"], "duplicate": not inserted}
+
+
+# --- Shared instance ---
+_processor: Optional[WebhookProcessor] = None
+_processor_lock = threading.Lock()
+
+
+def get_webhook_processor(service=None, db=None) -> WebhookProcessor:
+    """Gedeelde queue + processor; `service` en `db` zijn alleen bij de eerste aanroep nodig"""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            if service is None:
+                from stripe_service import stripe_service as service
+            queue = WebhookQueue(os.getenv("WEBHOOK_QUEUE_DB", DEFAULT_DB_PATH))
+            _processor = WebhookProcessor(queue, make_webhook_handler(service, db), service=service)
+        return _processor
+
+
+def stop_webhook_processor(timeout: float = 5.0) -> None:
+    global _processor
+    with _processor_lock:
+        processor, _processor = _processor, None
+    if processor is None:
+        return
+    if processor.stop(timeout):
+        processor.queue.close()
+    else:
+        # Een worker zit nog in process_event; de queue open laten zodat zijn ack niet verloren
+        # gaat. Lukt dat niet meer, dan geeft de lease het event na een herstart terug
+        print(f"⚠️ Stripe webhook workers still busy at shutdown; leaving queue {processor.queue.path} open")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: hands per seconde en geheugen per tafel voor de blackjack engine.
+
+Maakt N tafels aan (elk met een eigen shoe) en speelt er round-robin
+rondes op met een simpele policy (hit onder de 17, double op 10/11). Meet
+het geheugen per tafel met tracemalloc en de doorvoer in hands/sec, met
+schudden via een seeded PRNG, via SystemRandom (`--csprng`) of via een
+ShoePool met vooraf geschudde shoes (`--pool`). Rondes die met een nieuwe
+shoe beginnen worden apart getimed: daar zit de kosten van het schudden.
+
+    python bench_blackjack.py --tables 20000 --hands 200000
+    python bench_blackjack.py --tables 2000 --hands 200000 --csprng
+    python bench_blackjack.py --tables 2000 --hands 200000 --pool
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from app.game import Rules, Shoe, ShoePool, Table
+from app.game.engine import PLAYER_TURN
+
+
+def play_hand(table: Table) -> int:
+    table.start_round(10)
+    if table.phase == PLAYER_TURN and table.player.score in (10, 11):
+        table.double()
+    while table.phase == PLAYER_TURN:
+        if table.player.score < 17:
+            table.hit()
+        else:
+            table.stand()
+    return table.settle().net
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=20000)
+    parser.add_argument("--hands", type=int, default=200000)
+    parser.add_argument("--decks", type=int, default=6)
+    parser.add_argument("--csprng", action="store_true", help="schud met SystemRandom in plaats van een seeded PRNG")
+    parser.add_argument("--pool", action="store_true", help="neem geschudde shoes uit een ShoePool")
+    parser.add_argument("--pool-size", type=int, default=256)
+    parser.add_argument("--pool-mode", choices=("process", "thread"), default="process")
+    parser.add_argument("--seed", type=int, default=21)
+    args = parser.parse_args()
+
+    rules = Rules(decks=args.decks)
+    rng = None if args.csprng else random.Random(args.seed)
+    pool = None
+    if args.pool:
+        pool = ShoePool(args.decks, size=args.pool_size, low_water=args.pool_size // 2,
+                        batch=args.pool_size // 4 or 1, mode=args.pool_mode)
+        pool.fill()
+        pool.start()
+
+    def new_table() -> Table:
+        if pool is None:
+            return Table(rules, rng=rng)
+        return Table(rules, shoe=Shoe(rules.decks, rules.penetration, pool=pool))
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    tables = [new_table() for _ in range(args.tables)]
+    # Tafels die op verschillende momenten zijn begonnen: niet allemaal tegelijk bij de cut card
+    offsets = random.Random(args.seed)
+    for table in tables:
+        table.shoe.position = offsets.randrange(table.shoe.cut)
+    setup = time.perf_counter() - started
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    setup_fallbacks = pool.fallbacks if pool else 0
+
+    net = 0
+    reshuffle_ms = []
+    started = time.perf_counter()
+    for i in range(args.hands):
+        table = tables[i % len(tables)]
+        if table.shoe.needs_shuffle:
+            hand_started = time.perf_counter()
+            net += play_hand(table)
+            reshuffle_ms.append((time.perf_counter() - hand_started) * 1000)
+        else:
+            net += play_hand(table)
+    elapsed = time.perf_counter() - started
+    shuffles = sum(table.shoe.shuffles for table in tables)
+
+    print(f"{args.tables} tables in {setup:.2f}s, {memory / len(tables):.0f} bytes/table "
+          f"({memory / 2 ** 20:.1f} MiB)")
+    source = "ShoePool" if pool else "SystemRandom" if args.csprng else "seeded PRNG"
+    print(f"{args.hands} hands in {elapsed:.2f}s: {args.hands / elapsed:,.0f} hands/sec "
+          f"({shuffles} shuffles, {source})")
+    if reshuffle_ms:
+        reshuffle_ms.sort()
+        print(f"hands with a new shoe: avg {sum(reshuffle_ms) / len(reshuffle_ms):.3f}ms, "
+              f"p99 {reshuffle_ms[int(len(reshuffle_ms) * 0.99)]:.3f}ms")
+    print(f"player net: {net:+} coins on {args.hands * 10} staked ({net / (args.hands * 10):+.2%})")
+    if pool is not None:
+        pool.stop()
+        stats = pool.stats()
+        print(f"pool ({stats['mode']}): {stats['fallbacks'] - setup_fallbacks} inline shuffles while playing, "
+              f"{stats['refills']} refills, {stats['generate_ms_avg']}ms per generated shoe")
+
+
+if __name__ == "__main__":
+    main()
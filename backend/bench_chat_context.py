@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vaste "laatste 6 berichten" history vs. de ContextBuilder.
+
+Genereert een synthetisch corpus van chat gesprekken (korte beurten met af
+en toe een geplakt essay), bouwt per bericht de prompt op beide manieren en
+stuurt die naar een lokale OpenAI-compatible stub server die prefill
+simuleert (wachttijd per prompt token). Rapporteert prompt tokens
+(mean/p99) en latency per request.
+
+    python bench_chat_context.py --conversations 40 --turns 30 --essay-rate 0.05
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.apis.ai_chat.client import LLMClientManager
+from app.apis.ai_chat.context import ContextBuilder
+from app.apis.ai_chat.prompts import PromptRegistry
+from app.apis.ai_chat.tokens import count_message_tokens, tiktoken_available
+from conftest import FakeOpenAIServer
+
+SHORT_MESSAGES = [
+    "Hit me!", "Should I double down on eleven?", "Ugh, bust again.", "Dealer always gets 21...",
+    "Do you like playing here?", "What would you do with sixteen against a ten?", "Split the eights?",
+    "Lucky me!", "One more hand and then I'm going to sleep.", "You look great tonight.",
+]
+REPLIES = [
+    "Feeling lucky tonight, darling?", "Bold move, I like it.", "The cards love a brave player.",
+    "Stay with me for one more hand?", "Eleven? Double it and smile.", "Ooh, so close this time!",
+]
+ESSAY_SENTENCES = [
+    "So let me tell you what happened at work today, because it has been a long week.",
+    "My manager asked me to rewrite the whole quarterly report from scratch.",
+    "Then the train was delayed for forty minutes and I missed dinner with my friends.",
+    "I read somewhere that card counting only works with a perfect running count.",
+    "Anyway, I copied this article about blackjack strategy and want your opinion on it.",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def build_corpus(conversations: int, turns: int, essay_rate: float, seed: int):
+    """Lijst van (history, bericht) zoals de frontend ze per bericht zou sturen"""
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(conversations):
+        history = []
+        for _ in range(turns):
+            if rng.random() < essay_rate:
+                message = " ".join(rng.choice(ESSAY_SENTENCES) for _ in range(rng.randint(30, 120)))
+            else:
+                message = rng.choice(SHORT_MESSAGES)
+            requests.append((list(history), message))
+            history.append({"role": "user", "content": message})
+            history.append({"role": "assistant", "content": rng.choice(REPLIES)})
+    return requests
+
+
+def naive_messages(system, history, message):
+    """Oude situatie: laatste 6 berichten, ongeacht hun lengte"""
+    return [system] + history[-6:] + [{"role": "user", "content": message}]
+
+
+async def run_load(server: FakeOpenAIServer, prompts, concurrency: int):
+    manager = LLMClientManager(api_key="sk-bench", base_url=server.base_url)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(messages):
+        async with semaphore:
+            started = time.perf_counter()
+            await manager.client.chat.completions.create(model="gpt-4o-mini", messages=messages, max_tokens=50)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    try:
+        await asyncio.gather(*(one(messages) for messages in prompts))
+    finally:
+        await manager.aclose()
+    return latencies
+
+
+def report(name, tokens, latencies):
+    print(f"{name:<16} tokens p50 {percentile(tokens, 50):5d}  mean {statistics.mean(tokens):7.1f}  p99 {percentile(tokens, 99):6d}  max {max(tokens):6d}  "
+          f"| latency p50 {percentile(latencies, 50):7.2f}ms  p99 {percentile(latencies, 99):7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--essay-rate", type=float, default=0.05, help="kans dat een bericht een geplakt essay is")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--prefill-us", type=float, default=20.0, help="gesimuleerde prefill tijd per prompt token")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.conversations, args.turns, args.essay_rate, args.seed)
+    system = PromptRegistry().get(None, 0).message
+    builder = ContextBuilder()
+
+    naive = [naive_messages(system, history, message) for history, message in corpus]
+    started = time.perf_counter()
+    budgeted = [builder.build([system], history, message).messages for history, message in corpus]
+    build_us = (time.perf_counter() - started) / len(corpus) * 1e6
+
+    server = FakeOpenAIServer()
+    server.prompt_token_delay = args.prefill_us / 1e6
+    server.start()
+    try:
+        print(f"🏁 {len(corpus)} requests, essay rate {args.essay_rate:.0%}, budget {builder.budget} tokens, "
+              f"{args.prefill_us:.0f}µs prefill/token, tiktoken {'on' if tiktoken_available() else 'off (heuristic)'}")
+        # Warm-up zodat import- en verbindingskosten niet meetellen
+        asyncio.run(run_load(server, naive[:20], args.concurrency))
+        for name, prompts in (("last 6 messages", naive), ("context builder", budgeted)):
+            latencies = asyncio.run(run_load(server, prompts, args.concurrency))
+            report(name, [count_message_tokens(m) for m in prompts], latencies)
+        stats = builder.stats()
+        print(f"🧮 build {build_us:.1f}µs/request, {stats['truncated_messages']} messages truncated, "
+              f"{stats['summarized_turns']} turns summarized")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
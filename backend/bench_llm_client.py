@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: nieuwe OpenAI client per bericht vs. de gedeelde, gepoolde client.
+
+Draait tegen een lokale OpenAI-compatible stub server (standaard via HTTPS
+met een self-signed cert, zodat de TLS handshake per nieuwe client meetelt)
+en rapporteert p50/p99 latency per request.
+
+    python bench_llm_client.py --requests 300 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.apis.ai_chat.client import LLMClientManager
+from conftest import FakeOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "Deal me in!"}]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_load(requests: int, concurrency: int, call):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, time.perf_counter() - started
+
+
+async def per_request_clients(server: FakeOpenAIServer, requests: int, concurrency: int):
+    """Oude situatie: elke chat call bouwt en sluit zijn eigen client"""
+    async def call():
+        client = AsyncOpenAI(
+            api_key="sk-bench", base_url=server.base_url,
+            http_client=httpx.AsyncClient(verify=server.cert_path or True),
+        )
+        try:
+            await client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+        finally:
+            await client.close()
+
+    return await run_load(requests, concurrency, call)
+
+
+async def pooled_client(server: FakeOpenAIServer, requests: int, concurrency: int):
+    """Nieuwe situatie: één client uit de lifespan voor alle calls"""
+    manager = LLMClientManager(api_key="sk-bench", base_url=server.base_url, verify=server.cert_path or True)
+
+    async def call():
+        await manager.client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+    try:
+        return await run_load(requests, concurrency, call)
+    finally:
+        await manager.aclose()
+
+
+def report(name, latencies, elapsed):
+    print(f"{name:<22} p50 {percentile(latencies, 50):7.2f}ms  p99 {percentile(latencies, 99):7.2f}ms  "
+          f"mean {statistics.mean(latencies):7.2f}ms  {len(latencies) / elapsed:7.0f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="gesimuleerde model latency per call")
+    parser.add_argument("--no-tls", action="store_true", help="stub server over plain HTTP")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tls_dir:
+        server = FakeOpenAIServer()
+        server.first_token_delay = args.latency_ms / 1000
+        server.start(tls_dir=None if args.no_tls else tls_dir)
+        try:
+            print(f"🏁 {args.requests} requests, concurrency {args.concurrency}, "
+                  f"stub {server.base_url} ({args.latency_ms:.0f}ms model latency)")
+            # Warm-up zodat import- en JIT-achtige kosten niet meetellen
+            asyncio.run(pooled_client(server, 10, 1))
+
+            server.peers.clear()
+            latencies, elapsed = asyncio.run(per_request_clients(server, args.requests, args.concurrency))
+            report("client per request", latencies, elapsed)
+            connections_before = len(server.peers)
+
+            server.peers.clear()
+            latencies, elapsed = asyncio.run(pooled_client(server, args.requests, args.concurrency))
+            report("pooled client", latencies, elapsed)
+            print(f"🔌 TCP connections: {connections_before} per-request vs {len(server.peers)} pooled")
+        finally:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
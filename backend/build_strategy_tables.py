@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Bereken de EV tabellen voor dealer hints en schrijf ze naar
+app/game/strategy_tables.bin (zie app/game/strategy.py).
+
+Draai dit opnieuw na een wijziging in de regels of de berekening; de app
+laadt het bestand bij het opstarten.
+
+    python build_strategy_tables.py --decks 1 2 4 6 8
+"""
+
+import argparse
+import time
+
+from app.game.strategy import DEFAULT_DECK_COUNTS, DEFAULT_TABLES_PATH, StrategyTables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--decks", type=int, nargs="+", default=list(DEFAULT_DECK_COUNTS))
+    parser.add_argument("--output", default=DEFAULT_TABLES_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tables = StrategyTables.compute(args.decks)
+    tables.save(args.output)
+    stats = tables.stats()
+    print(f"✅ {len(stats['rule_sets'])} rule sets ({stats['bytes']} bytes) in "
+          f"{time.perf_counter() - started:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
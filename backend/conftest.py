@@ -0,0 +1,429 @@
+"""
+Gedeelde test fakes voor Firestore, Firebase Storage en OpenAI.
+
+De fakes houden documenten en blobs in het geheugen en bootsen alleen het
+deel van de firebase_admin API na dat de backend gebruikt. Listeners
+krijgen change events gepusht zoals de echte Watch dat doet.
+"""
+
+import asyncio
+import copy
+import json
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+# stripe_service weigert te importeren zonder key; tests praten nooit met Stripe zelf
+os.environ.setdefault("STRIPE_SECRET_KEY", "sk_test_conftest")
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = copy.deepcopy(data) if data is not None else None
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class FakeChange:
+    def __init__(self, change_type, document):
+        self.type = SimpleNamespace(name=change_type)
+        self.document = document
+
+
+class FakeWatch:
+    def __init__(self, collection, callback):
+        self.collection = collection
+        self.callback = callback
+        self.active = True
+
+    def unsubscribe(self):
+        self.active = False
+        self.collection._watches.remove(self)
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self.parent = collection
+        self.id = doc_id
+
+    def get(self):
+        self.parent.db.reads += 1
+        return FakeDocumentSnapshot(self.id, self.parent._docs.get(self.id))
+
+    def set(self, data, merge=False):
+        self.parent._write(self.id, data, merge=merge)
+
+    def create(self, data):
+        with self.parent.db.lock:
+            if self.id in self.parent._docs:
+                from google.api_core.exceptions import AlreadyExists
+                raise AlreadyExists(f"Document already exists: {self.parent.name}/{self.id}")
+            self.parent._write(self.id, data)
+
+    def update(self, data):
+        if self.id not in self.parent._docs:
+            raise KeyError(f"No document to update: {self.id}")
+        self.parent._write(self.id, data, merge=True)
+
+    def delete(self):
+        self.parent._delete(self.id)
+
+    def collection(self, name):
+        # Subcollecties als platte collectie met het volledige pad als naam
+        return self.parent.db.collection(f"{self.parent.name}/{self.id}/{name}")
+
+
+class FakeCollectionReference:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self._docs = {}
+        self._watches = []
+
+    def document(self, doc_id):
+        return FakeDocumentReference(self, doc_id)
+
+    def stream(self):
+        self.db.reads += len(self._docs)
+        return [FakeDocumentSnapshot(doc_id, data) for doc_id, data in list(self._docs.items())]
+
+    def on_snapshot(self, callback):
+        watch = FakeWatch(self, callback)
+        self._watches.append(watch)
+        changes = [
+            FakeChange("ADDED", FakeDocumentSnapshot(doc_id, data))
+            for doc_id, data in self._docs.items()
+        ]
+        callback(self.stream(), changes, None)
+        return watch
+
+    def _write(self, doc_id, data, merge=False):
+        with self.db.lock:
+            self.db.writes += 1
+            self.db.doc_writes[f"{self.name}/{doc_id}"] += 1
+            existed = doc_id in self._docs
+            merged = dict(self._docs[doc_id]) if merge and existed else {}
+            for key, value in data.items():
+                if type(value).__name__ == "Increment":
+                    # firestore.Increment transform, zoals de server die toepast
+                    merged[key] = merged.get(key, 0) + value.value
+                else:
+                    merged[key] = copy.deepcopy(value)
+            self._docs[doc_id] = merged
+        self._notify("MODIFIED" if existed else "ADDED", doc_id)
+
+    def _delete(self, doc_id):
+        with self.db.lock:
+            existed = self._docs.pop(doc_id, None) is not None
+        if existed:
+            self._notify("REMOVED", doc_id, data={})
+
+    def _notify(self, change_type, doc_id, data=None):
+        snapshot = FakeDocumentSnapshot(doc_id, self._docs.get(doc_id, data))
+        for watch in list(self._watches):
+            watch.callback(None, [FakeChange(change_type, snapshot)], None)
+
+
+class FakeWriteBatch:
+    """Verzamelt writes en past ze pas toe bij commit()"""
+
+    def __init__(self, db):
+        self.db = db
+        self._ops = []
+        self._creates = []
+
+    def set(self, doc_ref, data, merge=False):
+        self._ops.append(lambda: doc_ref.set(data, merge=merge))
+
+    def create(self, doc_ref, data):
+        self._creates.append(doc_ref)
+        self._ops.append(lambda: doc_ref.set(data))
+
+    def update(self, doc_ref, data):
+        self._ops.append(lambda: doc_ref.update(data))
+
+    def delete(self, doc_ref):
+        self._ops.append(doc_ref.delete)
+
+    def __len__(self):
+        return len(self._ops)
+
+    def commit(self):
+        with self.db.lock:
+            if self.db.fail_next_commits > 0:
+                self.db.fail_next_commits -= 1
+                raise RuntimeError("simulated commit failure")
+            # Atomisch: een bestaand create() document laat de hele batch falen
+            for doc_ref in self._creates:
+                if doc_ref.id in doc_ref.parent._docs:
+                    from google.api_core.exceptions import AlreadyExists
+                    raise AlreadyExists(f"Document already exists: {doc_ref.parent.name}/{doc_ref.id}")
+            for op in self._ops:
+                op()
+            self.db.commits += 1
+        return [None] * len(self._ops)
+
+
+class FakeFirestore:
+    """Minimale in-memory vervanger voor `firestore.client()`"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+        self.fail_next_commits = 0
+        self.doc_writes = Counter()
+        self._collections = {}
+
+    def collection(self, name):
+        with self.lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollectionReference(self, name)
+            return self._collections[name]
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+        self.cache_control = None
+        self.chunk_size = None
+        self.public = False
+
+    @property
+    def public_url(self):
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    def upload_from_string(self, data, content_type=None):
+        if isinstance(data, str):
+            data = data.encode()
+        self.bucket.uploads += 1
+        self.content_type = content_type
+        self.bucket._write_object(self.name, [bytes(data)])
+
+    def upload_from_file(self, file_obj, content_type=None, size=None, **kwargs):
+        """Leest het file object per chunk_size, zoals een resumable upload"""
+        chunk_size = self.chunk_size or 256 * 1024
+
+        def chunks():
+            remaining = size
+            while remaining is None or remaining > 0:
+                chunk = file_obj.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+        self.bucket.uploads += 1
+        self.content_type = content_type
+        self.bucket._write_object(self.name, chunks())
+
+    def download_as_bytes(self):
+        return self.bucket._read_object(self.name)
+
+    def make_public(self):
+        self.public = True
+
+    def exists(self):
+        self.bucket.exists_calls += 1
+        return self.name in self.bucket._objects
+
+
+class FakeBucket:
+    """Minimale vervanger voor `storage.bucket()`, in het geheugen of op schijf"""
+
+    def __init__(self, name="test-bucket", root=None):
+        self.name = name
+        self.root = root
+        self.uploads = 0
+        self.exists_calls = 0
+        self._objects = {}
+        self._blobs = {}
+
+    def blob(self, name):
+        if name not in self._blobs:
+            self._blobs[name] = FakeBlob(self, name)
+        return self._blobs[name]
+
+    def get_blob(self, name):
+        return self._blobs.get(name) if name in self._objects else None
+
+    def object_names(self):
+        return sorted(self._objects)
+
+    def _write_object(self, name, chunks):
+        if self.root is None:
+            self._objects[name] = b"".join(chunks)
+            return
+        path = os.path.join(self.root, name.replace('/', '__'))
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self._objects[name] = path
+
+    def _read_object(self, name):
+        if self.root is None:
+            return self._objects[name]
+        with open(self._objects[name], 'rb') as f:
+            return f.read()
+
+
+class FakeOpenAIServer:
+    """Lokale OpenAI-compatible server (`/v1/chat/completions`) op een echte poort"""
+
+    def __init__(self):
+        self.reply_tokens = ["Hi", " there", ",", " lucky", " player!"]
+        self.first_token_delay = 0.0
+        self.token_delay = 0.0
+        self.prompt_token_delay = 0.0  # prefill: extra wachttijd per prompt token
+        self.status_code = 200
+        self.requests = []
+        self.peers = set()  # (host, port) per TCP verbinding van de client
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.base_url = None
+        self.cert_path = None
+
+    def _app(self):
+        from starlette.applications import Starlette
+        from starlette.responses import JSONResponse, StreamingResponse
+        from starlette.routing import Route
+
+        async def completions(request):
+            body = await request.json()
+            with self._lock:
+                self.requests.append(body)
+                self.peers.add((request.client.host, request.client.port))
+            if self.status_code != 200:
+                return JSONResponse({"error": {"message": "fake failure"}}, status_code=self.status_code)
+
+            created = int(time.time())
+            first_token_delay = self.first_token_delay
+            if self.prompt_token_delay:
+                from app.apis.ai_chat.tokens import count_message_tokens
+                first_token_delay += self.prompt_token_delay * count_message_tokens(body["messages"])
+            if not body.get("stream"):
+                await asyncio.sleep(first_token_delay)
+                return JSONResponse({
+                    "id": "chatcmpl-fake", "object": "chat.completion", "created": created,
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(self.reply_tokens)}}],
+                })
+
+            async def events():
+                await asyncio.sleep(first_token_delay)
+                for i, token in enumerate(self.reply_tokens):
+                    if i:
+                        await asyncio.sleep(self.token_delay)
+                    chunk = {
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created,
+                        "model": body.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+
+    def start(self, tls_dir=None):
+        """Start op een vrije poort; met `tls_dir` via HTTPS met een self-signed cert"""
+        import uvicorn
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", 0))
+        scheme = "https" if tls_dir else "http"
+        self.base_url = f"{scheme}://127.0.0.1:{sock.getsockname()[1]}/v1"
+
+        ssl_options = {}
+        if tls_dir:
+            self.cert_path, key_path = _self_signed_cert(tls_dir)
+            ssl_options = {"ssl_certfile": self.cert_path, "ssl_keyfile": key_path}
+
+        config = uvicorn.Config(self._app(), log_level="warning", lifespan="off", **ssl_options)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def _self_signed_cert(directory):
+    """Schrijf een self-signed cert + key voor 127.0.0.1 en geef de paden terug"""
+    import datetime
+    import ipaddress
+
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+    cert_path = os.path.join(str(directory), "fake_openai_cert.pem")
+    key_path = os.path.join(str(directory), "fake_openai_key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption(),
+        ))
+    return cert_path, key_path
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    server = FakeOpenAIServer().start()
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fake_db():
+    return FakeFirestore()
+
+
+@pytest.fixture
+def fake_bucket():
+    return FakeBucket()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Load test: synthetische spelers tegen de TableManager in één proces.
+
+Elke speler opent een tafel en speelt rondes (hit onder de 17), met een
+willekeurige bedenktijd tussen acties. Een deel van de spelers neemt af en
+toe een pauze langer dan de idle timeout, zodat tafels naar snapshots gaan
+en bij de volgende actie weer worden ingeladen. Rapporteert acties/sec,
+latency per actie, het aantal levende tafels en snapshots, en het maximale
+RSS geheugen van het proces.
+
+    python loadtest_tables.py --players 20000 --duration 30
+"""
+
+import argparse
+import asyncio
+import random
+import resource
+import time
+import tracemalloc
+
+from app.game import Rules
+from app.game.sessions import TableManager
+from app.game.shoe_pool import ShoePool
+
+
+async def player(manager: TableManager, table_id: str, name: str, args, rng: random.Random, latencies: list,
+                 deadline: float):
+    # Niet alle spelers tegelijk laten beginnen
+    await asyncio.sleep(rng.random() * args.think)
+
+    async def act(action: str, **kwargs):
+        started = time.perf_counter()
+        state = await manager.call(table_id, action, name, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        if time.monotonic() < deadline:
+            await asyncio.sleep(rng.uniform(0, 2 * args.think))
+        # Alleen bewaren wat de speler nodig heeft, niet de hele view
+        return state["player"]["score"], "settlement" in state
+
+    while time.monotonic() < deadline:
+        score, settled = await act("bet", bet=10)
+        while not settled:
+            score, settled = await act("hit" if score < 17 else "stand")
+        if rng.random() < args.break_chance:
+            pause = args.idle_timeout * (1 + rng.random())
+            await asyncio.sleep(min(pause, max(deadline - time.monotonic(), 0)))
+
+
+async def run(args):
+    pool = ShoePool(args.decks, size=256, low_water=128, batch=64).start()
+    manager = TableManager(Rules(decks=args.decks), idle_timeout=args.idle_timeout,
+                           max_live=args.max_live, evict_interval=0.5, pool_for=lambda decks: pool)
+    await manager.start()
+
+    latencies: list = []
+    peak = {"live": 0, "snapshots": 0}
+
+    async def monitor():
+        while True:
+            stats = manager.stats()
+            peak["live"] = max(peak["live"], stats["live"])
+            peak["snapshots"] = max(peak["snapshots"], stats["snapshots"])
+            await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    names = [f"player-{i}" for i in range(args.players)]
+    tracemalloc.start()
+    table_ids = [manager.open(name) for name in names]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"opened {args.players} tables in {time.perf_counter() - started:.2f}s, "
+          f"{memory / args.players:.0f} bytes/live table")
+
+    rng = random.Random(args.seed)
+    deadline = time.monotonic() + args.duration
+    watcher = asyncio.create_task(monitor())
+    started = time.perf_counter()
+    players = [
+        asyncio.create_task(player(manager, table_id, name, args, rng, latencies, deadline))
+        for table_id, name in zip(table_ids, names)
+    ]
+    await asyncio.gather(*players)
+    elapsed = time.perf_counter() - started
+    watcher.cancel()
+    await manager.stop()
+    pool.stop()
+
+    latencies.sort()
+    stats = manager.stats()
+    print(f"{args.players} players, {len(latencies)} actions in {elapsed:.1f}s: "
+          f"{len(latencies) / elapsed:,.0f} actions/sec")
+    print(f"latency p50 {latencies[len(latencies) // 2] * 1000:.2f}ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms, max {latencies[-1] * 1000:.2f}ms")
+    print(f"peak live tables {peak['live']}, peak snapshots {peak['snapshots']}, "
+          f"{stats['evicted']} evicted, {stats['restored']} restored, "
+          f"{stats['snapshot_bytes'] / max(stats['snapshots'], 1):.0f} bytes/snapshot")
+    print(f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB, "
+          f"shoe pool fallbacks {pool.stats()['fallbacks']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=20000)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--think", type=float, default=3.0, help="gemiddelde bedenktijd per actie in seconden")
+    parser.add_argument("--break-chance", type=float, default=0.1, help="kans op een lange pauze na een ronde")
+    parser.add_argument("--idle-timeout", type=float, default=10.0)
+    parser.add_argument("--max-live", type=int, default=50000)
+    parser.add_argument("--decks", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=21)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
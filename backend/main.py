@@ -1,11 +1,10 @@
 import os
 import pathlib
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from stripe_service import StripeService, PackageType
 import stripe
-from pydantic import BaseModel
-from typing import List, Optional
 
 # Import Firebase configuration FIRST to set up credentials
 try:
@@ -14,33 +13,6 @@ try:
 except ImportError as e:
     print(f"⚠️ Could not import Firebase config: {e}")
 
-# AI Chat Models
-class ChatMessageInput(BaseModel):
-    role: str # "user" or "assistant"
-    content: str
-
-class AiChatRequest(BaseModel):
-    message: str
-    history: List[ChatMessageInput]
-    outfit_stage_index: Optional[int] = None
-
-class AiChatResponse(BaseModel):
-    reply: str
-
-# OpenAI Client
-def get_openai_client():
-    """Get OpenAI client with API key from environment"""
-    try:
-        from openai import OpenAI
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key or api_key == "sk-your-openai-api-key-here":
-            print("⚠️ OpenAI API key not configured properly")
-            raise ValueError("OPENAI_API_KEY environment variable not set or using placeholder")
-        return OpenAI(api_key=api_key)
-    except ImportError:
-        print("❌ OpenAI library not installed. Run: pip install openai")
-        raise ValueError("OpenAI library not installed")
-
 def import_api_routers() -> APIRouter:
     """Create top level router including all user defined endpoints."""
     routes = APIRouter(prefix="/api")
@@ -68,12 +40,69 @@ def import_api_routers() -> APIRouter:
 
     return routes
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared in-process caches and stop them on shutdown."""
+    from app.datastore import get_datastore
+    datastore = get_datastore()
+
+    catalog = None
+    try:
+        from app.catalog import get_dealer_catalog
+        catalog = get_dealer_catalog()
+        await datastore.run(catalog.start)
+    except Exception as e:
+        print(f"⚠️ Dealer catalog not loaded at startup: {e}")
+
+    from app.apis.ai_chat.client import start_llm_client, stop_llm_client
+    from app.apis.ai_chat.prompts import get_prompt_registry
+    await start_llm_client()
+    # Compile all dealer prompts once; rebuilt on catalog changes
+    get_prompt_registry()
+    # Strategy EV tables for /game/hint and dealer tips (one small file read)
+    from app.game.strategy import get_strategy_tables
+    get_strategy_tables()
+    # Pre-shuffled shoes for the default rules, refilled by a background thread
+    from app.game import Rules
+    from app.game.shoe_pool import get_shoe_pool, stop_shoe_pools
+    get_shoe_pool(Rules().decks)
+    # Server-side tables (asyncio actors); idle tables are evicted to snapshots
+    from app.game.sessions import get_table_manager, stop_table_manager
+    await get_table_manager().start()
+    # Chat sessions; expired sessions are purged periodically
+    from app.apis.ai_chat.sessions import get_session_store, stop_session_store
+    await get_session_store().start()
+
+    # Stripe webhooks are acked once queued; workers apply them in the background
+    from app.payments import get_webhook_processor, stop_webhook_processor
+    try:
+        get_webhook_processor(getattr(app.state, "stripe_service", None)).start()
+    except Exception as e:
+        print(f"⚠️ Stripe webhook processor not started: {e}")
+
+    yield
+
+    stop_webhook_processor()
+    await stop_table_manager()
+    stop_shoe_pools()
+
+    await stop_llm_client()
+    await stop_session_store()
+    if catalog is not None:
+        catalog.stop()
+    from app.datastore import stop_datastore
+    stop_datastore()
+
+    from app.imaging import stop_image_pool
+    stop_image_pool()
+
 def create_app() -> FastAPI:
     """Create the FastAPI application."""
     app = FastAPI(
         title="Lucky Flirty Chat API",
         description="Backend API for the Lucky Flirty Chat application",
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=lifespan
     )
     
     # Set up CORS
@@ -101,6 +130,10 @@ def create_app() -> FastAPI:
     
     # Initialize Stripe service
     stripe_service = StripeService()
+    app.state.stripe_service = stripe_service
+    # Shop catalog serialized once; rebuilt after a product sync
+    from app.catalog import PackageCatalog
+    package_catalog = PackageCatalog(stripe_service)
 
     @app.get("/")
     async def root():
@@ -152,31 +185,11 @@ def create_app() -> FastAPI:
 
     @app.post("/api/webhooks/stripe")
     async def stripe_webhook(request: Request):
-        """Handle Stripe webhook events"""
-        try:
-            payload = await request.body()
-            sig_header = request.headers.get('stripe-signature')
-            
-            if not sig_header:
-                raise HTTPException(400, "Missing stripe-signature header")
-            
-            result = stripe_service.handle_webhook(payload.decode(), sig_header)
-            
-            if not result.get('success'):
-                raise HTTPException(400, result.get('error', 'Webhook processing failed'))
-            
-            # Here you would typically update your database
-            # For example:
-            # - Add coins to user account
-            # - Activate premium subscription
-            # - Update user status
-            
-            print(f"Webhook processed successfully: {result}")
-            return {"status": "success", "result": result}
-            
-        except Exception as e:
-            print(f"Webhook error: {e}")
-            raise HTTPException(400, str(e))
+        """Verify and enqueue Stripe webhook events; a background processor applies them"""
+        from app.payments import get_webhook_processor, ingest_webhook
+        payload = await request.body()
+        sig_header = request.headers.get('stripe-signature')
+        return await ingest_webhook(get_webhook_processor(stripe_service), payload, sig_header)
 
     @app.get("/payment/success")
     async def payment_success(session_id: str):
@@ -205,41 +218,9 @@ def create_app() -> FastAPI:
         }
 
     @app.get("/api/packages")
-    async def get_packages():
-        """Get all available coin and premium packages"""
-        try:
-            coin_packages = []
-            for package in stripe_service.coin_packages.values():
-                coin_packages.append({
-                    "id": package.id,
-                    "name": package.name,
-                    "coins": package.coins,
-                    "price_eur": package.price_eur,
-                    "original_price_eur": package.original_price_eur,
-                    "is_popular": package.is_popular,
-                    "bonus_description": package.bonus_description,
-                    "stripe_price_id": package.stripe_price_id
-                })
-            
-            premium_packages = []
-            for package in stripe_service.premium_packages.values():
-                premium_packages.append({
-                    "id": package.id,
-                    "name": package.name,
-                    "price_eur": package.price_eur,
-                    "interval": package.interval,
-                    "features": package.features,
-                    "stripe_price_id": package.stripe_price_id
-                })
-            
-            return {
-                "success": True,
-                "coin_packages": coin_packages,
-                "premium_packages": premium_packages
-            }
-        except Exception as e:
-            print(f"Error getting packages: {e}")
-            raise HTTPException(500, str(e))
+    async def get_packages(request: Request):
+        """Get all available coin and premium packages (pre-serialized, ETag/304 aware)"""
+        return package_catalog.response(request)
 
     @app.get("/api/test-stripe-config")
     async def test_stripe_config():
@@ -259,66 +240,6 @@ def create_app() -> FastAPI:
                 detail=f"Stripe configuratie error: {str(e)}"
             )
 
-    # AI Chat Endpoints
-    @app.post("/api/ai-chat/send-message", response_model=AiChatResponse)
-    async def send_chat_message(request: AiChatRequest):
-        """Send a chat message to AI and get response"""
-        try:
-            client = get_openai_client()
-            
-            # Build messages for OpenAI
-            messages = []
-            for msg in request.history:
-                messages.append({"role": msg.role, "content": msg.content})
-            
-            # Add current message
-            messages.append({"role": "user", "content": request.message})
-            
-            # Personality prompts based on outfit stage - ALL IN ENGLISH as default
-            personality_prompts = [
-                "I am a professional blackjack dealer with natural charm. I am warm, professional and subtly playful. I use gentle flirtation and encouragement. Keep responses under 15 words.",
-                "I am an elegant blackjack dealer in cocktail attire. I am charming, witty and more intimate. I compliment your decisions and create romantic tension. Keep responses under 15 words.",
-                "I am a casual but stylish blackjack dealer. I am approachable, fun and flirtatiously encouraging. I playfully tease about your luck and skills. Keep responses under 15 words.",
-                "I am a sporty, confident blackjack dealer. I am energetic, bold and confidently flirtatious. I celebrate your wins with enthusiasm. Keep responses under 15 words.",
-                "I am a beautiful blackjack dealer in swimwear. I am confident, seductive and playfully enticing. I use sensual compliments. Keep responses under 15 words.",
-                "I am a luxurious, captivating blackjack dealer. I am refined, mysterious and irresistibly charming. I whisper sweet encouragements. Keep responses under 15 words."
-            ]
-            
-            outfit_stage = request.outfit_stage_index or 0
-            if outfit_stage >= len(personality_prompts):
-                outfit_stage = 0
-                
-            system_prompt = personality_prompts[outfit_stage]
-            
-            # Detect language from recent messages and respond accordingly
-            # Default to English, but detect if user speaks Dutch, German, etc.
-            language_instruction = " IMPORTANT: Default to English responses. If you detect the user is speaking Dutch, respond in Dutch. If German, respond in German. If unclear or mixed languages, use English."
-            
-            # Add system prompt
-            messages.insert(0, {"role": "system", "content": system_prompt + language_instruction})
-            
-            # Get AI response
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                max_tokens=50,
-                temperature=0.7
-            )
-            
-            reply = response.choices[0].message.content
-            return AiChatResponse(reply=reply)
-            
-        except ValueError as e:
-            # Return helpful message when OpenAI is not configured
-            return AiChatResponse(
-                reply="AI chat is not configured. Please add OPENAI_API_KEY to your environment variables."
-            )
-        except Exception as e:
-            print(f"AI Chat error: {e}")
-            return AiChatResponse(
-                reply="An error occurred while processing your message. Please try again."
-            )
-
     # Lokalisatie endpoints
     @app.get("/api/translations/{language}")
     async def get_translations(language: str):
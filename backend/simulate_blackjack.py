@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+House edge en dealer win rates uit de gevectoriseerde simulatie.
+
+Speelt miljoenen handen onder de opgegeven regels en policy en print de
+uitkomst als JSON: house edge, bust rates en een tabel per dealer upcard.
+Bedoeld om uitbetalingen en `winPercentage` / `experienceLevel` van de
+dealers op data te baseren in plaats van met de hand in te vullen.
+
+    python simulate_blackjack.py --hands 5000000 --decks 6 --policy basic --workers 4
+    python simulate_blackjack.py --policy dealer --h17
+"""
+
+import argparse
+import json
+import time
+
+from app.game import Rules
+from app.game.simulation import simulate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hands", type=int, default=2_000_000)
+    parser.add_argument("--decks", type=int, default=6)
+    parser.add_argument("--penetration", type=float, default=0.75)
+    parser.add_argument("--h17", action="store_true", help="dealer hit op soft 17")
+    parser.add_argument("--blackjack-pays", type=float, default=1.5)
+    parser.add_argument("--policy", choices=["basic", "dealer", "never_bust"], default="basic")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rules = Rules(decks=args.decks, penetration=args.penetration,
+                  dealer_hits_soft_17=args.h17, blackjack_pays=args.blackjack_pays)
+    started = time.perf_counter()
+    result = simulate(args.hands, rules, policy=args.policy, workers=args.workers, seed=args.seed)
+    elapsed = time.perf_counter() - started
+
+    report = result.to_dict()
+    report["seconds"] = round(elapsed, 2)
+    report["hands_per_second"] = round(result.hands / elapsed)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -49,6 +49,9 @@ class PremiumPackage:
 
 class StripeService:
     def __init__(self):
+        # Verhoogd na elke product sync, zodat gecachte catalogi opnieuw opbouwen
+        self.catalog_version = 0
+        
         # Coin pakketten configureren (met aliases voor frontend compatibiliteit)
         starter_package = CoinPackage(
             id="starter",
@@ -151,8 +154,8 @@ class StripeService:
     async def create_stripe_products(self):
         """Maak Stripe producten en prijzen aan voor alle pakketten"""
         
-        # Coin pakketten
-        for package in self.coin_packages.values():
+        # Coin pakketten (aliases wijzen naar hetzelfde object: elk pakket één keer)
+        for package in {id(p): p for p in self.coin_packages.values()}.values():
             try:
                 # Maak product aan
                 product = stripe.Product.create(
@@ -205,6 +208,8 @@ class StripeService:
                 
             except Exception as e:
                 print(f"❌ Error creating premium package {package.id}: {e}")
+        
+        self.catalog_version += 1
 
     def create_checkout_session(self, package_id: str, package_type: PackageType, 
                               success_url: str, cancel_url: str, customer_email: str = None,
@@ -259,21 +264,29 @@ class StripeService:
         
         return session
 
-    def handle_webhook(self, payload: str, signature: str) -> Dict:
-        """Verwerk Stripe webhook events"""
+    def verify_webhook(self, payload: str, signature: str):
+        """Controleer de handtekening en geef het Stripe event terug
         
+        Raises ValueError (ongeldige payload) of stripe.error.SignatureVerificationError.
+        """
         endpoint_secret = os.getenv('STRIPE_WEBHOOK_SECRET')
+        return stripe.Webhook.construct_event(payload, signature, endpoint_secret)
+
+    def handle_webhook(self, payload: str, signature: str) -> Dict:
+        """Verwerk Stripe webhook events (verificatie en verwerking in één keer)"""
         
         try:
-            event = stripe.Webhook.construct_event(
-                payload, signature, endpoint_secret
-            )
+            event = self.verify_webhook(payload, signature)
         except ValueError:
             return {"success": False, "error": "Invalid payload"}
         except stripe.error.SignatureVerificationError:
             return {"success": False, "error": "Invalid signature"}
 
-        # Verwerk het event
+        return self.process_event(event)
+
+    def process_event(self, event) -> Dict:
+        """Vertaal een geverifieerd event (Stripe object of dict) naar een actie"""
+        
         if event['type'] == 'checkout.session.completed':
             session = event['data']['object']
             return self._handle_successful_payment(session)
@@ -299,9 +312,7 @@ class StripeService:
             package_id = metadata.get('package_id')
             coins = int(metadata.get('coins', 0))
             
-            # Hier zou je de coins toevoegen aan de gebruiker
-            # await add_coins_to_user(user_id, coins)
-            
+            # Bijschrijven gebeurt in app.payments, idempotent op het event id
             return {
                 "success": True,
                 "action": "add_coins",
@@ -318,8 +329,7 @@ class StripeService:
         subscription_id = invoice['subscription']
         customer_id = invoice['customer']
         
-        # Hier zou je premium status activeren
-        # await activate_premium_status(customer_id)
+        # Premium status activeren gebeurt in apply_webhook_result (app.payments.webhooks)
         
         return {
             "success": True,
@@ -333,8 +343,7 @@ class StripeService:
         
         customer_id = subscription['customer']
         
-        # Hier zou je premium status deactiveren
-        # await deactivate_premium_status(customer_id)
+        # Premium status deactiveren gebeurt in apply_webhook_result (app.payments.webhooks)
         
         return {
             "success": True,
@@ -342,27 +351,49 @@ class StripeService:
             "customer_id": customer_id
         }
 
+    def plan_name(self, price: Dict) -> str:
+        """Plan naam via de lokale pakketten; geen extra Stripe call voor `price.product`"""
+        
+        for package in self.premium_packages.values():
+            if package.stripe_price_id == price.get('id'):
+                return package.name
+        return price.get('nickname') or "Unknown"
+
+    def subscription_summary(self, subscription: Dict) -> Dict:
+        """Abonnement (als dict) in het formaat van de subscriptions API"""
+        
+        items = (subscription.get('items') or {}).get('data') or []
+        # Nieuwere API versies zetten de periode op het subscription item
+        period_end = subscription.get('current_period_end')
+        if period_end is None and items:
+            period_end = items[0].get('current_period_end')
+        return {
+            "id": subscription['id'],
+            "status": subscription.get('status'),
+            "current_period_end": period_end,
+            "plan_name": self.plan_name(items[0].get('price') or {}) if items else "Unknown"
+        }
+
+    def fetch_customer_subscriptions(self, customer_email: str) -> Optional[Dict]:
+        """Klant + abonnementen in één Stripe call; None als er geen klant is"""
+        
+        customers = stripe.Customer.list(email=customer_email, limit=1, expand=['data.subscriptions'])
+        if not customers.data:
+            return None
+        
+        customer = customers.data[0].to_dict()
+        subscriptions = (customer.get('subscriptions') or {}).get('data') or []
+        return {
+            "customer_id": customer['id'],
+            "subscriptions": [self.subscription_summary(sub) for sub in subscriptions]
+        }
+
     def get_customer_subscriptions(self, customer_email: str) -> List[Dict]:
         """Haal actieve abonnementen op voor een klant"""
         
         try:
-            customers = stripe.Customer.list(email=customer_email)
-            
-            if not customers.data:
-                return []
-                
-            customer = customers.data[0]
-            subscriptions = stripe.Subscription.list(customer=customer.id)
-            
-            return [
-                {
-                    "id": sub.id,
-                    "status": sub.status,
-                    "current_period_end": sub.current_period_end,
-                    "plan_name": sub.items.data[0].price.product.name if sub.items.data else "Unknown"
-                }
-                for sub in subscriptions.data
-            ]
+            customer = self.fetch_customer_subscriptions(customer_email)
+            return customer["subscriptions"] if customer else []
             
         except Exception as e:
             print(f"Error fetching subscriptions: {e}")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests voor de SSE chat route en de send-message routes tegen een lokale fake OpenAI server
+"""
+
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.apis import ai_chat
+from app.apis.ai_chat import admission
+from app.apis.ai_chat import client as llm_client
+from app.apis.ai_chat import prompts
+from app.apis.ai_chat import reply_cache as reply_cache_module
+from app.apis.ai_chat import streaming
+from app.apis.ai_chat.reply_cache import ReplyCache
+
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(streaming, "stream_metrics", streaming.StreamMetrics())
+    monkeypatch.setattr(llm_client, "_manager", None)
+    monkeypatch.setattr(prompts, "_registry", prompts.PromptRegistry())
+    monkeypatch.setattr(admission, "_controller", admission.LLMAdmissionController(user_rate=0))
+    monkeypatch.setattr(reply_cache_module, "_reply_cache", ReplyCache(variety=1))
+    app = FastAPI()
+    app.include_router(ai_chat.router, prefix="/api")
+    return TestClient(app)
+
+
+def post_stream(client, **payload):
+    payload.setdefault("history", [])
+    with client.stream("POST", "/api/ai-chat/stream", json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return parse_sse(response.read().decode())
+
+
+def test_tokens_are_forwarded_as_sse_events(client, fake_openai):
+    fake_openai.first_token_delay = 0.05
+
+    events = post_stream(client, message="Hallo!", outfit_stage_index=2,
+                         history=[{"role": "user", "content": "hoi"}, {"role": "assistant", "content": "hey"}])
+
+    tokens = [data["delta"] for event, data in events if event == "token"]
+    assert tokens == fake_openai.reply_tokens
+    event, done = events[-1]
+    assert event == "done"
+    assert done["reply"] == "Hi there, lucky player!"
+    assert done["chunks"] == 5
+    assert done["ttft_ms"] >= 50
+    assert done["total_ms"] >= done["ttft_ms"]
+
+    sent = fake_openai.requests[0]
+    assert sent["stream"] is True
+    assert sent["messages"][0]["content"].startswith(prompts.DEFAULT_STAGE_PROMPTS[2])
+    assert [m["role"] for m in sent["messages"]] == ["system", "user", "assistant", "user"]
+
+
+def test_ttft_is_reported_in_stats(client, fake_openai):
+    post_stream(client, message="Hi")
+    post_stream(client, message="Nog een keer")
+
+    stats = client.get("/api/ai-chat/stream/stats").json()
+    assert stats["streams"] == 2
+    assert stats["errors"] == 0
+    assert stats["ttft_ms_p50"] is not None
+
+
+def test_upstream_error_becomes_error_event(client, fake_openai, monkeypatch):
+    fake_openai.status_code = 400
+
+    events = post_stream(client, message="Hi")
+
+    assert events == [("error", {"message": streaming.ERROR_MESSAGE})]
+    assert streaming.stream_metrics.errors == 1
+
+
+def test_missing_api_key_returns_configuration_hint(client, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    events = post_stream(client, message="Hi")
+
+    assert events == [("error", {"message": streaming.NOT_CONFIGURED_MESSAGE})]
+
+
+
+@pytest.mark.parametrize("path", ["/api/ai-chat/chat/send-message", "/api/ai-chat/send-message"])
+def test_send_message_uses_the_registry_prompt_context_and_cache(client, fake_openai, path):
+    history = [{"role": "user", "content": f"message {i}"} for i in range(3)]
+    payload = {"message": "You won!", "history": history, "outfit_stage_index": 2, "message_type": "game_event"}
+
+    first = client.post(path, json=payload).json()
+    second = client.post(path, json=payload).json()
+
+    assert first == {"reply": "Hi there, lucky player!", "session_id": None, "cached": False}
+    assert second["cached"] is True and second["reply"] == first["reply"]
+    assert len(fake_openai.requests) == 1
+    sent = fake_openai.requests[0]
+    assert sent["model"] == streaming.CHAT_MODEL
+    assert sent["messages"][0]["content"].startswith(prompts.DEFAULT_STAGE_PROMPTS[2])
+    assert "mention current scores" in sent["messages"][1]["content"]
+    assert sent["messages"][-1] == {"role": "user", "content": "You won!"}
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests voor de base64 → Storage migratie engine met fake Firestore/Storage
+"""
+
+import base64
+import json
+import threading
+
+import pytest
+
+from app.maintenance import Base64MigrationEngine, BucketUploader
+
+
+def data_url(payload: bytes, mime_type: str = "image/png") -> str:
+    return f"data:{mime_type};base64,{base64.b64encode(payload).decode()}"
+
+
+def seed_dealers(db, count=5):
+    dealers = db.collection('dealers')
+    for i in range(count):
+        dealers.document(f"dealer_{i}").set({
+            'name': f"Dealer {i}",
+            'bio': 'Keeps this field untouched',
+            'avatarUrl': data_url(f"avatar-{i}".encode()),
+            'professionalImageUrl': 'https://example.com/already-migrated.jpg',
+            'outfitStages': [
+                {'stageName': 'Professional', 'imageUrl': data_url(f"stage-{i}-1".encode(), "image/jpeg")},
+                {'stageName': 'Dinner', 'imageUrl': 'https://example.com/stage2.jpg'},
+            ],
+        })
+    dealers.document('no_images').set({'name': 'Plain'})
+
+
+class CountingUploader(BucketUploader):
+    def __init__(self, bucket, fail_for=()):
+        super().__init__(bucket)
+        self.fail_for = set(fail_for)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def upload(self, storage_path, data, content_type):
+        with self.lock:
+            self.calls += 1
+        if any(storage_path.startswith(f"dealers/{d}/") for d in self.fail_for):
+            raise RuntimeError("upload failed")
+        return super().upload(storage_path, data, content_type)
+
+
+def test_migrates_all_images_with_field_level_batched_updates(fake_db, fake_bucket, tmp_path):
+    seed_dealers(fake_db)
+    checkpoint = tmp_path / "checkpoint.json"
+    engine = Base64MigrationEngine(
+        fake_db, BucketUploader(fake_bucket), checkpoint_path=str(checkpoint), batch_size=2
+    )
+
+    report = engine.run()
+
+    assert report.images_converted == 10
+    assert report.dealers_updated == 5
+    assert report.batches_committed == 3
+    assert fake_db.commits == 3
+
+    dealer = fake_db.collection('dealers').document('dealer_3').get().to_dict()
+    assert dealer['avatarUrl'].endswith("dealers/dealer_3/avatar.png")
+    assert dealer['outfitStages'][0]['imageUrl'].endswith("dealers/dealer_3/outfits/stage_1.jpg")
+    assert dealer['outfitStages'][1]['imageUrl'] == 'https://example.com/stage2.jpg'
+    assert dealer['bio'] == 'Keeps this field untouched'
+    assert fake_bucket.get_blob("dealers/dealer_3/avatar.png").download_as_bytes() == b"avatar-3"
+
+    state = json.loads(checkpoint.read_text())
+    assert len(state["completed"]) == 5
+    assert state["uploaded"] == {}
+
+
+def test_failed_dealer_is_retried_on_next_run(fake_db, fake_bucket, tmp_path):
+    seed_dealers(fake_db)
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    first = Base64MigrationEngine(
+        fake_db, CountingUploader(fake_bucket, fail_for={"dealer_2"}), checkpoint_path=checkpoint
+    ).run()
+    assert first.images_failed == 2
+    assert first.dealers_updated == 4
+
+    uploader = CountingUploader(fake_bucket)
+    second = Base64MigrationEngine(fake_db, uploader, checkpoint_path=checkpoint).run()
+
+    assert second.dealers_skipped == 4
+    assert second.images_converted == 2
+    assert uploader.calls == 2
+    assert fake_db.collection('dealers').document('dealer_2').get().to_dict()['avatarUrl'].startswith("https://")
+
+
+def test_crash_before_commit_resumes_without_reuploading(fake_db, fake_bucket, tmp_path, monkeypatch):
+    seed_dealers(fake_db)
+    checkpoint = str(tmp_path / "checkpoint.json")
+    monkeypatch.setenv("BULK_WRITE_BACKOFF", "0")
+    # Meer failures dan BulkWriter retries, dus de run crasht echt
+    fake_db.fail_next_commits = 10
+
+    first_uploader = CountingUploader(fake_bucket)
+    with pytest.raises(RuntimeError):
+        Base64MigrationEngine(fake_db, first_uploader, checkpoint_path=checkpoint, batch_size=100).run()
+    assert first_uploader.calls == 10
+    assert fake_db.collection('dealers').document('dealer_0').get().to_dict()['avatarUrl'].startswith("data:")
+
+    fake_db.fail_next_commits = 0
+    second_uploader = CountingUploader(fake_bucket)
+    report = Base64MigrationEngine(fake_db, second_uploader, checkpoint_path=checkpoint).run()
+
+    assert second_uploader.calls == 0
+    assert report.images_reused == 10
+    assert report.dealers_updated == 5
+    assert fake_db.collection('dealers').document('dealer_0').get().to_dict()['avatarUrl'].startswith("https://")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests voor BulkWriter: batching, retry, throttle en throughput stats
+"""
+
+import pytest
+
+from app.maintenance import BulkWriter
+
+
+def test_writes_are_grouped_into_batches_of_at_most_500(fake_db):
+    players = fake_db.collection('playerProgress')
+    committed = []
+
+    with BulkWriter(fake_db, batch_size=1000, on_commit=committed.append) as writer:
+        for i in range(1200):
+            writer.set(players.document(f"player_{i}"), {'coins': i}, tag=i)
+        # Automatisch geflusht bij 500, de rest wacht nog
+        assert fake_db.commits == 2
+        assert len(writer) == 200
+
+    assert fake_db.commits == 3
+    assert [len(tags) for tags in committed] == [500, 500, 200]
+    assert players.document('player_1199').get().to_dict() == {'coins': 1199}
+
+    stats = writer.stats()
+    assert stats["docs_written"] == 1200
+    assert stats["batches_committed"] == 3
+    assert stats["pending"] == 0
+    assert stats["docs_per_second"] > 0
+
+
+def test_update_and_delete_are_batched(fake_db):
+    dealers = fake_db.collection('dealers')
+    dealers.document('emma').set({'name': 'Emma', 'avatarUrl': 'data:image/png;base64,AA=='})
+    dealers.document('old').set({'name': 'Old'})
+
+    with BulkWriter(fake_db) as writer:
+        writer.update(dealers.document('emma'), {'avatarUrl': 'https://cdn/emma.png'})
+        writer.delete(dealers.document('old'))
+        assert fake_db.commits == 0
+
+    assert fake_db.commits == 1
+    assert dealers.document('emma').get().to_dict() == {'name': 'Emma', 'avatarUrl': 'https://cdn/emma.png'}
+    assert not dealers.document('old').get().exists
+
+
+def test_failed_commit_is_retried_with_a_fresh_batch(fake_db):
+    fake_db.fail_next_commits = 2
+    writer = BulkWriter(fake_db, max_retries=3, retry_backoff=0)
+
+    writer.set(fake_db.collection('dealers').document('emma'), {'name': 'Emma'})
+    writer.flush()
+
+    assert writer.retries == 2
+    assert fake_db.commits == 1
+    assert fake_db.collection('dealers').document('emma').get().exists
+
+
+def test_commit_error_is_raised_after_max_retries(fake_db):
+    fake_db.fail_next_commits = 5
+    writer = BulkWriter(fake_db, max_retries=1, retry_backoff=0)
+    writer.set(fake_db.collection('dealers').document('emma'), {'name': 'Emma'})
+
+    with pytest.raises(RuntimeError):
+        writer.flush()
+
+    # Writes blijven staan voor een volgende flush
+    assert len(writer) == 1
+    assert fake_db.commits == 0
+
+
+def test_throttle_limits_docs_per_second(fake_db, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("app.maintenance.bulk_writer.time.sleep", sleeps.append)
+    players = fake_db.collection('playerProgress')
+
+    with BulkWriter(fake_db, batch_size=100, max_docs_per_second=1000) as writer:
+        for i in range(300):
+            writer.set(players.document(f"player_{i}"), {'coins': i})
+
+    # Drie batches van 100 docs bij 1000 docs/sec: pas na ~0.1s, ~0.2s, ~0.3s
+    # (sleep is gemockt, dus de wachttijden tellen niet op)
+    assert sleeps == pytest.approx([0.1, 0.2, 0.3], abs=0.05)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
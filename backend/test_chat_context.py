@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Tests voor de token-gebudgetteerde chat context (history compaction)
+"""
+
+import json
+import sys
+import types
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.apis import ai_chat
+from app.apis.ai_chat import admission
+from app.apis.ai_chat import client as llm_client
+from app.apis.ai_chat import context as chat_context
+from app.apis.ai_chat import prompts
+from app.apis.ai_chat.context import ContextBuilder
+from app.apis.ai_chat import tokens
+from app.apis.ai_chat.tokens import count_message_tokens, count_tokens, truncate_to_tokens
+
+SYSTEM = {"role": "system", "content": "I am a friendly blackjack dealer. Keep responses under 15 words."}
+ESSAY = "Let me tell you the whole story of my week at the casino. " * 200
+
+
+def conversation(turns):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i}: should I hit on sixteen against a ten?"})
+        history.append({"role": "assistant", "content": f"Answer {i}: feeling lucky tonight, darling?"})
+    return history
+
+
+def test_truncate_to_tokens_respects_the_limit():
+    assert truncate_to_tokens("short", 10) == "short"
+    truncated = truncate_to_tokens(ESSAY, 50)
+    assert truncated.endswith("…")
+    assert count_tokens(truncated) <= 50
+
+
+def test_failed_encoding_download_falls_back_to_the_estimate(monkeypatch):
+    downloads = []
+
+    def encoding_for_model(model):
+        downloads.append(model)
+        raise ConnectionError("no route to openaipublic.blob.core.windows.net")
+
+    monkeypatch.setitem(sys.modules, "tiktoken", types.SimpleNamespace(encoding_for_model=encoding_for_model))
+    tokens._encoder.cache_clear()
+    try:
+        assert count_tokens("a" * 40) == 10
+        assert count_tokens("b" * 40) == 10
+        assert truncate_to_tokens(ESSAY, 50).endswith("…")
+    finally:
+        tokens._encoder.cache_clear()
+    # Eén poging; het resultaat (None) wordt gecached
+    assert len(downloads) == 1
+
+
+def test_short_conversation_is_passed_through_unchanged():
+    builder = ContextBuilder(budget=800)
+    history = conversation(2)
+
+    context = builder.build([SYSTEM], history, "Hit me!")
+
+    assert context.messages == [SYSTEM] + history + [{"role": "user", "content": "Hit me!"}]
+    assert context.prompt_tokens == count_message_tokens(context.messages)
+    assert context.tokens_saved == 0
+    assert (context.truncated, context.summarized, context.dropped) == (0, 0, 0)
+
+
+def test_pasted_essay_is_truncated_per_message():
+    builder = ContextBuilder(budget=800, message_max_tokens=100)
+
+    context = builder.build([SYSTEM], [{"role": "user", "content": ESSAY}], ESSAY)
+
+    assert context.truncated == 2
+    for message in context.messages[1:]:
+        assert count_tokens(message["content"]) <= 100
+    assert context.prompt_tokens <= 800
+    assert context.tokens_saved > count_tokens(ESSAY)
+
+
+def test_history_stays_within_budget_and_keeps_newest_turns():
+    builder = ContextBuilder(budget=200, summary_tokens=0)
+    history = conversation(30)
+
+    context = builder.build([SYSTEM], history, "Hit me!")
+
+    assert context.prompt_tokens == count_message_tokens(context.messages)
+    assert context.prompt_tokens <= 200
+    kept = context.messages[1:-1]
+    assert kept == history[-len(kept):]
+    assert context.dropped == len(history) - len(kept)
+
+
+def test_max_history_caps_the_number_of_turns():
+    builder = ContextBuilder(budget=10000, max_history=4, summary_tokens=0)
+
+    context = builder.build([SYSTEM], conversation(10), "Hit me!")
+
+    assert len(context.messages) == 1 + 4 + 1
+
+
+def test_older_turns_are_summarized_in_a_system_note():
+    builder = ContextBuilder(budget=300, summary_tokens=80)
+    history = conversation(30)
+
+    context = builder.build([SYSTEM], history, "Hit me!")
+
+    summary = context.messages[1]
+    assert summary["role"] == "system"
+    assert summary["content"].startswith("Earlier in this conversation:")
+    assert context.summarized > 0
+    # De samenvatting bevat de meest recente van de weggelaten beurten
+    first_kept = history.index(context.messages[2])
+    assert history[first_kept - 1]["content"][:20] in summary["content"]
+    assert context.prompt_tokens == count_message_tokens(context.messages)
+    assert context.prompt_tokens <= 300
+
+
+def test_identical_turns_do_not_confuse_the_window():
+    builder = ContextBuilder(budget=100, summary_tokens=0)
+    history = [{"role": "user", "content": "hit"}, {"role": "assistant", "content": "ok"}] * 40
+
+    context = builder.build([SYSTEM], history, "hit")
+
+    assert context.dropped == len(history) - (len(context.messages) - 2)
+
+
+def test_stats_accumulate_saved_tokens():
+    builder = ContextBuilder(budget=300)
+    builder.build([SYSTEM], conversation(30), ESSAY)
+    builder.build([SYSTEM], conversation(1), "Hit me!")
+
+    stats = builder.stats()
+    assert stats["requests"] == 2
+    assert stats["tokens_saved"] > 0
+    assert stats["truncated_messages"] == 1
+    assert 0 < stats["avg_prompt_tokens"] <= 300
+
+
+# --- Stream route ---
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(llm_client, "_manager", None)
+    monkeypatch.setattr(prompts, "_registry", prompts.PromptRegistry())
+    monkeypatch.setattr(admission, "_controller", admission.LLMAdmissionController(user_rate=0))
+    monkeypatch.setattr(chat_context, "_builder", ContextBuilder(budget=400, message_max_tokens=100))
+    app = FastAPI()
+    app.include_router(ai_chat.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_stream_sends_budgeted_prompt_upstream(client, fake_openai):
+    history = conversation(30) + [{"role": "user", "content": ESSAY}]
+
+    with client.stream("POST", "/api/ai-chat/stream", json={"message": "Hit me!", "history": history}) as response:
+        events = parse_sse(response.read().decode())
+
+    event, done = events[-1]
+    assert event == "done"
+    assert 0 < done["prompt_tokens"] <= 400
+    assert done["tokens_saved"] > count_tokens(ESSAY) // 2
+
+    sent = fake_openai.requests[0]["messages"]
+    assert count_message_tokens(sent) == done["prompt_tokens"]
+    assert sent[-1] == {"role": "user", "content": "Hit me!"}
+
+    stats = client.get("/api/ai-chat/stream/stats").json()["context"]
+    assert stats["requests"] == 1
+    assert stats["tokens_saved"] == done["tokens_saved"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Tests voor de server-side chat sessies (ring buffer, LRU, SQLite backend,
+opruimen en een verloren sessie)
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.apis import ai_chat
+from app.apis.ai_chat import admission
+from app.apis.ai_chat import client as llm_client
+from app.apis.ai_chat import context as chat_context
+from app.apis.ai_chat import prompts
+from app.apis.ai_chat import sessions
+from app.apis.ai_chat.sessions import SessionStore, SQLiteSessionBackend, valid_session_id
+from app.apis.ai_chat.streaming import INVALID_SESSION_MESSAGE, SESSION_EXPIRED_MESSAGE
+
+SESSION = "c6f1a2b4-5d7e-4f80-9a1b-2c3d4e5f6a7b"
+
+
+def turn(i):
+    return ({"role": "user", "content": f"question {i}"}, {"role": "assistant", "content": f"answer {i}"})
+
+
+def test_session_ids_are_validated():
+    assert valid_session_id(SESSION)
+    assert valid_session_id("abc_DEF-123")
+    assert not valid_session_id(None)
+    assert not valid_session_id("short")
+    assert not valid_session_id("../../etc/passwd")
+    assert not valid_session_id("x" * 65)
+
+
+def test_ring_buffer_keeps_the_latest_messages():
+    store = SessionStore(max_messages=6)
+
+    async def scenario():
+        assert await store.history(SESSION) == []
+        for i in range(10):
+            await store.append(SESSION, *turn(i))
+        return await store.history(SESSION)
+
+    history = asyncio.run(scenario())
+    assert history == [m for i in range(7, 10) for m in turn(i)]
+    assert store.stats()["misses"] == 1
+
+
+def test_lru_evicts_the_least_recently_used_session():
+    store = SessionStore(max_sessions=2)
+
+    async def scenario():
+        await store.append("session-a", *turn(0))
+        await store.append("session-b", *turn(1))
+        await store.history("session-a")          # a is weer recent
+        await store.append("session-c", *turn(2))
+        return await store.history("session-a"), await store.history("session-b")
+
+    history_a, history_b = asyncio.run(scenario())
+    assert history_a == list(turn(0))
+    assert history_b == []
+    assert store.stats()["evictions"] == 1
+
+
+def test_expired_sessions_start_empty():
+    store = SessionStore(ttl=0.05)
+
+    async def scenario():
+        await store.append(SESSION, *turn(0))
+        await asyncio.sleep(0.1)
+        return await store.history(SESSION)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_sqlite_backend_survives_eviction_and_restart(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SessionStore(SQLiteSessionBackend(path), max_sessions=1)
+
+    async def scenario():
+        await store.append("session-a", *turn(0))
+        await store.append("session-b", *turn(1))   # a gaat uit de LRU
+        return await store.history("session-a")
+
+    assert asyncio.run(scenario()) == list(turn(0))
+    assert store.stats()["loads"] == 1
+    store.close()
+
+    restarted = SessionStore(SQLiteSessionBackend(path))
+    assert asyncio.run(restarted.history("session-b")) == list(turn(1))
+    restarted.close()
+
+
+def test_sqlite_backend_ignores_and_purges_old_sessions(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    backend.save(SESSION, list(turn(0)))
+    time.sleep(0.05)
+
+    assert backend.load(SESSION, max_age=0.01) is None
+    assert backend.load(SESSION, max_age=60) == list(turn(0))
+    assert backend.purge(max_age=0.01) == 1
+    assert backend.load(SESSION, max_age=60) is None
+    backend.close()
+
+
+def test_purge_drops_expired_sessions_from_memory_and_backend(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    store = SessionStore(backend, ttl=0.05)
+
+    async def scenario():
+        await store.append("session-old", *turn(0))
+        await asyncio.sleep(0.1)
+        await store.append("session-new", *turn(1))
+        return await store.purge()
+
+    assert asyncio.run(scenario()) == 2
+    assert list(store._sessions) == ["session-new"]
+    assert backend.load("session-old", max_age=60) is None
+    assert backend.load("session-new", max_age=60) == list(turn(1))
+    store.close()
+
+
+def test_purge_task_runs_in_the_background():
+    store = SessionStore(ttl=0.01, purge_interval=0.02)
+
+    async def scenario():
+        await store.append(SESSION, *turn(0))
+        await store.start()
+        await asyncio.sleep(0.1)
+        await store.stop()
+
+    asyncio.run(scenario())
+    assert len(store) == 0
+    assert store.stats()["purged"] == 1
+
+
+def test_backend_errors_fall_back_to_memory():
+    class BrokenBackend(sessions.SessionBackend):
+        def load(self, session_id, max_age):
+            raise OSError("disk gone")
+
+        def save(self, session_id, messages):
+            raise OSError("disk gone")
+
+        def delete(self, session_id):
+            raise OSError("disk gone")
+
+    store = SessionStore(BrokenBackend())
+
+    async def scenario():
+        await store.append(SESSION, *turn(0))
+        return await store.history(SESSION)
+
+    assert asyncio.run(scenario()) == list(turn(0))
+    assert store.stats()["backend_errors"] == 2
+
+
+def test_backend_must_implement_the_interface():
+    class Incomplete(sessions.SessionBackend):
+        def load(self, session_id, max_age):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_shared_store_is_in_memory_unless_a_database_is_configured(monkeypatch, tmp_path):
+    monkeypatch.delenv("CHAT_SESSION_DB", raising=False)
+    monkeypatch.setattr(sessions, "_store", None)
+    assert sessions.get_session_store().backend is None
+    asyncio.run(sessions.stop_session_store())
+
+    monkeypatch.setenv("CHAT_SESSION_DB", str(tmp_path / "sessions.db"))
+    assert isinstance(sessions.get_session_store().backend, SQLiteSessionBackend)
+    asyncio.run(sessions.stop_session_store())
+
+
+# --- Stream route ---
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_client, "_manager", None)
+    monkeypatch.setattr(prompts, "_registry", prompts.PromptRegistry())
+    monkeypatch.setattr(admission, "_controller", admission.LLMAdmissionController(user_rate=0))
+    monkeypatch.setattr(chat_context, "_builder", chat_context.ContextBuilder())
+    store = SessionStore(SQLiteSessionBackend(str(tmp_path / "sessions.db")))
+    monkeypatch.setattr(sessions, "_store", store)
+    app = FastAPI()
+    app.include_router(ai_chat.router, prefix="/api")
+    yield TestClient(app)
+    store.close()
+
+
+def post_stream(client, payload):
+    body = json.dumps(payload).encode()
+    with client.stream("POST", "/api/ai-chat/stream", content=body,
+                       headers={"content-type": "application/json"}) as response:
+        return len(body), parse_sse(response.read().decode())
+
+
+def test_session_keeps_history_on_the_server(client, fake_openai):
+    seed = [{"role": "user", "content": "hoi"}, {"role": "assistant", "content": "hey there"}]
+    sizes = []
+    for i in range(8):
+        size, events = post_stream(client, {
+            "message": f"message {i}", "session_id": SESSION,
+            "history": seed if i == 0 else [], "resume_session": i > 0,
+        })
+        sizes.append(size)
+        event, done = events[-1]
+        assert event == "done"
+        assert done["session_id"] == SESSION
+
+    # Payload blijft constant, de server stuurt wel de opgebouwde history upstream
+    assert max(sizes[1:]) - min(sizes[1:]) <= 1
+    last_prompt = fake_openai.requests[-1]["messages"]
+    assert {"role": "user", "content": "message 6"} in last_prompt
+    assert last_prompt[-1] == {"role": "user", "content": "message 7"}
+
+    history = asyncio.run(sessions._store.history(SESSION))
+    assert history[:2] == seed
+    assert history[-2:] == [{"role": "user", "content": "message 7"},
+                            {"role": "assistant", "content": "Hi there, lucky player!"}]
+
+    stats = client.get("/api/ai-chat/stream/stats").json()["sessions"]
+    assert stats["sessions"] == 1
+    assert stats["backend"] == "SQLiteSessionBackend"
+
+
+def test_invalid_session_id_is_rejected(client, fake_openai):
+    _, events = post_stream(client, {"message": "hi", "session_id": "../nope"})
+
+    assert events == [("error", {"message": INVALID_SESSION_MESSAGE})]
+    assert fake_openai.requests == []
+
+
+def test_lost_session_asks_the_client_for_its_history(client, fake_openai):
+    seed = [{"role": "user", "content": "hoi"}, {"role": "assistant", "content": "hey there"}]
+    # Bijv. na een herstart: de client zet een sessie voort die de server niet kent
+    _, events = post_stream(client, {"message": "and now?", "session_id": SESSION, "resume_session": True})
+
+    assert events == [("error", {"message": SESSION_EXPIRED_MESSAGE, "session_reset": True})]
+    assert fake_openai.requests == []
+
+    _, events = post_stream(client, {"message": "and now?", "session_id": SESSION, "history": seed})
+    assert events[-1][0] == "done"
+    assert fake_openai.requests[-1]["messages"][-3:-1] == seed
+    assert sessions._store.stats()["expired"] == 1
+
+
+def test_send_message_answers_409_for_a_lost_session(client, fake_openai):
+    response = client.post("/api/ai-chat/send-message", json={
+        "message": "and now?", "session_id": SESSION, "resume_session": True,
+    })
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == SESSION_EXPIRED_MESSAGE
+    assert fake_openai.requests == []
+
+
+def test_failed_reply_is_not_stored(client, fake_openai):
+    fake_openai.status_code = 500
+
+    _, events = post_stream(client, {"message": "hi", "session_id": SESSION})
+
+    assert events[-1][0] == "error"
+    assert asyncio.run(sessions._store.history(SESSION)) == []
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests voor de gesharde coin saldi (spreiding over shards, cache, API)
+"""
+
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.apis import coins as coins_api
+from app.auth.user import get_authorized_user
+from app.payments import CoinBalances, CoinLedger, InsufficientCoinsError, balances as balances_module
+from app.payments.balances import DEFAULT_TIERS, parse_tiers
+
+
+def shard_writes(db, user_id):
+    prefix = f"playerData/{user_id}/coinShards/"
+    return {path: count for path, count in db.doc_writes.items() if path.startswith(prefix)}
+
+
+def test_tiers_are_configurable():
+    assert parse_tiers(None) == DEFAULT_TIERS
+    assert parse_tiers("standard=2, whale=64,vip=0") == {"standard": 2, "premium": 8, "whale": 64, "vip": 1}
+
+    balances = CoinBalances(None, tiers={"standard": 2, "whale": 16})
+    assert balances.shard_count("whale") == 16
+    assert balances.shard_count(None) == 2
+    assert balances.shard_count("unknown") == 2
+
+
+def test_whale_writes_are_spread_over_shards(fake_db):
+    balances = CoinBalances(fake_db)
+    CoinLedger(fake_db).credit("whale-1", 10000)
+    CoinLedger(fake_db).credit("casual-1", 10000)
+    balances.set_tier("whale-1", "whale")
+
+    for _ in range(640):
+        balances.adjust("whale-1", -5)
+        balances.adjust("casual-1", -5)
+
+    whale, casual = shard_writes(fake_db, "whale-1"), shard_writes(fake_db, "casual-1")
+    assert len(whale) == 32
+    assert len(casual) == 4
+    # Gemiddeld 20 writes per shard; geen enkele shard krijgt het gros
+    assert max(whale.values()) < 45
+    assert fake_db.doc_writes["playerData/whale-1"] == 2
+    assert balances.balance("whale-1", fresh=True).coins == 10000 - 640 * 5
+
+
+def test_reads_aggregate_shards_and_are_cached(fake_db):
+    balances = CoinBalances(fake_db, ttl=60)
+    CoinLedger(fake_db).credit("user-1", 1000)
+    for amount in (-100, 250, -50):
+        balances.adjust("user-1", amount)
+
+    reads = fake_db.reads
+    balance = balances.balance("user-1")
+    assert (balance.coins, balance.earned) == (1100, 1250)
+    assert fake_db.reads == reads
+
+    fresh = balances.balance("user-1", fresh=True)
+    assert (fresh.coins, fresh.earned, fresh.tier, fresh.shards) == (1100, 1250, "standard", 4)
+
+
+def test_debits_never_go_below_zero(fake_db):
+    balances = CoinBalances(fake_db)
+    CoinLedger(fake_db).credit("user-1", 1000)
+
+    def bettor():
+        for _ in range(50):
+            try:
+                balances.adjust("user-1", -7)
+            except InsufficientCoinsError:
+                pass
+
+    threads = [threading.Thread(target=bettor) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    accepted = balances.stats()["writes"]
+    assert accepted == 1000 // 7
+    assert balances.balance("user-1", fresh=True).coins == 1000 - accepted * 7
+    with pytest.raises(InsufficientCoinsError):
+        balances.adjust("user-1", -7)
+
+
+def test_purchase_invalidates_the_cached_total(monkeypatch, fake_db):
+    balances = CoinBalances(fake_db, ttl=60)
+    monkeypatch.setattr(balances_module, "_balances", balances)
+    balances.adjust("user-1", 100)
+    assert balances.balance("user-1").coins == 100
+
+    from app.payments.webhooks import apply_webhook_result
+    apply_webhook_result(fake_db, "evt_1", {"action": "add_coins", "user_id": "user-1", "coins": 500})
+
+    assert balances.balance("user-1").coins == 600
+
+
+@pytest.fixture
+def client(monkeypatch, fake_db):
+    monkeypatch.setattr(balances_module, "_balances", CoinBalances(fake_db))
+    app = FastAPI()
+    app.include_router(coins_api.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_balance_api(client, fake_db):
+    user_id = get_authorized_user(None).sub
+    CoinLedger(fake_db).credit(user_id, 300)
+
+    assert client.get("/api/coins/balance").json() == {
+        "user_id": user_id, "coins": 300, "earned": 300, "tier": "standard", "shards": 4,
+    }
+    assert client.post("/api/coins/adjust", json={"amount": -120}).json()["coins"] == 180
+
+    response = client.post("/api/coins/adjust", json={"amount": -1000})
+    assert response.status_code == 400
+    assert "needs 1000" in response.json()["detail"]
+    # Bijschrijven kan alleen server-side
+    assert client.post("/api/coins/adjust", json={"amount": 40}).status_code == 400
+    assert client.post("/api/coins/adjust", json={"amount": 0}).status_code == 400
+    assert client.get("/api/coins/balance", params={"fresh": True}).json()["coins"] == 180
+    assert client.get("/api/coins/stats").json()["rejected"] == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
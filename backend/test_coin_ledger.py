@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests voor de coin ledger (Increment, onveranderlijke entries, batching)
+"""
+
+import random
+import threading
+
+import pytest
+
+from app.payments import CoinCredit, CoinLedger
+
+
+def balance(db, user_id):
+    return db.collection("playerData").document(user_id).get().to_dict()
+
+
+def entries(db):
+    return {doc.id: doc.to_dict() for doc in db.collection("coinLedger").stream()}
+
+
+def test_credit_never_reads_the_balance(fake_db):
+    ledger = CoinLedger(fake_db)
+
+    assert ledger.credit("user-1", 500, idempotency_key="evt_1", source="stripe", reason="starter")
+    assert ledger.credit("user-1", 250)
+    assert ledger.credit("user-1", -100, reason="outfit")
+
+    assert fake_db.reads == 0
+    assert balance(fake_db, "user-1")["playerCoins"] == 650
+    # Uitgaven tellen niet mee als verdiend
+    assert balance(fake_db, "user-1")["totalCoinsEarned"] == 750
+    ledger_entries = entries(fake_db)
+    assert len(ledger_entries) == 3
+    assert ledger_entries["evt_1"]["source"] == "stripe"
+    assert ledger_entries["evt_1"]["reason"] == "starter"
+
+
+def test_concurrent_credits_lose_nothing(fake_db):
+    ledger = CoinLedger(fake_db)
+    users = [f"user-{i}" for i in range(10)]
+    expected = {user: 0 for user in users}
+    expected_lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for i in range(200):
+            if i % 20 == 0:
+                credits = [CoinCredit(rng.choice(users), rng.randint(1, 50)) for _ in range(25)]
+                ledger.credit_many(credits)
+            else:
+                credits = [CoinCredit(rng.choice(users), rng.randint(1, 50), idempotency_key=f"w{seed}-{i}")]
+                ledger.credit(credits[0].user_id, credits[0].coins, credits[0].idempotency_key)
+                # Redelivery van dezelfde key
+                ledger.credit(credits[0].user_id, credits[0].coins, credits[0].idempotency_key)
+            with expected_lock:
+                for credit in credits:
+                    expected[credit.user_id] += credit.coins
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {user: balance(fake_db, user)["playerCoins"] for user in users} == expected
+    assert sum(entry["coins"] for entry in entries(fake_db).values()) == sum(expected.values())
+    assert ledger.stats()["duplicates"] == 16 * 190
+
+
+def test_credit_many_batches_up_to_the_write_limit(fake_db):
+    ledger = CoinLedger(fake_db)
+    credits = [CoinCredit(f"user-{i % 100}", 10) for i in range(1000)]
+
+    assert all(ledger.credit_many(credits))
+
+    # 400 entries + 100 increments = 500 writes per batch
+    assert ledger.stats()["commits"] == 3
+    assert fake_db.writes == 1000 + 3 * 100
+    assert all(balance(fake_db, f"user-{i}")["playerCoins"] == 100 for i in range(100))
+    assert len(entries(fake_db)) == 1000
+
+
+def test_credit_many_skips_already_credited_keys(fake_db):
+    ledger = CoinLedger(fake_db)
+    ledger.credit("user-1", 100, idempotency_key="evt_old")
+
+    applied = ledger.credit_many([
+        CoinCredit("user-1", 100, idempotency_key="evt_new"),
+        CoinCredit("user-1", 100, idempotency_key="evt_old"),
+        CoinCredit("user-2", 300, idempotency_key="evt_other"),
+        CoinCredit("user-2", 300, idempotency_key="evt_other"),
+    ])
+
+    assert applied == [True, False, True, False]
+    assert balance(fake_db, "user-1")["playerCoins"] == 200
+    assert balance(fake_db, "user-2")["playerCoins"] == 300
+    assert ledger.stats()["duplicates"] == 2
+
+
+def test_failed_commit_is_retried_with_the_same_entries(fake_db):
+    ledger = CoinLedger(fake_db, retry_backoff=0)
+    fake_db.fail_next_commits = 2
+
+    assert ledger.credit_many([CoinCredit("user-1", 100), CoinCredit("user-1", 50)]) == [True, True]
+
+    assert ledger.stats()["retries"] == 2
+    assert balance(fake_db, "user-1")["playerCoins"] == 150
+    assert len(entries(fake_db)) == 2
+
+    fake_db.fail_next_commits = 1
+    with pytest.raises(RuntimeError):
+        CoinLedger(fake_db, max_retries=0).credit("user-1", 100)
+    assert balance(fake_db, "user-1")["playerCoins"] == 150
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests voor de non-blocking datastore executor
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.datastore import DatastoreExecutor, DatastoreTimeoutError, get_datastore, stop_datastore
+from app.datastore import executor as executor_module
+
+
+def test_slow_call_does_not_block_event_loop():
+    datastore = DatastoreExecutor(max_workers=4, default_timeout=2)
+
+    async def scenario():
+        slow = asyncio.create_task(datastore.run(time.sleep, 0.3))
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        fast = await datastore.run(lambda: "fast")
+        elapsed = time.perf_counter() - started
+        await slow
+        return fast, elapsed
+
+    fast, elapsed = asyncio.run(scenario())
+    assert fast == "fast"
+    assert elapsed < 0.2
+    datastore.shutdown()
+
+
+def test_timeout_raises_and_keeps_slot_until_thread_finishes():
+    datastore = DatastoreExecutor(max_workers=1, default_timeout=0.05)
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(DatastoreTimeoutError):
+            await datastore.run(release.wait)
+        # Het enige slot is nog bezet door de hangende call
+        with pytest.raises(DatastoreTimeoutError):
+            await datastore.run(lambda: "blocked")
+        release.set()
+        return await datastore.run(lambda: "ok", timeout=1)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert datastore.timeouts == 2
+    datastore.shutdown()
+
+
+def test_concurrency_cap_is_respected():
+    datastore = DatastoreExecutor(max_workers=8, max_concurrency=3, default_timeout=5)
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def work():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+
+    async def scenario():
+        await asyncio.gather(*(datastore.run(work) for _ in range(20)))
+
+    asyncio.run(scenario())
+    assert peak == 3
+    assert datastore.completed == 20
+    datastore.shutdown()
+
+
+def test_firestore_helpers(fake_db):
+    datastore = DatastoreExecutor(max_workers=2)
+    ref = fake_db.collection('playerProgress').document('u1')
+
+    async def scenario():
+        await datastore.set(ref, {'playerCoins': 10})
+        await datastore.update(ref, {'playerCoins': 15})
+        doc = await datastore.get(ref)
+        docs = await datastore.stream(fake_db.collection('playerProgress'))
+        return doc, docs
+
+    doc, docs = asyncio.run(scenario())
+    assert doc.to_dict() == {'playerCoins': 15}
+    assert [d.id for d in docs] == ['u1']
+    datastore.shutdown()
+
+
+
+def test_stop_datastore_replaces_the_shared_executor(monkeypatch):
+    monkeypatch.setattr(executor_module, "_datastore", None)
+    first = get_datastore()
+    stop_datastore()
+
+    # Na een herstart van de lifespan werkt get_datastore() weer
+    second = get_datastore()
+    assert second is not first
+    assert asyncio.run(second.run(lambda: "ok")) == "ok"
+    stop_datastore()
+    assert executor_module._datastore is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests voor de in-memory dealer catalogus met een fake Firestore client
+"""
+
+import time
+
+from app.catalog import DealerCatalog
+
+
+def seed_dealers(db):
+    dealers = db.collection('dealers')
+    dealers.document('emma').set({'name': 'Emma', 'winPercentage': 55})
+    dealers.document('sofia').set({'name': 'Sofia', 'winPercentage': 48})
+
+
+def test_initial_load_from_snapshot(fake_db):
+    seed_dealers(fake_db)
+    catalog = DealerCatalog(fake_db, mode="snapshot")
+    catalog.start()
+
+    assert catalog.active_mode == "snapshot"
+    assert {d['id'] for d in catalog.list()} == {'emma', 'sofia'}
+    assert catalog.get('emma')['name'] == 'Emma'
+    assert catalog.get('unknown') is None
+    catalog.stop()
+
+
+def test_snapshot_changes_are_applied(fake_db):
+    seed_dealers(fake_db)
+    catalog = DealerCatalog(fake_db, mode="snapshot")
+    catalog.start()
+    dealers = fake_db.collection('dealers')
+
+    dealers.document('lola').set({'name': 'Lola'})
+    dealers.document('emma').update({'winPercentage': 60})
+    dealers.document('sofia').delete()
+
+    assert {d['id'] for d in catalog.list()} == {'emma', 'lola'}
+    assert catalog.get('emma')['winPercentage'] == 60
+    assert catalog.get('sofia') is None
+    catalog.stop()
+
+
+def test_reads_do_not_hit_firestore(fake_db):
+    seed_dealers(fake_db)
+    catalog = DealerCatalog(fake_db, mode="snapshot")
+    catalog.start()
+    reads_after_start = fake_db.reads
+
+    for _ in range(1000):
+        catalog.list()
+        catalog.get('emma')
+
+    assert fake_db.reads == reads_after_start
+    catalog.stop()
+
+
+def test_stop_unsubscribes_listener(fake_db):
+    seed_dealers(fake_db)
+    catalog = DealerCatalog(fake_db, mode="snapshot")
+    catalog.start()
+    catalog.stop()
+
+    fake_db.collection('dealers').document('lola').set({'name': 'Lola'})
+    assert catalog.get('lola') is None
+
+
+def test_polling_fallback_when_listener_fails(fake_db):
+    seed_dealers(fake_db)
+
+    def broken_on_snapshot(callback):
+        raise RuntimeError("watch not supported")
+
+    fake_db.collection('dealers').on_snapshot = broken_on_snapshot
+    catalog = DealerCatalog(fake_db, mode="snapshot", poll_interval=0.05)
+    catalog.start()
+    assert catalog.active_mode == "poll"
+    assert len(catalog.list()) == 2
+
+    fake_db.collection('dealers').document('lola').set({'name': 'Lola'})
+    deadline = time.time() + 2
+    while catalog.get('lola') is None and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert catalog.get('lola')['name'] == 'Lola'
+    catalog.stop()
+
+
+def test_poll_mode_configured_explicitly(fake_db):
+    seed_dealers(fake_db)
+    catalog = DealerCatalog(fake_db, mode="poll", poll_interval=60)
+    catalog.start()
+
+    assert catalog.active_mode == "poll"
+    assert fake_db.collection('dealers')._watches == []
+    catalog.stop()
+
+
+
+def test_slow_listener_falls_back_after_the_start_timeout(fake_db):
+    seed_dealers(fake_db)
+    watches = []
+
+    def silent_on_snapshot(callback):
+        watch = type("Watch", (), {"unsubscribe": lambda self: watches.remove(self)})()
+        watches.append(watch)
+        return watch
+
+    fake_db.collection('dealers').on_snapshot = silent_on_snapshot
+    catalog = DealerCatalog(fake_db, mode="snapshot", poll_interval=60, start_timeout=0.05)
+    started = time.monotonic()
+    catalog.start()
+
+    # Niet de poll interval van 60s wachten
+    assert time.monotonic() - started < 1
+    assert catalog.active_mode == "poll"
+    assert watches == []
+    assert len(catalog.list()) == 2
+    catalog.stop()
+
+
+def test_reload_keeps_unchanged_dealers_and_skips_listeners(fake_db):
+    seed_dealers(fake_db)
+    catalog = DealerCatalog(fake_db, mode="poll", poll_interval=60)
+    catalog.start()
+    notified = []
+    catalog.add_listener(lambda: notified.append(True))
+    emma, sofia = catalog.get('emma'), catalog.get('sofia')
+
+    catalog.reload()
+    assert catalog.get('emma') is emma
+    assert notified == []
+
+    fake_db.collection('dealers').document('sofia').update({'winPercentage': 50})
+    catalog.reload()
+    assert catalog.get('emma') is emma
+    assert catalog.get('sofia') is not sofia
+    assert catalog.get('sofia')['winPercentage'] == 50
+    assert notified == [True]
+    catalog.stop()
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
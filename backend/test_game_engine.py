@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tests voor de server-side blackjack engine (shoe, hand totalen, rondes)
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from app.game import GameError, Hand, Rules, Shoe, Table, card_code
+from app.game.cards import CARDS_PER_DECK
+from app.game.engine import BETTING, BLACKJACK, BUST, GAME_OVER, LOSE, PLAYER_TURN, PUSH, WIN
+
+
+def cards(*ranks):
+    return [card_code(rank) for rank in ranks]
+
+
+def stacked_table(*ranks, **rules):
+    """Kaarten in deelvolgorde: speler, dealer, speler, dealer, daarna de rest"""
+    return Table(Rules(**rules), shoe=Shoe.stacked(cards(*ranks)))
+
+
+def reference_score(ranks):
+    """calculateScore uit blackjackLogic.ts"""
+    values = {"J": 10, "Q": 10, "K": 10, "A": 11}
+    score = sum(values.get(rank) or int(rank) for rank in ranks)
+    aces = ranks.count("A")
+    while score > 21 and aces:
+        score -= 10
+        aces -= 1
+    return score
+
+
+def test_incremental_scores_match_the_frontend():
+    rng = random.Random(3)
+    labels = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A"]
+    for _ in range(2000):
+        ranks = [rng.choice(labels) for _ in range(rng.randint(1, 7))]
+        hand = Hand()
+        for i, rank in enumerate(ranks, 1):
+            assert hand.add(card_code(rank)) == reference_score(ranks[:i])
+
+    assert Hand(cards("A", "6")).soft
+    assert not Hand(cards("A", "6", "10")).soft
+    assert Hand(cards("A", "A", "9")).score == 21
+    assert Hand(cards("A", "K")).is_blackjack
+    assert not Hand(cards("7", "7", "7")).is_blackjack
+
+
+def test_shoe_holds_every_card_once_per_deck():
+    shoe = Shoe(decks=6, rng=random.Random(1))
+
+    assert len(shoe.cards) == 6 * CARDS_PER_DECK
+    assert shoe.cards.itemsize == 1
+    assert Counter(shoe.cards) == {code: 6 for code in range(CARDS_PER_DECK)}
+    assert shoe.cut == 234
+
+
+def test_table_reshuffles_at_the_cut_card():
+    table = Table(Rules(decks=1, penetration=0.5), rng=random.Random(2))
+    for _ in range(40):
+        table.start_round(10)
+        if table.phase == PLAYER_TURN:
+            table.stand()
+        table.settle()
+        assert table.shoe.position <= 26 + 12
+
+    assert table.shoe.shuffles > 5
+
+
+def test_player_bust_ends_the_round_without_dealer_draw():
+    table = stacked_table("10", "9", "6", "7", "K", "5")
+    table.start_round(20)
+
+    assert table.hit() == 26
+    assert table.phase == GAME_OVER
+    assert len(table.dealer) == 2
+    settlement = table.settle()
+    assert (settlement.outcome, settlement.payout, settlement.net) == (BUST, 0, -20)
+    assert table.phase == BETTING
+
+
+def test_dealer_stands_on_soft_17_unless_the_rules_say_otherwise():
+    table = stacked_table("10", "A", "8", "6", "4")
+    table.start_round(10)
+    table.stand()
+    assert (table.dealer.score, table.outcome) == (17, WIN)
+
+    table = stacked_table("10", "A", "8", "6", "4", dealer_hits_soft_17=True)
+    table.start_round(10)
+    table.stand()
+    assert (table.dealer.score, table.outcome) == (21, LOSE)
+
+
+@pytest.mark.parametrize("ranks, outcome, payout", [
+    (("A", "9", "K", "7"), BLACKJACK, 25),
+    (("9", "A", "7", "K"), LOSE, 0),
+    (("A", "A", "K", "Q"), PUSH, 10),
+])
+def test_naturals_settle_immediately(ranks, outcome, payout):
+    table = stacked_table(*ranks)
+    table.start_round(10)
+
+    assert table.phase == GAME_OVER
+    assert table.settle().to_dict()["payout"] == payout
+    assert table.rounds == 1
+
+
+def test_double_takes_one_card_and_stands():
+    table = stacked_table("6", "10", "5", "7", "10")
+    table.start_round(15)
+
+    assert table.double() == 21
+    assert table.phase == GAME_OVER
+    settlement = table.settle()
+    assert (settlement.outcome, settlement.bet, settlement.payout) == (WIN, 30, 60)
+
+
+def test_double_cannot_exceed_the_max_bet():
+    table = stacked_table("6", "10", "5", "7", "10", max_bet=100)
+    table.start_round(60)
+
+    with pytest.raises(GameError):
+        table.double()
+    assert (table.phase, table.bet, len(table.player)) == (PLAYER_TURN, 60, 2)
+
+    table.stand()
+    assert table.settle().bet == 60
+
+
+def test_illegal_actions_raise():
+    table = stacked_table("10", "9", "6", "7", "5", "K")
+    with pytest.raises(GameError):
+        table.hit()
+    with pytest.raises(GameError):
+        table.start_round(0)
+
+    table.start_round(10)
+    with pytest.raises(GameError):
+        table.start_round(10)
+    with pytest.raises(GameError):
+        table.settle()
+    table.hit()
+    with pytest.raises(GameError):
+        table.double()
+
+
+def test_view_hides_the_hole_card():
+    table = stacked_table("10", "9", "6", "7", "K")
+    table.start_round(10)
+
+    view = table.view()
+    assert view["dealer"] == {"cards": [{"rank": "9", "suit": "♠", "value": 9}], "hidden": 1, "score": 9}
+    assert view["player"]["score"] == 16
+    assert table.describe() == "Player: 10♠ 6♠ (16) | Dealer shows: 9♠"
+
+    table.stand()
+    assert table.view()["dealer"]["hidden"] == 0
+    assert table.view()["dealer"]["score"] == 16 + 10
+    assert table.view()["outcome"] == WIN
+
+
+def test_many_tables_play_independently():
+    rng = random.Random(5)
+    tables = [Table(rng=rng) for _ in range(200)]
+    outcomes = Counter()
+    for _ in range(10):
+        for table in tables:
+            table.start_round(10)
+            while table.phase == PLAYER_TURN:
+                table.hit() if table.player.score < 17 else table.stand()
+            outcomes[table.settle().outcome] += 1
+
+    assert sum(outcomes.values()) == 2000
+    assert {WIN, LOSE, PUSH, BUST} <= set(outcomes)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Tests voor de table actors, idle evictie naar snapshots en de /game/tables routes
+"""
+
+import asyncio
+import random
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.apis import game as game_api
+from app.auth.user import User, get_authorized_user
+from app.game import GameError, Rules, Shoe, ShoePool, Table, card_code
+from app.game import sessions
+from app.game.sessions import TableBusyError, TableManager, TableNotFoundError
+from app.game.snapshot import dump_table, load_table
+from app.payments import CoinBalances, CoinLedger
+
+
+@pytest.fixture
+def pool():
+    pool = ShoePool(6, size=4, mode="thread")
+    pool.fill()
+    return pool
+
+
+def manager_for(pool, **kwargs):
+    kwargs.setdefault("idle_timeout", 60)
+    return TableManager(pool_for=lambda decks: pool, **kwargs)
+
+
+def play_round(table: Table) -> None:
+    table.start_round(10)
+    while table.phase == "PLAYER_TURN":
+        table.stand()
+
+
+def test_snapshot_of_a_pooled_shoe_stores_only_the_seed(pool):
+    table = Table(Rules(), Shoe(6, pool=pool))
+    for _ in range(3):
+        play_round(table)
+        table.settle()
+    table.start_round(20)
+
+    snapshot = dump_table(table, "player-1")
+    restored, owner = load_table(snapshot, lambda decks: pool)
+
+    assert len(snapshot) < 120
+    assert owner == "player-1"
+    assert restored.view() == table.view()
+    assert restored.rounds == 3 and restored.bet == 20
+    assert restored.shoe.pool is pool
+    # Zelfde kaarten vanaf hier
+    assert [restored.shoe.draw() for _ in range(20)] == [table.shoe.draw() for _ in range(20)]
+
+
+def test_snapshot_of_an_rng_shoe_stores_the_cards():
+    table = Table(Rules(decks=2), rng=random.Random(7))
+    play_round(table)
+
+    restored, owner = load_table(dump_table(table))
+
+    assert owner == ""
+    assert restored.view() == table.view()
+    assert restored.shoe.cards == table.shoe.cards
+    assert restored.settle() == table.settle()
+
+
+def test_round_is_settled_by_the_actor(pool):
+    async def scenario():
+        manager = manager_for(pool)
+        table_id = manager.open("player-1")
+        state = await manager.call(table_id, "bet", "player-1", bet=10)
+        while "settlement" not in state:
+            state = await manager.call(table_id, "stand", "player-1")
+        return state, await manager.call(table_id, "view", "player-1")
+
+    state, after = asyncio.run(scenario())
+
+    assert state["phase"] == "GAME_OVER"
+    assert state["settlement"]["bet"] == 10
+    assert after["phase"] == "BETTING"
+    assert "settlement" not in after
+
+
+def test_concurrent_actions_run_in_order(pool):
+    async def scenario():
+        manager = manager_for(pool)
+        table_id = manager.open("player-1")
+        # Geen natural, anders is de eerste ronde meteen afgerekend
+        manager._live[table_id].table.shoe = Shoe.stacked(card_code(rank) for rank in ["10", "9", "10", "7"] * 10)
+        return await asyncio.gather(
+            manager.call(table_id, "bet", "player-1", bet=10),
+            manager.call(table_id, "view", "player-1"),
+            manager.call(table_id, "bet", "player-1", bet=10),
+            return_exceptions=True,
+        )
+
+    first, view, second = asyncio.run(scenario())
+
+    assert first["bet"] == 10
+    assert view["bet"] == 10
+    # Tweede bet komt na de eerste: er loopt al een ronde
+    assert isinstance(second, GameError)
+
+
+def test_full_mailbox_is_rejected(pool):
+    async def scenario():
+        manager = manager_for(pool, mailbox_size=2)
+        table_id = manager.open("player-1")
+        results = await asyncio.gather(
+            *(manager.call(table_id, "view", "player-1") for _ in range(4)), return_exceptions=True
+        )
+        return manager, results
+
+    manager, results = asyncio.run(scenario())
+
+    assert [isinstance(r, TableBusyError) for r in results] == [False, False, True, True]
+    assert manager.stats()["rejected"] == 2
+
+
+def test_idle_tables_are_evicted_and_restored(pool):
+    async def scenario():
+        manager = manager_for(pool, idle_timeout=10)
+        idle = manager.open("player-1")
+        active = manager.open("player-2")
+        await manager.call(idle, "bet", "player-1", bet=10)
+        before = await manager.call(idle, "view", "player-1")
+        await manager.call(active, "view", "player-2")
+        manager._live[idle].last_active -= 20
+
+        assert manager.evict_idle() == 1
+        stats = manager.stats()
+        assert (stats["live"], stats["snapshots"]) == (1, 1)
+        assert 0 < stats["snapshot_bytes"] < 120
+        assert active in manager._live
+
+        state = await manager.call(idle, "view", "player-1")
+        return manager, before, state
+
+    manager, before, state = asyncio.run(scenario())
+
+    assert state == before
+    stats = manager.stats()
+    assert (stats["live"], stats["snapshots"], stats["snapshot_bytes"]) == (2, 0, 0)
+    assert stats["restored"] == 1
+
+
+def test_oldest_tables_are_evicted_above_max_live(pool):
+    manager = manager_for(pool, max_live=3)
+    table_ids = [manager.open(f"player-{i}") for i in range(5)]
+
+    assert list(manager._live) == table_ids[2:]
+    assert manager.stats()["evicted"] == 2
+    assert set(manager._snapshots) == set(table_ids[:2])
+
+
+def test_snapshots_expire_after_the_ttl(pool):
+    manager = manager_for(pool, idle_timeout=10, snapshot_ttl=100)
+    table_id = manager.open("player-1")
+    now = manager._live[table_id].last_active
+
+    manager.evict_idle(now + 20)
+    manager.evict_idle(now + 50)
+    assert table_id in manager._snapshots
+    manager.evict_idle(now + 200)
+
+    assert manager.stats()["expired"] == 1
+    with pytest.raises(TableNotFoundError):
+        asyncio.run(manager.call(table_id, "view"))
+
+
+def test_tables_belong_to_their_owner(pool):
+    manager = manager_for(pool)
+    table_id = manager.open("player-1")
+
+    with pytest.raises(TableNotFoundError):
+        asyncio.run(manager.call(table_id, "view", "player-2"))
+    with pytest.raises(TableNotFoundError):
+        manager.close(table_id, "player-2")
+    manager.close(table_id, "player-1")
+    with pytest.raises(TableNotFoundError):
+        asyncio.run(manager.call(table_id, "view", "player-1"))
+
+
+def test_evictor_task_runs_in_the_background(pool):
+    async def scenario():
+        manager = manager_for(pool, idle_timeout=0.01, evict_interval=0.01)
+        manager.open("player-1")
+        await manager.start()
+        await asyncio.sleep(0.1)
+        await manager.stop()
+        return manager.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert (stats["live"], stats["evicted"]) == (0, 1)
+
+
+@pytest.fixture
+def balances(fake_db, monkeypatch):
+    balances = CoinBalances(fake_db)
+    CoinLedger(fake_db).credit("dev-user-123", 1000)
+    monkeypatch.setattr(game_api, "get_coin_balances", lambda: balances)
+    return balances
+
+
+@pytest.fixture
+def client(monkeypatch, pool, balances):
+    monkeypatch.setattr(sessions, "_manager", manager_for(pool))
+    app = FastAPI()
+    app.include_router(game_api.router, prefix="/api")
+    yield TestClient(app), app
+
+
+def test_table_routes(client):
+    client, app = client
+    opened = client.post("/api/game/tables").json()
+    table_id = opened["table_id"]
+    assert opened["phase"] == "BETTING"
+    assert opened["shoe_commitment"]
+
+    state = client.post(f"/api/game/tables/{table_id}/actions", json={"action": "bet", "bet": 10}).json()
+    while "settlement" not in state:
+        state = client.post(f"/api/game/tables/{table_id}/actions", json={"action": "stand"}).json()
+    assert client.get(f"/api/game/tables/{table_id}").json()["phase"] == "BETTING"
+
+    assert client.post(f"/api/game/tables/{table_id}/actions", json={"action": "hit"}).status_code == 400
+    assert client.post(f"/api/game/tables/{table_id}/actions", json={"action": "split"}).status_code == 400
+    assert client.get("/api/game/tables/stats").json()["live"] == 1
+
+    app.dependency_overrides[get_authorized_user] = lambda: User(sub="someone-else")
+    assert client.get(f"/api/game/tables/{table_id}").status_code == 404
+    assert client.delete(f"/api/game/tables/{table_id}").status_code == 404
+    app.dependency_overrides.clear()
+
+    assert client.delete(f"/api/game/tables/{table_id}").json() == {"closed": table_id}
+    assert client.get(f"/api/game/tables/{table_id}").status_code == 404
+
+
+def test_bets_and_payouts_are_booked_on_the_shards(client, balances, fake_db):
+    client, app = client
+    table_id = client.post("/api/game/tables").json()["table_id"]
+
+    net = 0
+    for _ in range(5):
+        state = client.post(f"/api/game/tables/{table_id}/actions", json={"action": "bet", "bet": 10}).json()
+        while "settlement" not in state:
+            state = client.post(f"/api/game/tables/{table_id}/actions", json={"action": "stand"}).json()
+        net += state["settlement"]["net"]
+
+    assert balances.balance("dev-user-123", fresh=True).coins == 1000 + net
+    # Het hoofddocument wordt alleen door de ledger beschreven
+    assert fake_db.doc_writes["playerData/dev-user-123"] == 1
+
+
+def test_rejected_bets_cost_nothing(client, balances):
+    client, app = client
+    table_id = client.post("/api/game/tables").json()["table_id"]
+
+    assert client.post(f"/api/game/tables/{table_id}/actions", json={"action": "bet", "bet": 5000}).status_code == 400
+    sessions._manager._live[table_id].table.shoe = Shoe.stacked(card_code(rank) for rank in ["10", "9", "10", "7"] * 10)
+    client.post(f"/api/game/tables/{table_id}/actions", json={"action": "bet", "bet": 10})
+    # Er loopt al een ronde: tweede bet geweigerd en teruggeboekt
+    assert client.post(f"/api/game/tables/{table_id}/actions", json={"action": "bet", "bet": 10}).status_code == 400
+
+    assert balances.balance("dev-user-123", fresh=True).coins == 990
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
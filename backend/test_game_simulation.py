@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests voor de gevectoriseerde blackjack simulatie
+"""
+
+import numpy as np
+import pytest
+
+from app.game import Rules
+from app.game.simulation import DOUBLE, HIT, STAND, UPCARDS, basic_strategy, simulate, simulate_shoes
+
+
+def test_mimic_the_dealer_gives_the_known_house_edge():
+    result = simulate(300_000, Rules(), policy="dealer", workers=1, seed=1)
+
+    # Bekende waarde voor "speel als de dealer" is ±5,5%
+    assert 0.045 < result.house_edge < 0.067
+    assert result.hands >= 300_000
+
+
+def test_basic_strategy_beats_simple_policies():
+    basic = simulate(300_000, policy="basic", workers=1, seed=2)
+    never_bust = simulate(300_000, policy="never_bust", workers=1, seed=2)
+
+    assert basic.house_edge < never_bust.house_edge
+    assert never_bust.to_dict()["player_bust_rate"] == 0
+    assert basic.to_dict()["double_rate"] > 0.05
+
+
+def test_upcard_table_matches_blackjack_folklore():
+    report = simulate(400_000, policy="basic", workers=1, seed=3).to_dict()
+    by_upcard = {row["upcard"]: row for row in report["by_upcard"]}
+
+    assert [row["upcard"] for row in report["by_upcard"]] == list(UPCARDS)
+    assert sum(row["hands"] for row in report["by_upcard"]) == report["hands"]
+    # 10-waardes komen vier keer zo vaak voor als elke andere rank
+    assert 3.5 < by_upcard["10"]["hands"] / by_upcard["7"]["hands"] < 4.5
+    # Dealer bust het vaakst met 5/6 open en het minst met een aas
+    assert by_upcard["6"]["dealer_bust_rate"] > 0.38
+    assert by_upcard["A"]["dealer_bust_rate"] < 0.2
+    assert by_upcard["6"]["player_ev"] > 0 > by_upcard["A"]["player_ev"]
+    assert abs(report["blackjack_rate"] - 0.0475) < 0.003
+
+
+def test_results_are_reproducible_per_seed():
+    first = simulate(50_000, workers=1, seed=42)
+    second = simulate(50_000, workers=1, seed=42)
+
+    assert first.to_dict() == second.to_dict()
+    assert simulate(50_000, workers=1, seed=43).to_dict() != first.to_dict()
+
+
+def test_work_is_split_over_processes():
+    result = simulate(40_000, workers=2, seed=5)
+
+    assert result.hands >= 40_000
+    assert 0 < result.house_edge < 0.05
+
+
+def test_custom_policy_and_deep_penetration():
+    stand_always = np.full((2, 22, len(UPCARDS)), STAND, dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    totals = simulate_shoes(500, Rules(decks=1, penetration=1.0), stand_always, rng)
+
+    assert totals["player_busts"].sum() == 0
+    assert totals["doubles"].sum() == 0
+    assert totals["wins"].sum() + totals["pushes"].sum() + totals["losses"].sum() == totals["hands"].sum()
+
+    with pytest.raises(ValueError):
+        simulate(10, policy="card_counting", workers=1)
+
+
+def test_basic_strategy_table():
+    table = basic_strategy()
+    assert table[0, 11, UPCARDS.index("A")] == HIT
+    assert basic_strategy(dealer_hits_soft_17=True)[0, 11, UPCARDS.index("A")] == DOUBLE
+    assert table[0, 16, UPCARDS.index("6")] == STAND
+    assert table[0, 16, UPCARDS.index("7")] == HIT
+    assert table[1, 18, UPCARDS.index("9")] == HIT
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests voor de image worker pool
+"""
+
+import asyncio
+import io
+import time
+
+import pytest
+from PIL import Image
+
+from app.imaging import (
+    ImageJobTimeoutError,
+    ImagePoolBusyError,
+    ImageWorkerPool,
+    convert_to_webp,
+    get_image_pool,
+    stop_image_pool,
+)
+from app.imaging import pool as pool_module
+
+
+def make_png(width=2400, height=1600) -> bytes:
+    output = io.BytesIO()
+    Image.new('RGBA', (width, height), (200, 30, 90, 128)).save(output, format='PNG')
+    return output.getvalue()
+
+
+def test_convert_in_process_pool():
+    pool = ImageWorkerPool(max_workers=2, mode="process")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(pool.submit(convert_to_webp, make_png(), quality=80) for _ in range(3))
+        )
+
+    results = asyncio.run(scenario())
+    for webp in results:
+        image = Image.open(io.BytesIO(webp))
+        assert image.format == 'WEBP'
+        assert image.width == 1200
+    assert pool.stats()["completed"] == 3
+    pool.shutdown()
+
+
+def test_backpressure_rejects_when_queue_is_full():
+    pool = ImageWorkerPool(max_workers=1, max_queue=1, mode="thread")
+
+    async def scenario():
+        jobs = [asyncio.create_task(pool.submit(time.sleep, 0.1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert pool.queue_depth == 1
+        with pytest.raises(ImagePoolBusyError):
+            await pool.submit(time.sleep, 0.1)
+        await asyncio.gather(*jobs)
+
+    asyncio.run(scenario())
+    assert pool.rejected == 1
+    assert pool.pending == 0
+    pool.shutdown()
+
+
+def test_job_timeout():
+    pool = ImageWorkerPool(max_workers=1, mode="thread", job_timeout=0.05)
+
+    async def scenario():
+        with pytest.raises(ImageJobTimeoutError):
+            await pool.submit(time.sleep, 0.3)
+        # De worker is nog bezet tot de job echt klaar is
+        assert pool.pending == 1
+
+    asyncio.run(scenario())
+    assert pool.timeouts == 1
+    pool.shutdown()
+
+
+
+def test_stop_image_pool_replaces_the_shared_pool(monkeypatch):
+    monkeypatch.setattr(pool_module, "_image_pool", None)
+    first = get_image_pool()
+    stop_image_pool()
+
+    assert get_image_pool() is not first
+    stop_image_pool()
+    assert pool_module._image_pool is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
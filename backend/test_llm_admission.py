@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Tests voor de LLM admission controller: concurrency cap, queue deadline,
+coalescing en per-user token buckets
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from starlette.requests import Request
+
+from app.apis import ai_chat
+from app.apis.ai_chat import admission
+from app.apis.ai_chat import client as llm_client
+from app.apis.ai_chat import prompts
+from app.apis.ai_chat import reply_cache as reply_cache_module
+from app.apis.ai_chat import streaming
+from app.apis.ai_chat.admission import AdmissionRejected, LLMAdmissionController, client_identity
+from app.auth import User
+
+
+def test_concurrency_is_capped_and_queue_wait_is_measured():
+    controller = LLMAdmissionController(max_concurrency=2, max_queue=10, user_rate=0)
+    running = []
+    peak = []
+
+    async def upstream():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.02)
+        running.pop()
+        return "ok"
+
+    async def scenario():
+        return await asyncio.gather(*(controller.call(f"key-{i}", "user", upstream) for i in range(6)))
+
+    assert asyncio.run(scenario()) == ["ok"] * 6
+    assert max(peak) == 2
+    stats = controller.stats()
+    assert stats["admitted"] == 6
+    assert stats["active"] == 0
+    assert stats["queue_wait_ms_p99"] >= 20
+    assert stats["upstream_ms_p50"] >= 20
+
+
+def test_full_queue_and_deadline_are_rejected():
+    controller = LLMAdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.05, user_rate=0)
+    release = None
+
+    async def blocking():
+        await release.wait()
+        return "slow"
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.create_task(controller.call("a", None, blocking))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(controller.call("b", None, blocking))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.call("c", None, blocking)
+        with pytest.raises(AdmissionRejected) as deadline:
+            await queued
+
+        release.set()
+        return full.value, deadline.value, await first
+
+    full, deadline, first = asyncio.run(scenario())
+    assert (full.reason, full.status_code) == ("queue_full", 503)
+    assert deadline.reason == "deadline"
+    assert first == "slow"
+    stats = controller.stats()
+    assert stats["rejected"]["queue_full"] == 1
+    assert stats["rejected"]["deadline"] == 1
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+
+
+def test_identical_in_flight_requests_share_one_upstream_call():
+    controller = LLMAdmissionController(user_rate=0)
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"reply": "Nice hand!"}
+
+    async def scenario():
+        return await asyncio.gather(*(controller.call("same", f"user-{i}", upstream) for i in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert controller.stats()["coalesced"] == 4
+
+
+def test_leader_disconnect_does_not_cancel_coalesced_calls():
+    controller = LLMAdmissionController(user_rate=0)
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.03)
+        return "Feeling lucky?"
+
+    async def scenario():
+        leader = asyncio.create_task(controller.call("same", None, upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(controller.call("same", None, upstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(scenario())
+    assert isinstance(leader, asyncio.CancelledError)
+    assert follower == "Feeling lucky?"
+    assert len(calls) == 1
+
+
+def test_coalesced_callers_are_charged_to_their_own_bucket():
+    controller = LLMAdmissionController(user_rate=0.01, user_burst=1)
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        return "Hi"
+
+    async def scenario():
+        return await asyncio.gather(
+            *(controller.call("same", "user:a", upstream) for _ in range(2)),
+            controller.call("same", "user:b", upstream),
+            return_exceptions=True,
+        )
+
+    first, second, other = asyncio.run(scenario())
+    assert first == "Hi" and other == "Hi"
+    assert isinstance(second, AdmissionRejected) and second.reason == "rate_limited"
+
+
+def test_coalesced_streams_receive_the_same_chunks():
+    controller = LLMAdmissionController(user_rate=0)
+    produced = []
+
+    async def produce():
+        produced.append(1)
+        for delta in ["Hi", " there", "!"]:
+            await asyncio.sleep(0.01)
+            yield delta
+
+    async def consume():
+        return [delta async for delta in controller.stream("same", None, produce)]
+
+    async def scenario():
+        return await asyncio.gather(consume(), consume(), consume())
+
+    assert asyncio.run(scenario()) == [["Hi", " there", "!"]] * 3
+    assert len(produced) == 1
+
+
+def test_leader_disconnect_does_not_cancel_coalesced_streams():
+    controller = LLMAdmissionController(user_rate=0)
+    produced = []
+
+    async def produce():
+        produced.append(1)
+        for delta in ["Hi", " there", "!"]:
+            await asyncio.sleep(0.01)
+            yield delta
+
+    async def consume():
+        return [delta async for delta in controller.stream("same", None, produce)]
+
+    async def scenario():
+        leader = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(consume())
+        await asyncio.sleep(0.015)
+        # Client van de leader haakt af midden in de stream
+        leader.cancel()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(scenario())
+    assert isinstance(leader, asyncio.CancelledError)
+    assert follower == ["Hi", " there", "!"]
+    assert len(produced) == 1
+
+
+def test_upstream_stream_stops_when_every_listener_is_gone():
+    controller = LLMAdmissionController(user_rate=0)
+    closed = []
+
+    async def produce():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield "tick"
+        finally:
+            closed.append(1)
+
+    async def consume():
+        return [delta async for delta in controller.stream("same", None, produce)]
+
+    async def scenario():
+        listeners = [asyncio.create_task(consume()) for _ in range(2)]
+        await asyncio.sleep(0.03)
+        for task in listeners:
+            task.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        await asyncio.sleep(0)
+        # Een nieuw verzoek start een eigen upstream call
+        assert "same" not in controller._flights
+
+    asyncio.run(scenario())
+    assert closed == [1]
+    assert controller.stats()["active"] == 0
+
+
+def test_upstream_errors_reach_every_coalesced_caller():
+    controller = LLMAdmissionController(user_rate=0)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("rate limit")
+
+    async def scenario():
+        return await asyncio.gather(*(controller.call("same", None, failing) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert controller.stats()["upstream_errors"] == 1
+    assert controller.stats()["active"] == 0
+
+
+def test_per_user_token_bucket(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: clock[0])
+    controller = LLMAdmissionController(user_rate=0.5, user_burst=2)
+
+    controller.check_rate("user:a")
+    controller.check_rate("user:a")
+    with pytest.raises(AdmissionRejected) as exc_info:
+        controller.check_rate("user:a")
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.retry_after == pytest.approx(2.0)
+
+    # Andere gebruikers hebben hun eigen bucket
+    controller.check_rate("user:b")
+
+    clock[0] += 2
+    controller.check_rate("user:a")
+    assert controller.stats()["rejected"]["rate_limited"] == 1
+
+
+def make_request(headers, host="10.0.0.7"):
+    return Request({
+        "type": "http",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": (host, 443),
+    })
+
+
+def test_rate_limit_identity_cannot_be_spoofed(monkeypatch):
+    spoofed = make_request({"X-User-Id": "someone-else", "X-Forwarded-For": "1.2.3.4"})
+    assert client_identity(spoofed) == "ip:10.0.0.7"
+    assert client_identity(spoofed, User(sub="player-1")) == "user:player-1"
+
+    # Achter één eigen proxy telt alleen de hop die die proxy toevoegde
+    monkeypatch.setattr(admission, "TRUSTED_PROXY_HOPS", 1)
+    proxied = make_request({"X-Forwarded-For": "1.2.3.4, 203.0.113.9"})
+    assert client_identity(proxied) == "ip:203.0.113.9"
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(streaming, "stream_metrics", streaming.StreamMetrics())
+    monkeypatch.setattr(llm_client, "_manager", None)
+    monkeypatch.setattr(prompts, "_registry", prompts.PromptRegistry())
+    monkeypatch.setattr(reply_cache_module, "_reply_cache", reply_cache_module.ReplyCache())
+    app = FastAPI()
+    app.include_router(ai_chat.router, prefix="/api")
+    return app
+
+
+def test_concurrent_identical_streams_hit_upstream_once(app, fake_openai, monkeypatch):
+    monkeypatch.setattr(admission, "_controller", LLMAdmissionController(user_rate=0))
+    fake_openai.first_token_delay = 0.2
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            payload = {"message": "Deal!", "history": []}
+            responses = await asyncio.gather(*(client.post("/api/ai-chat/stream", json=payload) for _ in range(5)))
+            stats = (await client.get("/api/ai-chat/stream/stats")).json()
+        return [r.text for r in responses], stats
+
+    bodies, stats = asyncio.run(scenario())
+    assert len(fake_openai.requests) == 1
+    assert all('"reply": "Hi there, lucky player!"' in body for body in bodies)
+    assert stats["admission"]["coalesced"] == 4
+
+
+def test_rate_limited_user_gets_busy_event(app, fake_openai, monkeypatch):
+    monkeypatch.setattr(admission, "_controller", LLMAdmissionController(user_rate=0.01, user_burst=1))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {"Authorization": "Bearer player-1-token"}
+            first = await client.post("/api/ai-chat/stream", json={"message": "one", "history": []}, headers=headers)
+            second = await client.post("/api/ai-chat/stream", json={"message": "two", "history": []}, headers=headers)
+        return first.text, second.text
+
+    first, second = asyncio.run(scenario())
+    assert "event: done" in first
+    assert "event: error" in second
+    assert admission.BUSY_MESSAGE in second
+    assert len(fake_openai.requests) == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
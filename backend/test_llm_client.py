@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests voor de gedeelde, gepoolde LLM client tegen een lokale fake OpenAI server
+"""
+
+import asyncio
+
+import pytest
+
+from app.apis.ai_chat import client as llm_client
+from app.apis.ai_chat.client import LLMClientManager
+
+
+@pytest.fixture(autouse=True)
+def reset_manager(monkeypatch):
+    monkeypatch.setattr(llm_client, "_manager", None)
+
+
+async def ask(client, text):
+    response = await client.chat.completions.create(
+        model="gpt-4o-mini", messages=[{"role": "user", "content": text}]
+    )
+    return response.choices[0].message.content
+
+
+def test_requests_reuse_one_keep_alive_connection(fake_openai):
+    async def scenario():
+        manager = await llm_client.start_llm_client()
+        try:
+            for i in range(10):
+                assert await ask(llm_client.get_llm_client(), f"hi {i}") == "Hi there, lucky player!"
+            assert llm_client.get_llm_manager() is manager
+        finally:
+            await llm_client.stop_llm_client()
+        return manager
+
+    manager = asyncio.run(scenario())
+
+    assert len(fake_openai.requests) == 10
+    assert len(fake_openai.peers) == 1
+    assert manager.closed
+    assert llm_client._manager is None
+
+
+def test_pool_limits_and_http2_are_configurable(fake_openai, monkeypatch):
+    monkeypatch.setenv("LLM_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("LLM_MAX_KEEPALIVE", "3")
+    monkeypatch.setenv("LLM_HTTP2", "0")
+
+    manager = LLMClientManager()
+    stats = manager.stats()
+
+    assert stats["max_connections"] == 7
+    assert stats["max_keepalive"] == 3
+    assert stats["http2"] is False
+    assert stats["base_url"].startswith(fake_openai.base_url)
+    asyncio.run(manager.aclose())
+
+
+def test_http2_is_enabled_when_h2_is_installed(fake_openai):
+    pytest.importorskip("h2")
+    manager = LLMClientManager()
+    assert manager.http2 is True
+    asyncio.run(manager.aclose())
+
+
+def test_missing_api_key_is_a_configuration_error(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    with pytest.raises(ValueError):
+        llm_client.get_llm_client()
+    # De lifespan start gewoon door zonder client
+    assert asyncio.run(llm_client.start_llm_client()) is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests voor de voorgeserialiseerde pakketten catalogus (ETag, 304, aliases)
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import stripe_service as stripe_module
+from app.catalog import PackageCatalog
+from app.catalog.package_catalog import etag_matches, group_aliases
+from stripe_service import StripeService
+
+
+@pytest.fixture
+def service():
+    return StripeService()
+
+
+@pytest.fixture
+def catalog(service):
+    return PackageCatalog(service, max_age=120)
+
+
+@pytest.fixture
+def client(catalog):
+    app = FastAPI()
+
+    @app.get("/api/packages")
+    async def get_packages(request: Request):
+        return catalog.response(request)
+
+    return TestClient(app)
+
+
+def test_aliases_are_collapsed(service):
+    groups = group_aliases(service.coin_packages)
+
+    assert [package.id for package, _ in groups] == ["starter", "popular", "value", "premium", "whale"]
+    assert dict((package.id, aliases) for package, aliases in groups)["starter"] == ["starter_pack"]
+    assert [aliases for _, aliases in group_aliases(service.premium_packages)] == [[], []]
+
+
+def test_response_contains_each_package_once(client):
+    response = client.get("/api/packages")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["cache-control"] == "public, max-age=120"
+    data = response.json()
+    assert data["success"] is True
+    ids = [package["id"] for package in data["coin_packages"]]
+    assert ids == ["starter", "popular", "value", "premium", "whale"]
+    whale = data["coin_packages"][-1]
+    assert whale["aliases"] == ["whale_package"]
+    assert whale["coins"] == 15000
+    assert whale["type"] == "coins"
+    assert [p["interval"] for p in data["premium_packages"]] == ["month", "year"]
+
+
+def test_conditional_get_returns_304(client):
+    first = client.get("/api/packages")
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/api/packages", headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    assert client.get("/api/packages", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_body_is_serialized_once(catalog, client):
+    for _ in range(5):
+        client.get("/api/packages")
+        client.get("/api/packages", headers={"If-None-Match": catalog.current().etag})
+
+    assert catalog.builds == 1
+    assert catalog.stats()["served"] == 5
+    assert catalog.stats()["not_modified"] == 5
+    assert catalog.current().body is catalog.current().body
+
+
+def test_product_sync_rebuilds_the_catalog(monkeypatch, service, catalog, client):
+    created = []
+
+    def create_product(**kwargs):
+        created.append(kwargs["metadata"]["package_id"])
+        return SimpleNamespace(id=f"prod_{len(created)}")
+
+    monkeypatch.setattr(stripe_module.stripe.Product, "create", create_product)
+    monkeypatch.setattr(stripe_module.stripe.Price, "create",
+                        lambda **kwargs: SimpleNamespace(id=f"price_new_{kwargs['product']}"))
+
+    old_etag = client.get("/api/packages").headers["etag"]
+    asyncio.run(service.create_stripe_products())
+
+    # Aliases mogen niet tot dubbele Stripe producten leiden
+    assert sorted(created) == sorted(["starter", "popular", "value", "premium", "whale",
+                                      "premium_monthly", "premium_yearly"])
+    assert service.catalog_version == 1
+
+    response = client.get("/api/packages", headers={"If-None-Match": old_etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != old_etag
+    assert all(p["stripe_price_id"].startswith("price_new_") for p in response.json()["coin_packages"])
+    assert catalog.builds == 2
+
+
+def test_etag_matching():
+    assert not etag_matches(None, '"abc"')
+    assert not etag_matches("", '"abc"')
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches(' W/"abc" ', '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests voor de voorgecompileerde prompt registry op basis van de dealer catalogus
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.apis import ai_chat
+from app.apis.ai_chat import admission
+from app.apis.ai_chat import client as llm_client
+from app.apis.ai_chat import prompts
+from app.apis.ai_chat.prompts import DEFAULT_STAGE_PROMPTS, PromptRegistry
+from app.apis.ai_chat.tokens import count_message_tokens, count_tokens
+from app.catalog import DealerCatalog
+
+
+@pytest.fixture
+def catalog(fake_db):
+    dealers = fake_db.collection('dealers')
+    dealers.document('emma').set({
+        'name': 'Emma',
+        'chatPersonalityPrompt': 'I grew up in Amsterdam and love a bold player.',
+        'outfitStages': [
+            {'stageName': 'Professional', 'personalityPrompt': 'Tonight I am all business.'},
+            {'stageName': 'Dinner', 'personalityPrompt': ''},
+        ],
+    })
+    dealers.document('sofia').set({'name': 'Sofia'})
+    catalog = DealerCatalog(fake_db, mode="snapshot")
+    catalog.start()
+    yield catalog
+    catalog.stop()
+
+
+def test_prompts_are_compiled_from_dealer_documents(catalog):
+    registry = PromptRegistry(catalog)
+
+    prompt = registry.get('emma', 0, 'nl')
+    assert prompt.text.startswith("My name is Emma. I grew up in Amsterdam and love a bold player. Tonight I am all business.")
+    assert prompt.text.endswith("Always respond in Dutch.")
+    assert prompt.tokens == count_tokens(prompt.text)
+    assert prompt.message == {"role": "system", "content": prompt.text}
+
+    # Lege stage prompt valt terug op de standaard persona voor die stage
+    assert DEFAULT_STAGE_PROMPTS[1] in registry.get('emma', 1).text
+    # Dealer zonder eigen prompt krijgt zes standaard stages
+    assert registry.get('sofia', 5).text.startswith(f"My name is Sofia. {DEFAULT_STAGE_PROMPTS[5]}")
+
+
+def test_lookup_falls_back_for_unknown_dealer_stage_and_language(catalog):
+    registry = PromptRegistry(catalog)
+
+    assert registry.get('unknown', 2).text.startswith(DEFAULT_STAGE_PROMPTS[2])
+    assert registry.get('emma', 4).stage == 0  # Emma heeft maar twee stages
+    assert registry.get(None, None, 'fr').language == "auto"
+    # Zelfde dealer + stage: identieke prefix ongeacht de taal
+    assert registry.get('emma', 0, 'en').text.split("IMPORTANT")[0] == registry.get('emma', 0, 'de').text.split("IMPORTANT")[0]
+
+
+def test_registry_recompiles_only_changed_dealers(catalog, fake_db):
+    registry = PromptRegistry(catalog)
+    assert registry.compiled_dealers == 2
+    unchanged = registry.get('sofia', 0)
+
+    fake_db.collection('dealers').document('emma').update({'chatPersonalityPrompt': 'I only play high stakes.'})
+
+    assert "I only play high stakes." in registry.get('emma', 0).text
+    assert registry.compiled_dealers == 3
+    assert registry.get('sofia', 0) is unchanged
+
+    fake_db.collection('dealers').document('sofia').delete()
+    assert registry.get('sofia', 0).dealer_id is None
+
+
+def test_poll_without_changes_recompiles_nothing(catalog, fake_db):
+    registry = PromptRegistry(catalog)
+
+    for _ in range(3):
+        catalog.reload()
+    fake_db.collection('dealers').document('emma').update({'name': 'Emma'})
+
+    assert registry.compiled_dealers == 2
+
+
+def test_message_token_count_includes_overhead():
+    messages = [{"role": "system", "content": "abcd" * 10}, {"role": "user", "content": "hi"}]
+    assert count_message_tokens(messages) > count_tokens("abcd" * 10) + count_tokens("hi")
+
+
+def test_stream_route_uses_dealer_prompt(catalog, fake_openai, monkeypatch):
+    monkeypatch.setattr(llm_client, "_manager", None)
+    monkeypatch.setattr(admission, "_controller", admission.LLMAdmissionController(user_rate=0))
+    monkeypatch.setattr(prompts, "_registry", PromptRegistry(catalog))
+    app = FastAPI()
+    app.include_router(ai_chat.router, prefix="/api")
+
+    with TestClient(app).stream("POST", "/api/ai-chat/stream", json={
+        "message": "Hoi", "history": [], "dealer_id": "emma", "outfit_stage_index": 0, "language": "nl",
+    }) as response:
+        response.read()
+
+    system = fake_openai.requests[0]["messages"][0]
+    assert system == prompts.get_prompt_registry().get('emma', 0, 'nl').message
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Tests voor de reply cache: key normalisatie, variety pool, TTL/LRU en de
+integratie in de SSE route
+"""
+
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.apis import ai_chat
+from app.apis.ai_chat import admission
+from app.apis.ai_chat import client as llm_client
+from app.apis.ai_chat import prompts
+from app.apis.ai_chat import reply_cache as reply_cache_module
+from app.apis.ai_chat import streaming
+from app.apis.ai_chat.reply_cache import ReplyCache
+
+SYSTEM = "I am a professional blackjack dealer."
+
+
+def test_key_ignores_case_whitespace_and_old_history():
+    cache = ReplyCache(history_messages=2)
+    history = [
+        {"role": "user", "content": "first"},
+        {"role": "assistant", "content": "Nice  hand"},
+        {"role": "user", "content": "You won!"},
+    ]
+    noisy = [{"role": "user", "content": "something else"}, {"role": "assistant", "content": " nice hand "},
+             {"role": "user", "content": "YOU WON!"}]
+
+    assert cache.key(SYSTEM, history, "You won!") == cache.key(SYSTEM.upper(), noisy, "  you   won! ")
+    assert cache.key(SYSTEM, history, "You won!") != cache.key(SYSTEM, history, "You lost!")
+    assert cache.key(SYSTEM, history, "You won!") != cache.key("Other dealer", history, "You won!")
+
+
+def test_key_includes_every_leading_system_message():
+    cache = ReplyCache(history_messages=2)
+    history = [{"role": "user", "content": f"turn {i}"} for i in range(4)]
+    last = {"role": "user", "content": "You won!"}
+
+    def messages(hint):
+        return [{"role": "system", "content": SYSTEM}, {"role": "system", "content": hint}, *history, last]
+
+    assert cache.key_for_messages(messages("Hard 16 vs 10: hit")) != cache.key_for_messages(messages("Hard 12 vs 6: stand"))
+    assert cache.key_for_messages(messages("Hard 16 vs 10: hit")) == cache.key_for_messages(messages("Hard 16 vs 10: hit"))
+
+
+def test_variety_pool_fills_before_serving_and_never_repeats():
+    cache = ReplyCache(variety=3)
+    key = cache.key(SYSTEM, [], "You won!")
+
+    # Dubbele antwoorden tellen niet mee voor de pool
+    for reply in ["Well played!", "Lucky you!", "Well played!", "Winner!"]:
+        assert cache.get(key) is None
+        cache.put(key, reply)
+
+    served = [cache.get(key) for _ in range(50)]
+    assert set(served) == {"Well played!", "Lucky you!", "Winner!"}
+    assert all(a != b for a, b in zip(served, served[1:]))
+    stats = cache.stats()
+    assert stats["hits"] == 50
+    assert stats["fills"] == 3
+    assert stats["hit_rate"] == pytest.approx(50 / 54, abs=0.001)
+
+
+def test_entries_expire_and_are_evicted_lru(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(reply_cache_module.time, "monotonic", lambda: clock[0])
+    cache = ReplyCache(max_entries=2, ttl=60, variety=1)
+
+    keys = [cache.key(SYSTEM, [], f"event {i}") for i in range(3)]
+    cache.put(keys[0], "a")
+    cache.put(keys[1], "b")
+    assert cache.get(keys[0]) == "a"  # keys[0] wordt recent gebruikt
+    cache.put(keys[2], "c")
+
+    assert cache.get(keys[1]) is None
+    assert cache.stats()["evictions"] == 1
+
+    clock[0] += 61
+    assert cache.get(keys[0]) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_only_automatic_message_types_are_cacheable():
+    cache = ReplyCache()
+    assert cache.is_cacheable("game_event")
+    assert cache.is_cacheable("conversation_starter")
+    assert not cache.is_cacheable("user_typed")
+    assert not cache.is_cacheable(None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(streaming, "stream_metrics", streaming.StreamMetrics())
+    monkeypatch.setattr(llm_client, "_manager", None)
+    monkeypatch.setattr(prompts, "_registry", prompts.PromptRegistry())
+    monkeypatch.setattr(admission, "_controller", admission.LLMAdmissionController(user_rate=0))
+    monkeypatch.setattr(reply_cache_module, "_reply_cache", ReplyCache(variety=2))
+    app = FastAPI()
+    app.include_router(ai_chat.router, prefix="/api")
+    return TestClient(app)
+
+
+def final_event(client, **payload):
+    with client.stream("POST", "/api/ai-chat/stream", json={"history": [], **payload}) as response:
+        last_block = response.read().decode().strip().split("\n\n")[-1]
+    return json.loads(last_block.split("data: ", 1)[1])
+
+
+def test_game_events_are_served_from_cache_after_pool_fills(client, fake_openai):
+    replies = []
+    for tokens in (["Well", " played!"], ["Lucky", " you!"]):
+        fake_openai.reply_tokens = tokens
+        done = final_event(client, message="You won!", message_type="game_event")
+        assert done["cached"] is False
+        replies.append(done["reply"])
+
+    for _ in range(20):
+        done = final_event(client, message="You won!", message_type="game_event")
+        assert done["cached"] is True
+        assert done["reply"] in replies
+
+    assert len(fake_openai.requests) == 2
+    stats = client.get("/api/ai-chat/stream/stats").json()["reply_cache"]
+    assert stats["hits"] == 20
+
+
+def test_game_state_is_part_of_the_cache_key(client, fake_openai):
+    history = [{"role": "user", "content": "Deal me in"}, {"role": "assistant", "content": "Cards are out"},
+               {"role": "user", "content": "Hmm"}, {"role": "assistant", "content": "Your move"}]
+    hard_16 = {"player_total": 16, "dealer_upcard": "K"}
+    for tokens in (["Take", " a card"], ["Hit", " it"]):
+        fake_openai.reply_tokens = tokens
+        final_event(client, message="Your turn", message_type="game_event", history=history, game_state=hard_16)
+    assert final_event(client, message="Your turn", message_type="game_event", history=history,
+                       game_state=hard_16)["cached"] is True
+
+    # Zelfde history en bericht, ander advies: niet uit de pool van hard 16
+    done = final_event(client, message="Your turn", message_type="game_event", history=history,
+                       game_state={"player_total": 12, "dealer_upcard": "6"})
+    assert done["cached"] is False
+    assert len(fake_openai.requests) == 3
+
+
+def test_typed_messages_always_reach_the_model(client, fake_openai):
+    for _ in range(3):
+        done = final_event(client, message="You won!", message_type="user_typed")
+        assert done["cached"] is False
+    assert len(fake_openai.requests) == 3
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
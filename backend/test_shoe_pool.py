@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests voor de pool met vooraf geschudde, seed-committed shoes
+"""
+
+import hashlib
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.apis import game as game_api
+from app.game import Rules, Shoe, ShoePool, Table
+from app.game import shoe_pool as shoe_pool_module
+from app.game.cards import new_shoe_cards
+from app.game.shoe_pool import prepare_shoe, shuffle_from_seed
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_shuffle_is_a_deterministic_permutation_of_the_seed():
+    seed = b"\x01" * 32
+    cards = shuffle_from_seed(seed, 6)
+
+    assert sorted(cards) == sorted(new_shoe_cards(6))
+    assert cards == shuffle_from_seed(seed, 6)
+    assert cards != shuffle_from_seed(b"\x02" * 32, 6)
+    assert cards != new_shoe_cards(6)
+
+
+def test_prepared_shoe_matches_its_commitment():
+    prepared = prepare_shoe(2)
+
+    assert prepared.commitment == hashlib.sha256(prepared.seed).hexdigest()
+    assert prepared.cards == shuffle_from_seed(prepared.seed, 2)
+
+
+def test_empty_pool_shuffles_inline():
+    pool = ShoePool(6, size=4, mode="thread")
+
+    shoe = pool.take()
+
+    assert len(shoe.cards) == 312
+    assert pool.stats()["fallbacks"] == 1
+    assert pool.fill() == 4
+    pool.take()
+    assert pool.stats()["fallbacks"] == 1
+    assert pool.depth == 3
+
+
+def test_worker_refills_below_the_low_water_mark():
+    pool = ShoePool(1, size=8, low_water=3, batch=2, mode="thread").start()
+    try:
+        wait_for(lambda: pool.depth == 8)
+        for _ in range(4):
+            pool.take()
+        # Nog boven de low-water mark: de worker blijft slapen
+        time.sleep(0.05)
+        assert pool.depth == 4
+
+        pool.take()
+        wait_for(lambda: pool.depth == 8)
+        stats = pool.stats()
+        assert stats["refills"] == 2
+        assert stats["fallbacks"] == 0
+        assert stats["generated"] == 13
+    finally:
+        pool.stop()
+    assert not pool.stats()["running"]
+
+
+def test_process_mode_generates_in_a_worker_process():
+    pool = ShoePool(2, size=3, mode="process")
+    try:
+        assert pool.fill() == 3
+        prepared = pool.take()
+        assert prepared.cards == shuffle_from_seed(prepared.seed, 2)
+    finally:
+        pool.stop()
+
+
+def test_table_reveals_the_seed_after_each_shoe():
+    pool = ShoePool(1, size=4, mode="thread")
+    pool.fill()
+    shoe = Shoe(decks=1, penetration=0.5, pool=pool)
+    table = Table(Rules(decks=1, penetration=0.5), shoe=shoe)
+
+    commitment, played = shoe.commitment, list(shoe.cards)
+    assert table.view()["shoe_commitment"] == commitment
+    assert table.view()["previous_shoe_seed"] is None
+
+    shoe.shuffle()
+    seed = bytes.fromhex(table.view()["previous_shoe_seed"])
+    assert hashlib.sha256(seed).hexdigest() == commitment
+    assert list(shuffle_from_seed(seed, 1)) == played
+    assert shoe.commitment != commitment
+
+    with pytest.raises(ValueError):
+        Shoe(decks=6, pool=pool)
+
+
+def test_rounds_play_from_pooled_shoes():
+    pool = ShoePool(1, size=4, low_water=1, mode="thread").start()
+    try:
+        table = Table(Rules(decks=1), shoe=Shoe(decks=1, pool=pool))
+        for _ in range(60):
+            table.start_round(10)
+            while table.phase == "PLAYER_TURN":
+                table.stand()
+            table.settle()
+        assert table.shoe.shuffles > 5
+        assert pool.stats()["served"] == table.shoe.shuffles
+    finally:
+        pool.stop()
+
+
+def test_pool_stats_api(monkeypatch):
+    pool = ShoePool(6, size=2, mode="thread")
+    pool.fill()
+    monkeypatch.setattr(shoe_pool_module, "_pools", {6: pool})
+    app = FastAPI()
+    app.include_router(game_api.router, prefix="/api")
+
+    stats = TestClient(app).get("/api/game/shoes/stats").json()
+
+    assert stats["6d"]["depth"] == 2
+    assert stats["6d"]["generated"] == 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests voor het streaming upload pad: piekgeheugen en harde limieten,
+gemeten tegen een lokale (schijf) fake bucket
+"""
+
+import asyncio
+import hashlib
+import tempfile
+import tracemalloc
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from app.apis import firebase_storage
+from app.apis.firebase_storage.object_index import KnownObjectIndex
+from conftest import FakeBucket
+
+MB = 1024 * 1024
+
+
+def make_upload(size: int, filename: str, content_type: str, known_size: bool = True):
+    """UploadFile zoals starlette hem aanlevert: gespoold naar schijf boven 1MB"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=MB)
+    block = bytes(range(256)) * (MB // 256)
+    written = 0
+    while written < size:
+        chunk = block[: min(MB, size - written)]
+        spooled.write(chunk)
+        written += len(chunk)
+    spooled.seek(0)
+    return UploadFile(
+        file=spooled,
+        size=size if known_size else None,
+        filename=filename,
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+def call_upload(upload: UploadFile):
+    return asyncio.run(firebase_storage.upload_file(
+        file=upload,
+        folder="uploads",
+        convert_webp=True,
+        webp_quality=85,
+        variant_widths="",
+        include_avif=False,
+    ))
+
+
+@pytest.fixture
+def disk_bucket(tmp_path, monkeypatch):
+    bucket = FakeBucket(root=str(tmp_path))
+    monkeypatch.setattr(firebase_storage, "firebase_bucket", bucket)
+    monkeypatch.setattr(firebase_storage, "known_objects", KnownObjectIndex())
+    return bucket
+
+
+def test_large_file_streams_with_bounded_memory(disk_bucket):
+    size = 20 * MB
+    upload = make_upload(size, "intro.mp4", "video/mp4")
+
+    tracemalloc.start()
+    result = call_upload(upload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert result.success is True
+    assert disk_bucket.uploads == 1
+    stored = disk_bucket.blob(f"uploads/{result.file_name}")
+    assert stored.chunk_size == firebase_storage.STORAGE_STREAM_CHUNK_SIZE
+    assert result.file_name == hashlib.sha256(stored.download_as_bytes()).hexdigest() + ".mp4"
+
+    print(f"📈 Peak traced memory for {size // MB}MB upload: {peak / MB:.2f}MB")
+    assert peak < 4 * MB
+
+
+def test_oversized_image_with_known_size_is_rejected_without_reading(disk_bucket, monkeypatch):
+    monkeypatch.setattr(firebase_storage, "MAX_IMAGE_UPLOAD_BYTES", 2 * MB)
+    upload = make_upload(5 * MB, "huge.jpg", "image/jpeg")
+
+    with pytest.raises(HTTPException) as exc_info:
+        call_upload(upload)
+
+    assert exc_info.value.status_code == 413
+    assert upload.file.tell() == 0
+    assert disk_bucket.uploads == 0
+
+
+def test_oversized_image_stream_is_rejected_while_reading(disk_bucket, monkeypatch):
+    monkeypatch.setattr(firebase_storage, "MAX_IMAGE_UPLOAD_BYTES", 2 * MB)
+    upload = make_upload(5 * MB, "huge.jpg", "image/jpeg", known_size=False)
+
+    with pytest.raises(HTTPException) as exc_info:
+        call_upload(upload)
+
+    assert exc_info.value.status_code == 413
+    # Gestopt na de limiet plus hooguit één chunk
+    assert upload.file.tell() <= 2 * MB + firebase_storage.READ_CHUNK_SIZE
+    assert disk_bucket.uploads == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "-s"]))
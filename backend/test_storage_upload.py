@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests voor de firebase_storage upload route tegen een fake bucket
+"""
+
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.apis import firebase_storage
+from app.apis.firebase_storage.object_index import KnownObjectIndex
+from app.imaging import ImageJobTimeoutError, ImagePoolBusyError, ImageWorkerPool
+
+
+def make_jpeg(width=2000, height=1000) -> bytes:
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), (20, 120, 200)).save(output, format='JPEG')
+    return output.getvalue()
+
+
+@pytest.fixture
+def client(fake_bucket, monkeypatch):
+    pool = ImageWorkerPool(max_workers=2, mode="thread")
+    monkeypatch.setattr(firebase_storage, "firebase_bucket", fake_bucket)
+    monkeypatch.setattr(firebase_storage, "get_image_pool", lambda: pool)
+    monkeypatch.setattr(firebase_storage, "known_objects", KnownObjectIndex())
+
+    app = FastAPI()
+    app.include_router(firebase_storage.router, prefix="/api")
+    yield TestClient(app)
+    pool.shutdown()
+
+
+def test_image_upload_creates_responsive_variants(client, fake_bucket):
+    response = client.post(
+        "/api/firebase-storage/upload",
+        files={"file": ("outfit.jpg", make_jpeg(), "image/jpeg")},
+        data={"folder": "dealers/emma"},
+    )
+    result = response.json()
+
+    assert result["success"] is True
+    assert [v["width"] for v in result["variants"]] == [160, 480, 1200]
+    assert result["file_url"] == result["variants"][-1]["url"]
+    assert result["file_name"].endswith("/w1200.webp")
+
+    stem = result["file_name"].split('/')[0]
+    assert fake_bucket.object_names() == [
+        f"dealers/emma/{stem}/w1200.webp",
+        f"dealers/emma/{stem}/w160.webp",
+        f"dealers/emma/{stem}/w480.webp",
+    ]
+    assert result["srcset"]["image/webp"].count("w,") == 2
+
+
+def test_variants_never_upscale(client):
+    response = client.post(
+        "/api/firebase-storage/upload",
+        files={"file": ("avatar.jpg", make_jpeg(300, 300), "image/jpeg")},
+        data={"variant_widths": "160,480,1200"},
+    )
+    widths = [v["width"] for v in response.json()["variants"]]
+    assert widths == [160, 300]
+
+
+def test_avif_variants_when_requested(client):
+    response = client.post(
+        "/api/firebase-storage/upload",
+        files={"file": ("avatar.jpg", make_jpeg(), "image/jpeg")},
+        data={"variant_widths": "160", "include_avif": "true"},
+    )
+    result = response.json()
+    assert {v["format"] for v in result["variants"]} == {"webp", "avif"}
+    assert set(result["srcset"]) == {"image/webp", "image/avif"}
+    assert result["file_url"].endswith("w160.webp")
+
+
+@pytest.mark.parametrize("error, status", [
+    (ImagePoolBusyError("queue full"), 503),
+    (ImageJobTimeoutError("job took 30s"), 504),
+])
+def test_overloaded_image_pool_is_an_http_error(client, fake_bucket, monkeypatch, error, status):
+    class OverloadedPool:
+        async def submit(self, fn, *args, **kwargs):
+            raise error
+
+    monkeypatch.setattr(firebase_storage, "get_image_pool", lambda: OverloadedPool())
+    response = client.post(
+        "/api/firebase-storage/upload",
+        files={"file": ("outfit.jpg", make_jpeg(), "image/jpeg")},
+    )
+
+    assert response.status_code == status
+    assert fake_bucket.object_names() == []
+
+
+def test_non_image_upload_is_stored_as_is(client, fake_bucket):
+    response = client.post(
+        "/api/firebase-storage/upload",
+        files={"file": ("notes.txt", b"hello", "text/plain")},
+    )
+    result = response.json()
+    assert result["success"] is True
+    assert result["variants"] is None
+    assert fake_bucket.get_blob(f"uploads/{result['file_name']}").download_as_bytes() == b"hello"
+
+
+def upload_outfit(client, content):
+    return client.post(
+        "/api/firebase-storage/upload",
+        files={"file": ("outfit.jpg", content, "image/jpeg")},
+        data={"folder": "dealers/emma"},
+    ).json()
+
+
+def test_reupload_is_deduplicated_from_local_index(client, fake_bucket):
+    content = make_jpeg()
+    first = upload_outfit(client, content)
+    uploads_after_first = fake_bucket.uploads
+    exists_after_first = fake_bucket.exists_calls
+
+    second = upload_outfit(client, content)
+
+    assert first["deduplicated"] is False
+    assert second["deduplicated"] is True
+    assert second["file_url"] == first["file_url"]
+    assert fake_bucket.uploads == uploads_after_first
+    # Beantwoord uit de lokale index, zonder network round trip
+    assert fake_bucket.exists_calls == exists_after_first
+    assert first["file_name"].startswith(first["variants"][-1]["url"].split('/')[-2])
+
+
+def test_existing_object_is_found_after_index_reset(client, fake_bucket, monkeypatch):
+    content = make_jpeg()
+    first = upload_outfit(client, content)
+    uploads_after_first = fake_bucket.uploads
+
+    monkeypatch.setattr(firebase_storage, "known_objects", KnownObjectIndex())
+    second = upload_outfit(client, content)
+
+    assert second["deduplicated"] is True
+    assert second["file_url"] == first["file_url"]
+    assert fake_bucket.uploads == uploads_after_first
+
+
+def test_reupload_with_other_variants_uploads_the_missing_ones(client, fake_bucket):
+    content = make_jpeg()
+    first = upload_outfit(client, content)
+    second = client.post(
+        "/api/firebase-storage/upload",
+        files={"file": ("outfit.jpg", content, "image/jpeg")},
+        data={"folder": "dealers/emma", "variant_widths": "320,1200", "include_avif": "true"},
+    ).json()
+
+    assert second["file_url"] == first["file_url"]
+    assert second["deduplicated"] is False
+    stored = {fake_bucket.blob(name).public_url for name in fake_bucket.object_names()}
+    assert {v["url"] for v in second["variants"]} <= stored
+
+
+def test_content_addressed_objects_are_immutable(client, fake_bucket):
+    result = client.post(
+        "/api/firebase-storage/upload",
+        files={"file": ("notes.txt", b"hello", "text/plain")},
+    ).json()
+
+    assert result["file_name"] == firebase_storage.content_digest(b"hello") + ".txt"
+    blob = fake_bucket.blob(f"uploads/{result['file_name']}")
+    assert blob.cache_control == firebase_storage.IMMUTABLE_CACHE_CONTROL
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
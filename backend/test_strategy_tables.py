@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Tests voor de voorberekende strategie tabellen en de hint API
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.apis import ai_chat
+from app.apis import game as game_api
+from app.apis.ai_chat import admission
+from app.apis.ai_chat import client as llm_client
+from app.apis.ai_chat import prompts
+from app.game import Rules
+from app.game import strategy
+from app.game.strategy import (
+    DEFAULT_TABLES_PATH,
+    TABLE_SIZE,
+    StrategyTables,
+    compute_table,
+    dealer_outcomes,
+    parse_rank,
+    shoe_composition,
+)
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return StrategyTables.load(DEFAULT_TABLES_PATH)
+
+
+def test_shipped_file_has_all_rule_sets(tables):
+    assert tables.rule_sets() == [(d, h17) for d in (1, 2, 4, 6, 8) for h17 in (False, True)]
+    # Compact: een paar KB per regelset
+    assert tables.stats()["bytes"] == 10 * TABLE_SIZE * 2 < 64 * 1024
+
+
+def test_shipped_file_matches_the_calculation(tables):
+    # Faalt na een wijziging in de berekening: draai build_strategy_tables.py opnieuw
+    assert tables.table(1, False).data == compute_table(1, False)
+
+
+@pytest.mark.parametrize("kwargs, action", [
+    (dict(total=16, upcard="10"), "hit"),
+    (dict(total=12, upcard="3"), "hit"),
+    (dict(total=12, upcard="4"), "stand"),
+    (dict(total=13, upcard="2"), "stand"),
+    (dict(total=11, upcard="6"), "double"),
+    (dict(total=10, upcard="K"), "hit"),
+    (dict(total=9, upcard="3"), "double"),
+    (dict(total=18, upcard="9", soft=True), "hit"),
+    (dict(total=18, upcard="3", soft=True), "double"),
+    (dict(total=17, upcard="7", soft=True), "hit"),
+    (dict(total=17, upcard="6"), "stand"),
+    (dict(total=11, upcard="A"), "hit"),
+])
+def test_six_deck_basic_strategy(tables, kwargs, action):
+    assert tables.advise(Rules(decks=6), **kwargs).action == action
+
+
+def test_rule_variations_change_the_advice(tables):
+    assert tables.advise(Rules(decks=6, dealer_hits_soft_17=True), 11, "A").action == "double"
+    assert tables.advise(Rules(decks=1), 11, "A").action == "double"
+
+
+def test_known_expected_values(tables):
+    evs = tables.advise(Rules(), 16, "10").evs
+    assert evs["hit"] == pytest.approx(-0.535, abs=0.005)
+    assert evs["stand"] == pytest.approx(-0.540, abs=0.005)
+    assert tables.advise(Rules(), 11, "6").evs["double"] == pytest.approx(0.67, abs=0.01)
+
+
+def test_pairs_and_later_decisions(tables):
+    pair = tables.advise(Rules(), 0, "10", pair="8")
+    assert (pair.total, pair.soft, pair.pair) == (16, False, "8")
+    assert set(pair.evs) == {"stand", "hit", "double"}
+
+    aces = tables.advise(Rules(), 0, "6", pair="A")
+    assert (aces.total, aces.soft) == (12, True)
+
+    later = tables.advise(Rules(), 16, "10", first_decision=False)
+    assert set(later.evs) == {"stand", "hit"}
+    assert tables.advise(Rules(), 21, "10", first_decision=False).action == "stand"
+
+    with pytest.raises(ValueError):
+        tables.advise(Rules(), 22, "10")
+    with pytest.raises(ValueError):
+        tables.advise(Rules(), 16, "X")
+
+
+def test_dealer_outcomes_without_blackjack():
+    comp = shoe_composition(6)
+    comp[parse_rank("6")] -= 1
+    six = dealer_outcomes(comp, parse_rank("6"), False)
+    assert sum(six) == pytest.approx(1.0)
+    assert six[5] == pytest.approx(0.42, abs=0.01)
+
+    comp = shoe_composition(6)
+    comp[parse_rank("A")] -= 1
+    ace = dealer_outcomes(comp, parse_rank("A"), False)
+    # Zonder blackjack alleen 21 met drie of meer kaarten (±7,7%, bekende tabelwaarde)
+    assert sum(ace) == pytest.approx(1.0)
+    assert ace[4] == pytest.approx(0.077, abs=0.003)
+
+
+def test_save_load_roundtrip_and_on_demand(tmp_path, tables):
+    empty = StrategyTables()
+    assert not empty.has(1, True)
+    table = empty.table(1, True)
+    assert empty.stats()["computed"] == 1
+    assert table.data == tables.table(1, True).data
+
+    path = str(tmp_path / "tables.bin")
+    empty.save(path)
+    assert StrategyTables.load(path).table(1, True).data == table.data
+
+
+@pytest.fixture
+def shared_tables(monkeypatch, tables):
+    monkeypatch.setattr(strategy, "_tables", tables)
+    return tables
+
+
+def test_hint_api(shared_tables):
+    app = FastAPI()
+    app.include_router(game_api.router, prefix="/api")
+    client = TestClient(app)
+
+    hint = client.get("/api/game/hint", params={"total": 11, "upcard": "6"}).json()
+    assert hint["action"] == "double"
+    assert hint["hint"].startswith("Hard 11 vs dealer 6: double")
+
+    assert client.get("/api/game/hint", params={"total": 16, "upcard": "10", "cards": 3}).json()["evs"].keys() == {
+        "stand", "hit",
+    }
+    assert client.get("/api/game/hint", params={"pair": "8", "upcard": "10"}).json()["total"] == 16
+    assert client.get("/api/game/hint", params={"total": 16}).status_code == 400
+    assert client.get("/api/game/hint", params={"total": 30, "upcard": "10"}).status_code == 400
+    assert client.get("/api/game/hint", params={"total": 16, "upcard": "10", "decks": 12}).status_code == 400
+    assert client.get("/api/game/hint/stats").json()["computed"] == 0
+
+
+def test_advice_is_added_to_the_chat_prompt(monkeypatch, shared_tables, fake_openai):
+    monkeypatch.setattr(llm_client, "_manager", None)
+    monkeypatch.setattr(prompts, "_registry", prompts.PromptRegistry())
+    monkeypatch.setattr(admission, "_controller", admission.LLMAdmissionController(user_rate=0))
+    app = FastAPI()
+    app.include_router(ai_chat.router, prefix="/api")
+    client = TestClient(app)
+
+    payload = {"message": "Should I hit?", "history": [],
+               "game_state": {"player_total": 16, "dealer_upcard": "K"}}
+    with client.stream("POST", "/api/ai-chat/stream", json=payload) as response:
+        response.read()
+
+    system = [m["content"] for m in fake_openai.requests[0]["messages"] if m["role"] == "system"]
+    assert len(system) == 2
+    assert "Hard 16 vs dealer 10: hit" in system[1]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Tests voor de Stripe webhook queue (ack na opslaan, idempotente verwerking)
+"""
+
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.payments import WebhookProcessor, WebhookQueue, credit_coins
+from app.payments import webhooks
+from app.payments.webhooks import DONE, FAILED, PENDING, ingest_webhook, make_webhook_handler
+from stripe_service import StripeService
+
+SECRET = "whsec_test_webhooks"
+
+
+def checkout_event(event_id, user_id, coins):
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "id": f"cs_{event_id}",
+            "object": "checkout.session",
+            "metadata": {"type": "coins", "user_id": user_id, "coins": str(coins), "package_id": "starter"},
+        }},
+    }
+
+
+def sign(payload: str, secret: str = SECRET) -> str:
+    timestamp = int(time.time())
+    digest = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def coins_of(db, user_id):
+    snapshot = db.collection("playerData").document(user_id).get()
+    return snapshot.to_dict()["playerCoins"] if snapshot.exists else 0
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WebhookQueue(str(tmp_path / "webhooks.db"), synchronous="NORMAL")
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def processor(monkeypatch, queue, fake_db):
+    monkeypatch.setenv("STRIPE_WEBHOOK_SECRET", SECRET)
+    service = StripeService()
+    processor = WebhookProcessor(queue, make_webhook_handler(service, fake_db), workers=4,
+                                 retry_backoff=0.01, poll_interval=0.05, service=service)
+    yield processor
+    processor.stop()
+
+
+@pytest.fixture
+def client(processor):
+    app = FastAPI()
+
+    @app.post("/api/webhooks/stripe")
+    async def stripe_webhook(request: Request):
+        return await ingest_webhook(processor, await request.body(), request.headers.get("stripe-signature"))
+
+    return TestClient(app)
+
+
+def post_event(client, payload, signature):
+    headers = {"content-type": "application/json"}
+    if signature:
+        headers["stripe-signature"] = signature
+    return client.post("/api/webhooks/stripe", content=payload, headers=headers)
+
+
+def test_replayed_events_are_credited_exactly_once(client, processor, queue, fake_db):
+    rng = random.Random(17)
+    users = [f"user-{i}" for i in range(50)]
+    events = [checkout_event(f"evt_{i:05d}", rng.choice(users), rng.choice([100, 500, 1200]))
+              for i in range(2000)]
+    expected = {}
+    for event in events:
+        metadata = event["data"]["object"]["metadata"]
+        expected[metadata["user_id"]] = expected.get(metadata["user_id"], 0) + int(metadata["coins"])
+
+    # ~10% redeliveries, door elkaar met de originele events
+    deliveries = events + rng.sample(events, len(events) // 10)
+    rng.shuffle(deliveries)
+
+    fake_db.fail_next_commits = 25
+    processor.start()
+    started = time.perf_counter()
+    duplicates = 0
+    for event in deliveries:
+        payload = json.dumps(event)
+        response = post_event(client, payload, sign(payload))
+        assert response.status_code == 200
+        duplicates += response.json()["duplicate"]
+    ack_time = time.perf_counter() - started
+
+    assert post_event(client, "{}", None).status_code == 400
+    payload = json.dumps(checkout_event("evt_forged", users[0], 99999))
+    assert post_event(client, payload, sign(payload, "whsec_wrong")).status_code == 400
+
+    assert processor.drain(timeout=60)
+    elapsed = time.perf_counter() - started
+    print(f"\n📬 {len(deliveries)} deliveries acked in {ack_time:.2f}s "
+          f"({len(deliveries) / ack_time:.0f}/s), drained after {elapsed:.2f}s")
+
+    assert duplicates == len(deliveries) - len(events)
+    assert {user: coins_of(fake_db, user) for user in expected} == expected
+    assert len(list(fake_db.collection("coinLedger").stream())) == len(events)
+    assert queue.counts()[DONE] == len(events)
+    assert queue.get("evt_forged") is None
+
+    stats = processor.stats()
+    assert stats["received"] == len(events)
+    assert stats["duplicates"] == duplicates
+    assert stats["retried"] == 25
+    assert stats["failed"] == 0
+    # Ruime ondergrens; TestClient zelf is hier de bottleneck
+    assert len(deliveries) / ack_time > 100
+
+
+def test_expired_lease_does_not_credit_twice(processor, queue, fake_db):
+    event = checkout_event("evt_crash", "user-crash", 500)
+    queue.enqueue(event["id"], event["type"], json.dumps(event))
+
+    # Worker claimt, schrijft bij en "crasht" voor complete()
+    [claimed] = queue.claim(limit=10, lease=0.05)
+    processor.handler(claimed.event)
+    assert queue.claim(limit=10, lease=0.05) == []
+    time.sleep(0.1)
+
+    [reclaimed] = queue.claim(limit=10, lease=60)
+    assert reclaimed.attempts == 2
+    processor._process(reclaimed)
+
+    assert queue.get("evt_crash")["status"] == DONE
+    assert coins_of(fake_db, "user-crash") == 500
+
+
+def test_event_fails_after_max_attempts(processor, queue, fake_db):
+    processor.max_attempts = 2
+    event = checkout_event("evt_broken", "user-broken", 100)
+    queue.enqueue(event["id"], event["type"], json.dumps(event))
+    fake_db.fail_next_commits = 5
+
+    [first] = queue.claim(limit=1, lease=60)
+    processor._process(first)
+    row = queue.get("evt_broken")
+    assert row["status"] == PENDING
+    assert "simulated commit failure" in row["last_error"]
+
+    time.sleep(0.05)
+    [second] = queue.claim(limit=1, lease=60)
+    processor._process(second)
+    assert queue.get("evt_broken")["status"] == FAILED
+    assert coins_of(fake_db, "user-broken") == 0
+
+
+def test_busy_worker_keeps_the_queue_open_at_shutdown(monkeypatch, tmp_path):
+    queue = WebhookQueue(str(tmp_path / "webhooks.db"), synchronous="NORMAL")
+    started, release = threading.Event(), threading.Event()
+
+    def slow_handler(event):
+        started.set()
+        release.wait(5)
+        return None
+
+    processor = WebhookProcessor(queue, slow_handler, workers=1, poll_interval=0.01)
+    monkeypatch.setattr(webhooks, "_processor", processor)
+    queue.enqueue("evt_slow", "checkout.session.completed", json.dumps(checkout_event("evt_slow", "u", 1)))
+    processor.start()
+    assert started.wait(5)
+
+    webhooks.stop_webhook_processor(timeout=0.05)
+    assert webhooks._processor is None
+
+    # De worker kan zijn event nog afronden: de queue is niet gesloten
+    release.set()
+    assert processor.stop(timeout=5) is True
+    assert queue.get("evt_slow")["status"] == DONE
+    queue.close()
+
+
+def test_credit_coins_is_idempotent_per_key(fake_db):
+    assert credit_coins(fake_db, "user-1", 300, idempotency_key="evt_1", source="stripe")
+    assert not credit_coins(fake_db, "user-1", 300, idempotency_key="evt_1", source="stripe")
+    assert credit_coins(fake_db, "user-1", 200)
+
+    progress = fake_db.collection("playerData").document("user-1").get().to_dict()
+    assert progress["playerCoins"] == 500
+    assert progress["totalCoinsEarned"] == 500
+    assert fake_db.collection("coinLedger").document("evt_1").get().to_dict()["userId"] == "user-1"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
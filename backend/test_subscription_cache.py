@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Tests voor de abonnementen cache (één Stripe call, webhook updates)
+"""
+
+import threading
+import time
+
+import pytest
+import stripe
+
+import stripe_service as stripe_module
+from app.payments import SubscriptionCache
+from app.payments import subscriptions as subscriptions_module
+from app.payments.webhooks import make_webhook_handler
+from stripe_service import StripeService
+
+EMAIL = "Player@Example.com"
+MONTHLY = "price_1RYRN8IhYvmNDX3MwXFzxQXG"
+
+
+def subscription(sub_id="sub_1", status="active", price=MONTHLY, customer="cus_1"):
+    return {
+        "id": sub_id,
+        "object": "subscription",
+        "customer": customer,
+        "status": status,
+        "items": {"object": "list", "data": [{
+            "object": "subscription_item",
+            "current_period_end": 1767225600,
+            "price": {"object": "price", "id": price, "product": "prod_1"},
+        }]},
+    }
+
+
+class FakeStripeCustomers:
+    def __init__(self):
+        self.customers = {EMAIL.lower(): {"id": "cus_1", "subscriptions": [subscription()]}}
+        self.calls = []
+        self.delay = 0.0
+
+    def list(self, email=None, limit=None, expand=None):
+        self.calls.append({"email": email, "expand": expand})
+        time.sleep(self.delay)
+        found = self.customers.get(email)
+        data = []
+        if found:
+            data.append({
+                "id": found["id"], "object": "customer", "email": email,
+                "subscriptions": {"object": "list", "data": list(found["subscriptions"])},
+            })
+        return stripe.StripeObject.construct_from({"object": "list", "data": data}, "sk_test")
+
+
+@pytest.fixture
+def customers(monkeypatch):
+    fake = FakeStripeCustomers()
+    monkeypatch.setattr(stripe_module.stripe.Customer, "list", fake.list)
+
+    def no_extra_calls(*args, **kwargs):
+        raise AssertionError("unexpected Stripe call")
+
+    monkeypatch.setattr(stripe_module.stripe.Subscription, "list", no_extra_calls)
+    monkeypatch.setattr(stripe_module.stripe.Product, "retrieve", no_extra_calls)
+    return fake
+
+
+@pytest.fixture
+def service():
+    return StripeService()
+
+
+@pytest.fixture
+def cache(service):
+    return SubscriptionCache(service, ttl=60, missing_ttl=60)
+
+
+def event(event_type, obj, created):
+    return {"id": f"evt_{created}", "type": event_type, "created": created, "data": {"object": obj}}
+
+
+def test_single_expanded_call_with_local_plan_names(customers, cache):
+    entry = cache.lookup(EMAIL)
+
+    assert customers.calls == [{"email": EMAIL.lower(), "expand": ["data.subscriptions"]}]
+    assert entry.customer_id == "cus_1"
+    assert entry.is_premium
+    assert entry.subscriptions == [{
+        "id": "sub_1", "status": "active", "current_period_end": 1767225600, "plan_name": "Premium Maandelijks",
+    }]
+
+
+def test_lookups_are_served_from_memory(customers, cache):
+    cache.lookup(EMAIL)
+    for _ in range(10):
+        cache.lookup(" player@example.com ")
+
+    assert len(customers.calls) == 1
+    assert cache.get_by_customer("cus_1").email == "player@example.com"
+    assert cache.stats()["hits"] == 10
+
+
+def test_unknown_customer_is_cached_briefly(customers, service):
+    cache = SubscriptionCache(service, ttl=60, missing_ttl=0.05)
+
+    assert cache.lookup("new@example.com").subscriptions == []
+    cache.lookup("new@example.com")
+    assert len(customers.calls) == 1
+
+    time.sleep(0.1)
+    customers.customers["new@example.com"] = {"id": "cus_2", "subscriptions": [subscription(customer="cus_2")]}
+    assert cache.lookup("new@example.com").is_premium
+
+
+def test_concurrent_misses_share_one_call(customers, cache):
+    customers.delay = 0.1
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.lookup(EMAIL))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(customers.calls) == 1
+    assert len({id(entry) for entry in results}) == 1
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_subscription_webhooks_update_entries_in_place(customers, cache):
+    cache.lookup(EMAIL)
+
+    assert cache.apply_event(event("customer.subscription.updated", subscription(status="past_due"), 200))
+    assert not cache.lookup(EMAIL).is_premium
+
+    # Ouder event na een nieuwer: genegeerd
+    assert not cache.apply_event(event("customer.subscription.updated", subscription(), 100))
+    assert cache.lookup(EMAIL).subscriptions[0]["status"] == "past_due"
+
+    yearly = subscription("sub_2", price="price_1RYRN9IhYvmNDX3M4EHboWuQ")
+    cache.apply_event(event("customer.subscription.created", yearly, 300))
+    assert [s["plan_name"] for s in cache.lookup(EMAIL).subscriptions] == ["Premium Maandelijks", "Premium Jaarlijks"]
+
+    cache.apply_event(event("customer.subscription.deleted", subscription(status="canceled"), 400))
+    assert [s["id"] for s in cache.lookup(EMAIL).subscriptions] == ["sub_2"]
+    assert len(customers.calls) == 1
+
+    # Onbekende klant: niets te doen, geen Stripe call
+    assert not cache.apply_event(event("customer.subscription.updated", subscription(customer="cus_9"), 500))
+
+
+def test_invoice_events_invalidate_the_customer(customers, cache):
+    cache.lookup(EMAIL)
+
+    assert cache.apply_event(event("invoice.payment_succeeded", {"customer": "cus_1", "subscription": "sub_1"}, 200))
+    assert cache.get_by_customer("cus_1") is None
+    cache.lookup(EMAIL)
+    assert len(customers.calls) == 2
+
+
+def test_invalidation_during_a_fetch_is_not_lost(customers, cache):
+    customers.delay = 0.1
+    thread = threading.Thread(target=cache.lookup, args=(EMAIL,))
+    thread.start()
+    time.sleep(0.03)
+    cache.invalidate(email=EMAIL)
+    thread.join()
+
+    cache.lookup(EMAIL)
+    assert len(customers.calls) == 2
+
+
+def test_webhook_handler_feeds_the_shared_cache(monkeypatch, customers, service, cache, fake_db):
+    monkeypatch.setattr(subscriptions_module, "_cache", cache)
+    cache.lookup(EMAIL)
+
+    handle = make_webhook_handler(service, fake_db)
+    handle(event("customer.subscription.deleted", subscription(status="canceled"), 200))
+
+    assert cache.lookup(EMAIL).subscriptions == []
+    assert not cache.lookup(EMAIL).is_premium
+
+
+def test_service_keeps_returning_plain_lists(customers, service):
+    assert service.get_customer_subscriptions(EMAIL.lower())[0]["plan_name"] == "Premium Maandelijks"
+    assert service.get_customer_subscriptions("nobody@example.com") == []
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -354,7 +354,7 @@ const GamePage = () => {
       const currentOutfitStage = playerData?.dealerProgress?.[dealerId || '']?.currentOutfitStageIndex || 0;
       
       // Send message using the chat store
-      await sendMessage(prompt, messages, currentOutfitStage, dealer);
+      await sendMessage(prompt, messages, currentOutfitStage, dealer, 'game_event');
       
       // Remove the thinking indicator
       addChatMessage(prompt, 'dealer');
@@ -8,6 +8,7 @@ export interface CoinPackage {
   original_price_eur?: number;
   is_popular?: boolean;
   bonus_description?: string;
+  aliases?: string[]; // other ids the backend accepts for this package
   type: 'coins';
 }
 
@@ -17,6 +18,7 @@ export interface PremiumPackage {
   price_eur: number;
   interval: string;
   features: string[];
+  aliases?: string[];
   type: 'premium';
 }
 
@@ -1,4 +1,5 @@
 import create from 'zustand';
+import { auth } from 'app';
 import { API_URL } from '../constants';
 import { DealerData } from './adminDealerManager';
 
@@ -16,8 +17,17 @@ export interface Message {
   isAction?: boolean;
 }
 
+// Server-side chat session: the backend keeps the history, requests only carry the new message
+const generateSessionId = () => {
+  return typeof crypto !== 'undefined' && 'randomUUID' in crypto
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).substring(2, 12)}`;
+};
+
 type ChatStore = {
   messages: Message[];
+  sessionId: string;
+  sessionStarted: boolean; // the server holds the history of this session
   isLoadingApiCall: boolean;
   thinkingText: string;
   setMessages: (messages: Message[]) => void;
@@ -28,11 +38,13 @@ type ChatStore = {
 
 export const useChatStore = create<ChatStore>((set, get) => ({
   messages: [],
+  sessionId: generateSessionId(),
+  sessionStarted: false,
   isLoadingApiCall: false,
   thinkingText: '',
   setMessages: (messages) => set({ messages }),
   addMessage: (message) => set((state) => ({ messages: [...state.messages, message] })),
-  clearMessages: () => set({ messages: [] }),
+  clearMessages: () => set({ messages: [], sessionId: generateSessionId(), sessionStarted: false }), // New chat, new server-side session
   sendMessage: async (text, history, outfitStage, dealer, messageType) => {
     set({ isLoadingApiCall: true, thinkingText: 'Dealer is thinking...' });
 
@@ -45,34 +57,100 @@ export const useChatStore = create<ChatStore>((set, get) => ({
     get().addMessage(newMessage);
 
     try {
-      const response = await fetch(`${API_URL}/ai-chat/send-message`, {
+      // Tokens arrive as Server-Sent Events, so the dealer starts "typing" right away
+      const requestReply = async () => fetch(`${API_URL}/ai-chat/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'Accept': 'text/event-stream',
+          // Signed-in players get their own rate limit bucket instead of sharing their IP's
+          'Authorization': await auth.getAuthHeaderValue(),
         },
         body: JSON.stringify({
           message: text,
-          history: history.slice(-6).map(m => ({ role: m.sender === 'user' ? 'user' : 'assistant', content: m.text })),
+          session_id: get().sessionId,
+          // History only seeds a new session; after that the payload is just the new message
+          history: get().sessionStarted
+            ? []
+            : history.slice(-20).map(m => ({ role: m.sender === 'user' ? 'user' : 'assistant', content: m.text })),
+          resume_session: get().sessionStarted,
           outfit_stage_index: outfitStage,
+          dealer_id: dealer?.id,
           message_type: messageType || 'user_typed',
         }),
       });
 
-      if (!response.ok) {
-        throw new Error(`API call failed: ${response.statusText}`);
-      }
+      const replyId = generateUniqueId();
+      let replyText = '';
+      const showReply = (textSoFar: string) => {
+        if (!get().messages.some(m => m.id === replyId)) {
+          get().addMessage({
+            id: replyId,
+            text: textSoFar,
+            sender: 'dealer',
+            timestamp: new Date().toISOString(),
+            avatar: dealer?.avatarUrl, // Fix the avatar property name
+          });
+          set({ thinkingText: '' });
+        } else {
+          set((state) => ({
+            messages: state.messages.map(m => (m.id === replyId ? { ...m, text: textSoFar } : m)),
+          }));
+        }
+      };
 
-      const data = await response.json();
+      // The server can lose a session (restart, eviction, another worker); it then asks for
+      // the history instead of answering without context, and we resend it once
+      for (let attempt = 0; attempt < 2; attempt++) {
+        const response = await requestReply();
+        if (!response.ok || !response.body) {
+          throw new Error(`API call failed: ${response.statusText}`);
+        }
 
-      const apiReply: Message = {
-        id: generateUniqueId(),
-        text: data.reply,
-        sender: 'dealer',
-        timestamp: new Date().toISOString(),
-        avatar: dealer?.avatarUrl, // Fix the avatar property name
-      };
+        let sessionReset = false;
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        reading: while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+
+          let boundary = buffer.indexOf('\n\n');
+          while (boundary !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            boundary = buffer.indexOf('\n\n');
+
+            const event = block.match(/^event: (.*)$/m)?.[1];
+            const data = block.match(/^data: (.*)$/m)?.[1];
+            if (!event || !data) continue;
+            const payload = JSON.parse(data);
 
-      get().addMessage(apiReply);
+            if (event === 'token') {
+              replyText += payload.delta;
+              showReply(replyText);
+            } else if (event === 'done') {
+              showReply(payload.reply || replyText);
+              if (payload.session_id === get().sessionId) {
+                set({ sessionStarted: true });
+              }
+            } else if (event === 'error' && payload.session_reset && attempt === 0) {
+              set({ sessionStarted: false });
+              sessionReset = true;
+              await reader.cancel();
+              break reading;
+            } else if (event === 'error') {
+              showReply(payload.message);
+            }
+          }
+        }
+        if (!sessionReset) break;
+      }
+
+      if (!get().messages.some(m => m.id === replyId)) {
+        throw new Error('Chat stream ended without a reply');
+      }
     } catch (error) {
       console.error("Failed to send message:", error);
       const errorReply: Message = {
@@ -1,6 +1,7 @@
 import { create } from 'zustand';
-import { doc, onSnapshot, setDoc, updateDoc, increment, getDoc, getFirestore } from 'firebase/firestore';
-import { firebaseApp } from 'app'; // Assuming db is initialized firebaseApp from firebase auth extension
+import { doc, collection, onSnapshot, setDoc, updateDoc, increment, getFirestore } from 'firebase/firestore';
+import { firebaseApp, auth } from 'app'; // Assuming db is initialized firebaseApp from firebase auth extension
+import { API_URL } from '../constants';
 import { dealers, getDealerById, OutfitStage } from './dealerData'; // To access winsToUnlock, coinsToUnlock
 
 const db = getFirestore(firebaseApp);
@@ -51,6 +52,33 @@ const initialPlayerData = (userId: string): PlayerData => ({
 });
 
 
+// --- Coin balance ---
+// playerCoins on the playerData document is only the base balance. Bets and spending are
+// debited by the backend (/api/coins/adjust) into playerData/{uid}/coinShards/{k}, and table
+// payouts (/api/game/tables) are credited there too, so the balance we show is the base plus
+// the sum of the shards.
+let baseCoins = 0;
+let shardCoins = 0;
+
+const withShardCoins = (data: PlayerData): PlayerData => {
+  baseCoins = data.playerCoins || 0;
+  return { ...data, playerCoins: baseCoins + shardCoins };
+};
+
+const debitCoins = async (amount: number): Promise<void> => {
+  const response = await fetch(`${API_URL}/api/coins/adjust`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': await auth.getAuthHeaderValue(),
+    },
+    body: JSON.stringify({ amount: -amount }),
+  });
+  if (!response.ok) {
+    throw new Error(`Coin debit failed: ${response.statusText}`);
+  }
+};
+
 // --- Zustand Store Definition ---
 export const usePlayerProgressStore = create<PlayerProgressState>((set, get) => ({
   playerData: null,
@@ -73,16 +101,29 @@ export const usePlayerProgressStore = create<PlayerProgressState>((set, get) =>
   subscribeToPlayerProgress: (userId) => {
     set({ isLoading: true, error: null });
     const playerDocRef = doc(db, 'playerData', userId);
+    baseCoins = 0;
+    shardCoins = 0;
+
+    const unsubscribeShards = onSnapshot(collection(db, 'playerData', userId, 'coinShards'),
+      (shardsSnap) => {
+        shardCoins = shardsSnap.docs.reduce((sum, shard) => sum + (shard.data().coins || 0), 0);
+        const current = get().playerData;
+        if (current) {
+          set({ playerData: { ...current, playerCoins: baseCoins + shardCoins } });
+        }
+      },
+      (err) => console.error("Error subscribing to coin shards:", err)
+    );
 
-    const unsubscribe = onSnapshot(playerDocRef,
+    const unsubscribeDoc = onSnapshot(playerDocRef,
       async (docSnap) => {
         if (docSnap.exists()) {
-          set({ playerData: { userId, ...docSnap.data() } as PlayerData, isLoading: false });
+          set({ playerData: withShardCoins({ userId, ...docSnap.data() } as PlayerData), isLoading: false });
         } else {
           console.log(`Player data for ${userId} not found. Initializing...`);
           try {
             const newPlayerData = await get().initializePlayerData(userId);
-            set({ playerData: newPlayerData, isLoading: false });
+            set({ playerData: withShardCoins(newPlayerData), isLoading: false });
           } catch (e) {
             console.error("Error initializing player data after not found:", e);
             set({ error: e as Error, isLoading: false });
@@ -94,7 +135,11 @@ export const usePlayerProgressStore = create<PlayerProgressState>((set, get) =>
         set({ error: err, isLoading: false });
       }
     );
-    return unsubscribe; // Return the unsubscribe function for cleanup
+    // Return the unsubscribe function for cleanup
+    return () => {
+      unsubscribeDoc();
+      unsubscribeShards();
+    };
   },
 
   syncWithUserProfile: (userId) => {
@@ -105,15 +150,16 @@ export const usePlayerProgressStore = create<PlayerProgressState>((set, get) =>
         const coinsFromProfile = userProfile.totalCoinsEarned || 0;
         
         const currentPlayerData = get().playerData;
-        // Only sync if we have a significant difference and playerData exists
-        if (currentPlayerData && Math.abs(currentPlayerData.playerCoins - coinsFromProfile) > 0) {
+        // Only top up (e.g. the welcome bonus): server-side credits such as table payouts and
+        // purchases are not in the profile, so a lower profile value must not undo them
+        if (currentPlayerData && coinsFromProfile > currentPlayerData.playerCoins) {
+          const topUp = coinsFromProfile - currentPlayerData.playerCoins;
           console.log(`🔄 Syncing coins from profile: ${currentPlayerData.playerCoins} -> ${coinsFromProfile}`);
           
-          // Update playerData document to match profile
           const playerDocRef = doc(db, 'playerData', userId);
           try {
             await updateDoc(playerDocRef, {
-              playerCoins: coinsFromProfile
+              playerCoins: increment(topUp)
             });
           } catch (error) {
             console.error("Error syncing playerData with profile:", error);
@@ -185,33 +231,19 @@ export const usePlayerProgressStore = create<PlayerProgressState>((set, get) =>
   },
 
   updatePlayerCoins: async (userId, amountChange) => {
-    const playerDocRef = doc(db, 'playerData', userId);
+    if (amountChange >= 0) {
+      // Credits are server-side only: table payouts via /api/game/tables, purchases via the ledger
+      console.warn(`Ignoring client-side coin credit of ${amountChange} for ${userId}.`);
+      return;
+    }
     const userProfileRef = doc(db, 'userProfiles', userId);
+    // Bets and spending go through the backend; it refuses to go below zero
     try {
-      // Always update profile first as it's the source of truth for coins
-      await updateDoc(userProfileRef, {
-        totalCoinsEarned: increment(amountChange),
-      });
-      
-      // Then update playerData to match
-      await updateDoc(playerDocRef, {
-        playerCoins: increment(amountChange),
-      });
-
+      await debitCoins(-amountChange);
+      await updateDoc(userProfileRef, { totalCoinsEarned: increment(amountChange) });
       console.log(`💰 Player coins updated for ${userId} by ${amountChange}.`);
     } catch (error) {
-      console.error("Error updating player coins:", error);
-      // If player document doesn't exist, this will fail. Consider initializing if not found.
-      const docSnap = await getDoc(playerDocRef);
-      if (!docSnap.exists()) {
-        console.log("Player document not found while trying to update coins. Initializing...");
-        await get().initializePlayerData(userId); // Initialize first
-        // Get current profile coins to sync properly
-        const profileSnap = await getDoc(userProfileRef);
-        const currentProfileCoins = profileSnap.exists() ? (profileSnap.data().totalCoinsEarned || 0) : 0;
-        await updateDoc(playerDocRef, { playerCoins: currentProfileCoins + amountChange });
-        await updateDoc(userProfileRef, { totalCoinsEarned: increment(amountChange) });
-      }
+      console.error("Error debiting player coins:", error);
     }
   },
 
@@ -237,9 +269,8 @@ export const usePlayerProgressStore = create<PlayerProgressState>((set, get) =>
     }
     
     try {
-      // Update both documents
+      await debitCoins(coinsNeeded);
       await updateDoc(playerDocRef, {
-        playerCoins: increment(-coinsNeeded),
         [`dealerProgress.${dealerId}.currentOutfitStageIndex`]: stageToUnlockIndex,
       });
       console.log(`Player ${userId} unlocked stage ${stageToUnlockIndex} for ${dealerId} with ${coinsNeeded} coins.`);